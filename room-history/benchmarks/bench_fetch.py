@@ -0,0 +1,99 @@
+"""
+Сравнение движков выборки SQLServerConnector: pandas (pyodbc + pd.read_sql) и arrow (arrow-odbc)
+
+Нужны настроенный config/credentials.py и доступный SQL Server. По умолчанию
+замеряется extract_tenants.sql (22 столбца) с lease_id из data/raw/ref_lease.csv.
+
+Запуск:
+    python benchmarks/bench_fetch.py
+    python benchmarks/bench_fetch.py --sql sql/extract_history.sql --repeat 5
+"""
+
+import argparse
+import importlib.util
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+
+from benchmarks.bench_pipeline import DEFAULT_RESULTS_DIR, StageTimer
+
+DEFAULT_SQL = project_root / 'sql' / 'extract_tenants.sql'
+LEASE_REF = project_root / 'data' / 'raw' / 'ref_lease.csv'
+
+
+def load_query(sql_path: Path, lease_limit: int) -> str:
+    """Читает запрос и подставляет lease_id в плейсхолдер extract_tenants.sql"""
+    query = sql_path.read_text(encoding='utf-8').strip()
+    if '{lease_id_placeholder}' in query:
+        if not LEASE_REF.exists():
+            raise FileNotFoundError(f"{LEASE_REF} не найден: сначала выполните извлечение мастер-справочника")
+        lease_ids = pd.read_csv(LEASE_REF)['lease_id'].dropna().astype(int).head(lease_limit)
+        query = query.replace('{lease_id_placeholder}', ','.join(map(str, lease_ids)))
+    return query
+
+
+def run_fetch_benchmark(connector, query: str, repeat: int = 3, trace_memory: bool = True) -> dict:
+    """
+    Выполняет запрос repeat раз каждым движком
+
+    Returns:
+        dict: {движок: {лучшее wall_s, cpu_s, peak_mb, rows, rows_per_s}}
+    """
+    results = {}
+    for engine in ('pandas', 'arrow'):
+        timer = StageTimer(trace_memory=trace_memory)
+        for attempt in range(repeat):
+            timer.run(f'{engine}.{attempt}', connector.execute_query, query, engine=engine)
+
+        best = min(timer.results.values(), key=lambda metrics: metrics['wall_s'])
+        results[engine] = dict(best, rows_per_s=round(best['rows'] / best['wall_s']) if best['wall_s'] else None)
+
+    return results
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='Сравнение движков выборки pandas и arrow')
+    parser.add_argument('--sql', type=Path, default=DEFAULT_SQL, help='SQL-файл запроса')
+    parser.add_argument('--lease-limit', type=int, default=500, help='Количество lease_id для extract_tenants.sql')
+    parser.add_argument('--repeat', type=int, default=3, help='Повторов на движок (берется лучший)')
+    parser.add_argument('--no-memory', action='store_true', help='Не замерять память')
+    parser.add_argument('--output', type=Path, help='Файл результатов JSON')
+    args = parser.parse_args(argv)
+
+    if importlib.util.find_spec('arrow_odbc') is None:
+        print("Пакет arrow-odbc не установлен: pip install arrow-odbc")
+        return 2
+
+    from src.database.db_connector import create_db_connector_from_config
+
+    connector = create_db_connector_from_config()
+    if not connector.test_connection():
+        print("Нет подключения к SQL Server")
+        return 2
+
+    query = load_query(args.sql, args.lease_limit)
+    results = run_fetch_benchmark(connector, query, repeat=args.repeat, trace_memory=not args.no_memory)
+
+    print(f"\nЗапрос: {args.sql.name}")
+    print(f"  {'движок':<10} {'wall, с':>9} {'cpu, с':>9} {'пик, МБ':>9} {'строк':>9} {'строк/с':>10}")
+    for engine, metrics in results.items():
+        peak = '-' if metrics['peak_mb'] is None else f"{metrics['peak_mb']:.1f}"
+        print(f"  {engine:<10} {metrics['wall_s']:>9.3f} {metrics['cpu_s']:>9.3f} {peak:>9} "
+              f"{metrics['rows']:>9} {metrics['rows_per_s'] or '-':>10}")
+
+    output_path = args.output or DEFAULT_RESULTS_DIR / f"fetch_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    report = {'created_at': datetime.now().isoformat(timespec='seconds'), 'sql': args.sql.name, 'results': results}
+    output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\nРезультаты сохранены в {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
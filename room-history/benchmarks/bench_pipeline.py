@@ -0,0 +1,271 @@
+"""
+Бенчмарк стадий извлечения, обработки и построения витрины
+
+Для каждого масштаба генерируется локальная база SQLite (аналог SQL Server),
+затем по очереди замеряются методы DBExtractor, HistoryProcessor и BIMartBuilder:
+время (wall/CPU) и пик памяти Python (tracemalloc). Результаты сохраняются в JSON
+и сравниваются с сохраненным baseline.
+
+Запуск:
+    python benchmarks/bench_pipeline.py --scales 5000 20000
+    python benchmarks/bench_pipeline.py --save-baseline
+    python benchmarks/bench_pipeline.py --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+
+from benchmarks.bench_startup import measure_startup
+from src.database.sqlite_connector import SQLiteConnector
+from src.etl.bi_mart import BIMartBuilder
+from src.etl.data_processor import HistoryProcessor
+from src.etl.db_extractor import DBExtractor
+from src.etl.validation import validate_processed_data
+from src.utils.data_generator import CSVSink, SyntheticDataGenerator, write_dataset
+
+BENCH_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCH_DIR / 'baseline.json'
+DEFAULT_RESULTS_DIR = BENCH_DIR / 'results'
+DEFAULT_SCALES = [5000, 20000]
+
+# SQL-файлы, которые читает DBExtractor (формируются из sql/*.sql.template)
+SQL_FILES = ['extract_master_reference', 'extract_history', 'extract_tenants', 'extract_models']
+
+
+class StageTimer:
+    """Замер времени и пика памяти набора стадий"""
+
+    def __init__(self, trace_memory: bool = True, quiet: bool = True):
+        self.trace_memory = trace_memory
+        self.quiet = quiet
+        self.results = {}
+
+    def run(self, name: str, func, *args, **kwargs):
+        """Выполняет func, сохраняет метрики под именем name и возвращает результат"""
+        output = io.StringIO()
+        if self.trace_memory:
+            tracemalloc.start()
+
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            with contextlib.redirect_stdout(output) if self.quiet else contextlib.nullcontext():
+                result = func(*args, **kwargs)
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            peak = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            if self.trace_memory:
+                tracemalloc.stop()
+
+        self.results[name] = {
+            'wall_s': round(wall, 4),
+            'cpu_s': round(cpu, 4),
+            'peak_mb': round(peak / 2 ** 20, 2) if peak is not None else None,
+            'rows': len(result) if isinstance(result, pd.DataFrame) else None,
+        }
+        return result
+
+
+def prepare_workspace(workspace: Path, rows: int, seed: int = 42, **generator_options) -> dict:
+    """
+    Создает рабочую папку: база SQLite, SQL-файлы, expert.csv и mapping_trc.csv
+
+    generator_options передаются SyntheticDataGenerator (например, first_legal_entity)
+
+    Returns:
+        dict: Пути к базе и папкам sql/raw/processed/mart
+    """
+    paths = {
+        'db': workspace / 'source.sqlite',
+        'sql': workspace / 'sql',
+        'raw': workspace / 'raw',
+        'processed': workspace / 'processed',
+        'mart': workspace / 'mart',
+    }
+    for key in ('sql', 'raw', 'processed', 'mart'):
+        paths[key].mkdir(parents=True, exist_ok=True)
+
+    for name in SQL_FILES:
+        template = project_root / 'sql' / f'{name}.sql.template'
+        shutil.copy(template, paths['sql'] / f'{name}.sql')
+
+    generator = SyntheticDataGenerator.for_history_rows(rows, seed=seed, **generator_options)
+    write_dataset(generator, 'sqlite', paths['db'])
+
+    # Эксперты приходят из CRM API, а не из БД - пишем их сразу в raw
+    expert_sink = CSVSink(paths['raw'])
+    for chunk in generator.iter_chunks():
+        expert_sink.write('expert', chunk['expert'])
+    generator.legal_entity_names()[['crm', 'legal_entity']].to_csv(
+        paths['processed'] / 'mapping_trc.csv', index=False, encoding='utf-8')
+
+    return paths
+
+
+def run_pipeline(paths: dict, timer: StageTimer):
+    """Замеряет стадии пайплайна на подготовленной рабочей папке"""
+    connector = SQLiteConnector(paths['db'])
+    extractor = DBExtractor(connector=connector, sql_dir=str(paths['sql']), output_dir=str(paths['raw']))
+
+    timer.run('extract.get_master_reference', extractor.get_master_reference)
+    timer.run('extract.extract_history', extractor.extract_history)
+    timer.run('extract.extract_tenants_with_placeholder', extractor.extract_tenants_with_placeholder)
+    timer.run('extract.enrich_models_reference', extractor.enrich_models_reference)
+
+    processor = HistoryProcessor(data_dir=paths['raw'], output_dir=paths['processed'])
+    df_history = timer.run('process.load_data', processor.load_data)
+    df_processed = timer.run('process.process_history', processor.process_history, df_history)
+    processor.save_to_csv(df_processed, 'processed_history.csv')
+    processor.save_to_csv(processor.add_fact_to_reference(), 'processed_ref_model.csv')
+
+    df_expert = timer.run('process.create_expert_history', processor.create_expert_history)
+    processor.save_to_csv(df_expert, 'processed_expert_history.csv')
+
+    df_tenants = timer.run('process.add_foreign_key_to_tenants', processor.add_foreign_key_to_tenants)
+    processor.save_to_csv(df_tenants, 'processed_tenants.csv')
+
+    df_contract_history = timer.run('process.create_contract_history', processor.create_contract_history,
+                                    df_processed, df_tenants)
+    processor.save_to_csv(df_contract_history, 'processed_contract_history.csv')
+
+    timer.run('validate', validate_processed_data, data_dir=paths['raw'], processed_dir=paths['processed'])
+
+    mart_builder = BIMartBuilder(processed_dir=paths['processed'], output_dir=paths['mart'])
+    timer.run('mart.build', mart_builder.build)
+
+
+def run_benchmarks(scales: list, trace_memory: bool = True, workspace: Path = None, seed: int = 42,
+                   startup_repeat: int = 3) -> dict:
+    """
+    Выполняет бенчмарк для каждого масштаба (количество строк tbl_crm_status_hist)
+
+    Время запуска CLI и импорта модулей (bench_startup) добавляется под масштабом
+    'startup', startup_repeat=0 отключает замер.
+
+    Returns:
+        dict: Результаты в формате JSON-отчета
+    """
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'trace_memory': trace_memory,
+        'results': {},
+    }
+
+    for rows in scales:
+        with tempfile.TemporaryDirectory(dir=workspace) as tmp_dir:
+            timer = StageTimer(trace_memory=trace_memory)
+            paths = timer.run('setup.generate_source', prepare_workspace, Path(tmp_dir), rows, seed)
+            run_pipeline(paths, timer)
+            report['results'][str(rows)] = timer.results
+
+        total = sum(stage['wall_s'] for stage in timer.results.values())
+        print(f"Масштаб {rows}: {total:.2f} с")
+
+    if startup_repeat:
+        report['results']['startup'] = measure_startup(repeat=startup_repeat)
+
+    return report
+
+
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float = 0.25,
+                          min_delta_s: float = 0.05) -> list:
+    """
+    Сравнивает время стадий с baseline
+
+    Регрессия - стадия медленнее baseline больше чем на tolerance (доля)
+    и больше чем на min_delta_s секунд (чтобы не реагировать на шум коротких стадий).
+
+    Returns:
+        list: Описания регрессий
+    """
+    regressions = []
+    for scale, stages in report['results'].items():
+        baseline_stages = baseline.get('results', {}).get(scale, {})
+        for stage, metrics in stages.items():
+            if stage not in baseline_stages:
+                continue
+            current, previous = metrics['wall_s'], baseline_stages[stage]['wall_s']
+            if current > previous * (1 + tolerance) and current - previous > min_delta_s:
+                regressions.append({
+                    'scale': scale,
+                    'stage': stage,
+                    'baseline_s': previous,
+                    'current_s': current,
+                    'ratio': round(current / previous, 2) if previous else None,
+                })
+    return regressions
+
+
+def print_report(report: dict, regressions: list):
+    """Выводит таблицу результатов и найденные регрессии"""
+    for scale, stages in report['results'].items():
+        print(f"\nМасштаб: {scale} строк истории" if scale != 'startup' else "\nЗапуск CLI и импорт модулей")
+        print(f"  {'стадия':<45} {'wall, с':>9} {'cpu, с':>9} {'пик, МБ':>9} {'строк':>9}")
+        for stage, metrics in stages.items():
+            peak = '-' if metrics['peak_mb'] is None else f"{metrics['peak_mb']:.1f}"
+            rows = '-' if metrics['rows'] is None else str(metrics['rows'])
+            cpu = '-' if metrics['cpu_s'] is None else f"{metrics['cpu_s']:.3f}"
+            print(f"  {stage:<45} {metrics['wall_s']:>9.3f} {cpu:>9} {peak:>9} {rows:>9}")
+
+    if regressions:
+        print("\nРегрессии производительности:")
+        for item in regressions:
+            print(f"  [{item['scale']}] {item['stage']}: {item['baseline_s']:.3f} -> "
+                  f"{item['current_s']:.3f} с (x{item['ratio']})")
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='Бенчмарк стадий пайплайна')
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help='Количество строк tbl_crm_status_hist для каждого прогона')
+    parser.add_argument('--output', type=Path, help='Файл результатов JSON')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help='Файл baseline JSON')
+    parser.add_argument('--save-baseline', action='store_true', help='Сохранить результаты как baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Допустимое замедление (доля)')
+    parser.add_argument('--no-memory', action='store_true', help='Не замерять память (без накладных расходов)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--startup-repeat', type=int, default=3,
+                        help='Запусков для замера старта CLI (0 - не замерять)')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.scales, trace_memory=not args.no_memory, seed=args.seed,
+                            startup_repeat=args.startup_repeat)
+
+    output_path = args.output or DEFAULT_RESULTS_DIR / f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\nРезультаты сохранены в {output_path}")
+
+    regressions = []
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"Baseline сохранен в {args.baseline}")
+    elif args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+        regressions = compare_with_baseline(report, baseline, tolerance=args.tolerance)
+        report['regressions'] = regressions
+        output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    print_report(report, regressions)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
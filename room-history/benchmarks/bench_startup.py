@@ -0,0 +1,89 @@
+"""
+Время запуска CLI и импорта модулей пайплайна
+
+Каждая команда выполняется в отдельном процессе интерпретатора (холодный импорт),
+берется лучшее время из repeat запусков. Результат - словарь стадий в формате
+StageTimer, который bench_pipeline добавляет в отчет под масштабом 'startup'.
+
+Запуск:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --max-s 0.5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # Windows: CPU дочерних процессов недоступно, замеряется только wall
+    resource = None
+
+project_root = Path(__file__).parent.parent
+
+# Стадия -> аргументы интерпретатора
+STARTUP_COMMANDS = {
+    'cli.help': ['main.py', '--help'],
+    'cli.datasets': ['main.py', 'datasets'],
+    'import.src.etl.data_processor': ['-c', 'import src.etl.data_processor'],
+    'import.src.etl.db_extractor': ['-c', 'import src.etl.db_extractor'],
+}
+
+# Команды, которые должны отвечать быстрее порога (--max-s)
+FAST_COMMANDS = ['cli.help', 'cli.datasets']
+
+
+def run_command(args: list) -> tuple:
+    """Запускает интерпретатор с args в корне проекта, возвращает (wall_s, cpu_s или None)"""
+    usage_before = resource.getrusage(resource.RUSAGE_CHILDREN) if resource else None
+    wall_start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=project_root, check=True,
+                   stdout=subprocess.DEVNULL, env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1'))
+    wall = time.perf_counter() - wall_start
+    if usage_before is None:
+        return wall, None
+    usage_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    return wall, cpu
+
+
+def measure_startup(commands: dict = None, repeat: int = 5) -> dict:
+    """
+    Лучшее время запуска каждой команды
+
+    Returns:
+        dict: {стадия: {wall_s, cpu_s, peak_mb, rows}}
+    """
+    results = {}
+    for name, args in (commands or STARTUP_COMMANDS).items():
+        best_wall, best_cpu = min((run_command(args) for _ in range(max(repeat, 1))), key=lambda run: run[0])
+        results[name] = {'wall_s': round(best_wall, 4),
+                         'cpu_s': round(best_cpu, 4) if best_cpu is not None else None,
+                         'peak_mb': None, 'rows': None}
+    return results
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='Время запуска CLI и импорта модулей')
+    parser.add_argument('--repeat', type=int, default=5, help='Запусков каждой команды')
+    parser.add_argument('--max-s', type=float, default=1.0, help='Порог для быстрых команд CLI, с')
+    args = parser.parse_args(argv)
+
+    results = measure_startup(repeat=args.repeat)
+    print(f"  {'стадия':<45} {'wall, с':>9} {'cpu, с':>9}")
+    for name, metrics in results.items():
+        cpu = '-' if metrics['cpu_s'] is None else f"{metrics['cpu_s']:.3f}"
+        print(f"  {name:<45} {metrics['wall_s']:>9.3f} {cpu:>9}")
+
+    slow = [name for name in FAST_COMMANDS if results[name]['wall_s'] > args.max_s]
+    for name in slow:
+        print(f"Медленный запуск: {name} {results[name]['wall_s']:.3f} с > {args.max_s} с")
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
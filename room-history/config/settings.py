@@ -18,7 +18,12 @@ API_CONFIG = {
         'base_url': os.getenv('CRM_BASE_URL', 'https://crm.company.com'),
         'timeout': int(os.getenv('API_TIMEOUT', 30)),
         'retry_attempts': int(os.getenv('API_RETRY_ATTEMPTS', 3)),
-        'page_size': int(os.getenv('CRM_PAGE_SIZE', 100))
+        'page_size': int(os.getenv('CRM_PAGE_SIZE', 100)),
+        # Планировщик запросов (src/api/scheduler.py): запросов в секунду на хост, пачка сверх
+        # равномерного потока и верхняя граница адаптивного окна одновременных запросов
+        'rate_limit': float(os.getenv('CRM_RATE_LIMIT', 5)),
+        'burst': int(os.getenv('CRM_BURST', 5)),
+        'max_concurrency': int(os.getenv('CRM_MAX_CONCURRENCY', 4))
     },
     'erp_system': {
         'base_url': os.getenv('ERP_BASE_URL', 'https://erp.company.com'),
@@ -36,6 +41,37 @@ DATABASE_CONFIG = {
     'database': os.getenv('DB_NAME', 'business_intelligence'),
     'schema': os.getenv('DB_SCHEMA', 'staging'),
     'connection_timeout': int(os.getenv('DB_TIMEOUT', 30)),
-    'command_timeout': int(os.getenv('DB_COMMAND_TIMEOUT', 600))
+    'command_timeout': int(os.getenv('DB_COMMAND_TIMEOUT', 600)),
+    # Движок выборки: 'pandas' (pyodbc + pd.read_sql) или 'arrow' (колоночная выборка arrow-odbc)
+    'fetch_engine': os.getenv('DB_FETCH_ENGINE', 'pandas'),
+    'fetch_batch_size': int(os.getenv('DB_FETCH_BATCH_SIZE', 65536)),
+    # Кэш результатов запросов (включается DB_QUERY_CACHE=1)
+    'query_cache': os.getenv('DB_QUERY_CACHE', '0') == '1',
+    'query_cache_dir': Path(os.getenv('DB_QUERY_CACHE_DIR', DATA_DIR / 'cache' / 'queries')),
+    'query_cache_max_mb': int(os.getenv('DB_QUERY_CACHE_MAX_MB', 2048)),
+    # Расчет previous/future_tenant оконными функциями на стороне БД
+    'tenant_pushdown': os.getenv('DB_TENANT_PUSHDOWN', '0') == '1',
+    # Несколько баз с одинаковой схемой (региональные БД, среды): "msk=sql-msk/BI_MSK,spb=sql-spb/BI_SPB".
+    # Пусто - одна база CurrentConfig.DB_SERVER / DB_NAME (src/etl/sources.py)
+    'sources': os.getenv('DB_SOURCES', '')
 }
 
+# Запись CSV (src/utils/csv_writer.py): чанки кодируются в пуле и пишутся атомарно
+OUTPUT_CONFIG = {
+    'write_workers': int(os.getenv('OUTPUT_WRITE_WORKERS', 4)),
+    'write_chunk_rows': int(os.getenv('OUTPUT_WRITE_CHUNK_ROWS', 100000)),
+    # 'thread' или 'process' (to_csv удерживает GIL - процессы быстрее на больших таблицах)
+    'write_executor': os.getenv('OUTPUT_WRITE_EXECUTOR', 'thread'),
+    # Поток изменений отслеживаемых выгрузок относительно предыдущего снимка (src/etl/changes.py)
+    'change_feed': os.getenv('OUTPUT_CHANGE_FEED', '1') == '1',
+    # Партиционированная выгрузка обработанных наборов для BI (src/etl/export.py)
+    'export_dir': Path(os.getenv('OUTPUT_EXPORT_DIR', DATA_DIR / 'output' / 'export')),
+}
+
+
+# Встроенный SQL над наборами data/processed и data/output/mart (src/utils/sql_engine.py):
+# 'duckdb', 'sqlite' или 'auto' (duckdb, если пакет установлен)
+SQL_ENGINE_CONFIG = {
+    'engine': os.getenv('SQL_ENGINE', 'auto'),
+    'threads': int(os.getenv('SQL_ENGINE_THREADS', os.cpu_count() or 4)),
+}
@@ -1,60 +1,26 @@
-import os
-import pandas as pd
+import sys
 from pathlib import Path
 
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
 
-def get_csv_structure():
-    """Получить структуру CSV файлов в текущей папке"""
+from src.utils.csv_profile import profile_directories, write_profile_json, write_text_report
 
-    # Получаем текущую папку
-    current_dir = Path('.')
 
-    # Находим все CSV файлы, которые не начинаются с _
-    csv_files = [f for f in current_dir.glob('*.csv') if not f.name.startswith('_')]
-
-    # Сортируем файлы по имени
-    csv_files.sort()
-
-    # Создаем список для хранения информации
-    structure_info = []
-
-    for csv_file in csv_files:
-        try:
-            # Читаем CSV файл
-            df = pd.read_csv(csv_file)
-
-            # Получаем названия полей
-            columns = list(df.columns)
-
-            # Добавляем информацию в список
-            structure_info.append({
-                'file_name': csv_file.name,
-                'columns': columns,
-                'row_count': len(df)
-            })
-
-        except Exception as e:
-            print(f"Ошибка при чтении файла {csv_file}: {e}")
+def get_csv_structure(directory='.', sample_rows=None):
+    """Получить структуру CSV файлов в папке (файлы на _ пропускаются)"""
 
+    # Строки считаются без разбора файлов, статистика колонок - по выборке
+    options = {'sample_rows': sample_rows} if sample_rows else {}
+    structure_info = profile_directories({None: Path(directory)}, **options)
     return structure_info
 
 
 def write_structure_to_file(structure_info, output_file='csv_structure.txt'):
-    """Записать структуру в файл"""
-
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("Структура CSV файлов в папке:\n")
-        f.write("=" * 50 + "\n\n")
-
-        for info in structure_info:
-            f.write(f"Файл: {info['file_name']}\n")
-            f.write(f"Количество строк: {info['row_count']}\n")
-            f.write("Поля:\n")
-
-            for i, column in enumerate(info['columns'], 1):
-                f.write(f"  {i}. {column}\n")
+    """Записать структуру в файл (и JSON с тем же именем)"""
 
-            f.write("\n" + "-" * 30 + "\n\n")
+    write_text_report(structure_info, output_file)
+    write_profile_json(structure_info, Path(output_file).with_suffix('.json'))
 
     print(f"Структура записана в файл: {output_file}")
 
@@ -82,4 +48,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,12 @@
+"""
+Точка входа room-history (см. src/cli.py)
+
+    python main.py --help
+"""
+
+import sys
+
+from src.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
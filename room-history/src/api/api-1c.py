@@ -1,3 +1,9 @@
+"""
+Модуль выгрузки ответственных экспертов (expert.csv) через сервис 1С/CRM
+
+Импорт модуля не выполняет запросов: авторизация и загрузка - в extract_1c_data().
+"""
+
 import requests
 import pandas as pd
 from pathlib import Path
@@ -7,43 +13,59 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from config.credentials import CRM_API_USERNAME, CRM_API_PASSWORD, CRM_AUTH_ENDPOINT, CRM_ENDPOINT, CurrentConfig
+from src.api.scheduler import get_scheduler
+from src.etl.changes import SnapshotStore
+from src.utils.csv_writer import write_csv
+
+SELECT_FIELDS = "TrcUnitNumber,TrcShoppingMall,TrcIsChief,TrcContactFullName,TrcRespStartDate,TrcRespEndDate,ModifiedOn,TrcBooleanActive"
+
+
+def extract_1c_data(start_date: str = "2025-01-01T00:00:01Z") -> bool:
+    """Авторизуется в сервисе и сохраняет записи, измененные после start_date, в data/raw/expert.csv"""
+    session = requests.Session()
+    # Тот же сервис, что и у api-crm: общий лимит частоты и повторы
+    scheduler = get_scheduler('crm_system')
 
-session = requests.Session()
+    # Авторизация через сервис
+    auth_url = f"{CurrentConfig.CRM_BASE_URL}{CRM_AUTH_ENDPOINT}"
+    auth_data = {"UserName": CRM_API_USERNAME, "UserPassword": CRM_API_PASSWORD}
 
-# Авторизация через сервис
-auth_url = f"{CurrentConfig.CRM_BASE_URL}{CRM_AUTH_ENDPOINT}"
-auth_data = {"UserName": CRM_API_USERNAME, "UserPassword": CRM_API_PASSWORD}
+    print(f"URL авторизации: {auth_url}")
 
-print(f"URL авторизации: {auth_url}")
-print(f"Тело запроса авторизации: {auth_data}")
+    auth_response = scheduler.post(session, auth_url, json=auth_data)
 
-auth_response = session.post(auth_url, json=auth_data)
+    print(f"Код авторизации: {auth_response.status_code}")
+    print(f"Ответ авторизации: {auth_response.text}")
 
-print(f"Код авторизации: {auth_response.status_code}")
-print(f"Ответ авторизации: {auth_response.text}")
+    if not (auth_response.status_code == 200 and auth_response.json().get("Code") == 0):
+        print("Ошибка авторизации")
+        return False
 
-if auth_response.status_code == 200 and auth_response.json().get("Code") == 0:
-    # Запрос данных с датой 01.01.2025
-    start_date = "2025-01-01T00:00:01Z"
-    select_fields = "TrcUnitNumber,TrcShoppingMall,TrcIsChief,TrcContactFullName,TrcRespStartDate,TrcRespEndDate,ModifiedOn,TrcBooleanActive"
     filter_condition = f"ModifiedOn ge {start_date}"
 
-    url = f"{CurrentConfig.CRM_BASE_URL}{CRM_ENDPOINT}?$select={select_fields}&$filter={filter_condition}"
+    url = f"{CurrentConfig.CRM_BASE_URL}{CRM_ENDPOINT}?$select={SELECT_FIELDS}&$filter={filter_condition}"
     print(f"URL данных: {url}")
 
-    response = session.get(url, timeout=30)
+    response = scheduler.get(session, url)
     print(f"Код ответа данных: {response.status_code}")
 
-    if response.status_code == 200:
-        data = response.json()
-        df = pd.DataFrame(data.get('value', []))
-
-        # Сохраняем в файл
-        output_path = project_root / 'data' / 'raw' / 'expert.csv'
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        df.to_csv(output_path, index=False, encoding='utf-8')
-        print(f"Сохранено {len(df)} записей в expert.csv")
-    else:
+    if response.status_code != 200:
         print(f"Ошибка данных: {response.text}")
-else:
-    print("Ошибка авторизации")
\ No newline at end of file
+        return False
+
+    data = response.json()
+    df = pd.DataFrame(data.get('value', []))
+
+    # Сохраняем в файл
+    output_path = project_root / 'data' / 'raw' / 'expert.csv'
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    # Поток изменений списка экспертов относительно предыдущей выгрузки - data/changes/expert_changes.csv
+    with SnapshotStore().capture(output_path):
+        write_csv(df, output_path, source='1c:' + CRM_ENDPOINT, query=filter_condition)
+    print(f"Сохранено {len(df)} записей в expert.csv")
+    return True
+
+
+if __name__ == "__main__":
+    if not extract_1c_data():
+        sys.exit(1)
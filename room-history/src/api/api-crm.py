@@ -13,17 +13,21 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from config.credentials import CRM_API_USERNAME, CRM_API_PASSWORD, CRM_ENDPOINT, CRM_AUTH_ENDPOINT, CurrentConfig
+from src.api.scheduler import get_scheduler
+from src.utils.csv_writer import write_csv
 
 
 class CRMClient:
     def __init__(self):
         self.session = requests.Session()
         self.base_url = CurrentConfig.CRM_BASE_URL
+        # Лимит частоты, окно конкурентности и повторы - общие для всех клиентов CRM процесса
+        self.scheduler = get_scheduler('crm_system')
 
     def auth(self, username, password):
         auth_url = f"{self.base_url}{CRM_AUTH_ENDPOINT}"
         auth_data = {"UserName": username, "UserPassword": password}
-        response = self.session.post(auth_url, json=auth_data)
+        response = self.scheduler.post(self.session, auth_url, json=auth_data)
 
         print(f"Код ответа: {response.status_code}")
         print(auth_url)
@@ -43,14 +47,14 @@ class CRMClient:
             filter_condition += " and TrcBooleanActive eq true"
 
         api_url = f"{self.base_url}{CRM_ENDPOINT}?$select={select_fields}&$filter={filter_condition}"
-        response = self.session.get(api_url)
+        response = self.scheduler.get(self.session, api_url)
         return response.json() if response.status_code == 200 else None
 
 
 def save_to_csv(df, filename, output_dir='data/raw'):
     output_path = project_root / output_dir / filename
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(output_path, index=False, encoding='utf-8')
+    write_csv(df, output_path, source='crm:' + CRM_ENDPOINT)
     print(f"Успешно: {len(df)} записей сохранено в {filename}")
 
 
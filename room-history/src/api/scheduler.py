@@ -0,0 +1,294 @@
+"""
+Планировщик HTTP-запросов к CRM/1С: лимит частоты, адаптивная конкурентность, повторы
+
+Для каждого хоста:
+    TokenBucket - не больше rate запросов в секунду (с пачкой до burst);
+    AIMDWindow  - окно одновременных запросов: растет на 1 за окно успешных ответов
+                  с нормальной задержкой и уменьшается вдвое на 429/5xx, таймаут или
+                  всплеск задержки (больше latency_factor x сглаженной базовой).
+Ответы 429/503 с Retry-After приостанавливают выдачу токенов хоста на указанное время;
+остальные повторы - с экспоненциальной задержкой и полным джиттером. Число повторов -
+API_CONFIG[...]['retry_attempts'].
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+import random
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.settings import API_CONFIG
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: Optional[str], now: datetime = None) -> Optional[float]:
+    """Retry-After в секундах: число секунд или HTTP-дата (None, если заголовок некорректен)"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = now or datetime.now(timezone.utc)
+    return max((moment - now).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    """
+    Лимит частоты: rate токенов в секунду, не больше burst накопленных
+
+    Args:
+        rate: Запросов в секунду
+        burst: Емкость ведра
+        clock, sleep: Источник времени и ожидание (подменяются в тестах)
+    """
+
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(self.burst)
+        self.updated = clock()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Забирает токен; возвращает время ожидания до его появления"""
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def acquire(self) -> float:
+        """Ждет токен; возвращает время ожидания"""
+        wait = self._reserve()
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float):
+        """Не выдавать токены seconds секунд (Retry-After)"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+
+class AIMDWindow:
+    """
+    Окно одновременных запросов с аддитивным ростом и мультипликативным уменьшением
+
+    Args:
+        initial: Начальный размер окна
+        minimum, maximum: Границы окна
+        decrease: Множитель при перегрузке
+        latency_factor: Задержка выше latency_factor x недавней считается перегрузкой
+
+    Задержка отслеживается двумя скользящими средними по всем успешным ответам:
+    recent (быстрая) - для обнаружения всплесков, baseline (медленная) - длительность
+    волны запросов. Устойчивый переход на новый уровень задержки перестает считаться
+    перегрузкой, как только recent его догоняет.
+    """
+
+    def __init__(self, initial: int = 2, minimum: int = 1, maximum: int = 16, decrease: float = 0.5,
+                 latency_factor: float = 3.0):
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.baseline = None
+        self.recent = None
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self, latency: float):
+        """Успешный ответ: рост окна или уменьшение при всплеске задержки"""
+        with self._condition:
+            spike = self.recent is not None and latency > self.latency_factor * self.recent
+            self.recent = latency if self.recent is None else 0.5 * self.recent + 0.5 * latency
+            self.baseline = latency if self.baseline is None else 0.9 * self.baseline + 0.1 * latency
+            if spike:
+                self._shrink()
+                return
+            # +1 к окну за limit успешных ответов
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def on_congestion(self):
+        """429/5xx или таймаут"""
+        with self._condition:
+            self._shrink()
+
+    def _shrink(self):
+        # Ответы одной волны запросов уменьшают окно один раз
+        now = time.monotonic()
+        if now - self._last_decrease < (self.baseline or 0.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease)
+
+
+class HostState:
+    """Лимиты и счетчики одного хоста"""
+
+    def __init__(self, bucket: TokenBucket, window: AIMDWindow):
+        self.bucket = bucket
+        self.window = window
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'retries': 0}
+        self.lock = threading.Lock()
+
+    def count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+
+class RequestScheduler:
+    """
+    Общий планировщик запросов API-клиентов (состояние - по хостам)
+
+    Args:
+        rate: Запросов в секунду на хост
+        burst: Пачка запросов сверх равномерного потока
+        max_concurrency: Верхняя граница окна одновременных запросов
+        retry_attempts: Повторов после первой попытки
+        timeout: Таймаут запроса, с
+        backoff_base, backoff_cap: Экспоненциальная задержка повторов (полный джиттер)
+    """
+
+    def __init__(self, rate: float = 10.0, burst: int = 5, max_concurrency: int = 8, retry_attempts: int = 3,
+                 timeout: float = 30, backoff_base: float = 0.5, backoff_cap: float = 30.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.retry_attempts = retry_attempts
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.sleep = sleep
+        self.hosts: Dict[str, HostState] = {}
+        self._lock = threading.Lock()
+
+    def host(self, url: str) -> HostState:
+        name = urlsplit(url).netloc
+        with self._lock:
+            if name not in self.hosts:
+                self.hosts[name] = HostState(
+                    TokenBucket(self.rate, self.burst, sleep=self.sleep),
+                    AIMDWindow(initial=min(2, self.max_concurrency), maximum=self.max_concurrency),
+                )
+            return self.hosts[name]
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def request(self, session: requests.Session, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Запрос с лимитами хоста и повторами
+
+        Возвращает последний ответ (в том числе 429/5xx после исчерпания повторов);
+        сетевая ошибка последней попытки пробрасывается.
+        """
+        state = self.host(url)
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.retry_attempts + 1):
+            last = attempt == self.retry_attempts
+            state.bucket.acquire()
+            state.window.acquire()
+            started = time.monotonic()
+            try:
+                state.count('requests')
+                response = session.request(method, url, **kwargs)
+            except (requests.Timeout, requests.ConnectionError):
+                state.count('errors')
+                state.window.on_congestion()
+                if last:
+                    raise
+                state.count('retries')
+                self.sleep(self.backoff(attempt))
+                continue
+            finally:
+                state.window.release()
+
+            if response.status_code not in RETRY_STATUSES:
+                state.window.on_success(time.monotonic() - started)
+                return response
+
+            state.count('throttled')
+            state.window.on_congestion()
+            if last:
+                return response
+            state.count('retries')
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                # Ограничение сервера действует на все запросы к хосту
+                state.bucket.pause(retry_after)
+            else:
+                self.sleep(self.backoff(attempt))
+        return response
+
+    def get(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        return self.request(session, 'GET', url, **kwargs)
+
+    def post(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        return self.request(session, 'POST', url, **kwargs)
+
+    def map(self, session: requests.Session, urls: List[str], method: str = 'GET',
+            **kwargs) -> List[requests.Response]:
+        """Параллельные запросы (порядок ответов совпадает с urls); конкурентность ограничивает окно хоста"""
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='api') as executor:
+            return list(executor.map(lambda url: self.request(session, method, url, **kwargs), urls))
+
+    def stats(self) -> Dict[str, dict]:
+        """Счетчики и текущее окно по хостам"""
+        return {name: {**state.stats, 'window': round(state.window.limit, 2)} for name, state in self.hosts.items()}
+
+
+_schedulers: Dict[str, RequestScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(system: str = 'crm_system') -> RequestScheduler:
+    """Общий планировщик системы из API_CONFIG (один на процесс)"""
+    with _schedulers_lock:
+        if system not in _schedulers:
+            config = API_CONFIG[system]
+            _schedulers[system] = RequestScheduler(
+                rate=config['rate_limit'],
+                burst=config['burst'],
+                max_concurrency=config['max_concurrency'],
+                retry_attempts=config['retry_attempts'],
+                timeout=config['timeout'],
+            )
+        return _schedulers[system]
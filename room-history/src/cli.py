@@ -0,0 +1,255 @@
+"""
+Единая точка входа room-history: extract / sync-crm / sync-erp / process / export / validate / mart / sql /
+bench / datasets / profile
+
+Модуль импортирует только стандартную библиотеку: pandas, SQLAlchemy, requests и
+модули пайплайна загружаются внутри выбранной команды, поэтому --help и datasets
+отвечают без затрат на импорт тяжелых зависимостей.
+
+Запуск:
+    python main.py datasets
+    python main.py extract --sequential
+    python main.py process
+    python main.py --profile-stages sample process
+    python main.py sql "SELECT legal_entity, COUNT(*) FROM processed_history GROUP BY 1"
+    python main.py bench --scales 5000
+"""
+
+import argparse
+import importlib.util
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.csv_profile import count_lines
+
+# Каталоги наборов данных для команды datasets
+DATASET_DIRS = {
+    'raw': project_root / 'data' / 'raw',
+    'processed': project_root / 'data' / 'processed',
+    'mart': project_root / 'data' / 'output' / 'mart',
+}
+
+
+def load_api_module(filename: str):
+    """Загружает модуль src/api по имени файла (имена с дефисом недоступны через import)"""
+    path = project_root / 'src' / 'api' / filename
+    spec = importlib.util.spec_from_file_location(f"src.api.{path.stem.replace('-', '_')}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def list_datasets(dirs: dict = None, rows: bool = False) -> List[dict]:
+    """Файлы CSV наборов данных: каталог, имя, размер, время изменения (и строки при rows)"""
+    from src.utils.catalog import DatasetCatalog
+
+    datasets = []
+    for location, directory in (dirs or DATASET_DIRS).items():
+        if not directory.exists():
+            continue
+        catalog = DatasetCatalog(directory)
+        entries = catalog.load()
+        for path in sorted(directory.glob('*.csv')):
+            stat = path.stat()
+            item = {
+                'location': location,
+                'name': path.name,
+                'size_bytes': stat.st_size,
+                'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds'),
+            }
+            if rows:
+                # Число строк из каталога, если файл не менялся после записи; иначе - подсчет по файлу
+                entry = entries.get(path.name)
+                unchanged = entry and entry['bytes'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+                item['rows'] = entry['rows'] if unchanged else count_lines(path)
+            datasets.append(item)
+    return datasets
+
+
+def cmd_datasets(args) -> int:
+    datasets = list_datasets(rows=args.rows)
+    if not datasets:
+        print("Наборы данных не найдены")
+        return 0
+    for item in datasets:
+        size_kb = item['size_bytes'] / 1024
+        rows = f" {item['rows']:>10} строк" if 'rows' in item else ''
+        print(f"  {item['location']:<10} {item['name']:<45} {size_kb:>10.1f} КБ  {item['modified']}{rows}")
+    return 0
+
+
+def dataset_location(value: str) -> str:
+    """Тип аргумента profile: имя каталога из DATASET_DIRS"""
+    if value not in DATASET_DIRS:
+        raise argparse.ArgumentTypeError(
+            f"неизвестный каталог: {value} (допустимые: {', '.join(sorted(DATASET_DIRS))})")
+    return value
+
+
+def cmd_profile(args) -> int:
+    from src.utils.csv_profile import profile_directories, write_profile_json, write_text_report
+
+    # По умолчанию профилируются raw и processed
+    locations = args.locations or ['raw', 'processed']
+    dirs = {location: DATASET_DIRS[location] for location in locations}
+    profiles = profile_directories(dirs, sample_rows=args.sample, max_workers=args.workers)
+    if not profiles:
+        print("Наборы данных не найдены")
+        return 0
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    write_profile_json(profiles, output.with_suffix('.json'))
+    write_text_report(profiles, output.with_suffix('.txt'))
+    print(f"Профиль {len(profiles)} файлов записан в {output.with_suffix('.json')} и {output.with_suffix('.txt')}")
+    return 0
+
+
+def cmd_extract(args) -> int:
+    from src.etl.db_extractor import extract_data
+
+    return 0 if extract_data(parallel=args.parallel, resume=args.resume) else 1
+
+
+def cmd_sync_crm(args) -> int:
+    return 0 if load_api_module('api-crm.py').extract_crm_data() else 1
+
+
+def cmd_sync_erp(args) -> int:
+    return 0 if load_api_module('api-1c.py').extract_1c_data() else 1
+
+
+def cmd_process(args) -> int:
+    from src.etl.data_processor import process_history_data
+
+    return 0 if process_history_data() else 1
+
+
+def cmd_export(args) -> int:
+    from src.etl.export import export_processed
+
+    return 0 if export_processed(export_dir=args.output) else 1
+
+
+def cmd_validate(args) -> int:
+    from src.etl.validation import validate_processed_data
+
+    report = validate_processed_data(sample_fraction=args.sample, seed=args.seed)
+    return 0 if report.ok else 1
+
+
+def cmd_mart(args) -> int:
+    from src.etl.bi_mart import build_bi_mart
+
+    return 0 if build_bi_mart() else 1
+
+
+def cmd_sql(args) -> int:
+    from src.utils.sql_engine import DatasetEngine
+
+    with DatasetEngine(engine=args.engine) as engine:
+        if not args.query:
+            print(f"Таблицы ({engine.engine}):")
+            print(engine.describe().to_string(index=False))
+            return 0
+        df = engine.query(args.query)
+
+    if args.output:
+        from src.utils.csv_writer import write_csv
+
+        write_csv(df, Path(args.output), catalog=False)
+        print(f"{len(df)} строк записано в {args.output}")
+    else:
+        print(df.to_string(index=False, max_rows=args.max_rows))
+    return 0
+
+
+def cmd_bench(args) -> int:
+    from benchmarks.bench_pipeline import main as bench_main
+
+    return bench_main(args.options)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='room-history', description='ETL истории статусов помещений')
+    parser.add_argument('--profile-stages', choices=['sample', 'deterministic'],
+                        help='Профилировать стадии (профили в logs/profiles/<run_id>)')
+    parser.add_argument('--profile-rate', type=float, default=1.0,
+                        help='Доля запусков, которые профилируются')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    datasets = commands.add_parser('datasets', help='Список наборов данных в data/')
+    datasets.add_argument('--rows', action='store_true', help='Подсчитать строки файлов')
+    datasets.set_defaults(func=cmd_datasets)
+
+    profile = commands.add_parser('profile', help='Профиль наборов: строки, колонки, пропуски, мощность, min/max')
+    # choices не используется: argparse проверяет по ним и значение по умолчанию для nargs='*'
+    profile.add_argument('locations', nargs='*', type=dataset_location, metavar='location',
+                         help=f"Каталоги ({', '.join(sorted(DATASET_DIRS))}; по умолчанию raw и processed)")
+    profile.add_argument('--sample', type=int, default=50000, help='Строк в выборке для статистики')
+    profile.add_argument('--workers', type=int, default=4, help='Файлов профилируется параллельно')
+    profile.add_argument('--output', default=str(project_root / 'data' / 'profile'),
+                         help='Путь отчета без расширения (.json и .txt)')
+    profile.set_defaults(func=cmd_profile)
+
+    extract = commands.add_parser('extract', help='Извлечение из SQL Server в data/raw')
+    extract.add_argument('--sequential', dest='parallel', action='store_false',
+                         help='Выполнять запросы последовательно')
+    extract.add_argument('--restart', dest='resume', action='store_false',
+                         help='Начать выгрузки чанками заново, не используя контрольные точки data/checkpoints')
+    extract.set_defaults(func=cmd_extract)
+
+    commands.add_parser('sync-crm', help='Выгрузка экспертов из CRM').set_defaults(func=cmd_sync_crm)
+    commands.add_parser('sync-erp', help='Выгрузка expert.csv из сервиса 1С').set_defaults(func=cmd_sync_erp)
+    commands.add_parser('process', help='Обработка data/raw -> data/processed').set_defaults(func=cmd_process)
+
+    export = commands.add_parser('export', help='Партиции legal_entity/month обработанных наборов для BI')
+    export.add_argument('--output', help='Каталог выгрузки (по умолчанию data/output/export)')
+    export.set_defaults(func=cmd_export)
+
+    validate = commands.add_parser('validate', help='Проверка качества данных')
+    validate.add_argument('--sample', type=float, help='Доля проверяемых цепочек/строк')
+    validate.add_argument('--seed', type=int, default=0)
+    validate.set_defaults(func=cmd_validate)
+
+    commands.add_parser('mart', help='Построение BI витрины').set_defaults(func=cmd_mart)
+
+    sql = commands.add_parser('sql', help='SQL-запрос к наборам data/processed и витрины (без запроса - список таблиц)')
+    sql.add_argument('query', nargs='?', help='Текст запроса, таблицы - имена файлов без .csv')
+    sql.add_argument('--engine', choices=['auto', 'duckdb', 'sqlite'], help='Движок (по умолчанию SQL_ENGINE)')
+    sql.add_argument('--output', help='Сохранить результат в CSV')
+    sql.add_argument('--max-rows', type=int, default=50, help='Строк результата в выводе')
+    sql.set_defaults(func=cmd_sql)
+
+    commands.add_parser('bench', help='Бенчмарк стадий (остальные аргументы передаются bench_pipeline)') \
+        .set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """Разбор аргументов; нераспознанные аргументы допустимы только для bench"""
+    parser = build_parser()
+    args, options = parser.parse_known_args(argv)
+    if options and args.command != 'bench':
+        parser.error(f"нераспознанные аргументы: {' '.join(options)}")
+    args.options = options[1:] if options[:1] == ['--'] else options
+    return args
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    if args.profile_stages:
+        from src.utils.profiling import configure_profiling
+
+        configure_profiling(mode=args.profile_stages, rate=args.profile_rate,
+                            output_dir=project_root / 'logs' / 'profiles')
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Пакетная загрузка DataFrame в БД (SQL Server и SQLite)
+"""
+
+import logging
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10000
+
+# Типы колонок для создания таблиц по dtype DataFrame
+SQL_TYPES = {
+    'mssql': {
+        'integer': 'BIGINT',
+        'float': 'FLOAT',
+        'bool': 'BIT',
+        'datetime': 'DATETIME2',
+        'string': 'NVARCHAR(4000)',
+    },
+    'sqlite': {
+        'integer': 'INTEGER',
+        'float': 'REAL',
+        'bool': 'INTEGER',
+        'datetime': 'TEXT',
+        'string': 'TEXT',
+    },
+}
+
+
+def iter_dataframe_chunks(data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+                          chunk_size: int = DEFAULT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Разбивает DataFrame (или поток DataFrame) на чанки не больше chunk_size строк
+
+    Args:
+        data: DataFrame или итератор DataFrame (например, pd.read_csv(..., chunksize=...))
+        chunk_size: Максимальный размер чанка
+    """
+    frames = [data] if isinstance(data, pd.DataFrame) else data
+
+    for frame in frames:
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size]
+
+
+def dataframe_to_rows(df: pd.DataFrame, datetime_as_str: bool = False) -> List[tuple]:
+    """
+    Преобразует DataFrame в список кортежей для executemany
+
+    NaN/NaT/pd.NA заменяются на None, numpy-типы - на встроенные типы Python.
+    Преобразование выполняется поколоночно (Series.tolist), без обхода ячеек в Python.
+    """
+    columns = []
+    for _, series in df.items():
+        if datetime_as_str and pd.api.types.is_datetime64_any_dtype(series.dtype):
+            series = series.dt.strftime('%Y-%m-%d %H:%M:%S')
+        if series.hasnans:
+            series = series.astype(object).where(series.notna(), None)
+        columns.append(series.tolist())
+
+    return list(zip(*columns))
+
+
+def column_kind(dtype) -> str:
+    """Определяет обобщенный тип колонки по dtype"""
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'integer'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'float'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime'
+    return 'string'
+
+
+def widen_kind(current: str, new: str) -> str:
+    """Общий тип колонки для значений двух типов (целые -> float, прочее -> строка)"""
+    if current == new:
+        return current
+    if {current, new} <= {'bool', 'integer', 'float'}:
+        return 'float' if 'float' in (current, new) else 'integer'
+    return 'string'
+
+
+def max_text_length(series: pd.Series) -> int:
+    """Длина самого длинного значения колонки в текстовом виде (0 - значений нет)"""
+    lengths = series.dropna().astype(str).str.len()
+    return int(lengths.max()) if len(lengths) else 0
+
+
+def conform_chunk(chunk: pd.DataFrame, kinds: Dict[str, str]) -> pd.DataFrame:
+    """
+    Приводит целые колонки с пропусками (float64 после read_csv) обратно к целым
+
+    Чанк read_csv с NaN в целой колонке получает float64; если все значения целые,
+    колонка загружается как целая и тип таблицы не расширяется.
+    """
+    casts = {}
+    for column, kind in kinds.items():
+        series = chunk[column]
+        if kind == 'integer' and pd.api.types.is_float_dtype(series.dtype):
+            values = series.dropna()
+            if (values == values.round()).all():
+                casts[column] = 'Int64'
+    return chunk.astype(casts) if casts else chunk
+
+
+class BulkLoadMixin:
+    """
+    Общая логика пакетной загрузки для коннекторов
+
+    Коннектор должен реализовать get_connection() и атрибут DIALECT,
+    а также методы _quote, _table_ref, _table_exists, _swap_statements;
+    _table_columns - если типы существующей таблицы нужно учитывать при дозаписи.
+    """
+
+    DIALECT = None
+
+    def _prepare_cursor(self, cursor):
+        """Настройка курсора перед пакетной вставкой"""
+        return cursor
+
+    def _begin(self, conn):
+        """Начало транзакции (по умолчанию транзакция открывается драйвером)"""
+
+    def _create_table_sql(self, table_ref: str, kinds: Dict[str, str]) -> str:
+        """Формирует CREATE TABLE без индексов (heap) по обобщенным типам колонок"""
+        types = SQL_TYPES[self.DIALECT]
+        columns = ', '.join(f'{self._quote(column)} {types[kind]}' for column, kind in kinds.items())
+        return f'CREATE TABLE {table_ref} ({columns})'
+
+    def _table_columns(self, cursor, schema: Optional[str], table: str) -> Dict[str, Tuple[str, Optional[int]]]:
+        """{колонка: (обобщенный тип, длина строки или None)} существующей таблицы ({} - не известны)"""
+        return {}
+
+    def _alter_column_sql(self, table_ref: str, column: str, kind: str) -> Optional[str]:
+        """Расширение типа колонки таблицы (None - не требуется)"""
+        return f'ALTER TABLE {table_ref} ALTER COLUMN {self._quote(column)} {SQL_TYPES[self.DIALECT][kind]}'
+
+    def _insert_sql(self, table_ref: str, columns: List[str]) -> str:
+        """Формирует параметризованный INSERT"""
+        column_list = ', '.join(self._quote(column) for column in columns)
+        placeholders = ', '.join('?' for _ in columns)
+        return f'INSERT INTO {table_ref} ({column_list}) VALUES ({placeholders})'
+
+    def bulk_load(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]], table: str,
+                  schema: Optional[str] = None, chunk_size: int = DEFAULT_BATCH_SIZE,
+                  swap: bool = False, dtypes: Dict[str, str] = None) -> int:
+        """
+        Пакетная загрузка данных в таблицу
+
+        Типы колонок создаваемой таблицы берутся из dtypes (например, схема каталога),
+        иначе - из первого чанка; при дозаписи - из существующей таблицы. Если в чанке
+        тип колонки шире (целые -> float, числа -> строки) или строки длиннее объявленной
+        длины, колонка расширяется до вставки.
+
+        Args:
+            data: DataFrame или поток DataFrame
+            table: Имя целевой таблицы
+            schema: Схема (по умолчанию из настроек коннектора)
+            chunk_size: Количество строк в одном пакете executemany
+            swap: Загрузить во временную heap-таблицу и подменить ей целевую
+            dtypes: {колонка: dtype pandas} для создания таблицы
+
+        Returns:
+            int: Количество загруженных строк
+        """
+        chunks = iter_dataframe_chunks(data, chunk_size)
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            logger.info(f"Нет данных для загрузки в {table}")
+            return 0
+
+        columns = list(first_chunk.columns)
+        dtypes = {column: dtype for column, dtype in (dtypes or {}).items() if dtype != 'unknown'}
+        kinds = {column: column_kind(dtypes.get(column, first_chunk[column].dtype)) for column in columns}
+        load_table = f'{table}__stage' if swap else table
+        load_ref = self._table_ref(schema, load_table)
+        insert_sql = self._insert_sql(load_ref, columns)
+        datetime_as_str = self.DIALECT == 'sqlite'
+        total_rows = 0
+
+        with self.get_connection() as conn:
+            cursor = self._prepare_cursor(conn.cursor())
+
+            self._begin(conn)
+            if swap:
+                cursor.execute(f'DROP TABLE IF EXISTS {load_ref}')
+            created = swap or not self._table_exists(cursor, schema, load_table)
+            lengths = {}
+            if created:
+                cursor.execute(self._create_table_sql(load_ref, kinds))
+            else:
+                # Дозапись: типы существующей таблицы расширяются так же, как у созданной
+                existing = self._table_columns(cursor, schema, load_table)
+                missing = [column for column in columns if existing and column not in existing]
+                if missing:
+                    raise ValueError(f"В таблице {load_ref} нет колонок {missing}")
+                for column in columns:
+                    if column in existing:
+                        kinds[column], length = existing[column]
+                        if length is not None:
+                            lengths[column] = length
+            conn.commit()
+
+            for chunk in chain([first_chunk], chunks):
+                chunk = conform_chunk(chunk[columns], kinds)
+                self._begin(conn)
+                for column, dtype in chunk.dtypes.items():
+                    kind = widen_kind(kinds[column], column_kind(dtype))
+                    too_long = (kind == 'string' and column in lengths
+                                and max_text_length(chunk[column]) > lengths[column])
+                    if kind == kinds[column] and not too_long:
+                        continue
+                    kinds[column] = kind
+                    lengths.pop(column, None)
+                    statement = self._alter_column_sql(load_ref, column, kind)
+                    if statement:
+                        logger.info(f"Колонка {column} таблицы {load_ref} расширена до {kind}")
+                        cursor.execute(statement)
+                cursor.executemany(insert_sql, dataframe_to_rows(chunk, datetime_as_str))
+                conn.commit()
+                total_rows += len(chunk)
+
+            if swap:
+                # Подмена выполняется одной транзакцией: читатели видят либо старую, либо новую таблицу
+                self._begin(conn)
+                for statement in self._swap_statements(schema, load_table, table):
+                    cursor.execute(statement)
+                conn.commit()
+
+        logger.info(f"Загружено {total_rows} строк в {self._table_ref(schema, table)}")
+        return total_rows
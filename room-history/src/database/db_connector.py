@@ -3,28 +3,97 @@
 Универсальный коннектор для работы с SQL Server
 """
 
-import pyodbc
 import logging
 import pandas as pd
-import sqlalchemy as sa
-from typing import List, Dict, Optional, Any
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
 from contextlib import contextmanager
 import urllib.parse
 
+from config.settings import DATABASE_CONFIG
+from src.database.bulk_load import BulkLoadMixin
+from src.database.query_pool import QueryPoolMixin
+from src.database.query_cache import QueryCacheMixin, referenced_tables
+from src.utils.helpers import query_label, track
+
+if TYPE_CHECKING:
+    # Драйверы импортируются при подключении: модуль загружается без них
+    import pyarrow
+    import pyodbc
+    import sqlalchemy
+
 logger = logging.getLogger(__name__)
 
+FETCH_ENGINES = ('pandas', 'arrow')
+
+# Обобщенные типы колонок существующих таблиц (прочие типы - строки)
+SQL_SERVER_KINDS = {
+    'bigint': 'integer', 'int': 'integer', 'smallint': 'integer', 'tinyint': 'integer',
+    'float': 'float', 'real': 'float', 'decimal': 'float', 'numeric': 'float', 'money': 'float',
+    'bit': 'bool',
+    'datetime2': 'datetime', 'datetime': 'datetime', 'smalldatetime': 'datetime', 'date': 'datetime',
+}
+
+
+def arrow_to_frame(table, dtype_backend: str = 'numpy') -> pd.DataFrame:
+    """
+    Преобразует pyarrow.Table в DataFrame
+
+    'numpy' - те же типы, что дает pd.read_sql (целые с NULL -> float64, строки -> object);
+    'pyarrow' - столбцы pd.ArrowDtype поверх буферов Arrow без копирования.
+    """
+    if dtype_backend == 'pyarrow':
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+class CancellableConnection:
+    """
+    Подключение pyodbc, запоминающее открытые на нем курсоры
+
+    pd.read_sql открывает курсор сам, поэтому курсор выполняющегося запроса доступен
+    только через обертку подключения. cancel() вызывается из другого потока
+    (отмена задачи пула) и прерывает запросы курсоров через SQLCancel.
+    """
+
+    def __init__(self, connection: 'pyodbc.Connection'):
+        self._connection = connection
+        self._cursors = []
+
+    def cursor(self) -> 'pyodbc.Cursor':
+        cursor = self._connection.cursor()
+        self._cursors.append(cursor)
+        return cursor
+
+    def cancel(self):
+        """Прерывает выполняющиеся на подключении запросы"""
+        for cursor in list(self._cursors):
+            try:
+                cursor.cancel()
+            except Exception as e:
+                # Курсор уже закрыт вместе с подключением
+                logger.warning(f"Не удалось прервать запрос: {e}")
+
+    def __getattr__(self, name: str):
+        return getattr(self._connection, name)
 
-class SQLServerConnector:
+
+class SQLServerConnector(BulkLoadMixin, QueryCacheMixin, QueryPoolMixin):
     """
     Универсальный коннектор для работы с SQL Server
     Поддерживает различные методы аутентификации
     """
 
+    DIALECT = 'mssql'
+
     def __init__(self, server: str, database: str, username: str = None,
                  password: str = None, driver: str = 'ODBC Driver 18 for SQL Server',
-                 use_windows_auth: bool = False, trust_server_certificate: bool = True):
+                 use_windows_auth: bool = False, trust_server_certificate: bool = True,
+                 schema: str = DATABASE_CONFIG['schema'],
+                 fetch_engine: str = DATABASE_CONFIG['fetch_engine']):
         """
         Инициализация подключения к SQL Server
+
+        fetch_engine - движок execute_query по умолчанию: 'pandas' или 'arrow'
         """
         self.server = server
         self.database = database
@@ -33,6 +102,8 @@ class SQLServerConnector:
         self.driver = driver
         self.use_windows_auth = use_windows_auth
         self.trust_server_certificate = trust_server_certificate
+        self.schema = schema
+        self.fetch_engine = fetch_engine
 
         self.connection_string = self._build_connection_string()
         self.engine = self._create_sqlalchemy_engine()
@@ -60,8 +131,11 @@ class SQLServerConnector:
 
         return ''.join(connection_parts)
 
-    def _create_sqlalchemy_engine(self) -> sa.engine.Engine:
+    def _create_sqlalchemy_engine(self) -> 'sqlalchemy.engine.Engine':
         """Создание SQLAlchemy engine для работы с pandas"""
+        # SQLAlchemy импортируется при создании коннектора: импорт модуля не замедляет запуск CLI
+        import sqlalchemy as sa
+
         if self.use_windows_auth:
             connection_uri = (
                 f"mssql+pyodbc://{self.server}/{self.database}"
@@ -84,18 +158,24 @@ class SQLServerConnector:
         return sa.create_engine(connection_uri, pool_pre_ping=True)
 
     @contextmanager
-    def get_connection(self) -> pyodbc.Connection:
-        """Context manager для получения подключения через pyodbc"""
+    def get_connection(self) -> CancellableConnection:
+        """Context manager для получения подключения через pyodbc (запросы прерываются при отмене задачи пула)"""
+        # pyodbc импортируется при подключении: модуль можно использовать без ODBC драйвера
+        import pyodbc
+
         connection = None
         try:
             connection = pyodbc.connect(self.connection_string)
+            cancellable = CancellableConnection(connection)
+            self._connection_opened(cancellable)
             logger.info(f"Успешное подключение к БД {self.database} на сервере {self.server}")
-            yield connection
+            yield cancellable
         except pyodbc.Error as e:
             logger.error(f"Ошибка подключения к БД: {e}")
             raise
         finally:
             if connection:
+                self._connection_closed()
                 connection.close()
 
     def test_connection(self) -> bool:
@@ -110,36 +190,218 @@ class SQLServerConnector:
             logger.error(f"Тест подключения к БД провален: {e}")
             return False
 
-    def execute_query(self, query: str, params: tuple = None) -> pd.DataFrame:
-        """Выполнение SQL запроса и возврат результата в виде DataFrame"""
-        try:
+    def execute_query(self, query: str, params: tuple = None, engine: str = None) -> pd.DataFrame:
+        """
+        Выполнение SQL запроса и возврат результата в виде DataFrame
+
+        Args:
+            query: SQL запрос
+            params: Параметры запроса
+            engine: 'pandas' (pyodbc + pd.read_sql) или 'arrow' (колоночная выборка),
+                    по умолчанию self.fetch_engine
+        """
+        engine = engine or self.fetch_engine
+        if engine not in FETCH_ENGINES:
+            raise ValueError(f"Неизвестный движок выборки: {engine}. Допустимые: {FETCH_ENGINES}")
+
+        def fetch() -> pd.DataFrame:
+            if engine == 'arrow':
+                table = self.fetch_arrow(query, params)
+                metrics.add_bytes_read(table.nbytes)
+                return arrow_to_frame(table)
             with self.get_connection() as conn:
-                df = pd.read_sql(query, conn, params=params)
+                result = pd.read_sql(query, conn, params=params)
+            metrics.add_bytes_read(result.memory_usage(index=False).sum())
+            return result
+
+        try:
+            with track('db.query', kind='query', database=self.database, engine=engine,
+                       sql=query_label(query)) as metrics:
+                df = self._cached(query, params, fetch)
+                metrics.add_rows_out(len(df))
                 logger.info(f"Запрос выполнен. Возвращено {len(df)} строк")
                 return df
         except Exception as e:
             logger.error(f"Ошибка выполнения запроса: {e}")
             raise
 
-def create_db_connector_from_config() -> SQLServerConnector:
+    def fetch_arrow(self, query: str, params: tuple = None,
+                    batch_size: int = DATABASE_CONFIG['fetch_batch_size'],
+                    max_text_size: int = 8000) -> 'pyarrow.Table':
+        """
+        Колоночная выборка результата в pyarrow.Table через arrow-odbc
+
+        Драйвер заполняет буферы столбцов пакетами по batch_size строк, Python-объекты
+        для отдельных ячеек не создаются. max_text_size ограничивает буфер для
+        столбцов NVARCHAR(MAX)/VARCHAR(MAX), у которых нет объявленной длины.
+        """
+        try:
+            import pyarrow as pa
+            from arrow_odbc import read_arrow_batches_from_odbc
+        except ImportError:
+            raise ImportError("Для движка 'arrow' необходимы пакеты arrow-odbc и pyarrow")
+
+        # arrow-odbc принимает параметры строками, приведение типов выполняет сервер
+        parameters = None if params is None else [None if value is None else str(value) for value in params]
+
+        reader = read_arrow_batches_from_odbc(
+            query=query,
+            connection_string=self.connection_string,
+            batch_size=batch_size,
+            parameters=parameters,
+            max_text_size=max_text_size,
+        )
+        if reader is None:
+            # Запрос без результирующего набора (например, DDL)
+            return pa.table({})
+
+        return pa.Table.from_batches(list(reader), schema=reader.schema)
+
+    def _source_version(self, query: str) -> Optional[str]:
+        """
+        Версия источника для ключа кэша запросов
+
+        Учитываются только признаки, меняющиеся при любом изменении данных:
+        версия change tracking, если он включен для всех таблиц запроса
+        (sys.change_tracking_tables), иначе время последнего изменения таблиц
+        (sys.dm_db_index_usage_stats, нужно право VIEW SERVER STATE). Количество строк
+        дополняет версию, но само по себе не меняется при UPDATE, поэтому без
+        этих признаков возвращается None - запрос выполняется мимо кэша.
+        """
+        tables = referenced_tables(query)
+        if not tables:
+            return None
+        placeholders = ', '.join('OBJECT_ID(?)' for _ in tables)
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""SELECT CHANGE_TRACKING_CURRENT_VERSION(),
+                          (SELECT COUNT(DISTINCT t.object_id) FROM sys.change_tracking_tables t
+                           WHERE t.object_id IN ({placeholders})),
+                          (SELECT SUM(p.rows) FROM sys.partitions p
+                           WHERE p.index_id IN (0, 1) AND p.object_id IN ({placeholders}))""",
+                *tables, *tables
+            )
+            ct_version, tracked_tables, row_count = cursor.fetchone()
+
+            # Все таблицы запроса отслеживаются: версия растет при каждом изменении
+            if ct_version is not None and tracked_tables == len(set(tables)):
+                return f'ct:{ct_version}:{row_count}'
+
+            try:
+                cursor.execute(
+                    f"""SELECT MAX(last_user_update) FROM sys.dm_db_index_usage_stats
+                       WHERE database_id = DB_ID() AND object_id IN ({placeholders})""",
+                    *tables
+                )
+                last_update = cursor.fetchone()[0]
+            except Exception:
+                # Нет права VIEW SERVER STATE
+                last_update = None
+
+        if last_update is None:
+            return None
+        return f'updated:{last_update}:{row_count}'
+
+    def _interrupt(self, connection: CancellableConnection):
+        """Прерывает выполняющийся запрос: cursor.cancel() допускает вызов из другого потока"""
+        connection.cancel()
+
+    def _quote(self, name: str) -> str:
+        """Экранирование идентификатора SQL Server"""
+        return '[' + name.replace(']', ']]') + ']'
+
+    def _table_ref(self, schema: Optional[str], table: str) -> str:
+        """Полное имя таблицы со схемой"""
+        return f'{self._quote(schema or self.schema)}.{self._quote(table)}'
+
+    def _table_exists(self, cursor, schema: Optional[str], table: str) -> bool:
+        """Проверка существования таблицы"""
+        cursor.execute("SELECT OBJECT_ID(?, 'U')", f'{schema or self.schema}.{table}')
+        return cursor.fetchone()[0] is not None
+
+    def _table_columns(self, cursor, schema: Optional[str], table: str) -> Dict[str, Tuple[str, Optional[int]]]:
+        """Обобщенные типы колонок таблицы и объявленные длины строк (NVARCHAR(MAX) - без длины)"""
+        cursor.execute(
+            "SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH FROM INFORMATION_SCHEMA.COLUMNS "
+            "WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?",
+            schema or self.schema, table
+        )
+        return {
+            name: (SQL_SERVER_KINDS.get(data_type.lower(), 'string'), length if length and length > 0 else None)
+            for name, data_type, length in cursor.fetchall()
+        }
+
+    def _prepare_cursor(self, cursor):
+        """Включает передачу параметров массивами (fast_executemany)"""
+        cursor.fast_executemany = True
+        return cursor
+
+    def _swap_statements(self, schema: Optional[str], stage_table: str, table: str) -> List[str]:
+        """Подмена целевой таблицы загруженной heap-таблицей"""
+        schema = schema or self.schema
+        # Имена передаются строковыми литералами: кавычки удваиваются
+        stage_ref = self._table_ref(schema, stage_table).replace("'", "''")
+        new_name = table.replace("'", "''")
+        return [
+            f'DROP TABLE IF EXISTS {self._table_ref(schema, table)}',
+            f"EXEC sp_rename N'{stage_ref}', N'{new_name}'",
+        ]
+
+
+def create_db_connector_from_config(server: str = None, database: str = None) -> SQLServerConnector:
     """
     Фабрика для создания подключения на основе конфигурации из credentials.py
+
+    server / database переопределяют CurrentConfig.DB_SERVER / DB_NAME (источники DB_SOURCES)
     """
     try:
         from config.credentials import CurrentConfig, DB_USERNAME, DB_PASSWORD, DB_NAME
         username = DB_USERNAME
         password = DB_PASSWORD
-        db_name = DB_NAME
+        db_name = database or DB_NAME
 
 
-        return SQLServerConnector(
-            server=CurrentConfig.DB_SERVER,
+        connector = SQLServerConnector(
+            server=server or CurrentConfig.DB_SERVER,
             database=db_name,  # Теперь этот атрибут существует
             username=username,
             password=password,
             driver='ODBC Driver 18 for SQL Server'
         )
+
+        if DATABASE_CONFIG['query_cache']:
+            connector.enable_query_cache(DATABASE_CONFIG['query_cache_dir'],
+                                         max_bytes=DATABASE_CONFIG['query_cache_max_mb'] * 2 ** 20)
+
+        return connector
     except ImportError:
         raise ImportError("Не удалось импортировать конфигурацию из config.credentials")
     except AttributeError as e:
-        raise AttributeError(f"Отсутствует необходимый атрибут в конфигурации: {e}")
\ No newline at end of file
+        raise AttributeError(f"Отсутствует необходимый атрибут в конфигурации: {e}")
+
+
+def parse_sources(spec: str) -> Dict[str, tuple]:
+    """
+    Разбирает список источников "имя=сервер/база,имя2=сервер2/база2"
+
+    Returns:
+        dict: {имя: (сервер, база)}
+    """
+    sources = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, sep, target = item.partition('=')
+        server, _, database = target.partition('/')
+        if not sep or not name.strip() or not server.strip() or not database.strip():
+            raise ValueError(f"Некорректный источник '{item}', ожидается имя=сервер/база")
+        if name.strip() in sources:
+            raise ValueError(f"Источник '{name.strip()}' указан дважды")
+        sources[name.strip()] = (server.strip(), database.strip())
+    return sources
+
+
+def create_db_connectors_from_config() -> Dict[str, SQLServerConnector]:
+    """Коннекторы источников DATABASE_CONFIG['sources'] (у каждого свой пул запросов)"""
+    return {name: create_db_connector_from_config(server, database)
+            for name, (server, database) in parse_sources(DATABASE_CONFIG['sources']).items()}
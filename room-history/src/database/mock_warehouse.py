@@ -0,0 +1,479 @@
+"""
+Построитель локального mock-хранилища SQLite (схема "созвездие" + таблицы-источники)
+
+Загрузка выполняется с настроенными PRAGMA (WAL, synchronous=OFF), через executemany
+в одной транзакции на таблицу; вторичные индексы создаются после загрузки, затем ANALYZE.
+"""
+
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Union
+
+import numpy as np
+import pandas as pd
+
+from src.database.bulk_load import DEFAULT_BATCH_SIZE, dataframe_to_rows, iter_dataframe_chunks
+
+logger = logging.getLogger(__name__)
+
+# model_id фактической модели в таблицах-источниках
+FACT_MODEL_ID = 666
+
+
+# Таблицы схемы "созвездие" (generating mock data/README.md) и таблицы-источники,
+# которые читают SQL-шаблоны из sql/. Порядок соответствует зависимостям внешних ключей.
+TABLES = {
+    'dim_employee': '''
+        CREATE TABLE IF NOT EXISTS dim_employee (
+            employee_id INTEGER PRIMARY KEY,
+            full_name TEXT NOT NULL
+        )
+    ''',
+    'dim_financial_model': '''
+        CREATE TABLE IF NOT EXISTS dim_financial_model (
+            financial_model_id INTEGER PRIMARY KEY,
+            model_name TEXT NOT NULL,
+            forecast_year INTEGER,
+            model_type TEXT NOT NULL
+        )
+    ''',
+    'dim_room': '''
+        CREATE TABLE IF NOT EXISTS dim_room (
+            room_key INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_id TEXT NOT NULL,
+            area_sq_m REAL NOT NULL,
+            floor INTEGER NOT NULL,
+            trc_id TEXT NOT NULL,
+            legal_entity TEXT NOT NULL
+        )
+    ''',
+    'dim_rent_contract': '''
+        CREATE TABLE IF NOT EXISTS dim_rent_contract (
+            contract_id TEXT PRIMARY KEY,
+            contract_number TEXT NOT NULL,
+            tenant_name TEXT NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            rent_amount REAL NOT NULL,
+            room_key INTEGER NOT NULL,
+            FOREIGN KEY (room_key) REFERENCES dim_room(room_key)
+        )
+    ''',
+    'fact_responsibility': '''
+        CREATE TABLE IF NOT EXISTS fact_responsibility (
+            responsibility_id INTEGER PRIMARY KEY,
+            room_key INTEGER NOT NULL,
+            start_date DATE NOT NULL,
+            change_number INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            FOREIGN KEY (room_key) REFERENCES dim_room(room_key),
+            FOREIGN KEY (employee_id) REFERENCES dim_employee(employee_id)
+        )
+    ''',
+    'fact_senior_responsibility': '''
+        CREATE TABLE IF NOT EXISTS fact_senior_responsibility (
+            responsibility_id INTEGER PRIMARY KEY,
+            room_key INTEGER NOT NULL,
+            start_date DATE NOT NULL,
+            change_number INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            FOREIGN KEY (room_key) REFERENCES dim_room(room_key),
+            FOREIGN KEY (employee_id) REFERENCES dim_employee(employee_id)
+        )
+    ''',
+    'fact_room_status': '''
+        CREATE TABLE IF NOT EXISTS fact_room_status (
+            financial_model_id INTEGER NOT NULL,
+            room_key INTEGER NOT NULL,
+            change_number INTEGER NOT NULL,
+            start_date DATE NOT NULL,
+            status TEXT NOT NULL,
+            contract_id TEXT,
+            contract_id_next TEXT,
+            PRIMARY KEY (financial_model_id, room_key, change_number),
+            FOREIGN KEY (financial_model_id) REFERENCES dim_financial_model(financial_model_id),
+            FOREIGN KEY (room_key) REFERENCES dim_room(room_key),
+            FOREIGN KEY (contract_id) REFERENCES dim_rent_contract(contract_id),
+            FOREIGN KEY (contract_id_next) REFERENCES dim_rent_contract(contract_id)
+        )
+    ''',
+    # Таблицы-источники (аналоги таблиц SQL Server из sql/*.sql.template)
+    'tbl_crm_status_hist': '''
+        CREATE TABLE IF NOT EXISTS tbl_crm_status_hist (
+            model_id INTEGER NOT NULL,
+            unit_id TEXT NOT NULL,
+            lease_id INTEGER NOT NULL,
+            status_sequence INTEGER NOT NULL,
+            status_start_date TEXT,
+            status_end_date TEXT,
+            crm_status TEXT,
+            trc_abbreviation TEXT,
+            legal_entity TEXT NOT NULL
+        )
+    ''',
+    'business_units': '''
+        CREATE TABLE IF NOT EXISTS business_units (
+            model_id INTEGER,
+            lease_id INTEGER,
+            unit_id TEXT,
+            total_area REAL,
+            legal_entity TEXT,
+            model_location_unit TEXT,
+            location_unit TEXT,
+            billing_start TEXT,
+            operations_start TEXT,
+            billing_end TEXT,
+            unit_created TEXT,
+            unit_closed TEXT,
+            fiscal_year INTEGER,
+            forecast_begin TEXT,
+            forecast_end TEXT,
+            brand_name TEXT,
+            client_category TEXT,
+            business_profile TEXT,
+            creation_reason TEXT,
+            contract_date TEXT,
+            renovation_days INTEGER,
+            agreement_end TEXT
+        )
+    ''',
+    'financial_models': '''
+        CREATE TABLE IF NOT EXISTS financial_models (
+            model_id INTEGER PRIMARY KEY,
+            model_type TEXT,
+            forecast_year TEXT
+        )
+    ''',
+}
+
+# Вторичные индексы создаются после загрузки данных
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS ix_rent_contract_room ON dim_rent_contract (room_key)',
+    'CREATE INDEX IF NOT EXISTS ix_responsibility_room ON fact_responsibility (room_key, change_number)',
+    'CREATE INDEX IF NOT EXISTS ix_senior_responsibility_room ON fact_senior_responsibility (room_key, change_number)',
+    'CREATE INDEX IF NOT EXISTS ix_room_status_room ON fact_room_status (room_key)',
+    'CREATE INDEX IF NOT EXISTS ix_room_status_contract ON fact_room_status (contract_id)',
+    'CREATE INDEX IF NOT EXISTS ix_status_hist_unit ON tbl_crm_status_hist (model_id, unit_id, legal_entity, status_sequence)',
+    'CREATE INDEX IF NOT EXISTS ix_status_hist_lease ON tbl_crm_status_hist (lease_id)',
+    'CREATE INDEX IF NOT EXISTS ix_business_units_lease ON business_units (lease_id)',
+]
+
+# PRAGMA на время загрузки: журнал WAL, без fsync, временные структуры в памяти
+LOAD_PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = OFF',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -262144',
+    'PRAGMA foreign_keys = OFF',
+]
+
+# PRAGMA после загрузки: обычный режим работы
+RUNTIME_PRAGMAS = [
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA foreign_keys = ON',
+]
+
+
+class MockWarehouseBuilder:
+    """Построитель mock-хранилища SQLite"""
+
+    def __init__(self, db_path: Union[str, Path], batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self.row_counts = {}
+        self.conn = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self, overwrite: bool = True):
+        """Открывает (пересоздает) базу и включает PRAGMA для загрузки"""
+        if overwrite:
+            for suffix in ('', '-wal', '-shm'):
+                path = Path(str(self.db_path) + suffix)
+                if path.exists():
+                    path.unlink()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, isolation_level=None)
+        for pragma in LOAD_PRAGMAS:
+            self.conn.execute(pragma)
+
+    def close(self):
+        """Закрывает соединение"""
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    def create_schema(self, tables: Iterable[str] = None):
+        """Создает таблицы (без вторичных индексов)"""
+        for table_name in tables or TABLES:
+            self.conn.execute(TABLES[table_name])
+
+    def load_table(self, table_name: str, data: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> int:
+        """
+        Загружает DataFrame или поток DataFrame в таблицу одной транзакцией
+
+        Returns:
+            int: Количество загруженных строк
+        """
+        loaded = 0
+        self.conn.execute('BEGIN')
+        try:
+            for chunk in iter_dataframe_chunks(data, self.batch_size):
+                columns = ', '.join(f'"{column}"' for column in chunk.columns)
+                placeholders = ', '.join('?' for _ in chunk.columns)
+                self.conn.executemany(
+                    f'INSERT INTO {table_name} ({columns}) VALUES ({placeholders})',
+                    dataframe_to_rows(chunk, datetime_as_str=True)
+                )
+                loaded += len(chunk)
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+        self.row_counts[table_name] = self.row_counts.get(table_name, 0) + loaded
+        return loaded
+
+    def load_tables(self, batches: Iterable[Dict[str, pd.DataFrame]]) -> Dict[str, int]:
+        """Загружает поток словарей {таблица: DataFrame}"""
+        for batch in batches:
+            for table_name, df in batch.items():
+                self.load_table(table_name, df)
+        return self.row_counts
+
+    def finalize(self):
+        """Создает вторичные индексы, собирает статистику и возвращает обычные PRAGMA"""
+        start = time.perf_counter()
+        for statement in INDEXES:
+            self.conn.execute(statement)
+        self.conn.execute('ANALYZE')
+        for pragma in RUNTIME_PRAGMAS:
+            self.conn.execute(pragma)
+        self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        logger.info(f"Индексы и статистика построены за {time.perf_counter() - start:.2f} с")
+
+    def table_columns(self, table_name: str) -> list:
+        """Список колонок таблицы"""
+        return [row[1] for row in self.conn.execute(f'PRAGMA table_info({table_name})')]
+
+    def table_counts(self) -> Dict[str, int]:
+        """Количество строк во всех таблицах схемы"""
+        return {
+            table_name: self.conn.execute(f'SELECT COUNT(*) FROM {table_name}').fetchone()[0]
+            for table_name in TABLES
+        }
+
+
+def generate_constellation(rooms: int = 1000, models: int = 3, changes_per_room: int = 4,
+                           chunk_rooms: int = 50000, seed: int = 42) -> Iterator[Dict[str, pd.DataFrame]]:
+    """
+    Генерирует данные схемы "созвездие" заданного масштаба блоками помещений
+
+    Размер fact_room_status = rooms * models * changes_per_room строк.
+    Статусы чередуются: нечетные изменения - "Свободен", четные - "Арендован" с договором.
+
+    По тем же помещениям и договорам строятся таблицы-источники SQL-шаблонов:
+    tbl_crm_status_hist (столько же строк, что fact_room_status), business_units
+    (договор в каждой модели) и financial_models. Финансовая модель 1 - факт (model_id 666),
+    остальные - прогнозы 1001, 1002, ...
+
+    Yields:
+        dict: {имя таблицы: DataFrame} для очередного блока
+    """
+    rng = np.random.default_rng(seed)
+    source_model_ids = np.array([FACT_MODEL_ID] + [1000 + i for i in range(1, models)])
+    trc_count = min(50, max(1, rooms // 100))
+    employee_count = max(20, rooms // 20)
+
+    yield {
+        'dim_employee': pd.DataFrame({
+            'employee_id': np.arange(101, 101 + employee_count),
+            'full_name': [f'Сотрудник {i}' for i in range(1, employee_count + 1)],
+        }),
+        'dim_financial_model': pd.DataFrame({
+            'financial_model_id': np.arange(1, models + 1),
+            'model_name': ['Факт 2023'] + [f'Прогноз {2023 + i}' for i in range(1, models)],
+            'forecast_year': 2023 + np.arange(models),
+            'model_type': ['Факт'] + ['Прогноз'] * (models - 1),
+        }),
+        # Без фактической модели - ее добавляет HistoryProcessor.add_fact_to_reference
+        'financial_models': pd.DataFrame({
+            'model_id': source_model_ids[1:],
+            'model_type': 'Прогноз',
+            'forecast_year': (2023 + np.arange(1, models)).astype(str),
+        }),
+    }
+
+    base_date = np.datetime64('2020-01-01')
+    contracts_per_room = changes_per_room // 2
+
+    for first_key in range(1, rooms + 1, chunk_rooms):
+        room_keys = np.arange(first_key, min(first_key + chunk_rooms, rooms + 1))
+        n = len(room_keys)
+        trc_numbers = (room_keys - 1) % trc_count + 1
+
+        dim_room = pd.DataFrame({
+            'room_key': room_keys,
+            'room_id': np.char.add('PA-', room_keys.astype(str)),
+            'area_sq_m': np.round(rng.uniform(20, 500, n), 1),
+            'floor': rng.integers(1, 5, n),
+            'trc_id': np.char.add('TRC-', trc_numbers.astype(str)),
+            'legal_entity': np.char.add('ООО ТРЦ ', trc_numbers.astype(str)),
+        })
+
+        # Даты изменений статуса: случайный старт + накопленные длительности
+        durations = rng.integers(30, 720, (n, changes_per_room + 1))
+        offsets = rng.integers(0, 365, n)[:, None] + np.cumsum(durations, axis=1) - durations[:, :1]
+        change_dates = base_date + offsets.astype('timedelta64[D]')
+
+        # Договоры: j-й договор помещения соответствует изменению 2j+1
+        contract_room = np.repeat(room_keys, contracts_per_room)
+        contract_index = np.tile(np.arange(contracts_per_room), n)
+        contract_ids = np.char.add(np.char.add('CTR-', contract_room.astype(str)),
+                                   np.char.add('-', contract_index.astype(str)))
+        leased_changes = 2 * contract_index + 1
+        row_index = np.repeat(np.arange(n), contracts_per_room)
+        dim_rent_contract = pd.DataFrame({
+            'contract_id': contract_ids,
+            'contract_number': np.char.add(contract_room.astype(str), np.char.add('/', contract_index.astype(str))),
+            'tenant_name': np.char.add('Арендатор ', rng.integers(1, 5000, len(contract_ids)).astype(str)),
+            'start_date': change_dates[row_index, leased_changes].astype(str),
+            'end_date': (change_dates[row_index, leased_changes + 1] - np.timedelta64(1, 'D')).astype(str),
+            'rent_amount': np.round(rng.uniform(50000, 500000, len(contract_ids)), -3),
+            'room_key': contract_room,
+        })
+
+        # История статусов одинакова для всех моделей блока
+        change_index = np.tile(np.arange(changes_per_room), n)
+        status_room = np.repeat(room_keys, changes_per_room)
+        leased = change_index % 2 == 1
+        current_contract = np.where(
+            leased,
+            np.char.add(np.char.add('CTR-', status_room.astype(str)), np.char.add('-', (change_index // 2).astype(str))),
+            None
+        )
+        next_index = (change_index + 1) // 2
+        next_contract = np.where(
+            2 * next_index + 1 < changes_per_room,
+            np.char.add(np.char.add('CTR-', status_room.astype(str)), np.char.add('-', next_index.astype(str))),
+            None
+        )
+        status_dates = change_dates[:, :changes_per_room].reshape(-1).astype(str)
+
+        fact_room_status = pd.DataFrame({
+            'financial_model_id': np.repeat(np.arange(1, models + 1), len(status_room)),
+            'room_key': np.tile(status_room, models),
+            'change_number': np.tile(change_index + 1, models),
+            'start_date': np.tile(status_dates, models),
+            'status': np.tile(np.where(leased, 'Арендован', 'Свободен'), models),
+            'contract_id': np.tile(current_contract, models),
+            'contract_id_next': np.tile(next_contract, models),
+        })
+
+        responsibility = {}
+        for table_name in ('fact_responsibility', 'fact_senior_responsibility'):
+            resp_room = np.repeat(room_keys, 2)
+            resp_dates = change_dates[:, [0, 2]].reshape(-1).astype(str)
+            responsibility[table_name] = pd.DataFrame({
+                'responsibility_id': 2 * (resp_room - 1) + np.tile([1, 2], n),
+                'room_key': resp_room,
+                'start_date': resp_dates,
+                'change_number': np.tile([1, 2], n),
+                'employee_id': rng.integers(101, 101 + employee_count, len(resp_room)),
+            })
+
+        # Таблицы-источники: lease_id - сквозной номер договора, у вакантных статусов 0
+        room_ids = dim_room['room_id'].to_numpy().astype(object)
+        trc_ids = dim_room['trc_id'].to_numpy().astype(object)
+        legal_entities = dim_room['legal_entity'].to_numpy().astype(object)
+        status_rows = np.repeat(np.arange(n), changes_per_room)
+        lease_ids = np.where(leased, (status_room - 1) * contracts_per_room + change_index // 2 + 1, 0)
+        # Последний статус цепочки открыт
+        status_ends = (change_dates[:, 1:] - np.timedelta64(1, 'D')).astype(str).astype(object)
+        status_ends[:, -1] = None
+
+        tbl_crm_status_hist = pd.DataFrame({
+            'model_id': np.repeat(source_model_ids, len(status_room)),
+            'unit_id': np.tile(room_ids[status_rows], models),
+            'lease_id': np.tile(lease_ids, models),
+            'status_sequence': np.tile(change_index + 1, models),
+            'status_start_date': np.tile(status_dates, models),
+            'status_end_date': np.tile(status_ends.reshape(-1), models),
+            'crm_status': fact_room_status['status'].to_numpy(),
+            'trc_abbreviation': np.tile(trc_ids[status_rows], models),
+            'legal_entity': np.tile(legal_entities[status_rows], models),
+        })
+
+        contract_count = len(contract_ids)
+        contract_models = np.repeat(source_model_ids, contract_count)
+        forecast_years = np.repeat(2023 + np.arange(models), contract_count).astype(str)
+        is_forecast = contract_models != FACT_MODEL_ID
+        location_unit = legal_entities[row_index] + '_' + room_ids[row_index]
+        contract_starts = change_dates[row_index, leased_changes]
+        contract_ends = dim_rent_contract['end_date'].to_numpy().astype(object)
+        business_units = pd.DataFrame({
+            'model_id': contract_models,
+            'lease_id': np.tile((contract_room - 1) * contracts_per_room + contract_index + 1, models),
+            'unit_id': np.tile(room_ids[row_index], models),
+            'total_area': np.tile(dim_room['area_sq_m'].to_numpy()[row_index], models),
+            'legal_entity': np.tile(legal_entities[row_index], models),
+            'model_location_unit': contract_models.astype(str).astype(object) + '_' + np.tile(location_unit, models),
+            'location_unit': np.tile(location_unit, models),
+            'billing_start': np.tile(contract_starts.astype(str), models),
+            'operations_start': np.tile(contract_starts.astype(str), models),
+            'billing_end': np.tile(contract_ends, models),
+            'unit_created': np.tile(change_dates[row_index, 0].astype(str), models),
+            'unit_closed': None,
+            'fiscal_year': np.tile(contract_starts.astype('datetime64[Y]').astype(int) + 1970, models),
+            'forecast_begin': np.where(is_forecast, np.char.add(forecast_years, '-01-01'), None),
+            'forecast_end': np.where(is_forecast, np.char.add(forecast_years, '-12-31'), None),
+            'brand_name': np.tile(dim_rent_contract['tenant_name'].to_numpy(), models),
+            'client_category': None,
+            'business_profile': None,
+            'creation_reason': None,
+            'contract_date': np.tile((contract_starts - np.timedelta64(30, 'D')).astype(str), models),
+            'renovation_days': 0,
+            'agreement_end': np.tile(contract_ends, models),
+        })
+
+        yield {
+            'dim_room': dim_room,
+            'dim_rent_contract': dim_rent_contract,
+            'fact_room_status': fact_room_status,
+            **responsibility,
+            'tbl_crm_status_hist': tbl_crm_status_hist,
+            'business_units': business_units,
+        }
+
+
+def build_mock_warehouse(db_path: Union[str, Path],
+                         batches: Iterable[Dict[str, pd.DataFrame]],
+                         batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Строит mock-хранилище из потока блоков данных
+
+    Args:
+        db_path: Путь к файлу SQLite (перезаписывается)
+        batches: Поток словарей {таблица: DataFrame}, например generate_constellation()
+        batch_size: Размер пакета executemany
+
+    Returns:
+        dict: Количество загруженных строк по таблицам
+    """
+    start = time.perf_counter()
+    with MockWarehouseBuilder(db_path, batch_size=batch_size) as builder:
+        builder.create_schema()
+        row_counts = builder.load_tables(batches)
+        builder.finalize()
+
+    total_rows = sum(row_counts.values())
+    logger.info(f"Mock-хранилище {db_path}: {total_rows} строк за {time.perf_counter() - start:.2f} с")
+    return row_counts
@@ -0,0 +1,240 @@
+"""
+Версионируемый кэш результатов SQL-запросов на диске
+
+Ключ - нормализованный текст SQL + параметры + версия источника (дешевый запрос-проба:
+версия change tracking и количество строк таблиц, для SQLite - отметка времени файла).
+Результаты хранятся в Parquet (pickle, если pyarrow недоступен или типы не поддерживаются),
+при превышении лимита размера удаляются давно не использованные записи (LRU).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import pandas as pd
+
+from src.utils.helpers import current_metrics, query_label
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 2 * 2 ** 30
+INDEX_FILE = 'index.json'
+
+_COMMENT_RE = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_TABLE_RE = re.compile(r'\b(?:FROM|JOIN)\s+((?:[\[\"]?\w+[\]\"]?\.){0,2}[\[\"]?\w+[\]\"]?)', re.I)
+
+
+def normalize_sql(query: str) -> str:
+    """Текст SQL без комментариев и лишних пробелов (строковые литералы не затрагиваются)"""
+    parts = re.split(r"('(?:[^']|'')*')", query)
+    for i in range(0, len(parts), 2):
+        parts[i] = ' '.join(_COMMENT_RE.sub(' ', parts[i]).split())
+    return ' '.join(part for part in parts if part).strip()
+
+
+def referenced_tables(query: str) -> List[str]:
+    """Имена таблиц после FROM/JOIN (без подзапросов и CTE), без скобок и кавычек"""
+    names = {match.replace('[', '').replace(']', '').replace('"', '')
+             for match in _TABLE_RE.findall(_COMMENT_RE.sub(' ', query))}
+    cte_names = {name.lower() for name in re.findall(r'\b(\w+)\s+AS\s*\(', query, re.I)}
+    return sorted(name for name in names if name.split('.')[-1].lower() not in cte_names)
+
+
+def cache_key(query: str, params: tuple = None, version: str = '') -> str:
+    """SHA-256 от нормализованного SQL, параметров и версии источника"""
+    payload = json.dumps([normalize_sql(query), list(params or ()), version],
+                         ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class QueryCache:
+    """Кэш DataFrame на диске с LRU-вытеснением по суммарному размеру"""
+
+    def __init__(self, cache_dir: Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+
+    def _load_index(self) -> dict:
+        index_path = self.cache_dir / INDEX_FILE
+        if not index_path.exists():
+            return {}
+        try:
+            index = json.loads(index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            logger.warning(f"Индекс кэша {index_path} поврежден, кэш будет пересоздан")
+            return {}
+        # Записи, файлы которых удалены вручную, пропускаем
+        return {key: entry for key, entry in index.items() if (self.cache_dir / entry['file']).exists()}
+
+    def _save_index(self):
+        index_path = self.cache_dir / INDEX_FILE
+        tmp_path = index_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self._index, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, index_path)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry['size'] for entry in self._index.values())
+
+    def _count(self, query: str, outcome: str):
+        label = query_label(query)
+        # Пул запросов обращается к кэшу из нескольких потоков
+        with self._lock:
+            item = self.stats.setdefault(label, {'hits': 0, 'misses': 0})
+            item[outcome] += 1
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """
+        Результат из кэша или None
+
+        Файл читается без блокировки, чтобы потоки пула не ждали друг друга; время
+        обращения обновляется только в памяти и попадает в index.json при put/clear.
+        """
+        with self._lock:
+            entry = self._index.get(key)
+        if entry is None:
+            return None
+        path = self.cache_dir / entry['file']
+        try:
+            df = pd.read_parquet(path) if entry['format'] == 'parquet' else pd.read_pickle(path)
+        except Exception as e:
+            with self._lock:
+                # Запись могли вытеснить или перезаписать другим потоком - тогда это не порча
+                if self._index.get(key) is entry:
+                    logger.warning(f"Запись кэша {entry['file']} не читается ({e}), удаляется")
+                    self._remove(key)
+            return None
+        with self._lock:
+            entry['last_access'] = time.time()
+        return df
+
+    def put(self, key: str, df: pd.DataFrame, query: str = ''):
+        """Сохраняет результат и вытесняет старые записи при превышении max_bytes"""
+        with self._lock:
+            path, file_format = self._write(key, df)
+            self._index[key] = {
+                'file': path.name,
+                'format': file_format,
+                'size': path.stat().st_size,
+                'rows': len(df),
+                'sql': query_label(query),
+                'created': time.time(),
+                'last_access': time.time(),
+            }
+            self._evict(keep=key)
+            self._save_index()
+
+    def _write(self, key: str, df: pd.DataFrame):
+        tmp_path = self.cache_dir / f'{key}.tmp'
+        try:
+            df.to_parquet(tmp_path, index=False)
+            path, file_format = self.cache_dir / f'{key}.parquet', 'parquet'
+        except Exception:
+            # pyarrow не установлен или столбец со смешанными типами
+            df.to_pickle(tmp_path)
+            path, file_format = self.cache_dir / f'{key}.pkl', 'pickle'
+        os.replace(tmp_path, path)
+        return path, file_format
+
+    def _remove(self, key: str):
+        entry = self._index.pop(key, None)
+        if entry:
+            (self.cache_dir / entry['file']).unlink(missing_ok=True)
+
+    def _evict(self, keep: str = None):
+        """Удаляет давно не использованные записи, пока размер кэша больше max_bytes"""
+        total = self.total_bytes
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= entry['size']
+            self._remove(key)
+            logger.info(f"Кэш запросов: вытеснена запись {entry['sql']}")
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+            self._save_index()
+
+    def fetch(self, query: str, params: tuple, version: Optional[str],
+              execute: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Возвращает результат из кэша или выполняет execute() и сохраняет результат
+
+        version=None означает, что версию источника определить не удалось -
+        запрос выполняется без кэша.
+        """
+        metrics = current_metrics()
+        if version is None:
+            if metrics is not None:
+                metrics.tags['cache'] = 'bypass'
+            return execute()
+
+        key = cache_key(query, params, version)
+        df = self.get(key)
+        outcome = 'hits' if df is not None else 'misses'
+        self._count(query, outcome)
+        if metrics is not None:
+            metrics.tags['cache'] = 'hit' if df is not None else 'miss'
+        logger.info(f"Кэш запросов: {'попадание' if df is not None else 'промах'} - {query_label(query, 80)}")
+
+        if df is None:
+            df = execute()
+            self.put(key, df, query)
+        return df
+
+    def format_stats(self) -> str:
+        """Попадания и промахи по запросам"""
+        with self._lock:
+            stats = {label: dict(item) for label, item in self.stats.items()}
+            lines = [f"Кэш запросов ({self.total_bytes / 2 ** 20:.1f} МБ, {len(self._index)} записей):"]
+        for label, item in stats.items():
+            lines.append(f"  попаданий {item['hits']:>3}, промахов {item['misses']:>3}: {label}")
+        return '\n'.join(lines)
+
+
+class QueryCacheMixin:
+    """
+    Подключаемый кэш результатов execute_query
+
+    Коннектор должен реализовать _source_version(query) -> str | None.
+    """
+
+    query_cache: Optional[QueryCache] = None
+
+    def enable_query_cache(self, cache_dir: Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES) -> QueryCache:
+        """Включает кэш результатов запросов в папке cache_dir"""
+        self.query_cache = QueryCache(cache_dir, max_bytes=max_bytes)
+        return self.query_cache
+
+    def disable_query_cache(self):
+        self.query_cache = None
+
+    def _source_version(self, query: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def _cached(self, query: str, params: tuple, execute: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """Выполняет запрос через кэш, если он включен"""
+        if self.query_cache is None:
+            return execute()
+
+        try:
+            version = self._source_version(query)
+        except Exception as e:
+            logger.warning(f"Не удалось определить версию источника, запрос без кэша: {e}")
+            version = None
+
+        return self.query_cache.fetch(query, params, version, execute)
@@ -0,0 +1,156 @@
+"""
+Параллельное выполнение независимых запросов коннектора (submit/gather)
+
+Каждый запрос выполняется в потоке пула на собственном подключении: get_connection
+открывает новое подключение на вызов (для pyodbc - из пула ODBC-драйвера).
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from src.utils.helpers import track
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class QueryCancelled(Exception):
+    """Запрос отменен из-за ошибки другого запроса пакета"""
+
+
+class QueryTask:
+    """Состояние задачи пула: имя, поток выполнения, время, флаг отмены"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.thread_id = None
+        self.cancelled = False
+        self.wall_s = None
+
+
+class QueryPoolMixin:
+    """
+    Пул потоков для независимых запросов коннектора
+
+    Коннектор может переопределить _interrupt(connection), чтобы прерывать уже
+    выполняющийся запрос при отмене; по умолчанию отменяются только задачи,
+    еще не начавшие выполнение, а результат выполняющихся отбрасывается.
+    """
+
+    max_workers: int = DEFAULT_MAX_WORKERS
+
+    def _pool_state(self):
+        if '_executor' not in self.__dict__:
+            self._executor = None
+            self._pool_lock = threading.Lock()
+            self._open_connections: Dict[int, Any] = {}
+        return self._pool_lock
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._pool_state():
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=f'{self.DIALECT}-query')
+            return self._executor
+
+    def _connection_opened(self, connection):
+        """Регистрирует подключение текущего потока (для прерывания при отмене)"""
+        with self._pool_state():
+            self._open_connections[threading.get_ident()] = connection
+
+    def _connection_closed(self):
+        with self._pool_state():
+            self._open_connections.pop(threading.get_ident(), None)
+
+    def _interrupt(self, connection):
+        """Прерывает выполняющийся на подключении запрос (если драйвер это умеет)"""
+
+    def submit_task(self, func: Callable, *args, name: str = None, **kwargs) -> Future:
+        """
+        Выполняет func(*args, **kwargs) в пуле
+
+        Returns:
+            Future: future.task - QueryTask с именем и временем выполнения
+        """
+        task = QueryTask(name or getattr(func, '__qualname__', 'task'))
+
+        def run():
+            if task.cancelled:
+                raise QueryCancelled(task.name)
+            task.thread_id = threading.get_ident()
+            start = time.perf_counter()
+            try:
+                with track(task.name, kind='task'):
+                    return func(*args, **kwargs)
+            finally:
+                task.wall_s = time.perf_counter() - start
+                logger.info(f"Задача {task.name} выполнена за {task.wall_s:.2f} с")
+
+        future = self._get_executor().submit(run)
+        future.task = task
+        return future
+
+    def submit(self, query: str, params: tuple = None, name: str = None, **kwargs) -> Future:
+        """Выполняет execute_query(query, params) в пуле, результат - DataFrame"""
+        return self.submit_task(self.execute_query, query, params, name=name or 'db.submit', **kwargs)
+
+    def cancel(self, futures: List[Future]):
+        """Отменяет задачи: ожидающие снимаются с очереди, выполняющиеся прерываются"""
+        for future in futures:
+            task = getattr(future, 'task', None)
+            if task is not None:
+                task.cancelled = True
+            if future.cancel() or task is None or task.thread_id is None or future.done():
+                continue
+            with self._pool_state():
+                connection = self._open_connections.get(task.thread_id)
+            if connection is not None:
+                logger.warning(f"Прерывание выполняющегося запроса {task.name}")
+                self._interrupt(connection)
+
+    def gather(self, futures: List[Future], cancel_on_error: bool = True,
+               timeout: Optional[float] = None) -> List[Any]:
+        """
+        Ожидает результаты задач в порядке futures
+
+        При cancel_on_error первая ошибка отменяет остальные задачи и пробрасывается;
+        иначе ошибки возвращаются на месте результатов.
+        """
+        done, pending = wait(futures, timeout=timeout,
+                             return_when=FIRST_EXCEPTION if cancel_on_error else ALL_COMPLETED)
+
+        failed = [future for future in futures
+                  if future in done and not future.cancelled() and future.exception() is not None]
+        if cancel_on_error and failed:
+            self.cancel(futures)
+            wait(futures)
+            raise failed[0].exception()
+
+        if pending:
+            self.cancel(futures)
+            raise TimeoutError(f"Не дождались {len(pending)} задач за {timeout} с")
+
+        results = []
+        for future in futures:
+            if future.cancelled():
+                results.append(QueryCancelled(future.task.name))
+            else:
+                results.append(future.exception() or future.result())
+        return results
+
+    def run_concurrently(self, tasks: Dict[str, Callable], cancel_on_error: bool = True) -> Dict[str, Any]:
+        """Выполняет набор независимых задач {имя: функция} и возвращает {имя: результат}"""
+        futures = {name: self.submit_task(func, name=name) for name, func in tasks.items()}
+        results = self.gather(list(futures.values()), cancel_on_error=cancel_on_error)
+        return dict(zip(futures, results))
+
+    def close_pool(self):
+        """Останавливает пул потоков"""
+        with self._pool_state():
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,113 @@
+"""
+Коннектор к SQLite с интерфейсом SQLServerConnector (для локальной разработки и тестов)
+"""
+
+import logging
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Union
+
+import pandas as pd
+
+from src.database.bulk_load import BulkLoadMixin
+from src.database.query_pool import QueryPoolMixin
+from src.database.query_cache import QueryCacheMixin
+from src.utils.helpers import query_label, track
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteConnector(BulkLoadMixin, QueryCacheMixin, QueryPoolMixin):
+    """
+    Коннектор к локальной базе SQLite
+    Повторяет интерфейс SQLServerConnector: get_connection, test_connection,
+    execute_query, bulk_load. Схемы в SQLite нет, параметр schema игнорируется.
+    """
+
+    DIALECT = 'sqlite'
+
+    def __init__(self, database: Union[str, Path]):
+        self.database = str(database)
+        self.server = 'sqlite'
+
+    @contextmanager
+    def get_connection(self) -> sqlite3.Connection:
+        """Context manager для получения подключения к SQLite"""
+        connection = None
+        try:
+            # Транзакциями управляем явно (см. _begin)
+            connection = sqlite3.connect(self.database, isolation_level=None)
+            self._connection_opened(connection)
+            yield connection
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка подключения к SQLite {self.database}: {e}")
+            raise
+        finally:
+            if connection:
+                self._connection_closed()
+                connection.close()
+
+    def test_connection(self) -> bool:
+        """Тестирование подключения к базе данных"""
+        try:
+            with self.get_connection() as conn:
+                return conn.execute("SELECT 1").fetchone()[0] == 1
+        except Exception as e:
+            logger.error(f"Тест подключения к SQLite провален: {e}")
+            return False
+
+    def execute_query(self, query: str, params: tuple = None) -> pd.DataFrame:
+        """Выполнение SQL запроса и возврат результата в виде DataFrame"""
+
+        def fetch() -> pd.DataFrame:
+            with self.get_connection() as conn:
+                result = pd.read_sql(query, conn, params=params)
+            metrics.add_bytes_read(result.memory_usage(index=False).sum())
+            return result
+
+        try:
+            with track('db.query', kind='query', database=self.database, sql=query_label(query)) as metrics:
+                df = self._cached(query, params, fetch)
+                metrics.add_rows_out(len(df))
+                logger.info(f"Запрос выполнен. Возвращено {len(df)} строк")
+                return df
+        except Exception as e:
+            logger.error(f"Ошибка выполнения запроса: {e}")
+            raise
+
+    def _source_version(self, query: str) -> Optional[str]:
+        """Версия источника: время изменения и размер файла базы (и WAL)"""
+        parts = []
+        for path in (Path(self.database), Path(self.database + '-wal')):
+            if path.exists():
+                stat = path.stat()
+                parts.append(f'{stat.st_mtime_ns}:{stat.st_size}')
+        return '|'.join(parts) or None
+
+    def _interrupt(self, connection):
+        """Прерывает выполняющийся запрос (sqlite3 допускает вызов из другого потока)"""
+        connection.interrupt()
+
+    def _begin(self, conn):
+        conn.execute('BEGIN')
+
+    def _quote(self, name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    def _table_ref(self, schema: Optional[str], table: str) -> str:
+        return self._quote(table)
+
+    def _table_exists(self, cursor, schema: Optional[str], table: str) -> bool:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        return cursor.fetchone() is not None
+
+    def _alter_column_sql(self, table_ref: str, column: str, kind: str) -> Optional[str]:
+        # Типы SQLite динамические: значения другого типа вставляются без изменения схемы
+        return None
+
+    def _swap_statements(self, schema: Optional[str], stage_table: str, table: str) -> List[str]:
+        return [
+            f'DROP TABLE IF EXISTS {self._quote(table)}',
+            f'ALTER TABLE {self._quote(stage_table)} RENAME TO {self._quote(table)}',
+        ]
@@ -1 +1,174 @@
-#bi_mart.py
\ No newline at end of file
+#bi_mart.py
+"""
+Построение BI витрины (схема "созвездие") из обработанных данных data/processed
+"""
+
+import pandas as pd
+from pathlib import Path
+import sys
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.etl.cubes import OccupancyCube
+from src.etl.intervals import resolve_responsibility
+from src.utils.csv_writer import write_csv
+from src.utils.helpers import configure_metrics, get_recorder, instrument, record_file_read
+
+
+class BIMartBuilder:
+    """
+    Формирует таблицы витрины по образцу generating mock data/README.md:
+    dim_room, dim_financial_model, dim_rent_contract, dim_employee,
+    fact_room_status, fact_responsibility, fact_senior_responsibility.
+    Ключ помещения - legal_unit_id из processed_ref_legal_unit.csv.
+    """
+
+    def __init__(self, processed_dir: Path = None, output_dir: Path = None):
+        self.processed_dir = Path(processed_dir) if processed_dir else project_root / 'data' / 'processed'
+        self.output_dir = Path(output_dir) if output_dir else project_root / 'data' / 'output' / 'mart'
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+    def load_processed(self, filename: str) -> pd.DataFrame:
+        """Загружает обработанный файл (пустой DataFrame если файла нет)"""
+        file_path = self.processed_dir / filename
+        if not file_path.exists():
+            print(f"Предупреждение: {filename} не найден")
+            return pd.DataFrame()
+        record_file_read(file_path)
+        return pd.read_csv(file_path)
+
+    def build_dim_room(self, df_legal_unit: pd.DataFrame, df_history: pd.DataFrame,
+                       df_tenants: pd.DataFrame) -> pd.DataFrame:
+        """Справочник помещений: ключ, ТРЦ, площадь"""
+        dim_room = df_legal_unit[['legal_unit_id', 'legal_entity', 'unit_id']].copy()
+
+        if 'trc_abbreviation' in df_history.columns:
+            trc = df_history[['legal_unit_id', 'trc_abbreviation']].drop_duplicates('legal_unit_id')
+            dim_room = dim_room.merge(trc, on='legal_unit_id', how='left')
+
+        if 'total_area' in df_tenants.columns:
+            area = df_tenants.groupby('legal_unit_id', as_index=False)['total_area'].max()
+            dim_room = dim_room.merge(area, on='legal_unit_id', how='left')
+
+        return dim_room
+
+    def build_dim_rent_contract(self, df_tenants: pd.DataFrame) -> pd.DataFrame:
+        """Справочник договоров аренды (одна строка на lease_id)"""
+        columns = [
+            'lease_id', 'legal_unit_id', 'brand_name', 'client_category', 'business_profile',
+            'contract_date', 'billing_start', 'billing_end', 'renovation_days'
+        ]
+        if 'lease_id' not in df_tenants.columns:
+            return pd.DataFrame(columns=columns)
+
+        available = [col for col in columns if col in df_tenants.columns]
+        return df_tenants[available].drop_duplicates('lease_id').reset_index(drop=True)
+
+    def build_fact_room_status(self, df_history: pd.DataFrame) -> pd.DataFrame:
+        """Факт статусов помещений: текущий и следующий договор по каждому изменению"""
+        fact = df_history.rename(columns={
+            'model_id': 'financial_model_id',
+            'status_sequence': 'change_number',
+            'status_start_date': 'start_date',
+            'status_end_date': 'end_date',
+            'crm_status': 'status',
+            'future_tenant': 'contract_id_next',
+        })
+        fact['contract_id'] = fact['lease_id'].where(fact['lease_id'] != 0).astype('Int64')
+
+        columns = [
+            'financial_model_id', 'legal_unit_id', 'change_number', 'start_date', 'end_date',
+            'status', 'contract_id', 'contract_id_next'
+        ]
+        return fact[columns]
+
+    def build_occupancy_cube(self, df_history: pd.DataFrame, df_tenants: pd.DataFrame) -> dict:
+        """Обновляет куб занятости occupancy_cube.sqlite (только измененные партиции)"""
+        cube = OccupancyCube(self.output_dir / 'occupancy_cube.sqlite')
+        return cube.refresh(df_history, df_tenants)
+
+    @instrument('mart.responsibility')
+    def build_responsibility(self, df_expert: pd.DataFrame):
+        """
+        Справочник сотрудников и факты ответственности (рядовые и старшие)
+
+        Пересекающиеся и открытые периоды разрешаются sweep-line (resolve_responsibility):
+        в каждый момент у помещения один ответственный и один старший.
+
+        Returns:
+            tuple: (dim_employee, fact_responsibility, fact_senior_responsibility)
+        """
+        employees = df_expert['contact_full_name'].dropna().drop_duplicates().sort_values()
+        dim_employee = pd.DataFrame({
+            'employee_id': range(1, len(employees) + 1),
+            'full_name': employees.to_numpy()
+        })
+
+        periods = resolve_responsibility(df_expert)
+        df = periods.merge(dim_employee, left_on='contact_full_name', right_on='full_name', how='inner')
+
+        columns = ['legal_unit_id', 'start_date', 'end_date', 'change_number', 'employee_id']
+        facts = []
+        for is_chief in (False, True):
+            fact = df[df['is_chief'] == is_chief][columns].reset_index(drop=True)
+            fact.insert(0, 'responsibility_id', range(1, len(fact) + 1))
+            facts.append(fact)
+
+        return dim_employee, facts[0], facts[1]
+
+    @instrument('mart.build')
+    def build(self) -> dict:
+        """
+        Строит все таблицы витрины и сохраняет их в output_dir
+
+        Returns:
+            dict: {имя таблицы: DataFrame}
+        """
+        df_legal_unit = self.load_processed('processed_ref_legal_unit.csv')
+        df_history = self.load_processed('processed_history.csv')
+        df_tenants = self.load_processed('processed_tenants.csv')
+        df_model = self.load_processed('processed_ref_model.csv')
+        df_expert = self.load_processed('processed_expert_history.csv')
+
+        if df_legal_unit.empty or df_history.empty:
+            print("Предупреждение: нет данных для построения витрины")
+            return {}
+
+        mart = {
+            'dim_room': self.build_dim_room(df_legal_unit, df_history, df_tenants),
+            'dim_financial_model': df_model.drop_duplicates().rename(
+                columns={'model_id': 'financial_model_id'}),
+            'dim_rent_contract': self.build_dim_rent_contract(df_tenants),
+            'fact_room_status': self.build_fact_room_status(df_history),
+        }
+
+        if not df_expert.empty:
+            (mart['dim_employee'],
+             mart['fact_responsibility'],
+             mart['fact_senior_responsibility']) = self.build_responsibility(df_expert)
+
+        for table_name, df in mart.items():
+            self.save_to_csv(df, f'{table_name}.csv')
+            print(f"Витрина: {table_name} - {len(df)} записей")
+
+        self.build_occupancy_cube(df_history, df_tenants)
+
+        return mart
+
+    @instrument('mart.save_csv')
+    def save_to_csv(self, df: pd.DataFrame, filename: str, source: str = 'mart'):
+        output_path = self.output_dir / filename
+        write_csv(df, output_path, source=source)
+
+
+def build_bi_mart():
+    configure_metrics(project_root / 'logs' / 'metrics.jsonl')
+    builder = BIMartBuilder()
+    builder.build()
+    print(get_recorder().format_summary())
+    return True
+
+
+if __name__ == "__main__":
+    build_bi_mart()
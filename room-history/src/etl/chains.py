@@ -0,0 +1,226 @@
+#chains.py
+"""
+Компактное хранение цепочек статусов: общие сегменты цепочек разных моделей
+
+tbl_crm_status_hist повторяет цепочку статусов помещения для каждой модели, причем
+прогнозные модели совпадают с фактом (model_id 666) на длинном начальном участке.
+Цепочка факта хранится сегментом целиком, цепочка модели - ссылкой на первые
+prefix_length строк сегмента факта и собственным хвостом. Сегменты с одинаковым
+содержимым (хэш строк) хранятся один раз, расчеты выполняются по строкам сегментов
+и раздаются цепочкам моделей.
+"""
+
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.csv_writer import write_csv
+
+FACT_MODEL_ID = 666
+UNIT_KEYS = ['legal_entity', 'unit_id']
+CHAIN_KEYS = ['model_id', 'legal_entity', 'unit_id']
+CONTENT_COLUMNS = ['status_sequence', 'lease_id', 'status_start_date', 'status_end_date', 'crm_status']
+
+# Множитель полиномиального хэша последовательности строк (арифметика по модулю 2**64)
+_HASH_BASE = np.uint64(1099511628211)
+
+
+def _starts(*codes: np.ndarray) -> np.ndarray:
+    """Флаги начала нового блока в отсортированных массивах кодов"""
+    flags = np.zeros(len(codes[0]), dtype=bool)
+    flags[:1] = True
+    for values in codes:
+        flags[1:] |= values[1:] != values[:-1]
+    return flags
+
+
+class ChainStore:
+    """
+    Цепочки статусов, разложенные на уникальные сегменты
+
+    Атрибуты:
+        history: Строки истории, отсортированные по помещению, модели и status_sequence
+        segments: Строки уникальных сегментов (segment_id, position + CONTENT_COLUMNS)
+        chains: Разметка цепочек (model_id, legal_entity, unit_id, prefix_segment,
+                prefix_length, suffix_segment, length), -1 - сегмента нет;
+                prefix_segment - сегмент эталонной цепочки, из него берутся
+                первые prefix_length строк
+        row_segment, row_position: Сегмент и позиция в нем для каждой строки history
+        row_chain, row_in_prefix: Цепочка строки и признак строки префикса
+    """
+
+    def __init__(self, history, segments, chains, row_segment, row_position, row_chain, row_in_prefix):
+        self.history = history
+        self.segments = segments
+        self.chains = chains
+        self.row_segment = row_segment
+        self.row_position = row_position
+        self.row_chain = row_chain
+        self.row_in_prefix = row_in_prefix
+        self._segment_offset = np.concatenate(
+            [[0], np.cumsum(np.bincount(segments['segment_id'].to_numpy(), minlength=self.segment_count))]
+        )[:-1]
+
+    @property
+    def segment_count(self) -> int:
+        return int(self.segments['segment_id'].max()) + 1 if len(self.segments) else 0
+
+    @classmethod
+    def from_history(cls, df: pd.DataFrame, reference_model_id: int = FACT_MODEL_ID,
+                     content_columns: list = None) -> 'ChainStore':
+        """
+        Раскладывает историю на сегменты
+
+        Префикс цепочки - начальный участок, совпадающий построчно с цепочкой
+        reference_model_id того же помещения; он не хранится, а читается из сегмента
+        эталонной цепочки. Хвост - остальные строки.
+        Хэш сегмента - полиномиальный хэш хэшей строк с учетом длины.
+        """
+        content_columns = content_columns or CONTENT_COLUMNS
+        history = df.sort_values(UNIT_KEYS + ['model_id', 'status_sequence'], kind='stable').reset_index(drop=True)
+        n = len(history)
+
+        unit_code = history.groupby(UNIT_KEYS, sort=False, dropna=False).ngroup().to_numpy()
+        model_code = pd.factorize(history['model_id'])[0]
+        chain_start = _starts(unit_code, model_code)
+        chain_code = np.cumsum(chain_start) - 1
+        chain_first = np.flatnonzero(chain_start)
+        chain_length = np.diff(np.append(chain_first, n))
+        position = np.arange(n) - chain_first[chain_code]
+
+        row_hash = pd.util.hash_pandas_object(history[content_columns], index=False).to_numpy()
+
+        # Сравнение со строкой эталонной цепочки того же помещения в той же позиции
+        reference = history['model_id'].to_numpy() == reference_model_id
+        width = int(chain_length.max()) + 1 if n else 1
+        row_key = unit_code.astype(np.int64) * width + position
+        reference_rows = np.flatnonzero(reference)
+        lookup = pd.Index(row_key[reference_rows]).get_indexer(row_key)
+        # Без эталонных строк (выгрузка только прогнозов) все строки - хвосты
+        reference_index = np.full(n, -1)
+        reference_index[lookup >= 0] = reference_rows[lookup[lookup >= 0]]
+        matches = (reference_index >= 0) & (row_hash[np.maximum(reference_index, 0)] == row_hash)
+
+        # Длина общего префикса - первая позиция расхождения
+        mismatch_position = np.where(matches, width, position)
+        prefix_length = np.minimum(np.minimum.reduceat(mismatch_position, chain_first), chain_length) \
+            if n else np.array([], dtype=np.int64)
+        in_prefix = position < prefix_length[chain_code]
+        relative = np.where(in_prefix, position, position - prefix_length[chain_code])
+
+        # Хранятся только цепочки эталона целиком и хвосты остальных цепочек;
+        # префикс читается из сегмента эталонной цепочки того же помещения
+        is_reference_chain = reference[chain_first] if n else np.array([], dtype=bool)
+        stored = reference | ~in_prefix
+        stored_rows = np.flatnonzero(stored)
+        stored_relative = relative[stored_rows]
+
+        # Полиномиальный хэш хранимых частей (одна часть на цепочку)
+        with np.errstate(over='ignore'):
+            weighted = row_hash[stored_rows] * np.power(_HASH_BASE, stored_relative.astype(np.uint64))
+        stored_chain = chain_code[stored_rows]
+        part_start = _starts(stored_chain) if len(stored_rows) else np.array([], dtype=bool)
+        part_first = np.flatnonzero(part_start)
+        part_code = np.cumsum(part_start) - 1
+        part_poly = np.add.reduceat(weighted, part_first) if len(stored_rows) else np.array([], dtype=np.uint64)
+        part_length = np.diff(np.append(part_first, len(stored_rows)))
+        part_hash = pd.util.hash_pandas_object(
+            pd.DataFrame({'poly': part_poly, 'length': part_length}), index=False).to_numpy()
+
+        segment_code, _ = pd.factorize(part_hash)
+        stored_segment = segment_code[part_code]
+
+        # Строки сегмента берутся из первой части с этим хэшем
+        segment_count = int(segment_code.max()) + 1 if len(segment_code) else 0
+        first_part = np.full(segment_count, -1)
+        first_part[segment_code[::-1]] = np.arange(len(segment_code))[::-1]
+        representative = part_code == first_part[stored_segment]
+        segments = history.loc[stored_rows[representative], content_columns].copy()
+        segments.insert(0, 'position', stored_relative[representative])
+        segments.insert(0, 'segment_id', stored_segment[representative])
+        segments = segments.sort_values(['segment_id', 'position'], kind='stable').reset_index(drop=True)
+
+        # Разметка цепочек: префикс - сегмент эталонной цепочки помещения, хвост - свой сегмент
+        chain_segment = np.full(len(chain_first), -1)
+        chain_segment[stored_chain[part_first]] = segment_code
+        chain_unit = unit_code[chain_first]
+        unit_reference_segment = np.full(int(unit_code.max()) + 1 if n else 0, -1)
+        unit_reference_segment[chain_unit[is_reference_chain]] = chain_segment[is_reference_chain]
+        prefix_segment = np.where(prefix_length > 0, unit_reference_segment[chain_unit], -1)
+        suffix_segment = np.where(is_reference_chain, -1, chain_segment)
+
+        row_segment = np.where(in_prefix, prefix_segment[chain_code], suffix_segment[chain_code])
+
+        chains = history.loc[chain_first, CHAIN_KEYS].reset_index(drop=True)
+        chains['prefix_segment'] = prefix_segment
+        chains['prefix_length'] = prefix_length
+        chains['suffix_segment'] = suffix_segment
+        chains['length'] = chain_length
+
+        return cls(history, segments, chains, row_segment, relative, chain_code, in_prefix)
+
+    def stats(self) -> dict:
+        """Размеры исходного и компактного представления"""
+        return {
+            'rows': len(self.history),
+            'chains': len(self.chains),
+            'segments': self.segment_count,
+            'segment_rows': len(self.segments),
+        }
+
+    def fan_out(self, segment_values: np.ndarray) -> np.ndarray:
+        """Раздает значения, рассчитанные по строкам сегментов, строкам history"""
+        return np.asarray(segment_values)[self._segment_offset[self.row_segment] + self.row_position]
+
+    def resolve_tenants(self) -> pd.DataFrame:
+        """
+        previous_tenant / future_tenant для всех строк истории
+
+        Логика совпадает с HistoryProcessor.process_history: предыдущий ненулевой
+        lease_id до строки включительно и следующий ненулевой после нее. Поиск
+        выполняется внутри сегментов в пределах префикса, на границе префикса
+        и хвоста берется последний договор префикса или первый договор хвоста.
+        """
+        segment_id = self.segments['segment_id']
+        lease = self.segments['lease_id'].where(self.segments['lease_id'] != 0)
+        lease_position = self.segments['position'].where(lease.notna())
+
+        local_previous = lease.groupby(segment_id).ffill().to_numpy(dtype=float)
+        local_future = lease.groupby(segment_id).shift(-1).groupby(segment_id).bfill().to_numpy(dtype=float)
+        future_position = lease_position.groupby(segment_id).shift(-1).groupby(segment_id).bfill() \
+            .to_numpy(dtype=float)
+        first_lease = lease.groupby(segment_id).first().reindex(range(self.segment_count)).to_numpy(dtype=float)
+
+        previous = self.fan_out(local_previous)
+        future = self.fan_out(local_future)
+
+        prefix_segment = self.chains['prefix_segment'].to_numpy()[self.row_chain]
+        prefix_length = self.chains['prefix_length'].to_numpy()[self.row_chain]
+        suffix_segment = self.chains['suffix_segment'].to_numpy()[self.row_chain]
+
+        # Сегмент префикса - цепочка эталона целиком: договоры после prefix_length не учитываются
+        beyond_prefix = self.row_in_prefix & ~(self.fan_out(future_position) < prefix_length)
+        future[beyond_prefix] = np.nan
+        carry_future = beyond_prefix & (suffix_segment >= 0)
+        future[carry_future] = first_lease[suffix_segment[carry_future]]
+
+        # Хвосту достается последний договор префикса (позиция prefix_length - 1)
+        carry_previous = ~self.row_in_prefix & np.isnan(previous) & (prefix_segment >= 0)
+        previous[carry_previous] = np.asarray(local_previous)[
+            self._segment_offset[prefix_segment[carry_previous]] + prefix_length[carry_previous] - 1]
+
+        result = self.history.copy()
+        result['previous_tenant'] = pd.array(previous, dtype='Float64').astype('Int64')
+        result['future_tenant'] = pd.array(future, dtype='Float64').astype('Int64')
+        return result
+
+    def save(self, output_dir: Path, prefix: str = 'processed_chain'):
+        """Сохраняет компактное представление: сегменты и разметку цепочек"""
+        output_dir = Path(output_dir)
+        write_csv(self.segments, output_dir / f'{prefix}_segments.csv', source='process.chains')
+        write_csv(self.chains, output_dir / f'{prefix}_map.csv', source='process.chains')
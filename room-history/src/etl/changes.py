@@ -0,0 +1,282 @@
+#changes.py
+"""
+Поток изменений между последовательными выгрузками (inserts / updates / deletes)
+
+Каждая строка снимка получает отпечаток: хэш естественного ключа и хэш остальных
+колонок. Снимки читаются чанками, отпечатки раскладываются по партициям хэша ключа во
+временные файлы, затем партиции сравниваются по одной (хэш-соединение по ключу), так что
+в памяти одновременно находятся только отпечатки одной партиции. Вторым проходом из
+нового снимка выбираются вставленные и измененные строки, из старого - удаленные.
+
+Значения сравниваются в текстовом виде CSV (dtype=str), поэтому вывод типов pandas
+по чанкам не порождает ложных изменений.
+"""
+
+from contextlib import contextmanager
+import hashlib
+from itertools import chain
+import json
+import os
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.settings import OUTPUT_CONFIG
+from src.utils.csv_writer import write_csv
+from src.utils.helpers import current_metrics, instrument, record_file_read
+
+# Естественные ключи отслеживаемых выгрузок
+SNAPSHOT_KEYS = {
+    'extract_history.csv': ['model_id', 'legal_entity', 'unit_id', 'status_sequence'],  # tbl_crm_status_hist
+    'extract_tenants.csv': ['model_id', 'legal_entity', 'unit_id', 'lease_id'],  # business_units
+    'expert.csv': ['TrcShoppingMall', 'TrcUnitNumber', 'TrcContactFullName', 'TrcRespStartDate'],  # эксперты CRM
+}
+
+CHANGE_COLUMN = 'change_type'
+DEFAULT_PARTITIONS = 16
+DEFAULT_CHUNK_ROWS = 200000
+
+# Запись отпечатка во временном файле партиции: хэш ключа и хэш строки
+_FINGERPRINT = np.dtype([('key', '<u8'), ('row', '<u8')])
+
+
+def read_snapshot(path: Path, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Снимок чанками строковых значений (пустые значения - пустые строки)"""
+    yield from pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+
+
+def fingerprint(df: pd.DataFrame, keys: List[str]) -> tuple:
+    """Хэши ключа и остальных колонок строк чанка (uint64)"""
+    missing = [key for key in keys if key not in df.columns]
+    if missing:
+        raise KeyError(f"В снимке нет ключевых колонок: {missing}")
+    values = [column for column in df.columns if column not in keys]
+    key_hash = pd.util.hash_pandas_object(df[keys], index=False).to_numpy()
+    row_hash = pd.util.hash_pandas_object(df[values], index=False).to_numpy() if values \
+        else np.zeros(len(df), dtype=np.uint64)
+    return key_hash, row_hash
+
+
+def partition_hashes(df: pd.DataFrame, keys: list, columns: List[str] = None) -> pd.DataFrame:
+    """
+    Хэш содержимого партиций: сумма хэшей строк (не зависит от порядка строк) и число строк
+
+    Args:
+        keys: Колонки df или Series ключа партиции
+        columns: Хэшируемые колонки (по умолчанию - все); их имена входят в хэш
+
+    Returns:
+        pd.DataFrame: Ключи партиции, rows, content_hash
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    keys = [df[key] if isinstance(key, str) else key for key in keys]
+    columns_hash = hashlib.sha256('\x1f'.join(columns).encode('utf-8')).hexdigest()[:8]
+    grouped = pd.util.hash_pandas_object(df[columns], index=False).groupby(keys)
+    result = pd.DataFrame({'row_sum': grouped.sum().astype('uint64'), 'rows': grouped.size()}).reset_index()
+    result['content_hash'] = [f'{row_sum:016x}-{rows}-{columns_hash}'
+                              for row_sum, rows in zip(result['row_sum'], result['rows'])]
+    return result.drop(columns='row_sum')
+
+
+class SnapshotDiff:
+    """
+    Сравнение двух снимков CSV по естественному ключу
+
+    Args:
+        keys: Колонки естественного ключа
+        partitions: Число партиций хэш-соединения (память ~ размер снимка / partitions)
+        chunk_rows: Строк в чанке чтения снимков
+    """
+
+    def __init__(self, keys: List[str], partitions: int = DEFAULT_PARTITIONS,
+                 chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        self.keys = list(keys)
+        self.partitions = partitions
+        self.chunk_rows = chunk_rows
+
+    def _spill(self, path: Path, spill_dir: Path, side: str) -> int:
+        """Раскладывает отпечатки снимка по файлам партиций; возвращает число строк"""
+        files = [open(spill_dir / f'{side}-{p:03d}.bin', 'wb') for p in range(self.partitions)]
+        rows = 0
+        try:
+            for chunk in read_snapshot(path, self.chunk_rows):
+                key_hash, row_hash = fingerprint(chunk, self.keys)
+                records = np.empty(len(chunk), dtype=_FINGERPRINT)
+                records['key'], records['row'] = key_hash, row_hash
+                partition = key_hash % np.uint64(self.partitions)
+                order = np.argsort(partition, kind='stable')
+                bounds = np.searchsorted(partition[order], np.arange(self.partitions + 1))
+                for p in range(self.partitions):
+                    if bounds[p] < bounds[p + 1]:
+                        records[order[bounds[p]:bounds[p + 1]]].tofile(files[p])
+                rows += len(chunk)
+        finally:
+            for f in files:
+                f.close()
+        record_file_read(path)
+        return rows
+
+    def _load_partition(self, spill_dir: Path, side: str, partition: int) -> pd.DataFrame:
+        records = np.fromfile(spill_dir / f'{side}-{partition:03d}.bin', dtype=_FINGERPRINT)
+        return pd.DataFrame({'key': records['key'], 'row': records['row']})
+
+    def compare(self, old_path: Path, new_path: Path, spill_dir: Path) -> Dict[str, np.ndarray]:
+        """Хэши ключей вставленных, измененных и удаленных строк и счетчики снимков"""
+        old_rows = self._spill(old_path, spill_dir, 'old')
+        new_rows = self._spill(new_path, spill_dir, 'new')
+
+        changed = {'insert': [], 'update': [], 'delete': []}
+        duplicates = 0
+        for p in range(self.partitions):
+            old = self._load_partition(spill_dir, 'old', p)
+            new = self._load_partition(spill_dir, 'new', p)
+            duplicates += int(old['key'].duplicated().sum() + new['key'].duplicated().sum())
+            joined = old.drop_duplicates('key', keep='last').merge(
+                new.drop_duplicates('key', keep='last'), on='key', how='outer',
+                suffixes=('_old', '_new'), indicator=True)
+            changed['delete'].append(joined.loc[joined['_merge'] == 'left_only', 'key'].to_numpy())
+            changed['insert'].append(joined.loc[joined['_merge'] == 'right_only', 'key'].to_numpy())
+            both = joined[joined['_merge'] == 'both']
+            changed['update'].append(both.loc[both['row_old'] != both['row_new'], 'key'].to_numpy())
+
+        if duplicates:
+            print(f"Предупреждение: {duplicates} строк с повторяющимся ключом {self.keys} "
+                  f"(сравнивается последняя строка ключа)")
+        result = {kind: np.sort(np.concatenate(parts).astype(np.uint64)) for kind, parts in changed.items()}
+        result['old_rows'], result['new_rows'] = old_rows, new_rows
+        return result
+
+    def _select(self, path: Path, key_hashes: Dict[str, np.ndarray], columns: List[str]) -> Iterator[pd.DataFrame]:
+        """Строки снимка, хэш ключа которых входит в key_hashes[тип изменения], в колонках columns"""
+        for chunk in read_snapshot(path, self.chunk_rows):
+            key_hash, _ = fingerprint(chunk, self.keys)
+            for change_type, hashes in key_hashes.items():
+                mask = np.isin(key_hash, hashes, assume_unique=False)
+                if mask.any():
+                    rows = chunk[mask]
+                    yield rows.assign(**{CHANGE_COLUMN: change_type}).reindex(columns=columns)
+
+    @instrument('changes.diff')
+    def diff(self, old_path: Path, new_path: Path, output_path: Path, source: str = None) -> Dict[str, int]:
+        """
+        Записывает поток изменений new относительно old в output_path
+
+        Для вставок и изменений в поток попадает новая строка, для удалений - старая.
+        Поток записывается атомарно и регистрируется в каталоге с источником source.
+
+        Returns:
+            dict: insert, update, delete, unchanged, old_rows, new_rows
+        """
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=output_path.parent, prefix='.diff-') as spill_dir:
+            changed = self.compare(Path(old_path), Path(new_path), Path(spill_dir))
+
+        # Колонки потока - колонки нового снимка (удаленные строки старой схемы приводятся к ним)
+        columns = [CHANGE_COLUMN, *pd.read_csv(new_path, dtype=str, nrows=0).columns]
+        header = pd.DataFrame(columns=columns, dtype=str)
+        result = write_csv(chain([header],
+                                 self._select(Path(new_path), {'insert': changed['insert'], 'update': changed['update']},
+                                              columns),
+                                 self._select(Path(old_path), {'delete': changed['delete']}, columns)),
+                           output_path, source=source, query=json.dumps(self.keys))
+
+        summary = {kind: int(len(changed[kind])) for kind in ('insert', 'update', 'delete')}
+        summary['old_rows'], summary['new_rows'] = changed['old_rows'], changed['new_rows']
+        summary['unchanged'] = summary['new_rows'] - summary['insert'] - summary['update']
+
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.add_rows_in(summary['old_rows'] + summary['new_rows'])
+            metrics.add_rows_out(result.rows)
+        return summary
+
+
+class SnapshotStore:
+    """
+    Предыдущие снимки выгрузок и потоки изменений
+
+    capture() сохраняет текущую версию файла жесткой ссылкой (без копирования данных)
+    до перезаписи, а после успешной записи сравнивает новую версию с сохраненной и пишет
+    changes_dir/<имя>_changes.csv. Жесткая ссылка сохраняет старое содержимое, потому что
+    write_csv заменяет файл новым (os.replace), а не перезаписывает его на месте.
+
+    Args:
+        snapshot_dir: Каталог предыдущих снимков
+        changes_dir: Каталог потоков изменений
+        enabled: Вести ли снимки (по умолчанию - OUTPUT_CONFIG['change_feed'])
+    """
+
+    def __init__(self, snapshot_dir: Path = None, changes_dir: Path = None, enabled: bool = None,
+                 partitions: int = DEFAULT_PARTITIONS):
+        self.snapshot_dir = Path(snapshot_dir or project_root / 'data' / 'snapshots')
+        self.changes_dir = Path(changes_dir or project_root / 'data' / 'changes')
+        self.enabled = OUTPUT_CONFIG['change_feed'] if enabled is None else enabled
+        self.partitions = partitions
+
+    def previous_path(self, path: Path) -> Path:
+        return self.snapshot_dir / Path(path).name
+
+    def changes_path(self, path: Path) -> Path:
+        return self.changes_dir / f'{Path(path).name.split(".")[0]}_changes.csv'
+
+    def preserve(self, path: Path) -> Optional[Path]:
+        """Сохраняет текущую версию файла как предыдущий снимок"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        previous = self.previous_path(path)
+        tmp_path = self.snapshot_dir / f'.{path.name}.tmp'
+        if tmp_path.exists():
+            tmp_path.unlink()
+        try:
+            os.link(path, tmp_path)
+        except OSError:
+            # Жесткие ссылки недоступны (другая ФС) - копируем
+            shutil.copy2(path, tmp_path)
+        os.replace(tmp_path, previous)
+        return previous
+
+    def publish(self, path: Path, keys: List[str] = None) -> Optional[Dict[str, int]]:
+        """Сравнивает файл с предыдущим снимком и пишет поток изменений"""
+        path = Path(path)
+        keys = keys or SNAPSHOT_KEYS.get(path.name)
+        previous = self.previous_path(path)
+        if not keys or not previous.exists():
+            return None
+
+        output_path = self.changes_path(path)
+        summary = SnapshotDiff(keys, partitions=self.partitions).diff(previous, path, output_path,
+                                                                      source=f'changes:{path.name}')
+        print(f"Изменения {path.name}: +{summary['insert']} ~{summary['update']} -{summary['delete']} "
+              f"(без изменений {summary['unchanged']}) -> {output_path.name}")
+        return summary
+
+    @contextmanager
+    def capture(self, path: Path, keys: List[str] = None):
+        """Сохраняет снимок до записи path и публикует изменения после нее"""
+        path = Path(path)
+        tracked = self.enabled and (keys or path.name in SNAPSHOT_KEYS)
+        if tracked:
+            self.preserve(path)
+        yield
+        if tracked:
+            self.publish(path, keys)
+
+
+def load_changes(path: Path, change_types: List[str] = None, columns: List[str] = None) -> pd.DataFrame:
+    """Читает поток изменений (при change_types - только строки этих типов)"""
+    usecols = None if columns is None else [CHANGE_COLUMN, *columns]
+    df = pd.read_csv(path, usecols=usecols)
+    if change_types is not None:
+        df = df[df[CHANGE_COLUMN].isin(change_types)]
+    return df
@@ -0,0 +1,206 @@
+#checkpoints.py
+"""
+Возобновляемые выгрузки чанками
+
+Каждый чанк (например, 500 lease_id запроса арендаторов) сохраняется фрагментом CSV
+в каталоге контрольной точки, после чего манифест manifest.json атомарно дополняется
+записью о чанке (файл фрагмента, число строк, SHA-256). Если выгрузка прервалась,
+повторный запуск с тем же планом (текст запроса и ключи чанков) пропускает чанки с
+целыми фрагментами и запрашивает только оставшиеся. Итоговый файл собирается из
+фрагментов; после выгрузки всех чанков контрольная точка удаляется.
+"""
+
+from datetime import datetime
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+import threading
+from typing import Callable, Dict, Iterator, List, Sequence
+
+import pandas as pd
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.catalog import file_checksum
+from src.utils.csv_writer import WriteResult, write_csv
+from src.utils.helpers import track
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def plan_hash(query: str, chunks: Sequence) -> str:
+    """Хэш плана выгрузки: текст запроса и ключи всех чанков по порядку"""
+    payload = json.dumps({'query': ' '.join(query.split()), 'chunks': [list(map(str, c)) for c in chunks]},
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class ChunkCheckpoint:
+    """
+    Контрольная точка выгрузки чанками
+
+    Args:
+        directory: Каталог фрагментов и манифеста (например, data/checkpoints/extract_tenants)
+        plan: Хэш плана (plan_hash); контрольная точка другого плана сбрасывается
+        encoding: Кодировка фрагментов
+    """
+
+    def __init__(self, directory: Path, plan: str, encoding: str = 'utf-8'):
+        self.directory = Path(directory)
+        self.plan = plan
+        self.encoding = encoding
+        self._lock = threading.Lock()
+        self.manifest = self._load()
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.directory / MANIFEST_FILE
+
+    def _load(self) -> dict:
+        empty = {'plan': self.plan, 'chunks': {}}
+        if not self.manifest_path.exists():
+            return empty
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            print(f"Предупреждение: манифест {self.manifest_path} не читается ({e}), выгрузка начнется заново")
+            self.reset()
+            return empty
+        if manifest.get('plan') != self.plan:
+            print(f"Контрольная точка {self.directory.name} относится к другому запросу, выгрузка начнется заново")
+            self.reset()
+            return empty
+        return manifest
+
+    def _save(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.manifest-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def fragment_path(self, index: int) -> Path:
+        return self.directory / f'chunk-{index:05d}.csv'
+
+    def is_complete(self, index: int) -> bool:
+        """Чанк выгружен и его фрагмент не изменился"""
+        entry = self.manifest['chunks'].get(str(index))
+        if entry is None:
+            return False
+        path = self.directory / entry['file']
+        if path.exists() and file_checksum(path) == entry['checksum']:
+            return True
+        # Фрагмент удален или поврежден - чанк выгружается заново
+        with self._lock:
+            del self.manifest['chunks'][str(index)]
+        return False
+
+    def complete(self, index: int, df: pd.DataFrame, key: Sequence = None) -> dict:
+        """Пишет фрагмент чанка и отмечает чанк выполненным в манифесте"""
+        path = self.fragment_path(index)
+        result = write_csv(df, path, encoding=self.encoding, catalog=False)
+        entry = {
+            'file': path.name,
+            'rows': result.rows,
+            'checksum': result.checksum,
+            'first_key': None if not key else str(key[0]),
+            'completed_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        with self._lock:
+            self.manifest['chunks'][str(index)] = entry
+            self._save()
+        return entry
+
+    def completed(self) -> List[int]:
+        return sorted(int(index) for index in self.manifest['chunks'])
+
+    def fragments(self, chunk_rows: int = 100000) -> Iterator[pd.DataFrame]:
+        """
+        Фрагменты выполненных чанков по порядку в виде строковых значений
+
+        Значения не приводятся к типам, поэтому собранный файл совпадает по тексту с фрагментами.
+        """
+        for index in self.completed():
+            path = self.directory / self.manifest['chunks'][str(index)]['file']
+            yield from pd.read_csv(path, dtype=str, keep_default_na=False, encoding=self.encoding,
+                                   chunksize=chunk_rows)
+
+    def reset(self):
+        """Удаляет контрольную точку"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.manifest = {'plan': self.plan, 'chunks': {}}
+
+
+class ResumableExtraction:
+    """
+    Выгрузка чанками с контрольной точкой
+
+    Args:
+        name: Имя выгрузки (каталог контрольной точки)
+        query: Шаблон запроса (входит в план)
+        chunks: Ключи чанков по порядку (например, списки lease_id)
+        checkpoint_dir: Каталог контрольных точек
+        resume: Продолжать с прерванной выгрузки (False - начать заново)
+    """
+
+    def __init__(self, name: str, query: str, chunks: Sequence[Sequence], checkpoint_dir: Path,
+                 resume: bool = True, encoding: str = 'utf-8'):
+        self.name = name
+        self.chunks = list(chunks)
+        self.checkpoint = ChunkCheckpoint(Path(checkpoint_dir) / name, plan_hash(query, self.chunks), encoding)
+        if not resume:
+            self.checkpoint.reset()
+
+    def run(self, fetch: Callable[[Sequence], pd.DataFrame]) -> Dict[str, int]:
+        """
+        Выгружает невыполненные чанки; ошибка чанка не останавливает остальные
+
+        Returns:
+            dict: chunks, resumed (чанки из контрольной точки), fetched, failed
+        """
+        stats = {'chunks': len(self.chunks), 'resumed': 0, 'fetched': 0, 'failed': 0}
+        with track(f'{self.name}.chunks') as metrics:
+            for index, key in enumerate(self.chunks):
+                if self.checkpoint.is_complete(index):
+                    stats['resumed'] += 1
+                    continue
+                try:
+                    df = fetch(key)
+                except Exception as e:
+                    # Чанк будет запрошен при следующем запуске
+                    stats['failed'] += 1
+                    print(f"Ошибка при извлечении чанка {self.name} {index + 1}/{len(self.chunks)} "
+                          f"({len(key)} ключей): {e}")
+                    continue
+                entry = self.checkpoint.complete(index, df, key)
+                metrics.add_rows_out(entry['rows'])
+                stats['fetched'] += 1
+            metrics.tags.update(stats)
+
+        if stats['resumed']:
+            print(f"{self.name}: {stats['resumed']} из {stats['chunks']} чанков взяты из контрольной точки")
+        return stats
+
+    @property
+    def is_complete(self) -> bool:
+        return len(self.checkpoint.completed()) == len(self.chunks)
+
+    def assemble(self, output_path: Path, **options) -> WriteResult:
+        """
+        Собирает итоговый файл из фрагментов (атомарно, через write_csv)
+
+        Контрольная точка удаляется, только если выполнены все чанки.
+        """
+        result = write_csv(self.checkpoint.fragments(), output_path, encoding=self.checkpoint.encoding, **options)
+        if self.is_complete:
+            self.checkpoint.reset()
+        return result
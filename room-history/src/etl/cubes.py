@@ -0,0 +1,311 @@
+"""
+Предагрегированные кубы занятости для BI с инкрементальным обновлением
+
+Куб хранит помесячные суммы по измерениям model_id, legal_entity, trc_abbreviation,
+client_category, статусу CRM и признаку договора: помещение-дни, площадь-дни и число
+начавшихся статусов. Средняя площадь месяца - площадь-дни / дни месяца, занятость и
+вакантность считаются из сумм при запросе, так что дашборду не нужны строки истории.
+
+Куб лежит в SQLite (таблица occupancy_cube) и разбит на партиции (model_id, legal_entity).
+При обновлении по каждой партиции считается хэш ее строк истории вместе с площадью и
+категорией арендатора; пересчитываются только партиции с изменившимся хэшем (или
+переданные явно в changed_keys), остальные строки куба не затрагиваются.
+"""
+
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+import sqlite3
+import sys
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.database.bulk_load import dataframe_to_rows
+from src.etl.changes import partition_hashes
+from src.utils.helpers import current_metrics, instrument
+
+CUBE_DIMENSIONS = ['model_id', 'legal_entity', 'trc_abbreviation', 'client_category']
+PARTITION_KEYS = ['model_id', 'legal_entity']
+CUBE_COLUMNS = CUBE_DIMENSIONS + ['month', 'crm_status', 'is_leased',
+                                  'days_in_month', 'unit_days', 'area_days', 'status_starts']
+
+CUBE_TABLE = 'occupancy_cube'
+PARTITIONS_TABLE = 'occupancy_cube_partitions'
+META_TABLE = 'occupancy_cube_meta'
+
+# Категория строк без договора (lease_id = 0) и договоров без категории
+NO_CONTRACT = 'Без договора'
+UNKNOWN_CATEGORY = 'Не указана'
+
+_HISTORY_CONTENT = ['lease_id', 'status_sequence', 'status_start_date', 'status_end_date', 'crm_status']
+
+
+def enrich_history(df_history: pd.DataFrame, df_tenants: pd.DataFrame) -> pd.DataFrame:
+    """
+    Строки истории с площадью помещения и категорией арендатора
+
+    Площадь - максимальная total_area договоров помещения (как в dim_room),
+    категория - client_category договора (lease_id, с model_id если он есть у договоров).
+    """
+    unit_key = 'legal_unit_id' if 'legal_unit_id' in df_history.columns else None
+    unit_keys = [unit_key] if unit_key else ['legal_entity', 'unit_id']
+    columns = list(dict.fromkeys(PARTITION_KEYS + unit_keys + ['trc_abbreviation'] + _HISTORY_CONTENT))
+    df = df_history[[col for col in columns if col in df_history.columns]].copy()
+    if 'trc_abbreviation' not in df.columns:
+        df['trc_abbreviation'] = ''
+
+    df['total_area'] = 0.0
+    df['client_category'] = UNKNOWN_CATEGORY
+    if not df_tenants.empty and set(unit_keys) <= set(df_tenants.columns) and 'total_area' in df_tenants.columns:
+        area = df_tenants.groupby(unit_keys, as_index=False)['total_area'].max()
+        df = df.drop(columns='total_area').merge(area, on=unit_keys, how='left')
+        df['total_area'] = df['total_area'].fillna(0.0)
+
+    if not df_tenants.empty and {'lease_id', 'client_category'} <= set(df_tenants.columns):
+        lease_keys = ['model_id', 'lease_id'] if 'model_id' in df_tenants.columns else ['lease_id']
+        category = df_tenants[lease_keys + ['client_category']].drop_duplicates(lease_keys)
+        df = df.drop(columns='client_category').merge(category, on=lease_keys, how='left')
+        df['client_category'] = df['client_category'].fillna(UNKNOWN_CATEGORY)
+    df.loc[df['lease_id'] == 0, 'client_category'] = NO_CONTRACT
+
+    df['trc_abbreviation'] = df['trc_abbreviation'].fillna('')
+    return df
+
+
+def aggregate_months(df: pd.DataFrame, horizon: np.datetime64) -> pd.DataFrame:
+    """
+    Разворачивает интервалы статусов по месяцам и агрегирует в строки куба
+
+    Конец статуса включительный, открытый конец ограничивается horizon. Месяцы
+    интервала порождаются векторно (repeat + смещения), без циклов по строкам.
+    """
+    start = pd.to_datetime(df['status_start_date'], errors='coerce').to_numpy('datetime64[D]')
+    end = pd.to_datetime(df['status_end_date'], errors='coerce').to_numpy('datetime64[D]')
+    end = np.where(np.isnat(end), horizon, np.minimum(end, horizon))
+    valid = ~np.isnat(start) & (end >= start)
+    rows = np.flatnonzero(valid)
+    start, end = start[valid], end[valid]
+
+    first_month = start.astype('datetime64[M]')
+    months = (end.astype('datetime64[M]') - first_month).astype(np.int64) + 1
+    repeated = np.repeat(np.arange(len(rows)), months)
+    offset = np.arange(len(repeated)) - np.repeat(np.cumsum(months) - months, months)
+    month = first_month[repeated] + offset.astype('timedelta64[M]')
+
+    month_start = month.astype('datetime64[D]')
+    month_end = (month + np.timedelta64(1, 'M')).astype('datetime64[D]')
+    days = (np.minimum(end[repeated] + np.timedelta64(1, 'D'), month_end)
+            - np.maximum(start[repeated], month_start)).astype(np.int64)
+
+    source = df.iloc[rows[repeated]]
+    expanded = pd.DataFrame({
+        **{column: source[column].to_numpy() for column in CUBE_DIMENSIONS + ['crm_status']},
+        'month': np.datetime_as_string(month, unit='M'),
+        'is_leased': (source['lease_id'].to_numpy() != 0).astype(np.int64),
+        'days_in_month': (month_end - month_start).astype(np.int64),
+        'unit_days': days,
+        'area_days': days * source['total_area'].to_numpy(dtype=float),
+        'status_starts': (offset == 0).astype(np.int64),
+    })
+
+    keys = CUBE_DIMENSIONS + ['month', 'crm_status', 'is_leased', 'days_in_month']
+    cube = expanded.groupby(keys, as_index=False, sort=False, dropna=False)[
+        ['unit_days', 'area_days', 'status_starts']].sum()
+    return cube[CUBE_COLUMNS]
+
+
+class OccupancyCube:
+    """
+    Куб занятости в SQLite
+
+    Args:
+        db_path: Файл базы SQLite (создается при первом обновлении)
+    """
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = Path(db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {CUBE_TABLE} (
+                model_id INTEGER, legal_entity TEXT, trc_abbreviation TEXT, client_category TEXT,
+                month TEXT, crm_status TEXT, is_leased INTEGER, days_in_month INTEGER,
+                unit_days INTEGER, area_days REAL, status_starts INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS ix_{CUBE_TABLE}_partition ON {CUBE_TABLE} (model_id, legal_entity);
+            CREATE INDEX IF NOT EXISTS ix_{CUBE_TABLE}_month ON {CUBE_TABLE} (month);
+            CREATE TABLE IF NOT EXISTS {PARTITIONS_TABLE} (
+                model_id INTEGER, legal_entity TEXT, content_hash TEXT, rows INTEGER, refreshed_at TEXT,
+                PRIMARY KEY (model_id, legal_entity)
+            );
+            CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        return conn
+
+    def partitions(self) -> pd.DataFrame:
+        """Партиции куба с хэшами содержимого"""
+        with closing(self._connect()) as conn:
+            return pd.read_sql(f'SELECT * FROM {PARTITIONS_TABLE} ORDER BY model_id, legal_entity', conn)
+
+    @instrument('cube.refresh')
+    def refresh(self, df_history: pd.DataFrame, df_tenants: pd.DataFrame = None,
+                changed_keys: pd.DataFrame = None, horizon: str = None) -> Dict[str, int]:
+        """
+        Обновляет партиции куба, затронутые изменениями истории
+
+        Args:
+            df_history: Полная обработанная история (processed_history)
+            df_tenants: Договоры (processed_tenants) - площадь и категория арендатора
+            changed_keys: Измененные партиции (model_id, legal_entity); None - по хэшам
+            horizon: Дата, до которой продлеваются открытые статусы (по умолчанию -
+                     конец месяца последней даты истории)
+
+        Returns:
+            dict: partitions, refreshed, removed, rows (вставлено строк куба)
+        """
+        df = enrich_history(df_history, df_tenants if df_tenants is not None else pd.DataFrame())
+        current = partition_hashes(df, PARTITION_KEYS,
+                                   columns=[col for col in df.columns if col not in PARTITION_KEYS])
+        horizon = np.datetime64(horizon, 'D') if horizon else self._default_horizon(df)
+
+        conn = self._connect()
+        try:
+            stored = pd.read_sql(f'SELECT model_id, legal_entity, content_hash FROM {PARTITIONS_TABLE}', conn)
+            meta = dict(conn.execute(f'SELECT key, value FROM {META_TABLE}').fetchall())
+
+            compared = current.merge(stored, on=PARTITION_KEYS, how='outer', suffixes=('', '_stored'),
+                                     indicator=True)
+            removed = compared[compared['_merge'] == 'right_only'][PARTITION_KEYS]
+            if meta.get('horizon') != str(horizon):
+                # Горизонт открытых статусов изменился - пересчитываются все партиции
+                touched = current[PARTITION_KEYS]
+            elif changed_keys is not None:
+                touched = changed_keys[PARTITION_KEYS].drop_duplicates().merge(current[PARTITION_KEYS],
+                                                                               on=PARTITION_KEYS)
+            else:
+                changed = compared[(compared['_merge'] == 'left_only')
+                                   | ((compared['_merge'] == 'both')
+                                      & (compared['content_hash'] != compared['content_hash_stored']))]
+                touched = changed[PARTITION_KEYS]
+
+            rows = df.merge(touched, on=PARTITION_KEYS)
+            cube = aggregate_months(rows, horizon) if len(rows) else pd.DataFrame(columns=CUBE_COLUMNS)
+
+            stale = pd.concat([touched, removed], ignore_index=True)
+            refreshed_at = datetime.now().isoformat(timespec='seconds')
+            partition_rows = touched.merge(current, on=PARTITION_KEYS)
+            partition_rows['refreshed_at'] = refreshed_at
+
+            conn.execute('BEGIN')
+            conn.executemany(f'DELETE FROM {CUBE_TABLE} WHERE model_id = ? AND legal_entity = ?',
+                             dataframe_to_rows(stale))
+            conn.executemany(f'DELETE FROM {PARTITIONS_TABLE} WHERE model_id = ? AND legal_entity = ?',
+                             dataframe_to_rows(stale))
+            conn.executemany(f"INSERT INTO {CUBE_TABLE} ({', '.join(CUBE_COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * len(CUBE_COLUMNS))})", dataframe_to_rows(cube))
+            conn.executemany(f'INSERT INTO {PARTITIONS_TABLE} (model_id, legal_entity, content_hash, rows, '
+                             f'refreshed_at) VALUES (?, ?, ?, ?, ?)',
+                             dataframe_to_rows(partition_rows[PARTITION_KEYS + ['content_hash', 'rows',
+                                                                                'refreshed_at']]))
+            conn.execute(f'INSERT OR REPLACE INTO {META_TABLE} (key, value) VALUES (?, ?)',
+                         ('horizon', str(horizon)))
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.add_rows_in(len(rows))
+            metrics.add_rows_out(len(cube))
+
+        stats = {'partitions': len(current), 'refreshed': len(touched), 'removed': len(removed), 'rows': len(cube)}
+        print(f"Куб занятости: обновлено {stats['refreshed']} из {stats['partitions']} партиций, "
+              f"удалено {stats['removed']}, вставлено {stats['rows']} строк")
+        return stats
+
+    @staticmethod
+    def _default_horizon(df: pd.DataFrame) -> np.datetime64:
+        dates = pd.concat([pd.to_datetime(df['status_start_date'], errors='coerce'),
+                           pd.to_datetime(df['status_end_date'], errors='coerce')])
+        last = dates.max()
+        if pd.isna(last):
+            return np.datetime64('today', 'D')
+        month = np.datetime64(last, 'M')
+        return (month + np.timedelta64(1, 'M')).astype('datetime64[D]') - np.timedelta64(1, 'D')
+
+    def query(self, by: List[str] = None, filters: dict = None, months: tuple = None) -> pd.DataFrame:
+        """
+        Срез куба для дашборда
+
+        Args:
+            by: Измерения группировки (из CUBE_DIMENSIONS, 'month', 'crm_status', 'is_leased')
+            filters: {измерение: значение или список значений}
+            months: (первый, последний) месяц 'YYYY-MM' включительно
+
+        Returns:
+            pd.DataFrame: by + total_area, leased_area, vacant_area (средние за период),
+                          occupancy_rate, vacancy_rate, units, leased_units, status_starts
+        """
+        by = list(by or [])
+        allowed = set(CUBE_DIMENSIONS) | {'month', 'crm_status', 'is_leased'}
+        unknown = (set(by) | set(filters or {})) - allowed
+        if unknown:
+            raise ValueError(f"Неизвестные измерения куба: {sorted(unknown)}")
+
+        conditions, params = [], []
+        for column, value in (filters or {}).items():
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(item.item() if isinstance(item, np.generic) else item for item in values)
+        if months:
+            conditions.append('month BETWEEN ? AND ?')
+            params.extend(months)
+
+        group = list(dict.fromkeys(by + ['month']))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        sql = f"""
+            SELECT {', '.join(group)},
+                   MAX(days_in_month) AS days,
+                   SUM(area_days) AS area_days,
+                   SUM(CASE WHEN is_leased = 1 THEN area_days ELSE 0 END) AS leased_area_days,
+                   SUM(unit_days) AS unit_days,
+                   SUM(CASE WHEN is_leased = 1 THEN unit_days ELSE 0 END) AS leased_unit_days,
+                   SUM(status_starts) AS status_starts
+            FROM {CUBE_TABLE} {where}
+            GROUP BY {', '.join(group)}
+        """
+        with closing(self._connect()) as conn:
+            monthly = pd.read_sql(sql, conn, params=params)
+
+        measures = ['area_days', 'leased_area_days', 'unit_days', 'leased_unit_days', 'status_starts']
+        aggregations = dict({measure: 'sum' for measure in measures}, days='max')
+        totals = monthly.groupby(by, as_index=False, sort=True).agg(aggregations) if by \
+            else monthly[measures].sum().to_frame().T
+
+        # Средние за период: площадь-дни делятся на дни месяца среза или на все дни месяцев запроса
+        if 'month' in by:
+            days = totals['days']
+        else:
+            days = pd.Series(monthly.drop_duplicates('month')['days'].sum(), index=totals.index)
+        days = days.where(days > 0)
+        result = totals[by].copy()
+        result['total_area'] = totals['area_days'] / days
+        result['leased_area'] = totals['leased_area_days'] / days
+        result['vacant_area'] = result['total_area'] - result['leased_area']
+        result['occupancy_rate'] = totals['leased_area_days'] / totals['area_days'].where(totals['area_days'] > 0)
+        result['vacancy_rate'] = 1 - result['occupancy_rate']
+        result['units'] = totals['unit_days'] / days
+        result['leased_units'] = totals['leased_unit_days'] / days
+        result['status_starts'] = totals['status_starts'].astype(np.int64)
+        return result.reset_index(drop=True)
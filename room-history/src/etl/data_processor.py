@@ -5,15 +5,26 @@ import sys
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+from src.etl.chains import ChainStore
+from src.etl.export import export_processed
+from src.etl.intervals import interval_join
+from src.etl.validation import validate_processed_data
+from src.utils.catalog import DatasetCatalog
+from src.utils.csv_writer import write_csv
+from src.utils.helpers import configure_metrics, get_recorder, instrument, record_file_read
+
 
 class HistoryProcessor:
-    def __init__(self):
-        self.data_dir = project_root / 'data' / 'raw'
-        self.output_dir = project_root / 'data' / 'processed'
+    def __init__(self, data_dir: Path = None, output_dir: Path = None):
+        self.data_dir = Path(data_dir) if data_dir else project_root / 'data' / 'raw'
+        self.output_dir = Path(output_dir) if output_dir else project_root / 'data' / 'processed'
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.chain_store = None
 
+    @instrument('process.load_data')
     def load_data(self) -> pd.DataFrame:
         file_path = self.data_dir / 'extract_history.csv'
+        record_file_read(file_path)
         return pd.read_csv(file_path)
 
     def add_primary_key_to_legal_unit(self):
@@ -25,6 +36,7 @@ class HistoryProcessor:
             return pd.DataFrame()
 
         df_legal_unit = pd.read_csv(legal_unit_path)
+        record_file_read(legal_unit_path)
 
         # Проверяем, есть ли уже первичный ключ
         if 'legal_unit_id' in df_legal_unit.columns:
@@ -38,6 +50,7 @@ class HistoryProcessor:
         print(f"Добавлен первичный ключ legal_unit_id для {len(df_legal_unit)} записей")
         return df_legal_unit
 
+    @instrument('process.history')
     def process_history(self, df: pd.DataFrame) -> pd.DataFrame:
         """Обрабатывает исторические данные и добавляет вторичный ключ"""
         # Сначала получаем обогащенный справочник legal_unit
@@ -51,39 +64,18 @@ class HistoryProcessor:
             # Сохраняем промежуточный справочник
             self.save_to_csv(df_legal_unit, 'processed_ref_legal_unit.csv')
 
-        def process_group(group):
-            group = group.sort_values('status_sequence')
-            non_zero_leases = group[group['lease_id'] != 0]
-
-            previous_tenants = []
-            future_tenants = []
-
-            for _, row in group.iterrows():
-                current_seq = row['status_sequence']
-
-                # Предыдущий не нулевой lease_id (включая текущий если не 0)
-                previous = non_zero_leases[non_zero_leases['status_sequence'] <= current_seq]
-                previous_tenant = previous.iloc[-1]['lease_id'] if not previous.empty else None
-
-                # Следующий не нулевой lease_id (исключая текущий)
-                future = non_zero_leases[non_zero_leases['status_sequence'] > current_seq]
-                future_tenant = future.iloc[0]['lease_id'] if not future.empty else None
-
-                # Если текущий lease_id не 0, оставляем его в previous_tenant
-                if row['lease_id'] != 0:
-                    previous_tenant = row['lease_id']
-
-                previous_tenants.append(previous_tenant)
-                future_tenants.append(future_tenant)
-
-            group = group.copy()
-            group['previous_tenant'] = previous_tenants
-            group['future_tenant'] = future_tenants
-
-            return group
-
-        # Обрабатываем группы
-        result = df.groupby(['model_id', 'unit_id', 'legal_entity']).apply(process_group).reset_index(drop=True)
+        if {'previous_tenant', 'future_tenant'}.issubset(df.columns):
+            # Арендаторы уже рассчитаны в БД (DBExtractor с tenant_pushdown)
+            result = df.sort_values(['model_id', 'unit_id', 'legal_entity', 'status_sequence']).reset_index(drop=True)
+        else:
+            # Арендаторы рассчитываются один раз на уникальный сегмент цепочки и раздаются моделям
+            self.chain_store = ChainStore.from_history(df)
+            stats = self.chain_store.stats()
+            print(f"Цепочки статусов: {stats['chains']} цепочек, {stats['segments']} уникальных сегментов "
+                  f"({stats['segment_rows']} из {stats['rows']} строк)")
+            result = self.chain_store.resolve_tenants()
+            result = result.sort_values(['model_id', 'unit_id', 'legal_entity', 'status_sequence'],
+                                        kind='stable').reset_index(drop=True)
 
         # ДОБАВЛЯЕМ ВТОРИЧНЫЙ КЛЮЧ
         if not df_legal_unit.empty:
@@ -111,15 +103,18 @@ class HistoryProcessor:
 
         return result
 
-    def save_to_csv(self, df: pd.DataFrame, filename: str):
+    @instrument('process.save_csv')
+    def save_to_csv(self, df: pd.DataFrame, filename: str, source: str = 'process'):
         output_path = self.output_dir / filename
-        df.to_csv(output_path, index=False, encoding='utf-8')
+        write_csv(df, output_path, source=source)
 
+    @instrument('process.ref_model')
     def add_fact_to_reference(self):
         """Добавляет запись '666 Факт null' в справочник моделей"""
         ref_model_path = self.data_dir / 'ref_model.csv'
 
         df_ref = pd.read_csv(ref_model_path)
+        record_file_read(ref_model_path)
 
         fact_record = pd.DataFrame({
             'model_id': [666],
@@ -148,6 +143,7 @@ class HistoryProcessor:
 
         return df_ref
 
+    @instrument('process.expert_history')
     def create_expert_history(self):
         """Создает историю экспертов с заменой TrcShoppingMall на legal_entity и добавляет вторичный ключ"""
         try:
@@ -166,6 +162,7 @@ class HistoryProcessor:
                 return pd.DataFrame()
 
             df_expert = pd.read_csv(expert_path)
+            record_file_read(expert_path)
 
             print(f"Количество записей в expert.csv: {len(df_expert)}")
 
@@ -235,6 +232,7 @@ class HistoryProcessor:
             print(f"Ошибка при создании истории экспертов: {e}")
             return pd.DataFrame()
 
+    @instrument('process.tenants')
     def add_foreign_key_to_tenants(self):
         """Добавляет вторичный ключ в extract_tenants.csv"""
         try:
@@ -245,6 +243,7 @@ class HistoryProcessor:
                 return pd.DataFrame()
 
             df_tenants = pd.read_csv(tenants_path)
+            record_file_read(tenants_path)
 
             print(f"Количество записей в extract_tenants.csv: {len(df_tenants)}")
 
@@ -280,13 +279,89 @@ class HistoryProcessor:
             print(f"Ошибка при добавлении вторичного ключа в extract_tenants: {e}")
             return pd.DataFrame()
 
+    @instrument('process.contract_history')
+    def create_contract_history(self, df_history: pd.DataFrame, df_tenants: pd.DataFrame) -> pd.DataFrame:
+        """
+        История статусов с атрибутами договоров, действовавших в период статуса
+
+        Договор подбирается по помещению (legal_unit_id и model_id, если он есть в обеих
+        таблицах) и пересечению [status_start_date, status_end_date] с
+        [billing_start, billing_end] (даты окончания включаются: следующий статус
+        начинается на следующий день). Статусы без договора остаются с пустыми атрибутами.
+        """
+        contract_columns = ['lease_id', 'billing_start', 'billing_end', 'brand_name', 'renovation_days']
+        if df_history.empty or df_tenants.empty or 'legal_unit_id' not in df_tenants.columns:
+            print("Предупреждение: нет данных для истории статусов с договорами")
+            return pd.DataFrame()
+
+        on = ['legal_unit_id'] + [col for col in ['model_id'] if col in df_tenants.columns]
+        available = [col for col in contract_columns if col in df_tenants.columns]
+        df_contracts = df_tenants[on + available].drop_duplicates().rename(columns={'lease_id': 'contract_lease_id'})
+
+        result = interval_join(
+            df_history, df_contracts, on=on,
+            left_on=('status_start_date', 'status_end_date'),
+            right_on=('billing_start', 'billing_end'),
+            how='left', left_closed=True, right_closed=True
+        )
+        if 'contract_lease_id' in result.columns:
+            result['contract_lease_id'] = result['contract_lease_id'].astype('Int64')
+
+        print(f"Создана история статусов с договорами: {len(result)} записей")
+        return result
+
+
+def publish_processed_data(connector, filenames: list = None, schema: str = None,
+                           chunk_size: int = 50000) -> dict:
+    """
+    Публикует обработанные CSV в БД пакетной загрузкой
+
+    Каждый файл читается потоком чанков и загружается через staging heap-таблицу
+    с последующей подменой, имя таблицы совпадает с именем файла без расширения.
+
+    Args:
+        connector: SQLServerConnector или SQLiteConnector
+        filenames: Список файлов из data/processed (по умолчанию все processed_*.csv)
+        schema: Схема назначения (по умолчанию DATABASE_CONFIG['schema'])
+        chunk_size: Размер чанка чтения и вставки
+
+    Returns:
+        dict: Количество загруженных строк по таблицам
+    """
+    processor = HistoryProcessor()
+    catalog = DatasetCatalog(processor.output_dir)
+
+    if filenames is None:
+        filenames = sorted(path.name for path in processor.output_dir.glob('processed_*.csv'))
+
+    loaded = {}
+    for filename in filenames:
+        csv_path = processor.output_dir / filename
+        if not csv_path.exists():
+            print(f"Предупреждение: {filename} не найден")
+            continue
+
+        table = csv_path.stem
+        # Типы таблицы - из схемы каталога: тип колонки в первом чанке может быть уже
+        dtypes = catalog.entry(filename)['schema'] if catalog.is_unchanged(filename) else None
+        chunks = pd.read_csv(csv_path, chunksize=chunk_size)
+        loaded[table] = connector.bulk_load(chunks, table, schema=schema,
+                                            chunk_size=chunk_size, swap=True, dtypes=dtypes)
+        print(f"Опубликовано {loaded[table]} строк в таблицу {table}")
+
+    return loaded
+
+
 def process_history_data():
+    configure_metrics(project_root / 'logs' / 'metrics.jsonl')
     processor = HistoryProcessor()
 
     # Обрабатываем исторические данные (теперь с добавлением вторичного ключа)
     df = processor.load_data()
     df_processed = processor.process_history(df)  # Этот метод теперь сам создает processed_ref_legal_unit.csv
     processor.save_to_csv(df_processed, 'processed_history.csv')
+    if processor.chain_store is not None:
+        processor.chain_store.save(processor.output_dir)
 
     # Обогащаем справочник моделей
     df_ref = processor.add_fact_to_reference()
@@ -300,7 +375,22 @@ def process_history_data():
     df_tenants = processor.add_foreign_key_to_tenants()
     processor.save_to_csv(df_tenants, 'processed_tenants.csv')
 
-    return True
+    # История статусов с атрибутами договоров (интервальное соединение)
+    df_contract_history = processor.create_contract_history(df_processed, df_tenants)
+    processor.save_to_csv(df_contract_history, 'processed_contract_history.csv')
+
+    # Проверка качества выгрузки и обработанных данных (отчет validation_*.csv)
+    report = validate_processed_data(data_dir=processor.data_dir, processed_dir=processor.output_dir)
+
+    # Партиции legal_entity / month для BI: перезаписываются только изменившиеся (data/output/export);
+    # при ошибках проверки BI остается на предыдущих партициях
+    if report.ok:
+        export_processed(processor.output_dir)
+    else:
+        print("Предупреждение: проверка данных не пройдена, партиции BI не обновлены (см. validation_*.csv)")
+
+    print(get_recorder().format_summary())
+    return report.ok
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@
 Модуль для извлечения данных из SQL Server и сохранения в CSV
 """
 
+from concurrent.futures import FIRST_COMPLETED, wait
 import pandas as pd  # Импорт библиотеки pandas для работы с данными в табличном формате
 from pathlib import Path  # Импорт для работы с путями файловой системы
 import sys  # Импорт системных функций
@@ -19,7 +20,67 @@ project_root = Path(__file__).parent.parent.parent  # Получаем путь
 sys.path.insert(0, str(project_root))  # Добавляем корень проекта в путь для импорта модулей
 
 
+from config.settings import DATABASE_CONFIG
 from src.database.db_connector import SQLServerConnector, create_db_connector_from_config  # Импорт классов для работы с БД
+from src.etl.changes import SnapshotStore
+from src.etl.checkpoints import ResumableExtraction
+from src.utils.csv_writer import WriteResult, write_csv
+from src.utils.helpers import configure_metrics, get_recorder, instrument, record_file_read
+
+
+# Ключ цепочки статусов помещения в модели
+TENANT_PARTITION_KEYS = ['model_id', 'unit_id', 'legal_entity']
+
+TENANT_WINDOW_SQL = """SELECT
+    {columns},
+    MAX(CASE WHEN lease_id <> 0 THEN lease_id END)
+        OVER (PARTITION BY {keys}, prev_group) AS previous_tenant,
+    CASE
+        WHEN lease_id <> 0
+            THEN LEAD(CASE WHEN lease_id <> 0 THEN lease_id END)
+                 OVER (PARTITION BY {keys}, has_tenant ORDER BY status_sequence)
+        ELSE MAX(CASE WHEN lease_id <> 0 THEN lease_id END)
+                 OVER (PARTITION BY {keys}, next_group)
+    END AS future_tenant
+FROM (
+    SELECT
+        hist.*,
+        CASE WHEN lease_id <> 0 THEN 1 ELSE 0 END AS has_tenant,
+        COUNT(CASE WHEN lease_id <> 0 THEN 1 END)
+            OVER (PARTITION BY {keys} ORDER BY status_sequence ROWS UNBOUNDED PRECEDING) AS prev_group,
+        COUNT(CASE WHEN lease_id <> 0 THEN 1 END)
+            OVER (PARTITION BY {keys} ORDER BY status_sequence DESC ROWS UNBOUNDED PRECEDING) AS next_group
+    FROM (
+{base_query}
+    ) AS hist
+) AS grouped
+ORDER BY {keys}, status_sequence"""
+
+
+def build_tenant_window_sql(base_query: str, columns: list) -> str:
+    """
+    Оборачивает запрос истории в оконные функции расчета previous/future_tenant
+
+    Логика совпадает с HistoryProcessor.process_history:
+    previous_tenant - последний ненулевой lease_id до текущего статуса включительно,
+    future_tenant - первый ненулевой lease_id после текущего статуса.
+
+    prev_group - число ненулевых договоров до строки включительно: в группе одна
+    ненулевая строка (первая) и следующие за ней нулевые. next_group - число ненулевых
+    договоров от строки до конца цепочки: в группе нулевые строки и ближайшая
+    следующая ненулевая. Для ненулевых строк следующий договор дает LEAD
+    среди ненулевых строк.
+
+    Args:
+        base_query: Исходный SQL (extract_history.sql)
+        columns: Колонки результата исходного запроса
+    """
+    base_query = base_query.strip().rstrip(';')
+    return TENANT_WINDOW_SQL.format(
+        columns=',\n    '.join(columns),
+        keys=', '.join(TENANT_PARTITION_KEYS),
+        base_query=base_query,
+    )
 
 
 class DBExtractor:
@@ -30,10 +91,16 @@ class DBExtractor:
             connector: SQLServerConnector,  # Объект соединения с БД
             sql_dir: str = 'sql',  # Директория с SQL-файлами
             output_dir: str = 'data/raw',  # Директория для сохранения результатов
-            encoding: str = 'utf-8'  # Кодировка файлов
+            encoding: str = 'utf-8',  # Кодировка файлов
+            tenant_pushdown: bool = False,  # Считать previous/future_tenant оконными функциями в БД
+            resume: bool = True,  # Продолжать прерванные выгрузки чанками с контрольной точки
+            checkpoint_dir: Path = None,  # Каталог контрольных точек (по умолчанию data/checkpoints)
+            snapshots: SnapshotStore = None  # Снимки и поток изменений (по умолчанию data/snapshots, data/changes)
     ):
         self.connector = connector  # Сохраняем соединение с БД
         self.encoding = encoding  # Сохраняем кодировку
+        self.tenant_pushdown = tenant_pushdown
+        self.resume = resume
 
         # Определяем пути относительно расположения этого файла
         self.sql_dir = project_root / sql_dir  # Формируем полный путь к директории с SQL-файлами
@@ -41,6 +108,12 @@ class DBExtractor:
 
         self.output_dir.mkdir(parents=True, exist_ok=True)  # Создаем директорию для вывода (если не существует)
 
+        # Предыдущие снимки отслеживаемых выгрузок и потоки изменений (data/snapshots, data/changes)
+        self.snapshots = snapshots or SnapshotStore(self.output_dir.parent / 'snapshots',
+                                                    self.output_dir.parent / 'changes')
+        # Контрольные точки выгрузок чанками (data/checkpoints/<выгрузка>)
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else self.output_dir.parent / 'checkpoints'
+
     def read_sql_file(self, filepath: Path) -> str:
         """Читает SQL-запрос из файла"""
         try:
@@ -50,17 +123,21 @@ class DBExtractor:
             print(f"Ошибка чтения SQL файла {filepath}: {e}")  # Выводим ошибку чтения файла
             raise  # Пробрасываем исключение дальше
 
-    def save_to_csv(self, df: pd.DataFrame, sql_path: Path):
-        """Сохраняет DataFrame в CSV файл"""
+    @instrument('extract.save_csv')
+    def save_to_csv(self, df: pd.DataFrame, sql_path: Path, source: str = None, query: str = None):
+        """Сохраняет DataFrame в CSV файл и обновляет запись в каталоге data/raw/catalog.json"""
 
         # path.stem - имя файла без расширения
         csv_filename = sql_path.stem + '.csv'  # Формируем имя CSV-файла на основе имени SQL-файла
 
         # оператор / для объединения объектов Path (или Path со строкой) в корректный путь файловой системы.
         output_path = self.output_dir / csv_filename  # Формируем полный путь для сохранения
-        df.to_csv(output_path, index=False, encoding=self.encoding)  # Сохраняем DataFrame в CSV без индексов
+        # Атомарная запись (временный файл + переименование), размер учитывается в метриках стадии.
+        # Источник - SQL-файл (для справочников передается явно), в каталог пишется только хэш запроса
+        with self.snapshots.capture(output_path):
+            result = write_csv(df, output_path, encoding=self.encoding, source=source or sql_path.name, query=query)
 
-        print(f"Успешно: {len(df)} записей сохранено в {csv_filename}")  # Выводим сообщение об успешном сохранении
+        print(f"Успешно: {len(df)} записей сохранено в {csv_filename} ({result.mb_per_s:.1f} МБ/с)")
 
     def test_connection(self):
         """Тестирует подключение к БД"""
@@ -91,43 +168,45 @@ class DBExtractor:
         base_filename = "ref_" + "_".join(column_prefixes)
 
         # Сохраняем в CSV
-        self.save_to_csv(ref_df, Path(base_filename))
-
-        # Сохраняем в CSV
-        self.save_to_csv(ref_df, Path(base_filename))
+        self.save_to_csv(ref_df, Path(base_filename), source='extract_master_reference.sql')
 
         print(f"Создан справочник {base_filename}.csv с {len(ref_df)} уникальными записями")
 
+    @instrument('extract.history')
     def extract_history(self) -> pd.DataFrame:
         """
         Извлекает исторические данные из БД
 
         Returns:
             pd.DataFrame: DataFrame с историческими данными
-        """
-        try:
-            # Формируем путь к SQL-файлу с историческими данными
-            history_sql_path = self.sql_dir / 'extract_history.sql'
 
-            # Читаем SQL-запрос из файла
-            sql_query = self.read_sql_file(history_sql_path)
+        Raises:
+            Exception: Ошибка запроса пробрасывается - extract_all отменяет остальные задачи
+        """
+        # Формируем путь к SQL-файлу с историческими данными
+        history_sql_path = self.sql_dir / 'extract_history.sql'
 
-            # Выполняем SQL-запрос и получаем DataFrame
-            df_history = self.connector.execute_query(sql_query)
+        # Читаем SQL-запрос из файла
+        sql_query = self.read_sql_file(history_sql_path)
 
-            # Сохраняем исторические данные в CSV
-            self.save_to_csv(df_history, history_sql_path)
+        if self.tenant_pushdown:
+            # Колонки исходного запроса получаем пустой выборкой
+            columns = self.connector.execute_query(
+                f"SELECT * FROM (\n{sql_query.rstrip(';')}\n) AS hist WHERE 1 = 0").columns.tolist()
+            sql_query = build_tenant_window_sql(sql_query, columns)
 
-            # Создаем справочник статусов из исторических данных
-            self.create_status_reference(df_history)
+        # Выполняем SQL-запрос и получаем DataFrame
+        df_history = self.connector.execute_query(sql_query)
 
-            return df_history
+        # Сохраняем исторические данные в CSV
+        self.save_to_csv(df_history, history_sql_path, query=sql_query)
 
-        except Exception as e:
-            print(f"Ошибка при извлечении исторических данных: {e}")
-            return pd.DataFrame()  # Возвращаем пустой DataFrame при ошибке
+        # Создаем справочник статусов из исторических данных
+        self.create_status_reference(df_history)
 
+        return df_history
 
+    @instrument('extract.master_reference')
     def get_master_reference(self) -> pd.DataFrame:
         """
         Получает мастер-справочник уникальных идентификаторов
@@ -140,7 +219,7 @@ class DBExtractor:
         sql_query = self.read_sql_file(master_sql_path)  # Читаем SQL из файла
         df_master = self.connector.execute_query(sql_query)  # Выполняем SQL-запрос и получаем DataFrame
         # Сохраняем мастер-справочник
-        self.save_to_csv(df_master, master_sql_path)
+        self.save_to_csv(df_master, master_sql_path, query=sql_query)
 
         reference_configs = [
             ['model_id'],
@@ -179,7 +258,7 @@ class DBExtractor:
             status_ref = status_ref.sort_values('crm_status').reset_index(drop=True)
 
             # Сохраняем справочник
-            self.save_to_csv(status_ref, Path('ref_crm_status'))
+            self.save_to_csv(status_ref, Path('ref_crm_status'), source='extract_history.sql')
 
             print(f"Создан справочник статусов: {len(status_ref)} уникальных записей")
 
@@ -187,56 +266,65 @@ class DBExtractor:
             print(f"Ошибка при создании справочника статусов: {e}")
 
 
-    def extract_tenants_with_placeholder(self):
-        """Извлекает данные арендаторов чанками по ref_lease_ids.csv"""
+    @instrument('extract.tenants')
+    def extract_tenants_with_placeholder(self) -> WriteResult:
+        """
+        Извлекает данные арендаторов чанками по ref_lease_ids.csv
+
+        Returns:
+            WriteResult: Итог записи extract_tenants.csv
+
+        Raises:
+            FileNotFoundError: Нет ref_lease.csv или extract_tenants.sql
+            RuntimeError: Выгружены не все чанки (extract_tenants.csv остается прежним)
+        """
 
         # Читаем lease_id из справочника
         lease_ref_path = self.output_dir / 'ref_lease.csv'  # Формируем путь к файлу со lease_id
-        if not lease_ref_path.exists():  # Проверяем существует ли файл
-            return  # Если файла нет, выходим из метода
+        if not lease_ref_path.exists():  # Без мастер-справочника арендаторов не выгрузить
+            raise FileNotFoundError(f"не найден справочник договоров {lease_ref_path}")
 
         df_lease_ref = pd.read_csv(lease_ref_path)  # Читаем CSV-файл с lease_id
+        record_file_read(lease_ref_path)
         lease_ids = df_lease_ref['lease_id'].dropna().tolist()  # Получаем список уникальных lease_id без NaN
 
-        if not lease_ids:  # Проверяем есть ли lease_id для обработки
-            return  # Если список пуст, выходим из метода
+        if not lease_ids:  # Пустой справочник - прежний extract_tenants.csv был бы выдан за новый
+            raise RuntimeError(f"в {lease_ref_path.name} нет lease_id")
 
         # Читаем SQL шаблон
         sql_template_path = self.sql_dir / 'extract_tenants.sql'  # Формируем путь к SQL-шаблону
         if not sql_template_path.exists():  # Проверяем существует ли файл
-            return  # Если файла нет, выходим из метода
+            raise FileNotFoundError(f"не найден SQL-шаблон {sql_template_path}")
 
         sql_template = self.read_sql_file(sql_template_path)  # Читаем SQL-шаблон из файла
 
         # Обрабатываем чанками
         chunk_size = 500  # Размер чанка (количество lease_id за один запрос)
-        all_chunks = []  # Список для хранения всех чанков данных
+        chunks = [lease_ids[i:i + chunk_size] for i in range(0, len(lease_ids), chunk_size)]
 
-        for i in range(0, len(lease_ids), chunk_size):  # Итерируемся по lease_id с шагом chunk_size
-            chunk_lease_ids = lease_ids[i:i + chunk_size]  # Получаем текущий чанк lease_id
+        def fetch(chunk_lease_ids):
             ids_str = ','.join(str(int(lease_id)) for lease_id in chunk_lease_ids)  # Преобразуем в строку через запятую
-
             # Заменяем плейсхолдер в SQL
-            sql_query = sql_template.replace('{lease_id_placeholder}', ids_str)  # Подставляем lease_id в SQL-запрос
-
-            try:
-                df_chunk = self.connector.execute_query(sql_query)  # Выполняем SQL-запрос для текущего чанка
-                all_chunks.append(df_chunk)  # Добавляем результат в список чанков
-            except Exception:  # Перехватываем любые исключения
-                continue  # Продолжаем обработку следующих чанков при ошибке
+            return self.connector.execute_query(sql_template.replace('{lease_id_placeholder}', ids_str))
 
-        if not all_chunks:  # Проверяем, есть ли данные в чанках
-            return  # Если нет данных, выходим из метода
+        # Выполненные чанки сохраняются фрагментами в data/checkpoints/extract_tenants: после сбоя
+        # повторный запуск запрашивает только невыполненные (и завершившиеся ошибкой) чанки
+        extraction = ResumableExtraction('extract_tenants', sql_template, chunks, self.checkpoint_dir,
+                                         resume=self.resume, encoding=self.encoding)
+        stats = extraction.run(fetch)
 
-        # Объединяем все чанки
-        df_result = pd.concat(all_chunks, ignore_index=True)  # Объединяем все чанки в один DataFrame
+        if stats['failed'] or not extraction.is_complete:
+            # Неполный файл не публикуется: остается предыдущая выгрузка, выполненные чанки
+            # сохранены в контрольной точке и при повторном запуске не запрашиваются
+            raise RuntimeError(f"не извлечено {stats['failed']} чанков арендаторов, "
+                               "extract_tenants.csv не обновлен")
 
-        # Сохраняем результат
+        # Собираем результат из фрагментов всех чанков
         output_path = self.output_dir / 'extract_tenants.csv'  # Формируем путь для сохранения результата
-        df_result.to_csv(output_path, index=False, encoding=self.encoding)  # Сохраняем объединенные данные в CSV
-
-        return df_result  # Возвращаем результат
+        with self.snapshots.capture(output_path):
+            return extraction.assemble(output_path, source=sql_template_path.name, query=sql_template)
 
+    @instrument('extract.models')
     def enrich_models_reference(self) -> pd.DataFrame:
         """
         Обогащает существующий справочник моделей дополнительными данными
@@ -244,86 +332,131 @@ class DBExtractor:
 
         Returns:
             pd.DataFrame: Обогащенный справочник моделей
+
+        Raises:
+            Exception: Ошибка запроса пробрасывается - extract_all отменяет остальные задачи
         """
-        try:
-            # Читаем существующий справочник моделей
-            ref_model_path = self.output_dir / 'ref_model.csv'
-            if not ref_model_path.exists():
-                print("Предупреждение: ref_model.csv не найден")
-                return pd.DataFrame()
+        # Читаем существующий справочник моделей
+        ref_model_path = self.output_dir / 'ref_model.csv'
+        if not ref_model_path.exists():
+            print("Предупреждение: ref_model.csv не найден")
+            return pd.DataFrame()
 
-            df_ref_model = pd.read_csv(ref_model_path)
+        df_ref_model = pd.read_csv(ref_model_path)
+        record_file_read(ref_model_path)
+
+        if df_ref_model.empty:
+            print("Предупреждение: ref_model.csv пуст")
+            return pd.DataFrame()
 
-            if df_ref_model.empty:
-                print("Предупреждение: ref_model.csv пуст")
-                return pd.DataFrame()
+        # Получаем список model_id для фильтрации
+        model_ids = df_ref_model['model_id'].dropna().unique().tolist()
 
-            # Получаем список model_id для фильтрации
-            model_ids = df_ref_model['model_id'].dropna().unique().tolist()
+        if not model_ids:
+            print("Предупреждение: не найдено model_id в справочнике")
+            return pd.DataFrame()
 
-            if not model_ids:
-                print("Предупреждение: не найдено model_id в справочнике")
-                return pd.DataFrame()
+        # Формируем путь к SQL-файлу с моделями
+        models_sql_path = self.sql_dir / 'extract_models.sql'
 
-            # Формируем путь к SQL-файлу с моделями
-            models_sql_path = self.sql_dir / 'extract_models.sql'
+        # Читаем SQL-запрос из файла
+        sql_query = self.read_sql_file(models_sql_path)
 
-            # Читаем SQL-запрос из файла
-            sql_query = self.read_sql_file(models_sql_path)
+        # Подставляем model_ids в запрос
+        ids_str = ','.join(str(int(model_id)) for model_id in model_ids if pd.notna(model_id))
+        sql_query = sql_query.replace('{model_id}', ids_str)
 
-            # Подставляем model_ids в запрос
-            ids_str = ','.join(str(int(model_id)) for model_id in model_ids if pd.notna(model_id))
-            sql_query = sql_query.replace('{model_id}', ids_str)
+        # Выполняем SQL-запрос и получаем дополнительные данные
+        df_models_additional = self.connector.execute_query(sql_query)
 
-            # Выполняем SQL-запрос и получаем дополнительные данные
-            df_models_additional = self.connector.execute_query(sql_query)
+        if df_models_additional.empty:
+            print("Предупреждение: не найдено дополнительных данных по моделям")
+            return df_ref_model
 
-            if df_models_additional.empty:
-                print("Предупреждение: не найдено дополнительных данных по моделям")
-                return df_ref_model
+        # Объединяем существующий справочник с дополнительными данными
+        df_enriched = pd.merge(
+            df_ref_model,
+            df_models_additional,
+            on='model_id',
+            how='left',
+            suffixes=('', '_additional')
+        )
 
-            # Объединяем существующий справочник с дополнительными данными
-            df_enriched = pd.merge(
-                df_ref_model,
-                df_models_additional,
-                on='model_id',
-                how='left',
-                suffixes=('', '_additional')
-            )
+        # Удаляем дублирующиеся колонки (если есть)
+        df_enriched = df_enriched.loc[:, ~df_enriched.columns.duplicated()]
 
-            # Удаляем дублирующиеся колонки (если есть)
-            df_enriched = df_enriched.loc[:, ~df_enriched.columns.duplicated()]
+        # Сохраняем обогащенный справочник В ТОТ ЖЕ ФАЙЛ
+        write_csv(df_enriched, ref_model_path, encoding=self.encoding, source=models_sql_path.name, query=sql_query)
 
-            # Сохраняем обогащенный справочник В ТОТ ЖЕ ФАЙЛ
-            df_enriched.to_csv(ref_model_path, index=False, encoding=self.encoding)
+        print(f"Обогащенный справочник моделей сохранен в ref_model.csv: {len(df_enriched)} записей")
+        return df_enriched
 
-            print(f"Обогащенный справочник моделей сохранен в ref_model.csv: {len(df_enriched)} записей")
-            return df_enriched
+    def extract_all(self, parallel: bool = True) -> dict:
+        """
+        Выполняет все извлечения
 
-        except Exception as e:
-            print(f"Ошибка при обогащении справочника моделей: {e}")
-            return pd.DataFrame()
+        История ни от чего не зависит и запускается сразу; параллельно с ней идет
+        цепочка мастер-справочник -> арендаторы и модели (читают ref_lease.csv и
+        ref_model.csv мастер-справочника). При parallel задачи выполняются в пуле
+        коннектора, ошибка одной задачи отменяет остальные.
+
+        Returns:
+            dict: Результаты по именам задач
+        """
+        dependent = {
+            'tenants': self.extract_tenants_with_placeholder,
+            'models': self.enrich_models_reference,
+        }
+        if not (parallel and hasattr(self.connector, 'submit_task')):
+            results = {'master_reference': self.get_master_reference(), 'history': self.extract_history()}
+            results.update({name: func() for name, func in dependent.items()})
+            return results
+
+        futures = {
+            'history': self.connector.submit_task(self.extract_history, name='history'),
+            'master_reference': self.connector.submit_task(self.get_master_reference, name='master_reference'),
+        }
+        # Ждем мастер-справочник; ошибка истории за это время прерывает выгрузку
+        pending = set(futures.values())
+        while not futures['master_reference'].done():
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if any(not future.cancelled() and future.exception() is not None for future in done):
+                break
+        if any(future.done() and (future.cancelled() or future.exception() is not None)
+               for future in futures.values()):
+            self.connector.gather(list(futures.values()))
+
+        for name, func in dependent.items():
+            futures[name] = self.connector.submit_task(func, name=name)
+        return dict(zip(futures, self.connector.gather(list(futures.values()))))
+
+def extract_data(parallel: bool = True, resume: bool = True):
+    """
+    Основная функция для извлечения данных
+
+    parallel=False - запросы по очереди, resume=False - выгрузки чанками начинаются заново
+    """
+    if DATABASE_CONFIG['sources']:
+        # Несколько баз с одинаковой схемой (DB_SOURCES) выгружаются параллельно
+        from src.etl.sources import extract_sources
+        return extract_sources(parallel=parallel, resume=resume)
+
+    configure_metrics(project_root / 'logs' / 'metrics.jsonl')  # Метрики стадий в JSON Lines
+    connector = None
 
-def extract_data():
-    """Основная функция для извлечения данных"""
     try:
         connector = create_db_connector_from_config()  # Создаем соединение с БД из конфигурации
 
         if not connector.test_connection():  # Проверяем подключение к БД
             return False  # Возвращаем False если подключение не удалось
 
-        extractor = DBExtractor(connector=connector)  # Создаем экземпляр extractor
-
-        # Получаем мастер-справочник
-        extractor.get_master_reference()  # Вызываем метод получения мастер-справочника
+        # Создаем экземпляр extractor
+        extractor = DBExtractor(connector=connector, tenant_pushdown=DATABASE_CONFIG['tenant_pushdown'],
+                                resume=resume)
 
-        # Извлекаем исторические данные
-        extractor.extract_history()
-
-        # Извлекаем данные арендаторов чанками
-        extractor.extract_tenants_with_placeholder()  # Вызываем метод извлечения данных арендаторов
-
-        extractor.enrich_models_reference()
+        # История выполняется параллельно с цепочкой мастер-справочник ->
+        # арендаторы (чанками) и обогащение справочника моделей
+        extractor.extract_all(parallel=parallel)  # Неполная выгрузка арендаторов - исключение
 
         return True  # Возвращаем True при успешном выполнении
 
@@ -331,6 +464,13 @@ def extract_data():
         print(f"Ошибка при извлечении данных: {e}")  # Выводим сообщение об ошибке
         return False  # Возвращаем False при возникновении ошибки
 
+    finally:
+        print(get_recorder().format_summary())  # Сводка метрик по стадиям
+        if connector is not None:
+            connector.close_pool()  # Останавливаем пул параллельных запросов
+            if connector.query_cache is not None:
+                print(connector.query_cache.format_stats())  # Попадания и промахи кэша запросов
+
 
 if __name__ == "__main__":
     success = extract_data()  # Вызываем основную функцию извлечения данных
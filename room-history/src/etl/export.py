@@ -0,0 +1,188 @@
+#export.py
+"""
+Партиционированная выгрузка обработанных данных для инкрементального обновления BI
+
+Обработанные файлы раскладываются по каталогам в стиле Hive:
+
+    data/output/export/processed_history/legal_entity=<юрлицо>/month=2024-01/part-0.csv
+
+Месяц берется из колонки даты набора (EXPORT_DATASETS). По каждой партиции считается
+хэш содержимого (сумма хэшей строк вместе со схемой, как у партиций куба), и
+перезаписываются только партиции с изменившимся хэшем; исчезнувшие партиции
+удаляются. Манифест _manifest.json набора перечисляет все партиции с числом строк,
+SHA-256 файла и временем изменения, а также списки изменившихся и удаленных партиций
+последней выгрузки - BI-модель обновляет только их.
+"""
+
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+from typing import Dict, Union
+
+import pandas as pd
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.settings import OUTPUT_CONFIG
+from src.etl.changes import partition_hashes
+from src.utils.csv_writer import write_csv
+from src.utils.helpers import current_metrics, instrument, record_file_read
+
+# Набор -> колонка даты, по месяцу которой строится партиция
+EXPORT_DATASETS = {
+    'processed_history.csv': 'status_start_date',
+    'processed_tenants.csv': 'billing_start',
+    'processed_expert_history.csv': 'resp_start_date',
+}
+
+PARTITION_COLUMN = 'legal_entity'
+MONTH_COLUMN = 'month'
+MANIFEST_FILE = '_manifest.json'
+PART_FILE = 'part-0.csv'
+# Значение партиции для пустого ключа (соглашение Hive)
+DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Символы, которые Hive экранирует в значениях партиций
+_ESCAPED = set('"#%\'*/:=?\\{[]^') | {chr(code) for code in range(0x20)} | {'\x7f'}
+
+
+def partition_value(value: str) -> str:
+    """Значение ключа партиции для имени каталога (экранирование %XX как в Hive)"""
+    if value == '':
+        return DEFAULT_PARTITION
+    return ''.join(f'%{ord(char):02X}' if char in _ESCAPED else char for char in value)
+
+
+class PartitionedExport:
+    """
+    Выгрузка набора по партициям legal_entity / month
+
+    Args:
+        export_dir: Корень выгрузки (по умолчанию OUTPUT_CONFIG['export_dir'])
+    """
+
+    def __init__(self, export_dir: Union[str, Path] = None):
+        self.export_dir = Path(export_dir or OUTPUT_CONFIG['export_dir'])
+
+    def dataset_dir(self, dataset: str) -> Path:
+        return self.export_dir / Path(dataset).name.split('.')[0]
+
+    def load_manifest(self, dataset: str) -> dict:
+        path = self.dataset_dir(dataset) / MANIFEST_FILE
+        if not path.exists():
+            return {'partitions': {}}
+        return json.loads(path.read_text(encoding='utf-8'))
+
+    def _save_manifest(self, dataset_dir: Path, manifest: dict):
+        fd, tmp_path = tempfile.mkstemp(dir=dataset_dir, prefix='.manifest-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, dataset_dir / MANIFEST_FILE)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def months(values: pd.Series) -> pd.Series:
+        """Месяц YYYY-MM из текстовой даты (нераспознанные даты - пустая строка)"""
+        return pd.to_datetime(values, errors='coerce', format='mixed').dt.strftime('%Y-%m').fillna('')
+
+    @instrument('export.partitions')
+    def export(self, path: Union[str, Path], date_column: str = None) -> dict:
+        """
+        Выгружает набор path по партициям, перезаписывая только изменившиеся
+
+        Returns:
+            dict: partitions, written, unchanged, removed (число партиций), rows
+        """
+        path = Path(path)
+        date_column = date_column or EXPORT_DATASETS[path.name]
+        # Значения переносятся текстом: партиции совпадают с исходным файлом построчно
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        record_file_read(path)
+        for column in (PARTITION_COLUMN, date_column):
+            if column not in df.columns:
+                raise KeyError(f"В {path.name} нет колонки {column} для партиционирования")
+
+        keys = [df[PARTITION_COLUMN].rename(PARTITION_COLUMN), self.months(df[date_column]).rename(MONTH_COLUMN)]
+        hashes = partition_hashes(df, keys)
+        groups = df.groupby(keys, sort=False).indices
+
+        dataset_dir = self.dataset_dir(path.name)
+        dataset_dir.mkdir(parents=True, exist_ok=True)
+        previous = self.load_manifest(path.name)['partitions']
+        now = datetime.now().isoformat(timespec='seconds')
+        partitions, changed = {}, []
+        for legal_entity, month, rows, content_hash in hashes[[PARTITION_COLUMN, MONTH_COLUMN, 'rows',
+                                                              'content_hash']].itertuples(index=False):
+            name = f'{PARTITION_COLUMN}={partition_value(legal_entity)}/{MONTH_COLUMN}={partition_value(month)}'
+            file_path = dataset_dir / name / PART_FILE
+            entry = previous.get(name)
+            if entry and entry['content_hash'] == content_hash and file_path.exists():
+                partitions[name] = entry
+                continue
+            result = write_csv(df.iloc[groups[(legal_entity, month)]], file_path, catalog=False)
+            partitions[name] = {
+                'path': f'{name}/{PART_FILE}',
+                PARTITION_COLUMN: legal_entity,
+                MONTH_COLUMN: month,
+                'rows': int(rows),
+                'content_hash': content_hash,
+                'checksum': result.checksum,
+                'updated_at': now,
+            }
+            changed.append(name)
+
+        removed = sorted(set(previous) - set(partitions))
+        for name in removed:
+            shutil.rmtree(dataset_dir / name, ignore_errors=True)
+            # Пустой каталог юрлица после удаления последнего месяца
+            parent = (dataset_dir / name).parent
+            if parent.is_dir() and not any(parent.iterdir()):
+                parent.rmdir()
+
+        self._save_manifest(dataset_dir, {
+            'dataset': path.name,
+            'date_column': date_column,
+            'partition_by': [PARTITION_COLUMN, MONTH_COLUMN],
+            'columns': list(df.columns),
+            'rows': len(df),
+            'exported_at': now,
+            'changed': sorted(changed),
+            'removed': removed,
+            'partitions': dict(sorted(partitions.items())),
+        })
+
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.add_rows_in(len(df))
+            metrics.add_rows_out(int(sum(partitions[name]['rows'] for name in changed)))
+            metrics.tags['dataset'] = path.name
+        summary = {'partitions': len(partitions), 'written': len(changed),
+                   'unchanged': len(partitions) - len(changed), 'removed': len(removed), 'rows': len(df)}
+        print(f"Выгрузка {path.name}: {summary['written']} из {summary['partitions']} партиций перезаписано, "
+              f"удалено {summary['removed']} -> {dataset_dir}")
+        return summary
+
+
+def export_processed(processed_dir: Union[str, Path] = None, export_dir: Union[str, Path] = None) -> Dict[str, dict]:
+    """Партиционированная выгрузка обработанных наборов EXPORT_DATASETS"""
+    processed_dir = Path(processed_dir) if processed_dir else project_root / 'data' / 'processed'
+    exporter = PartitionedExport(export_dir)
+    results = {}
+    for dataset, date_column in EXPORT_DATASETS.items():
+        path = processed_dir / dataset
+        if not path.exists() or path.stat().st_size == 0:
+            print(f"Предупреждение: {dataset} не найден, выгрузка пропущена")
+            continue
+        try:
+            results[dataset] = exporter.export(path, date_column)
+        except KeyError as e:
+            print(f"Предупреждение: {e}, выгрузка пропущена")
+    return results
@@ -0,0 +1,300 @@
+#intervals.py
+"""
+Операции над интервалами дат: разрешение пересечений ответственности (sweep-line)
+"""
+
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+# Открытый конец интервала (resp_end_date пуст) - максимальная дата numpy
+OPEN_END = np.iinfo(np.int64).max
+DAY_NS = 86_400 * 10 ** 9
+
+
+def _to_ns(values: pd.Series) -> np.ndarray:
+    """Даты в int64 наносекунд, NaT -> OPEN_END"""
+    dates = pd.to_datetime(values, errors='coerce')
+    ns = dates.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    return np.where(dates.isna().to_numpy(), OPEN_END, ns)
+
+
+def _from_ns(values: np.ndarray) -> pd.Series:
+    """int64 наносекунд -> даты, OPEN_END -> NaT"""
+    dates = values.astype('datetime64[ns]')
+    dates[values == OPEN_END] = np.datetime64('NaT')
+    return pd.Series(dates)
+
+
+def sweep_intervals(track: np.ndarray, start: np.ndarray, end: np.ndarray,
+                    priority: np.ndarray):
+    """
+    Разбивает пересекающиеся интервалы каждой дорожки на непересекающиеся отрезки
+
+    В каждой точке дорожки действует интервал с наибольшим priority среди покрывающих
+    ее. Границы всех интервалов сортируются один раз и делят дорожки на элементарные
+    отрезки; интервал покрывает непрерывный диапазон отрезков, который раскладывается
+    на два блока длины 2^k (как в sparse table). Максимум приоритета записывается
+    в начала блоков и спускается по уровням от длинных блоков к коротким - все шаги
+    выполняются операциями numpy: O((n + m) log m) для m границ.
+
+    Args:
+        track: Код дорожки (int), интервалы разных дорожек независимы
+        start: Начала (int64), end: концы (int64, OPEN_END - открытый интервал)
+        priority: Приоритет интервала (больше - важнее), значения уникальны
+
+    Returns:
+        tuple: (индекс интервала, начало отрезка, конец отрезка) - массивы numpy
+    """
+    n = len(start)
+    empty = np.array([], dtype=np.int64)
+    if n == 0:
+        return empty, empty, empty
+
+    # Точки событий: все начала и конечные концы, отсортированные по (дорожка, время)
+    finite = np.flatnonzero(end != OPEN_END)
+    point_track = np.concatenate([track, track[finite]])
+    point_time = np.concatenate([start, end[finite]])
+    # Сортировка по (дорожка, время) одним ключом: номер дорожки * число точек + ранг времени
+    time_rank = np.empty(len(point_time), dtype=np.int64)
+    time_rank[np.argsort(point_time)] = np.arange(len(point_time))
+    point_order = np.argsort(point_track.astype(np.int64) * len(point_time) + time_rank)
+    sorted_track, sorted_time = point_track[point_order], point_time[point_order]
+    distinct = np.ones(len(sorted_time), dtype=bool)
+    distinct[1:] = (sorted_track[1:] != sorted_track[:-1]) | (sorted_time[1:] != sorted_time[:-1])
+
+    # Номер отрезка каждой точки; отрезок j - [time[j], time[j + 1]) или до OPEN_END в конце дорожки
+    point_segment = np.empty(len(point_order), dtype=np.int64)
+    point_segment[point_order] = np.cumsum(distinct) - 1
+    seg_track, seg_time = sorted_track[distinct], sorted_time[distinct]
+    m = len(seg_time)
+    seg_end = np.full(m, OPEN_END, dtype=np.int64)
+    same_track = seg_track[1:] == seg_track[:-1]
+    seg_end[:-1][same_track] = seg_time[1:][same_track]
+
+    # Диапазон отрезков интервала [first, stop); открытый интервал - до конца дорожки
+    track_stop = np.flatnonzero(np.append(~same_track, True)) + 1
+    first = point_segment[:n]
+    stop = np.repeat(track_stop, np.diff(track_stop, prepend=0))[first]
+    stop[finite] = point_segment[n:]
+    covers = np.flatnonzero(stop > first)
+    first, stop = first[covers], stop[covers]
+    if len(covers) == 0:
+        return empty, empty, empty
+
+    # Ранги приоритетов: победитель отрезка - интервал с наибольшим рангом
+    rank = np.empty(n, dtype=np.int64)
+    by_rank = np.argsort(priority, kind='stable')
+    rank[by_rank] = np.arange(n)
+    rank = rank[covers]
+
+    level = np.frexp((stop - first).astype(np.float64))[1] - 1
+    best = None
+    for k in range(int(level.max()), -1, -1):
+        table = np.full(m, -1, dtype=np.int64)
+        if best is not None:
+            # Блок [i, i + 2^(k+1)) делится на [i, i + 2^k) и [i + 2^k, i + 2^(k+1))
+            half = 1 << k
+            np.maximum(table, best, out=table)
+            np.maximum(table[half:], best[:m - half], out=table[half:])
+        on_level = level == k
+        np.maximum.at(table, first[on_level], rank[on_level])
+        np.maximum.at(table, stop[on_level] - (1 << k), rank[on_level])
+        best = table
+
+    # Соседние отрезки дорожки с одним победителем объединяются
+    covered = np.flatnonzero(best >= 0)
+    winner = best[covered]
+    new_run = np.ones(len(covered), dtype=bool)
+    new_run[1:] = ((winner[1:] != winner[:-1]) | (covered[1:] != covered[:-1] + 1)
+                   | (seg_track[covered[1:]] != seg_track[covered[:-1]]))
+    run_first = np.flatnonzero(new_run)
+    run_last = np.append(run_first[1:] - 1, len(covered) - 1)
+
+    return (by_rank[winner[run_first]].astype(np.int64), seg_time[covered[run_first]],
+            seg_end[covered[run_last]])
+
+
+def resolve_responsibility(df_expert: pd.DataFrame) -> pd.DataFrame:
+    """
+    Непересекающиеся периоды ответственности по помещению и роли (is_chief)
+
+    Даты начала и окончания включаются в период (как в CRM). Пересечения
+    разрешаются в пользу записи с более поздним modified_on
+    (при равенстве - с более поздним началом). Соседние периоды одного сотрудника
+    склеиваются, change_number нумерует смены ответственного внутри помещения и роли.
+
+    Args:
+        df_expert: processed_expert_history (legal_unit_id, is_chief, contact_full_name,
+                   resp_start_date, resp_end_date, modified_on)
+
+    Returns:
+        pd.DataFrame: legal_unit_id, is_chief, contact_full_name, start_date, end_date, change_number
+    """
+    columns = ['legal_unit_id', 'is_chief', 'contact_full_name', 'start_date', 'end_date', 'change_number']
+
+    df = df_expert.dropna(subset=['legal_unit_id', 'contact_full_name', 'resp_start_date']).reset_index(drop=True)
+    start = _to_ns(df['resp_start_date'])
+    # resp_end_date включается в период: переходим к полуоткрытому [начало, конец + 1 день)
+    end = _to_ns(df['resp_end_date'])
+    end = np.where(end == OPEN_END, end, end + DAY_NS)
+    valid = (start != OPEN_END) & (end > start)
+    df, start, end = df[valid].reset_index(drop=True), start[valid], end[valid]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    is_chief = df['is_chief'].astype(str).str.lower().isin(['true', '1']).to_numpy()
+    track, track_keys = pd.factorize(pd.MultiIndex.from_arrays([df['legal_unit_id'].to_numpy(), is_chief]))
+
+    # Приоритет - ранг (modified_on, начало, порядок строки)
+    modified = pd.to_datetime(df['modified_on'], errors='coerce').to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    priority = np.empty(len(df), dtype=np.int64)
+    priority[np.lexsort((np.arange(len(df)), start, modified))] = np.arange(len(df))
+
+    rec, seg_start, seg_end = sweep_intervals(track, start, end, priority)
+
+    seg_track = track[rec]
+    employee = df['contact_full_name'].to_numpy()[rec]
+
+    # Склеиваем соседние отрезки одного сотрудника
+    new_run = np.ones(len(rec), dtype=bool)
+    new_run[1:] = ((seg_track[1:] != seg_track[:-1]) | (employee[1:] != employee[:-1])
+                   | (seg_start[1:] != seg_end[:-1]))
+    first = np.flatnonzero(new_run)
+    last = np.append(first[1:] - 1, len(rec) - 1)
+
+    result = pd.DataFrame({
+        'legal_unit_id': track_keys.get_level_values(0)[seg_track[first]],
+        'is_chief': track_keys.get_level_values(1)[seg_track[first]].astype(bool),
+        'contact_full_name': employee[first],
+        'start_date': _from_ns(seg_start[first]).dt.strftime('%Y-%m-%d'),
+        'end_date': _from_ns(np.where(seg_end[last] == OPEN_END, OPEN_END, seg_end[last] - DAY_NS))
+        .dt.strftime('%Y-%m-%d'),
+    })
+    result['legal_unit_id'] = result['legal_unit_id'].astype('Int64')
+    result['change_number'] = result.groupby(seg_track[first]).cumcount() + 1
+
+    return result[columns]
+
+
+# Отсутствующая дата в днях
+MISSING_DAY = np.iinfo(np.int64).min
+
+
+def to_days(values: pd.Series) -> np.ndarray:
+    """Даты в номера дней от эпохи, NaT -> MISSING_DAY"""
+    dates = pd.to_datetime(values, errors='coerce')
+    days = dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+    return np.where(dates.isna().to_numpy(), MISSING_DAY, days)
+
+
+def _key_codes(left: pd.DataFrame, right: pd.DataFrame, on: list):
+    """Общие целочисленные коды ключей соединения для обеих таблиц"""
+    keys = pd.concat([left[on], right[on]], ignore_index=True)
+    codes, _ = pd.factorize(pd.MultiIndex.from_frame(keys))
+    codes[keys.isna().any(axis=1).to_numpy()] = -1
+    return codes[:len(left)], codes[len(left):]
+
+
+def interval_join(left: pd.DataFrame, right: pd.DataFrame, on: list,
+                  left_on: tuple, right_on: tuple, how: str = 'inner',
+                  left_closed: bool = False, right_closed: bool = False, suffixes: tuple = ('', '_right'),
+                  max_pairs: int = 5_000_000) -> pd.DataFrame:
+    """
+    Соединение по ключу и пересечению интервалов дат (sort-merge)
+
+    Интервалы полуоткрытые [начало, конец), пустой конец - открытый интервал.
+    Правая таблица сортируется по (ключ, начало) один раз; для каждой левой строки
+    бинарным поиском находится диапазон правых строк с началом до конца левого
+    интервала и накопленным максимумом концов после его начала. Кандидаты
+    формируются пакетами не больше max_pairs пар, так что память пропорциональна
+    результату, а не произведению строк по ключу.
+
+    Args:
+        left, right: Таблицы
+        on: Колонки ключа (например ['legal_unit_id'])
+        left_on, right_on: (колонка начала, колонка конца) интервала
+        how: 'inner' - только пересекающиеся пары, 'left' - плюс левые строки без пар
+        left_closed: Конец левого интервала включается (например, status_end_date)
+        right_closed: Конец правого интервала включается (например, billing_end)
+        suffixes: Суффиксы для совпадающих имен колонок
+        max_pairs: Максимум пар-кандидатов в одном пакете
+    """
+    if how not in ('inner', 'left'):
+        raise ValueError(f"Неподдерживаемый тип соединения: {how}")
+
+    left = left.reset_index(drop=True)
+    right = right.reset_index(drop=True)
+    left_codes, right_codes = _key_codes(left, right, on)
+
+    l_start, l_end = to_days(left[left_on[0]]), to_days(left[left_on[1]])
+    r_start, r_end = to_days(right[right_on[0]]), to_days(right[right_on[1]])
+    if left_closed:
+        l_end = np.where(l_end == MISSING_DAY, l_end, l_end + 1)
+    if right_closed:
+        r_end = np.where(r_end == MISSING_DAY, r_end, r_end + 1)
+
+    # Дни от минимальной даты (с 1), открытый конец - за последним днем диапазона
+    known = np.concatenate([l_start, l_end, r_start, r_end])
+    known = known[known != MISSING_DAY]
+    first_day = known.min() if len(known) else 0
+    span = (known.max() - first_day + 3) if len(known) else 3
+
+    def shift(days, missing_value):
+        return np.where(days == MISSING_DAY, missing_value, days - first_day + 1)
+
+    l_start, r_start = shift(l_start, -1), shift(r_start, -1)
+    l_end, r_end = shift(l_end, span - 1), shift(r_end, span - 1)
+
+    # Строки без ключа или без даты начала в соединении не участвуют
+    l_index = np.flatnonzero((left_codes >= 0) & (l_start >= 0))
+    r_keep = np.flatnonzero((right_codes >= 0) & (r_start >= 0) & (r_end > r_start))
+
+    # Ключ и дата в одном числе: блоки ключей идут подряд, внутри блока - по началу
+    r_order = r_keep[np.lexsort((r_start[r_keep], right_codes[r_keep]))]
+    composite_start = right_codes[r_order] * span + r_start[r_order]
+    composite_end_max = np.maximum.accumulate(right_codes[r_order] * span + r_end[r_order]) \
+        if len(r_order) else np.array([], dtype=np.int64)
+
+    lo = np.searchsorted(composite_end_max, left_codes[l_index] * span + l_start[l_index], side='right')
+    hi = np.searchsorted(composite_start, left_codes[l_index] * span + l_end[l_index], side='left')
+    counts = np.maximum(hi - lo, 0)
+    cumulative = np.cumsum(counts)
+
+    pair_left, pair_right = [], []
+    start_pos = 0
+    while start_pos < len(l_index):
+        done = cumulative[start_pos - 1] if start_pos else 0
+        stop = max(int(np.searchsorted(cumulative, done + max_pairs, side='right')), start_pos + 1)
+        batch_counts = counts[start_pos:stop]
+        total = int(batch_counts.sum())
+        if total:
+            rows = np.repeat(l_index[start_pos:stop], batch_counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(batch_counts) - batch_counts, batch_counts)
+            candidates = r_order[np.repeat(lo[start_pos:stop], batch_counts) + offsets]
+            overlap = (r_end[candidates] > l_start[rows]) & (r_start[candidates] < l_end[rows])
+            pair_left.append(rows[overlap])
+            pair_right.append(candidates[overlap])
+        start_pos = stop
+
+    pair_left = np.concatenate(pair_left) if pair_left else np.array([], dtype=np.int64)
+    pair_right = np.concatenate(pair_right) if pair_right else np.array([], dtype=np.int64)
+
+    right_columns = [col for col in right.columns if col not in on]
+    result = left.iloc[pair_left].reset_index(drop=True).join(
+        right.iloc[pair_right][right_columns].reset_index(drop=True),
+        lsuffix=suffixes[0], rsuffix=suffixes[1]
+    )
+
+    if how == 'left':
+        unmatched = np.setdiff1d(np.arange(len(left)), pair_left)
+        result = pd.concat([result, left.iloc[unmatched]], ignore_index=True)
+        order = np.argsort(np.concatenate([pair_left, unmatched]), kind='stable')
+        result = result.iloc[order].reset_index(drop=True)
+
+    return result
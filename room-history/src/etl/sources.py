@@ -0,0 +1,280 @@
+#sources.py
+"""
+Извлечение из нескольких баз с одинаковой схемой (региональные БД, среды)
+
+Каждый источник выгружается своим DBExtractor со своим коннектором (и пулом запросов)
+во временный каталог, который заменяет партицию data/raw/sources/source=<имя>/ только
+после успешной выгрузки всех файлов; источники выгружаются параллельно, ошибка
+одного источника не останавливает остальные. Затем партиции объединяются в общие
+файлы data/raw: строки выгрузок получают колонку source, справочники ref_*
+объединяются без повторов. Для источника, выгрузка которого не удалась, в общий файл
+попадает его предыдущая успешная выгрузка из партиции.
+
+Обработка связывает общие файлы по ключам без source (цепочки по помещению,
+legal_unit_id, договоры по lease_id, справочник моделей), поэтому помещения и договоры
+разных источников не должны совпадать (SOURCE_KEYS), а справочник - определять один
+ключ разными строками (REFERENCE_KEYS). При пересечении объединение прерывается
+до записи общих файлов.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import shutil
+import sys
+import time
+from typing import Dict, Iterator, List
+
+import pandas as pd
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.settings import DATABASE_CONFIG
+from src.database.db_connector import create_db_connectors_from_config
+from src.etl.changes import SNAPSHOT_KEYS, SnapshotStore
+from src.etl.db_extractor import DBExtractor
+from src.utils.csv_writer import write_csv
+from src.utils.helpers import configure_metrics, get_recorder, record_file_read, track
+
+SOURCE_COLUMN = 'source'
+MERGE_CHUNK_ROWS = 200000
+
+# Ключи, по которым источники не пересекаются (значения NO_KEY_VALUES не проверяются)
+SOURCE_KEYS = {
+    'extract_history.csv': [['legal_entity', 'unit_id']],
+    'extract_tenants.csv': [['legal_entity', 'unit_id'], ['lease_id']],
+    'ref_lease.csv': [['lease_id']],
+}
+# Ключи справочников: в объединенном справочнике ключ определен одной строкой
+REFERENCE_KEYS = {
+    'ref_legal_unit.csv': ['legal_entity', 'unit_id'],
+    'ref_model.csv': ['model_id'],
+}
+# Заглушки одиночного ключа: lease_id = 0 - строки без договора
+NO_KEY_VALUES = {'lease_id': {'0', ''}}
+
+
+class MultiSourceExtractor:
+    """
+    Параллельная выгрузка из нескольких источников и объединение результатов
+
+    Args:
+        connectors: {имя источника: коннектор}
+        sql_dir: Директория с SQL-файлами
+        output_dir: Директория общих файлов (партиции - output_dir/sources/source=<имя>)
+        max_workers: Источников, выгружаемых одновременно (по умолчанию - все)
+        extractor_options: Параметры DBExtractor (encoding, tenant_pushdown, resume)
+    """
+
+    def __init__(self, connectors: Dict[str, object], sql_dir: str = 'sql', output_dir: str = 'data/raw',
+                 max_workers: int = None, encoding: str = 'utf-8', **extractor_options):
+        if not connectors:
+            raise ValueError("Не задано ни одного источника")
+        self.connectors = dict(connectors)
+        self.sql_dir = sql_dir
+        self.output_dir = project_root / output_dir
+        self.max_workers = max_workers or len(self.connectors)
+        self.encoding = encoding
+        self.extractor_options = extractor_options
+        # Поток изменений ведется по общим файлам (ключ дополняется источником)
+        self.snapshots = SnapshotStore(self.output_dir.parent / 'snapshots', self.output_dir.parent / 'changes')
+
+    def partition_dir(self, name: str) -> Path:
+        return self.output_dir / 'sources' / f'{SOURCE_COLUMN}={name}'
+
+    def staging_dir(self, name: str) -> Path:
+        """Временный каталог выгрузки источника (заменяет партицию после успешной выгрузки)"""
+        return self.output_dir / 'sources' / '.staging' / f'{SOURCE_COLUMN}={name}'
+
+    def extractor(self, name: str) -> DBExtractor:
+        """DBExtractor источника: временный каталог и свои контрольные точки, без снимков"""
+        return DBExtractor(
+            connector=self.connectors[name],
+            sql_dir=self.sql_dir,
+            output_dir=str(self.staging_dir(name)),
+            encoding=self.encoding,
+            checkpoint_dir=self.output_dir.parent / 'checkpoints' / f'{SOURCE_COLUMN}={name}',
+            snapshots=SnapshotStore(enabled=False),
+            **self.extractor_options,
+        )
+
+    def extract_source(self, name: str, parallel: bool = True) -> dict:
+        """
+        Выгружает один источник; ошибка возвращается в результате, а не пробрасывается
+
+        Файлы пишутся во временный каталог, который заменяет партицию только после
+        успешной выгрузки: при ошибке партиция остается предыдущей выгрузкой целиком,
+        без смеси новых и старых файлов.
+        """
+        started = time.perf_counter()
+        staging_dir = self.staging_dir(name)
+        with track('extract.source', source=name) as metrics:
+            try:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                if not self.connectors[name].test_connection():
+                    raise ConnectionError("нет подключения к базе")
+                self.extractor(name).extract_all(parallel=parallel)
+                self._publish(staging_dir, self.partition_dir(name))
+                result = {'status': 'ok'}
+            except Exception as e:
+                print(f"Ошибка извлечения источника {name}: {e}")
+                metrics.tags['error'] = str(e)
+                result = {'status': 'failed', 'error': str(e)}
+            finally:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+        result['wall_s'] = round(time.perf_counter() - started, 3)
+        return result
+
+    @staticmethod
+    def _publish(staging_dir: Path, partition_dir: Path):
+        """Заменяет партицию временным каталогом (предыдущая партиция удаляется после замены)"""
+        previous = staging_dir.with_name(staging_dir.name + '.previous')
+        shutil.rmtree(previous, ignore_errors=True)
+        partition_dir.parent.mkdir(parents=True, exist_ok=True)
+        if partition_dir.exists():
+            partition_dir.rename(previous)
+        staging_dir.rename(partition_dir)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    def extract_all(self, parallel: bool = True) -> Dict[str, dict]:
+        """
+        Выгружает все источники параллельно и объединяет партиции
+
+        Returns:
+            dict: {имя источника: {'status': 'ok' | 'failed', 'error', 'wall_s'}}
+        """
+        names = list(self.connectors)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='source') as executor:
+            results = dict(zip(names, executor.map(lambda name: self.extract_source(name, parallel), names)))
+
+        failed = [name for name, result in results.items() if result['status'] != 'ok']
+        if failed:
+            print(f"Предупреждение: не выгружены источники {failed}, в общие файлы попадут их предыдущие выгрузки")
+        self.merge()
+        return results
+
+    def partitions(self) -> Dict[str, Path]:
+        """Партиции настроенных источников, в которых есть выгрузка"""
+        return {name: self.partition_dir(name) for name in self.connectors if self.partition_dir(name).is_dir()}
+
+    def merge(self) -> Dict[str, int]:
+        """
+        Объединяет партиции источников в общие файлы output_dir
+
+        Returns:
+            dict: {файл: число строк}
+
+        Raises:
+            ValueError: Источники пересекаются по ключам SOURCE_KEYS или в справочнике ключ
+                REFERENCE_KEYS определен разными строками (общие файлы не изменяются)
+        """
+        partitions = self.partitions()
+        filenames = sorted({path.name for directory in partitions.values() for path in directory.glob('*.csv')})
+        file_paths = {
+            filename: {name: directory / filename for name, directory in partitions.items()
+                       if (directory / filename).exists()}
+            for filename in filenames
+        }
+        # Все проверки - до записи: общие файлы не должны остаться объединенными частично
+        for filename, paths in file_paths.items():
+            for keys in SOURCE_KEYS.get(filename, []):
+                self._check_source_keys(filename, paths, keys)
+            if filename in REFERENCE_KEYS:
+                self._check_reference_keys(filename, paths, REFERENCE_KEYS[filename])
+
+        merged = {}
+        for filename, paths in file_paths.items():
+            output_path = self.output_dir / filename
+            source = 'sources:' + ','.join(paths)
+            if filename.startswith('ref_'):
+                result = write_csv(self._distinct(paths), output_path, encoding=self.encoding, source=source)
+            else:
+                keys = SNAPSHOT_KEYS.get(filename)
+                with self.snapshots.capture(output_path, keys=[SOURCE_COLUMN, *keys] if keys else None):
+                    result = write_csv(self._tagged(paths), output_path, encoding=self.encoding, source=source)
+            merged[filename] = result.rows
+        print(f"Объединено {len(merged)} файлов из {len(partitions)} источников в {self.output_dir}")
+        return merged
+
+    def _check_source_keys(self, filename: str, paths: Dict[str, Path], keys: List[str]):
+        """ValueError, если значение ключа встречается в нескольких источниках"""
+        frames = []
+        for name, path in paths.items():
+            if not set(keys).issubset(self._read(path, nrows=0).columns):
+                return
+            chunks = self._read(path, usecols=keys, chunksize=MERGE_CHUNK_ROWS)
+            unique = pd.concat([chunk.drop_duplicates() for chunk in chunks], ignore_index=True)
+            frames.append(unique.drop_duplicates().assign(**{SOURCE_COLUMN: name}))
+        df = pd.concat(frames, ignore_index=True)
+        if len(keys) == 1 and keys[0] in NO_KEY_VALUES:
+            df = df[~df[keys[0]].isin(NO_KEY_VALUES[keys[0]])]
+        conflicts = df[df.duplicated(keys, keep=False)]
+        self._raise_conflicts(filename, conflicts, keys,
+                              f"источники {sorted(conflicts[SOURCE_COLUMN].unique())} пересекаются")
+
+    def _check_reference_keys(self, filename: str, paths: Dict[str, Path], keys: List[str]):
+        """ValueError, если ключ справочника определен разными строками"""
+        df = self._distinct(paths)
+        if not set(keys).issubset(df.columns):
+            return
+        conflicts = df[df.duplicated(keys, keep=False)]
+        self._raise_conflicts(filename, conflicts, keys, 'разные строки справочника с одним ключом')
+
+    @staticmethod
+    def _raise_conflicts(filename: str, conflicts: pd.DataFrame, keys: List[str], problem: str):
+        if not conflicts.empty:
+            example = dict(conflicts.iloc[0][keys])
+            raise ValueError(f"{filename}: {problem} по ключу {keys} ({len(conflicts)} строк, например {example}); "
+                             f"объединение источников прервано")
+
+    def _read(self, path: Path, **options) -> pd.DataFrame:
+        # Значения переносятся текстом, без вывода типов
+        return pd.read_csv(path, dtype=str, keep_default_na=False, encoding=self.encoding, **options)
+
+    def _tagged(self, paths: Dict[str, Path]) -> Iterator[pd.DataFrame]:
+        """Строки партиций с колонкой источника (колонки - объединение колонок партиций)"""
+        columns = [SOURCE_COLUMN]
+        for path in paths.values():
+            columns += [c for c in self._read(path, nrows=0).columns if c not in columns]
+        yield pd.DataFrame(columns=columns, dtype=str)
+        for name, path in paths.items():
+            for chunk in self._read(path, chunksize=MERGE_CHUNK_ROWS):
+                yield chunk.assign(**{SOURCE_COLUMN: name}).reindex(columns=columns, fill_value='')
+            record_file_read(path)
+
+    def _distinct(self, paths: Dict[str, Path]) -> pd.DataFrame:
+        """Справочник - объединение строк партиций без повторов"""
+        frames: List[pd.DataFrame] = []
+        for path in paths.values():
+            frames.append(self._read(path))
+            record_file_read(path)
+        return pd.concat(frames, ignore_index=True).fillna('').drop_duplicates(ignore_index=True)
+
+    def close(self):
+        """Останавливает пулы запросов коннекторов"""
+        for connector in self.connectors.values():
+            if hasattr(connector, 'close_pool'):
+                connector.close_pool()
+
+
+def extract_sources(parallel: bool = True, resume: bool = True) -> bool:
+    """Выгрузка источников DATABASE_CONFIG['sources']; True, если выгружены все источники"""
+    configure_metrics(project_root / 'logs' / 'metrics.jsonl')
+    extractor = None
+
+    try:
+        extractor = MultiSourceExtractor(create_db_connectors_from_config(),
+                                         tenant_pushdown=DATABASE_CONFIG['tenant_pushdown'], resume=resume)
+        results = extractor.extract_all(parallel=parallel)
+        for name, result in results.items():
+            print(f"Источник {name}: {result['status']} за {result['wall_s']:.1f} с")
+        return all(result['status'] == 'ok' for result in results.values())
+
+    except Exception as e:
+        print(f"Ошибка при извлечении данных: {e}")
+        return False
+
+    finally:
+        print(get_recorder().format_summary())
+        if extractor is not None:
+            extractor.close()
@@ -0,0 +1,502 @@
+"""
+Проверка качества входных и обработанных данных декларативными правилами
+
+Правило описывает таблицу, ключ и тип проверки: непрерывность цепочки статусов,
+отсутствие пересечений интервалов, ссылочная целостность, покрытие справочником,
+допустимые значения. Каждое правило выполняется векторно над всей таблицей
+(сортировка и сравнения соседних строк массивами numpy, без циклов по группам).
+Для очень больших входов проверяемые таблицы можно проверять по выборке групп:
+цепочка попадает в выборку целиком, справочники не сэмплируются.
+"""
+
+from pathlib import Path
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.etl.intervals import MISSING_DAY, to_days
+from src.utils.csv_writer import write_csv
+from src.utils.helpers import current_metrics, instrument, record_file_read
+
+VIOLATION_COLUMNS = ['rule', 'table', 'check', 'severity', 'row', 'key', 'detail']
+SUMMARY_COLUMNS = ['rule', 'table', 'check', 'severity', 'status', 'rows_checked', 'violations']
+
+# Открытый конец интервала при поиске пересечений
+_OPEN_DAY = np.iinfo(np.int64).max
+
+
+def _same_group(codes: np.ndarray) -> np.ndarray:
+    """Флаги строк, продолжающих группу предыдущей строки (для отсортированных кодов)"""
+    return codes[1:] == codes[:-1]
+
+
+def _group_codes(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """Целочисленные коды сочетаний колонок (-1 при пустом значении)"""
+    if df.empty:
+        return np.array([], dtype=np.int64)
+    codes, _ = pd.factorize(pd.MultiIndex.from_frame(df[columns]))
+    return codes
+
+
+def _text(values) -> np.ndarray:
+    """Текстовое представление значений (целые без дробной части, пустые - '')"""
+    series = pd.Series(values)
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype('Int64')
+    return series.astype(object).where(series.notna(), '').astype(str).to_numpy(dtype=object)
+
+
+def _comparable(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """Ключевые колонки в сопоставимом виде: числа - float64, остальное - строки"""
+    result = pd.DataFrame(index=df.index)
+    for column in columns:
+        values = df[column]
+        numeric = pd.to_numeric(values, errors='coerce')
+        if values.notna().sum() == numeric.notna().sum():
+            result[column] = numeric.astype('float64')
+        else:
+            result[column] = values.astype('string').str.strip()
+    return result
+
+
+class Rule:
+    """
+    Базовое правило проверки
+
+    Подклассы задают columns() (нужные колонки проверяемой таблицы), references()
+    (справочники {имя: колонки}) и evaluate(), возвращающий DataFrame нарушений с
+    колонками row (позиция строки в проверяемой таблице) и detail.
+    """
+
+    check = ''
+
+    def __init__(self, name: str, table: str, keys: list = None, severity: str = 'error'):
+        self.name = name
+        self.table = table
+        self.keys = list(keys or [])
+        self.severity = severity
+
+    @property
+    def sample_keys(self) -> Optional[list]:
+        """Колонки, по которым группы попадают в выборку целиком (None - по строкам)"""
+        return self.keys or None
+
+    def columns(self) -> list:
+        return list(self.keys)
+
+    def references(self) -> Dict[str, list]:
+        return {}
+
+    def evaluate(self, df: pd.DataFrame, context: 'ValidationContext') -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class ChainContinuityRule(Rule):
+    """
+    Непрерывность цепочки: status_sequence идет без пропусков, следующий статус
+    начинается не позже чем через tolerance_days после окончания предыдущего,
+    открытый конец допустим только у последнего статуса
+    """
+
+    check = 'chain_continuity'
+
+    def __init__(self, name: str, table: str, keys: list, sequence: str, start: str, end: str,
+                 tolerance_days: int = 1, severity: str = 'error'):
+        super().__init__(name, table, keys, severity)
+        self.sequence = sequence
+        self.start = start
+        self.end = end
+        self.tolerance_days = tolerance_days
+
+    def columns(self) -> list:
+        return self.keys + [self.sequence, self.start, self.end]
+
+    def evaluate(self, df: pd.DataFrame, context: 'ValidationContext') -> pd.DataFrame:
+        codes = _group_codes(df, self.keys)
+        sequence = pd.to_numeric(df[self.sequence], errors='coerce').to_numpy(dtype=float)
+        order = np.lexsort((sequence, codes))
+        codes, sequence = codes[order], sequence[order]
+        start = to_days(df[self.start])[order]
+        end = to_days(df[self.end])[order]
+
+        same = _same_group(codes)
+        following = order[1:]
+        known_start = same & (start[1:] != MISSING_DAY)
+        open_inside = same & (end[:-1] == MISSING_DAY)
+        sequence_gap = same & (sequence[1:] - sequence[:-1] != 1)
+        gap = start[1:].astype(float) - end[:-1].astype(float)
+        date_gap = known_start & ~open_inside & (gap > self.tolerance_days)
+        date_back = known_start & ~open_inside & (gap < 0)
+
+        previous_text = _text(sequence[:-1][sequence_gap])
+        current_text = _text(sequence[1:][sequence_gap])
+        return pd.concat([
+            pd.DataFrame({'row': following[sequence_gap],
+                          'detail': f'пропуск в {self.sequence}: ' + previous_text + ' -> ' + current_text}),
+            pd.DataFrame({'row': following[open_inside], 'detail': 'открытый конец не у последнего статуса'}),
+            pd.DataFrame({'row': following[date_gap],
+                          'detail': 'разрыв ' + _text(gap[date_gap]) + ' дн. между статусами'}),
+            pd.DataFrame({'row': following[date_back], 'detail': 'статус начинается до окончания предыдущего'}),
+        ], ignore_index=True)
+
+
+class NoOverlapRule(Rule):
+    """
+    Интервалы одного ключа не пересекаются
+
+    Строки сортируются по (ключ, начало), начало строки сравнивается с
+    накопленным максимумом концов предыдущих строк группы. Пустой конец -
+    открытый интервал. closed_end: конец входит в интервал.
+    """
+
+    check = 'no_overlap'
+
+    def __init__(self, name: str, table: str, keys: list, start: str, end: str,
+                 closed_end: bool = True, severity: str = 'error'):
+        super().__init__(name, table, keys, severity)
+        self.start = start
+        self.end = end
+        self.closed_end = closed_end
+
+    def columns(self) -> list:
+        return self.keys + [self.start, self.end]
+
+    def evaluate(self, df: pd.DataFrame, context: 'ValidationContext') -> pd.DataFrame:
+        codes = _group_codes(df, self.keys)
+        start = to_days(df[self.start])
+        end = to_days(df[self.end])
+        end = np.where(end == MISSING_DAY, _OPEN_DAY, end)
+
+        valid = start != MISSING_DAY
+        order = np.flatnonzero(valid)[np.lexsort((start[valid], codes[valid]))]
+        codes, start, end = codes[order], start[order], end[order]
+
+        # Накопленный максимум концов внутри группы
+        running_end = pd.Series(end).groupby(codes).cummax().to_numpy()
+        same = _same_group(codes)
+        previous_end = running_end[:-1]
+        overlap = same & ((start[1:] <= previous_end) if self.closed_end else (start[1:] < previous_end))
+
+        return pd.DataFrame({
+            'row': order[1:][overlap],
+            'detail': 'пересечение с предыдущим интервалом ключа',
+        })
+
+
+class ForeignKeyRule(Rule):
+    """
+    Ссылочная целостность: значения колонок есть в справочнике
+
+    Строки с пустыми значениями ключа пропускаются (allow_null) или считаются
+    нарушением; ignore_values - значения-заглушки одиночного ключа (lease_id = 0).
+    """
+
+    check = 'foreign_key'
+
+    def __init__(self, name: str, table: str, columns: list, ref_table: str, ref_columns: list = None,
+                 ignore_values: tuple = (), allow_null: bool = True, severity: str = 'error'):
+        super().__init__(name, table, [], severity)
+        self.fk_columns = list(columns)
+        self.ref_table = ref_table
+        self.ref_columns = list(ref_columns or columns)
+        self.ignore_values = tuple(ignore_values)
+        self.allow_null = allow_null
+
+    def columns(self) -> list:
+        return list(self.fk_columns)
+
+    def references(self) -> Dict[str, list]:
+        return {self.ref_table: self.ref_columns}
+
+    def _missing(self, df: pd.DataFrame, context: 'ValidationContext'):
+        """Маски пустых и отсутствующих в справочнике значений"""
+        child = _comparable(df, self.fk_columns)
+        ref = context.reference(self.ref_table)
+        parent = _comparable(ref, self.ref_columns).dropna()
+        parent.columns = self.fk_columns
+
+        null = child.isna().any(axis=1).to_numpy().copy()
+        if self.ignore_values and len(self.fk_columns) == 1:
+            null |= df[self.fk_columns[0]].isin(self.ignore_values).to_numpy()
+
+        found = pd.MultiIndex.from_frame(child).isin(pd.MultiIndex.from_frame(parent)) \
+            if len(child) else np.array([], dtype=bool)
+        return null, ~null & ~found
+
+    def evaluate(self, df: pd.DataFrame, context: 'ValidationContext') -> pd.DataFrame:
+        null, missing = self._missing(df, context)
+        frames = [pd.DataFrame({'row': np.flatnonzero(missing),
+                                'detail': f'нет в {self.ref_table}'})]
+        if not self.allow_null:
+            frames.append(pd.DataFrame({'row': np.flatnonzero(null), 'detail': 'пустой ключ'}))
+        return pd.concat(frames, ignore_index=True)
+
+
+class CoverageRule(ForeignKeyRule):
+    """
+    Покрытие справочником (маппингом): одно нарушение на каждое отсутствующее
+    значение с количеством строк, строка - первая встреченная
+    """
+
+    check = 'coverage'
+
+    def evaluate(self, df: pd.DataFrame, context: 'ValidationContext') -> pd.DataFrame:
+        _, missing = self._missing(df, context)
+        rows = np.flatnonzero(missing)
+        if not len(rows):
+            return pd.DataFrame({'row': rows, 'detail': []})
+
+        values = _text(df[self.fk_columns[0]].iloc[rows])
+        for column in self.fk_columns[1:]:
+            values = values + '|' + _text(df[column].iloc[rows])
+        grouped = pd.DataFrame({'row': rows, 'value': values}).groupby('value', sort=True)['row']
+        first, count = grouped.min(), grouped.size()
+        detail = "'" + first.index.astype(str) + f"' нет в {self.ref_table} (" + count.astype(str).to_numpy() + ' строк)'
+        return pd.DataFrame({'row': first.to_numpy(), 'detail': np.asarray(detail)})
+
+
+class DomainRule(Rule):
+    """Значения колонки - числа (numeric) или одно из allowed"""
+
+    check = 'domain'
+
+    def __init__(self, name: str, table: str, column: str, allowed: tuple = (), numeric: bool = False,
+                 allow_null: bool = True, severity: str = 'error'):
+        super().__init__(name, table, [], severity)
+        self.column = column
+        self.allowed = tuple(allowed)
+        self.numeric = numeric
+        self.allow_null = allow_null
+
+    def columns(self) -> list:
+        return [self.column]
+
+    def evaluate(self, df: pd.DataFrame, context: 'ValidationContext') -> pd.DataFrame:
+        values = df[self.column]
+        valid = values.isin(self.allowed).to_numpy().copy()
+        if self.numeric:
+            valid |= pd.to_numeric(values, errors='coerce').notna().to_numpy()
+        if self.allow_null:
+            valid |= values.isna().to_numpy()
+        rows = np.flatnonzero(~valid)
+        return pd.DataFrame({'row': rows, 'detail': "недопустимое значение '" + _text(values.iloc[rows]) + "'"})
+
+
+class ValidationContext:
+    """Таблицы проверки: полные (справочники) и выборки групп (проверяемые)"""
+
+    def __init__(self, tables: Dict[str, pd.DataFrame], sample_fraction: float = None, seed: int = 0):
+        self.tables = tables
+        self.sample_fraction = sample_fraction
+        self.seed = seed
+        self._samples = {}
+
+    def has(self, name: str, columns: list) -> bool:
+        df = self.tables.get(name)
+        return df is not None and set(columns).issubset(df.columns)
+
+    def reference(self, name: str) -> pd.DataFrame:
+        return self.tables[name]
+
+    def table(self, name: str, sample_keys: list = None) -> pd.DataFrame:
+        """Проверяемая таблица; при sample_fraction - выборка по хэшу ключа (детерминированная)"""
+        df = self.tables[name]
+        if not self.sample_fraction or self.sample_fraction >= 1 or df.empty:
+            return df
+
+        cache_key = (name, tuple(sample_keys or ()))
+        if cache_key not in self._samples:
+            source = df[sample_keys] if sample_keys else df
+            hashes = pd.util.hash_pandas_object(source, index=not sample_keys,
+                                                hash_key=f'{self.seed:016d}'[-16:]).to_numpy()
+            selected = (hashes % np.uint64(1_000_000)) < np.uint64(int(self.sample_fraction * 1_000_000))
+            self._samples[cache_key] = df[selected]
+        return self._samples[cache_key]
+
+
+class ValidationReport:
+    """Результат проверки: нарушения и сводка по правилам"""
+
+    def __init__(self, violations: pd.DataFrame, summary: pd.DataFrame, sample_fraction: float = None):
+        self.violations = violations
+        self.summary = summary
+        self.sample_fraction = sample_fraction
+
+    @property
+    def ok(self) -> bool:
+        """Нет нарушений уровня error"""
+        failed = self.summary[(self.summary['status'] == 'failed') & (self.summary['severity'] == 'error')]
+        return failed.empty
+
+    def counts(self) -> Dict[str, int]:
+        return dict(zip(self.summary['rule'], self.summary['violations']))
+
+    def format_summary(self) -> str:
+        lines = [f"Проверка качества данных{' (выборка ' + str(self.sample_fraction) + ')' if self.sample_fraction else ''}:"]
+        for row in self.summary.itertuples(index=False):
+            lines.append(f"  [{row.status:7}] {row.rule}: {row.violations} нарушений "
+                         f"из {row.rows_checked} строк ({row.table}, {row.severity})")
+        return '\n'.join(lines)
+
+    def save(self, output_dir: Path, prefix: str = 'validation') -> dict:
+        """Сохраняет нарушения и сводку в CSV"""
+        output_dir = Path(output_dir)
+        paths = {
+            'violations': output_dir / f'{prefix}_violations.csv',
+            'summary': output_dir / f'{prefix}_summary.csv',
+        }
+        write_csv(self.violations, paths['violations'], source='validate')
+        write_csv(self.summary, paths['summary'], source='validate')
+        return paths
+
+
+class DataValidator:
+    """
+    Выполняет набор правил над таблицами
+
+    Args:
+        rules: Список правил (по умолчанию default_rules())
+        sample_fraction: Доля групп/строк проверяемых таблиц (None - все строки)
+        seed: Зерно выборки
+        max_examples: Максимум детальных строк нарушений на правило (счетчик - полный)
+    """
+
+    def __init__(self, rules: List[Rule] = None, sample_fraction: float = None, seed: int = 0,
+                 max_examples: int = 1000):
+        self.rules = rules if rules is not None else default_rules()
+        self.sample_fraction = sample_fraction
+        self.seed = seed
+        self.max_examples = max_examples
+
+    def required_tables(self) -> List[str]:
+        names = []
+        for rule in self.rules:
+            for name in [rule.table] + list(rule.references()):
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def validate(self, tables: Dict[str, pd.DataFrame]) -> ValidationReport:
+        context = ValidationContext(tables, self.sample_fraction, self.seed)
+        violation_frames, summary_rows = [], []
+
+        for rule in self.rules:
+            summary = {'rule': rule.name, 'table': rule.table, 'check': rule.check,
+                       'severity': rule.severity, 'status': 'skipped', 'rows_checked': 0, 'violations': 0}
+            summary_rows.append(summary)
+
+            available = context.has(rule.table, rule.columns()) and all(
+                context.has(name, columns) for name, columns in rule.references().items())
+            if not available:
+                continue
+
+            df = context.table(rule.table, rule.sample_keys)
+            found = rule.evaluate(df, context) if len(df) else pd.DataFrame({'row': [], 'detail': []})
+            summary.update(status='failed' if len(found) else 'ok', rows_checked=len(df), violations=len(found))
+
+            found = found.sort_values('row', kind='stable').head(self.max_examples)
+            if found.empty:
+                continue
+            positions = found['row'].to_numpy(dtype=np.int64)
+            key_columns = rule.keys or rule.columns()
+            selected = df[key_columns].iloc[positions]
+            keys = _text(selected[key_columns[0]])
+            for column in key_columns[1:]:
+                keys = keys + '|' + _text(selected[column])
+            violation_frames.append(pd.DataFrame({
+                'rule': rule.name, 'table': rule.table, 'check': rule.check, 'severity': rule.severity,
+                'row': df.index[positions], 'key': keys, 'detail': found['detail'].to_numpy(),
+            }))
+
+        violations = pd.concat(violation_frames, ignore_index=True) if violation_frames \
+            else pd.DataFrame(columns=VIOLATION_COLUMNS)
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.add_rows_in(sum(row['rows_checked'] for row in summary_rows))
+            metrics.add_rows_out(len(violations))
+        return ValidationReport(violations, pd.DataFrame(summary_rows, columns=SUMMARY_COLUMNS),
+                                self.sample_fraction)
+
+
+# Таблицы проверки по умолчанию: имя -> (каталог, файл); 'raw' - data/raw, 'processed' - data/processed
+TABLE_FILES = {
+    'history': ('processed', 'processed_history.csv'),
+    'tenants': ('processed', 'processed_tenants.csv'),
+    'expert_history': ('processed', 'processed_expert_history.csv'),
+    'ref_legal_unit': ('processed', 'processed_ref_legal_unit.csv'),
+    'ref_model': ('processed', 'processed_ref_model.csv'),
+    'mapping_trc': ('processed', 'mapping_trc.csv'),
+    'ref_lease': ('raw', 'ref_lease.csv'),
+    'source_ref_model': ('raw', 'ref_model.csv'),
+    'expert': ('raw', 'expert.csv'),
+}
+
+CHAIN_KEYS = ['model_id', 'legal_entity', 'unit_id']
+UNIT_KEYS = ['legal_entity', 'unit_id']
+
+
+def default_rules() -> List[Rule]:
+    """Правила для выходов DBExtractor и HistoryProcessor"""
+    return [
+        ChainContinuityRule('history_chain_continuity', 'history', CHAIN_KEYS,
+                            'status_sequence', 'status_start_date', 'status_end_date'),
+        NoOverlapRule('history_no_overlap', 'history', CHAIN_KEYS, 'status_start_date', 'status_end_date'),
+        ForeignKeyRule('history_legal_unit_fk', 'history', UNIT_KEYS, 'ref_legal_unit'),
+        ForeignKeyRule('history_lease_fk', 'history', ['lease_id'], 'ref_lease', ignore_values=(0,)),
+        ForeignKeyRule('history_model_fk', 'history', ['model_id'], 'ref_model'),
+        ForeignKeyRule('tenants_lease_fk', 'tenants', ['lease_id'], 'ref_lease'),
+        ForeignKeyRule('tenants_legal_unit_fk', 'tenants', UNIT_KEYS, 'ref_legal_unit'),
+        CoverageRule('ref_lease_tenants_coverage', 'ref_lease', ['lease_id'], 'tenants', ignore_values=(0,)),
+        NoOverlapRule('tenants_billing_no_overlap', 'tenants', CHAIN_KEYS, 'billing_start', 'billing_end',
+                      severity='warning'),
+        CoverageRule('expert_mapping_trc_coverage', 'expert', ['TrcShoppingMall'], 'mapping_trc', ['crm']),
+        ForeignKeyRule('expert_legal_unit_fk', 'expert_history', UNIT_KEYS, 'ref_legal_unit',
+                       severity='warning'),
+        DomainRule('ref_model_forecast_year', 'source_ref_model', 'forecast_year', allowed=('все',),
+                   numeric=True),
+    ]
+
+
+def load_tables(names: list, data_dir: Path = None, processed_dir: Path = None,
+                table_files: dict = None) -> Dict[str, pd.DataFrame]:
+    """Загружает существующие файлы таблиц проверки"""
+    table_files = table_files or TABLE_FILES
+    dirs = {
+        'raw': Path(data_dir) if data_dir else project_root / 'data' / 'raw',
+        'processed': Path(processed_dir) if processed_dir else project_root / 'data' / 'processed',
+    }
+    tables = {}
+    for name in names:
+        if name not in table_files:
+            continue
+        location, filename = table_files[name]
+        path = dirs[location] / filename
+        if not path.exists():
+            print(f"Предупреждение: {filename} не найден, правила по таблице {name} пропущены")
+            continue
+        record_file_read(path)
+        tables[name] = pd.read_csv(path)
+    return tables
+
+
+@instrument('validate')
+def validate_processed_data(data_dir: Path = None, processed_dir: Path = None,
+                            sample_fraction: float = None, seed: int = 0) -> ValidationReport:
+    """Проверяет выгрузку и обработанные данные, сохраняет отчет в data/processed"""
+    validator = DataValidator(sample_fraction=sample_fraction, seed=seed)
+    tables = load_tables(validator.required_tables(), data_dir, processed_dir)
+    report = validator.validate(tables)
+
+    processed_dir = Path(processed_dir) if processed_dir else project_root / 'data' / 'processed'
+    report.save(processed_dir)
+    print(report.format_summary())
+    return report
+
+
+if __name__ == "__main__":
+    validate_processed_data()
@@ -0,0 +1,246 @@
+"""
+Каталог наборов данных: манифест с метаданными файлов каждого каталога данных
+
+Манифест catalog.json лежит рядом с файлами (data/raw, data/processed, ...) и хранит
+по каждому набору схему, число строк, размер, SHA-256, источник (SQL-файл и хэш текста
+запроса) и время выгрузки. Писатели обновляют запись после сохранения файла, манифест
+перезаписывается атомарно (временный файл + os.replace). По манифесту можно проверить
+актуальность набора и его входов, не открывая файлы данных; DatasetHandle читает
+только запрошенные колонки и диапазоны строк.
+
+Модуль импортирует pandas только при чтении данных (используется в CLI).
+"""
+
+import csv
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+MANIFEST_FILE = 'catalog.json'
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _directory_lock(directory: Path) -> threading.Lock:
+    """Блокировка манифеста каталога (общая для всех DatasetCatalog процесса)"""
+    key = str(directory.resolve())
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def file_checksum(path: Union[str, Path], block_size: int = 1 << 20) -> str:
+    """SHA-256 файла (потоковое чтение блоками)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def query_hash(query: str) -> str:
+    """Короткий хэш текста запроса без учета пробелов (текст запроса в манифест не пишется)"""
+    return hashlib.sha256(' '.join(query.split()).encode('utf-8')).hexdigest()[:16]
+
+
+def frame_schema(df) -> Dict[str, str]:
+    """Схема DataFrame: {колонка: dtype}"""
+    return {str(column): str(dtype) for column, dtype in df.dtypes.items()}
+
+
+class DatasetHandle:
+    """
+    Ленивый дескриптор набора данных: файл не читается до вызова read()/iter_chunks()
+
+    Атрибуты columns и rows берутся из манифеста (при отсутствии записи колонки
+    читаются из заголовка CSV).
+    """
+
+    def __init__(self, path: Path, entry: dict = None, encoding: str = 'utf-8'):
+        self.path = Path(path)
+        self.entry = entry or {}
+        self.encoding = encoding
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    @property
+    def columns(self) -> List[str]:
+        if self.entry.get('schema'):
+            return list(self.entry['schema'])
+        with open(self.path, 'r', encoding=self.encoding, newline='') as f:
+            return next(csv.reader(f), [])
+
+    @property
+    def rows(self) -> Optional[int]:
+        return self.entry.get('rows')
+
+    def read(self, columns: List[str] = None, start: int = 0, stop: int = None):
+        """
+        Читает колонки columns и строки данных [start, stop)
+
+        Пропуск строк выполняет парсер CSV, в память попадает только запрошенный диапазон.
+        """
+        import pandas as pd
+
+        skiprows = range(1, start + 1) if start else None
+        nrows = None if stop is None else max(stop - start, 0)
+        return pd.read_csv(self.path, usecols=columns, skiprows=skiprows, nrows=nrows, encoding=self.encoding)
+
+    def iter_chunks(self, chunk_size: int = 100000, columns: List[str] = None) -> Iterator:
+        """Поток DataFrame по chunk_size строк (только колонки columns)"""
+        import pandas as pd
+
+        yield from pd.read_csv(self.path, usecols=columns, chunksize=chunk_size, encoding=self.encoding)
+
+    def __repr__(self) -> str:
+        return f"DatasetHandle({self.path}, rows={self.rows})"
+
+
+class DatasetCatalog:
+    """
+    Манифест наборов данных одного каталога
+
+    Args:
+        directory: Каталог с файлами данных (манифест - directory/catalog.json)
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.manifest_path = self.directory / MANIFEST_FILE
+        self._lock = _directory_lock(self.directory) if self.directory.exists() else threading.Lock()
+
+    def load(self) -> Dict[str, dict]:
+        """Записи манифеста {имя файла: метаданные}"""
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            return json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries: Dict[str, dict]):
+        """Атомарная запись манифеста: читатели видят старую или новую версию целиком"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.catalog.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                # Наборы по имени; порядок колонок схемы сохраняется
+                json.dump(dict(sorted(entries.items())), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def record(self, path: Union[str, Path], df=None, source: str = None, query: str = None,
+               extracted_at: str = None, checksum: Union[bool, str] = True, rows: int = None) -> dict:
+        """
+        Обновляет запись набора после записи файла
+
+        Args:
+            path: Записанный файл (в каталоге манифеста)
+            df: Записанный DataFrame - схема и число строк (иначе - заголовок и подсчет строк)
+            source: Источник (имя SQL-файла, API, стадия)
+            query: Текст запроса - в манифест попадает только его хэш
+            extracted_at: Время выгрузки (по умолчанию - сейчас)
+            checksum: Считать SHA-256 файла (или готовая сумма, посчитанная при записи)
+            rows: Число строк, если df - только схема (потоковая запись)
+        """
+        path = Path(path)
+        stat = path.stat()
+        if df is not None:
+            schema, rows = frame_schema(df), len(df) if rows is None else rows
+        else:
+            handle = DatasetHandle(path)
+            schema, rows = {column: 'unknown' for column in handle.columns}, _count_rows(path)
+
+        entry = {
+            'schema': schema,
+            'rows': rows,
+            'bytes': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'checksum': checksum if isinstance(checksum, str) else file_checksum(path) if checksum else None,
+            'source': source,
+            'query_hash': query_hash(query) if query else None,
+            'extracted_at': extracted_at or datetime.now().isoformat(timespec='microseconds'),
+        }
+        with self._lock:
+            entries = self.load()
+            entries[path.name] = entry
+            self._save(entries)
+        return entry
+
+    def remove(self, name: str):
+        with self._lock:
+            entries = self.load()
+            if entries.pop(name, None) is not None:
+                self._save(entries)
+
+    def entry(self, name: str) -> Optional[dict]:
+        return self.load().get(name)
+
+    def dataset(self, name: str) -> DatasetHandle:
+        """Ленивый дескриптор набора (файл не открывается)"""
+        return DatasetHandle(self.directory / name, self.entry(name))
+
+    def names(self) -> List[str]:
+        return sorted(self.load())
+
+    def is_unchanged(self, name: str) -> bool:
+        """Файл не менялся после записи в манифест (сверка размера и mtime, без чтения)"""
+        entry = self.entry(name)
+        path = self.directory / name
+        if entry is None or not path.exists():
+            return False
+        stat = path.stat()
+        return stat.st_size == entry['bytes'] and stat.st_mtime_ns == entry['mtime_ns']
+
+    def verify(self, name: str) -> bool:
+        """Полная проверка содержимого по SHA-256"""
+        entry = self.entry(name)
+        path = self.directory / name
+        return bool(entry and entry.get('checksum') and path.exists() and file_checksum(path) == entry['checksum'])
+
+    def is_fresh(self, name: str, inputs: List[tuple] = None, query: str = None) -> bool:
+        """
+        Набор можно не пересчитывать
+
+        Файл не менялся после записи, запрос (если задан) совпадает с исходным, и набор
+        выгружен не раньше каждого входа inputs - [(DatasetCatalog, имя), ...].
+        """
+        if not self.is_unchanged(name):
+            return False
+        entry = self.entry(name)
+        if query is not None and entry.get('query_hash') != query_hash(query):
+            return False
+        for catalog, input_name in inputs or []:
+            input_entry = catalog.entry(input_name)
+            if input_entry is None or not catalog.is_unchanged(input_name):
+                return False
+            if input_entry['extracted_at'] > entry['extracted_at']:
+                return False
+        return True
+
+
+def _count_rows(path: Path) -> int:
+    """Число записей CSV (без заголовка), с учетом переводов строк внутри кавычек"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+
+def record_dataset(path: Union[str, Path], df=None, source: str = None, query: str = None,
+                   rows: int = None, checksum: Union[bool, str] = True) -> dict:
+    """Запись набора в манифест каталога, в котором лежит файл"""
+    path = Path(path)
+    return DatasetCatalog(path.parent).record(path, df=df, source=source, query=query, rows=rows,
+                                              checksum=checksum)
@@ -1,11 +1,16 @@
 """
 Утилита для загрузки выгруженных CSV файлов
+
+Загрузка идет через каталог наборов (src/utils/catalog.py): dataset() возвращает
+ленивый дескриптор, load() читает только запрошенные колонки и диапазон строк.
 """
 
 import pandas as pd
 import logging
 from pathlib import Path
-import json
+from typing import List
+
+from src.utils.catalog import DatasetCatalog, DatasetHandle
 
 logger = logging.getLogger(__name__)
 
@@ -13,46 +18,44 @@ logger = logging.getLogger(__name__)
 class CSVLoader:
     """Класс для загрузки данных из CSV"""
 
-    def __init__(self):
-        self.data_dir = Path(__file__).parent.parent.parent / "data" / "raw"
+    def __init__(self, data_dir: Path = None):
+        self.data_dir = Path(data_dir) if data_dir else Path(__file__).parent.parent.parent / "data" / "raw"
+        self.catalog = DatasetCatalog(self.data_dir)
 
-    def load_rooms_data(self) -> pd.DataFrame:
-        """Загрузка данных о помещениях из CSV"""
-        file_path = self.data_dir / "rooms.csv"
+    def dataset(self, filename: str) -> DatasetHandle:
+        """Ленивый дескриптор набора: схема и число строк - из манифеста, файл не открывается"""
+        return self.catalog.dataset(filename)
 
-        if not file_path.exists():
-            logger.error(f"Файл не найден: {file_path}")
+    def load(self, filename: str, columns: List[str] = None, start: int = 0, stop: int = None) -> pd.DataFrame:
+        """Загрузка колонок columns и строк [start, stop) набора"""
+        handle = self.dataset(filename)
+
+        if not handle.exists:
+            logger.error(f"Файл не найден: {handle.path}")
             return pd.DataFrame()
 
-        logger.info(f"Загружаем данные о помещениях из: {file_path}")
-        df = pd.read_csv(file_path, encoding='utf-8')
-        logger.info(f"Загружено {len(df)} записей о помещениях")
+        logger.info(f"Загружаем {filename} из: {handle.path}")
+        df = handle.read(columns=columns, start=start, stop=stop)
+        logger.info(f"Загружено {len(df)} записей из {filename}")
         return df
 
+    def load_rooms_data(self) -> pd.DataFrame:
+        """Загрузка данных о помещениях из CSV"""
+        return self.load("rooms.csv")
+
     def load_statuses_data(self) -> pd.DataFrame:
         """Загрузка истории статусов из CSV"""
-        file_path = self.data_dir / "statuses.csv"
-
-        if not file_path.exists():
-            logger.error(f"Файл не найден: {file_path}")
-            return pd.DataFrame()
+        return self.load("statuses.csv")
 
-        logger.info(f"Загружаем историю статусов из: {file_path}")
-        df = pd.read_csv(file_path, encoding='utf-8')
-        logger.info(f"Загружено {len(df)} записей истории статусов")
-        return df
+    def is_fresh(self, filename: str, query: str = None) -> bool:
+        """Набор не менялся после записи в каталог (и выгружен тем же запросом)"""
+        return self.catalog.is_fresh(filename, query=query)
 
     def get_extraction_info(self) -> dict:
-        """Получение информации о последней выгрузке"""
-        metadata_file = self.data_dir / "extraction_metadata.json"
-
-        if not metadata_file.exists():
-            return {}
-
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        """Получение информации о последней выгрузке: записи каталога {файл: метаданные}"""
+        return self.catalog.load()
 
     def list_available_files(self) -> list:
         """Список доступных CSV файлов"""
         csv_files = list(self.data_dir.glob("*.csv"))
-        return [f.name for f in csv_files]
\ No newline at end of file
+        return [f.name for f in csv_files]
@@ -0,0 +1,268 @@
+"""
+Профилирование CSV наборов данных: структура, число строк и статистика колонок
+
+Число строк считается сканированием переводов строк без разбора CSV (или берется из
+каталога, если файл не менялся), колонки - из заголовка. Статистика (доля пропусков,
+приближенное число различных значений по HyperLogLog, min/max чисел и дат) считается по
+потоковой выборке: из больших файлов читаются равномерно расположенные блоки строк.
+Файлы профилируются параллельно; результат - JSON и текстовый отчет (csv_structure.txt).
+
+Модуль импортирует pandas/numpy только при сборе статистики.
+"""
+
+import csv
+import io
+import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+DEFAULT_SAMPLE_ROWS = 50000
+DEFAULT_BLOCKS = 8
+DEFAULT_MAX_WORKERS = 4
+
+# Строковые значения, которые проверяются на дату: 2024-01-31[ 12:00:00] и 31.01.2024
+ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$')
+DOTTED_DATE = re.compile(r'^\d{2}\.\d{2}\.\d{4}( \d{2}:\d{2}(:\d{2})?)?$')
+
+
+def count_lines(path: Path, block_size: int = 1 << 20) -> int:
+    """Количество строк данных CSV (без заголовка) без разбора файла"""
+    lines, last = 0, b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def read_header(path: Path, encoding: str = 'utf-8') -> List[str]:
+    """Названия колонок из первой строки файла"""
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        return next(csv.reader(f), [])
+
+
+class HyperLogLog:
+    """
+    Скетч HyperLogLog: приближенное число различных значений за O(2^p) памяти
+
+    Регистры объединяются поэлементным максимумом (merge), поэтому скетчи частей
+    набора можно считать независимо. Относительная ошибка ~1.04 / sqrt(2^p).
+    """
+
+    def __init__(self, p: int = 12):
+        import numpy as np
+
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        """Добавляет 64-битные хэши значений (массив uint64)"""
+        import numpy as np
+
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes << np.uint64(self.p)
+        # Позиция старшей единицы по старшим 32 битам (float64 представляет их точно)
+        top = (rest >> np.uint64(32)).astype(np.float64)
+        _, bit_length = np.frexp(top)
+        rank = np.where(top > 0, 33 - bit_length, 33).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def add_values(self, values):
+        """Добавляет значения Series (пропуски не учитываются)"""
+        import pandas as pd
+
+        values = values.dropna()
+        self.add_hashes(pd.util.hash_pandas_object(values, index=False).to_numpy())
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        import numpy as np
+
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> int:
+        import numpy as np
+
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m ** 2 / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros:
+            # Поправка для малых мощностей (linear counting)
+            raw = self.m * math.log(self.m / zeros)
+        return int(round(raw))
+
+
+def sample_frame(path: Path, columns: List[str], rows: int, sample_rows: int = DEFAULT_SAMPLE_ROWS,
+                 blocks: int = DEFAULT_BLOCKS, encoding: str = 'utf-8'):
+    """
+    Выборка строк файла как DataFrame строковых значений
+
+    Файл до sample_rows строк читается целиком; из большего читаются blocks блоков
+    подряд идущих строк с равномерно распределенных смещений. Если блок не разбирается
+    (смещение попало внутрь многострочного значения), берутся первые sample_rows строк.
+    """
+    import pandas as pd
+
+    read_options = dict(dtype=str, keep_default_na=True, encoding=encoding)
+    if rows <= sample_rows:
+        return pd.read_csv(path, **read_options)
+
+    per_block = max(sample_rows // blocks, 1)
+    size = path.stat().st_size
+    parts = []
+    with open(path, 'rb') as f:
+        f.readline()
+        data_start = f.tell()
+        for block in range(blocks):
+            f.seek(data_start + (size - data_start) * block // blocks)
+            if block:
+                f.readline()  # Пропускаем неполную строку
+            lines = [line for line in (f.readline() for _ in range(per_block)) if line]
+            parts.append(b''.join(lines))
+
+    text = b''.join(parts).decode(encoding, errors='replace')
+    try:
+        sample = pd.read_csv(io.StringIO(text), header=None, names=columns, **read_options)
+    except (pd.errors.ParserError, ValueError):
+        return pd.read_csv(path, nrows=sample_rows, **read_options)
+    return sample
+
+
+def column_stats(values) -> dict:
+    """Статистика колонки выборки: пропуски, различные значения, тип и min/max"""
+    import pandas as pd
+
+    present = values.dropna()
+    sketch = HyperLogLog()
+    sketch.add_values(present)
+    stats = {
+        'null_rate': round(1 - len(present) / len(values), 4) if len(values) else None,
+        'distinct': sketch.estimate(),
+        'kind': 'text',
+        'min': None,
+        'max': None,
+    }
+    if present.empty:
+        return stats
+
+    numbers = pd.to_numeric(present, errors='coerce')
+    if numbers.notna().all():
+        stats.update(kind='number', min=numbers.min().item(), max=numbers.max().item())
+        return stats
+
+    for pattern, dayfirst in ((ISO_DATE, False), (DOTTED_DATE, True)):
+        if present.str.match(pattern).all():
+            dates = pd.to_datetime(present, errors='coerce', format='mixed', dayfirst=dayfirst)
+            if dates.notna().all():
+                # Даты без времени выводятся как YYYY-MM-DD
+                date_only = bool((dates == dates.dt.normalize()).all())
+                low, high = dates.min(), dates.max()
+                stats.update(kind='date', min=low.date().isoformat() if date_only else low.isoformat(),
+                             max=high.date().isoformat() if date_only else high.isoformat())
+            break
+    return stats
+
+
+def profile_file(path: Union[str, Path], location: str = None, sample_rows: int = DEFAULT_SAMPLE_ROWS,
+                 with_stats: bool = True) -> dict:
+    """Профиль одного CSV: колонки, строки, размер и статистика по выборке"""
+    from src.utils.catalog import DatasetCatalog
+
+    path = Path(path)
+    catalog = DatasetCatalog(path.parent)
+    entry = catalog.entry(path.name)
+    # Число строк из каталога, если файл не менялся после записи
+    rows = entry['rows'] if entry and catalog.is_unchanged(path.name) else count_lines(path)
+    columns = read_header(path)
+
+    profile = {
+        'location': location,
+        'file_name': path.name,
+        'bytes': path.stat().st_size,
+        'row_count': rows,
+        'columns': columns,
+    }
+    if with_stats and columns:
+        sample = sample_frame(path, columns, rows, sample_rows=sample_rows)
+        profile['sample_rows'] = len(sample)
+        profile['sampled'] = len(sample) < rows
+        profile['stats'] = {column: column_stats(sample[column]) for column in columns}
+    return profile
+
+
+def find_csv_files(dirs: Dict[str, Path]) -> List[tuple]:
+    """[(location, путь)] CSV файлов каталогов (файлы на '_' пропускаются)"""
+    files = []
+    for location, directory in dirs.items():
+        directory = Path(directory)
+        if directory.exists():
+            files.extend((location, path) for path in sorted(directory.glob('*.csv'))
+                         if not path.name.startswith('_'))
+    return files
+
+
+def profile_directories(dirs: Dict[str, Path], sample_rows: int = DEFAULT_SAMPLE_ROWS,
+                        max_workers: int = DEFAULT_MAX_WORKERS, with_stats: bool = True) -> List[dict]:
+    """Профили CSV файлов каталогов; файлы обрабатываются параллельно, порядок сохраняется"""
+    from src.utils.helpers import track
+
+    files = find_csv_files(dirs)
+    with track('profile') as metrics:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='profile') as executor:
+            futures = [executor.submit(_safe_profile, path, location, sample_rows, with_stats) for location, path in files]
+            profiles = [future.result() for future in futures]
+        profiles = [profile for profile in profiles if profile is not None]
+        metrics.add_rows_in(sum(profile['row_count'] for profile in profiles))
+    return profiles
+
+
+def _safe_profile(path: Path, location: str, sample_rows: int, with_stats: bool) -> Optional[dict]:
+    try:
+        return profile_file(path, location, sample_rows=sample_rows, with_stats=with_stats)
+    except Exception as e:
+        print(f"Ошибка при чтении файла {path}: {e}")
+        return None
+
+
+def write_profile_json(profiles: List[dict], output_file: Union[str, Path]):
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f, ensure_ascii=False, indent=2, default=str)
+
+
+def format_stats(stats: dict) -> str:
+    text = f"пропуски {stats['null_rate']:.1%}, различных ~{stats['distinct']}" \
+        if stats['null_rate'] is not None else f"различных ~{stats['distinct']}"
+    if stats['min'] is not None:
+        text += f", {stats['kind']} {stats['min']} .. {stats['max']}"
+    return text
+
+
+def write_text_report(profiles: List[dict], output_file: Union[str, Path]):
+    """Текстовый отчет в формате csv_structure.txt (со статистикой колонок, если она есть)"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write("Структура CSV файлов в папке:\n")
+        f.write("=" * 50 + "\n\n")
+
+        for info in profiles:
+            name = f"{info['location']}/{info['file_name']}" if info.get('location') else info['file_name']
+            f.write(f"Файл: {name}\n")
+            f.write(f"Количество строк: {info['row_count']}\n")
+            if info.get('sampled'):
+                f.write(f"Статистика по выборке: {info['sample_rows']} строк\n")
+            f.write("Поля:\n")
+
+            stats = info.get('stats', {})
+            for i, column in enumerate(info['columns'], 1):
+                suffix = f" ({format_stats(stats[column])})" if column in stats else ''
+                f.write(f"  {i}. {column}{suffix}\n")
+
+            f.write("\n" + "-" * 30 + "\n\n")
@@ -0,0 +1,295 @@
+"""
+Атомарная запись CSV: параллельное кодирование чанков, сжатие на лету, потоковый ввод
+
+Данные пишутся во временный файл рядом с целевым и переименовываются (os.replace)
+только после успешной записи всех чанков, поэтому следующие стадии никогда не видят
+частично записанный файл. Чанки по chunk_rows строк кодируются в пуле (потоки или
+процессы), результат пишется в файл в исходном порядке.
+
+Сжатие:
+    gzip - каждый чанк сжимается в пуле отдельным членом gzip (конкатенация членов -
+           корректный gzip-файл);
+    zstd - поток сжимается одним многопоточным компрессором пакета zstandard
+           (pandas читает только первый кадр zstd, поэтому кадры по чанкам не годятся).
+"""
+
+import codecs
+import gzip
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+import pandas as pd
+
+from config.settings import OUTPUT_CONFIG
+from src.utils.catalog import record_dataset
+from src.utils.helpers import record_file_written, track
+
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+EXECUTORS = ('thread', 'process')
+# Кодировки с BOM: BOM пишется только первым чанком, остальные - кодеком без BOM
+_BOM_CONTINUATIONS = {
+    'utf-8-sig': 'utf-8',
+    'utf-16': f'utf-16-{sys.byteorder[0]}e',
+    'utf-32': f'utf-32-{sys.byteorder[0]}e',
+}
+
+_umask: Optional[int] = None
+_umask_lock = threading.Lock()
+
+
+def _process_umask() -> int:
+    """umask процесса: читается один раз при первой записи, а не при импорте модуля"""
+    global _umask
+    with _umask_lock:
+        if _umask is None:
+            try:
+                # Linux: значение без временной смены umask
+                with open('/proc/self/status', encoding='ascii') as status:
+                    _umask = int(re.search(r'^Umask:\s*([0-7]+)', status.read(), re.M).group(1), 8)
+            except (OSError, AttributeError):
+                _umask = os.umask(0o022)
+                os.umask(_umask)
+        return _umask
+
+
+def file_mode(path: Path) -> int:
+    """Права итогового файла: как у заменяемого файла, для нового - 0666 с учетом umask"""
+    try:
+        return path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_process_umask()
+
+
+def infer_compression(path: Path) -> Optional[str]:
+    """Сжатие по расширению файла: .csv.gz - gzip, .csv.zst - zstd"""
+    return COMPRESSIONS.get(Path(path).suffix)
+
+
+def continuation_encoding(encoding: str) -> str:
+    """Кодировка чанков после первого: для utf-8-sig/utf-16/utf-32 - без BOM"""
+    return _BOM_CONTINUATIONS.get(codecs.lookup(encoding).name, encoding)
+
+
+def encode_chunk(frame: pd.DataFrame, header: bool, encoding: str = 'utf-8',
+                 compression: str = None, level: int = 6) -> bytes:
+    """Кодирует чанк в байты CSV (и сжимает членом gzip); функция модуля - для пула процессов"""
+    data = frame.to_csv(index=False, header=header).encode(encoding)
+    if compression == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return data
+
+
+class WriteResult:
+    """Итог записи: путь, строки, байты на диске, время и SHA-256 записанного файла"""
+
+    def __init__(self, path: Path, rows: int, bytes_written: int, wall_s: float, checksum: str):
+        self.path = path
+        self.rows = rows
+        self.bytes_written = bytes_written
+        self.wall_s = wall_s
+        self.checksum = checksum
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes_written / 2 ** 20 / self.wall_s if self.wall_s else 0.0
+
+    def __repr__(self) -> str:
+        return (f"WriteResult({self.path.name}, rows={self.rows}, "
+                f"{self.bytes_written / 2 ** 20:.1f} МБ, {self.mb_per_s:.1f} МБ/с)")
+
+
+class AtomicCSVWriter:
+    """
+    Потоковая атомарная запись CSV
+
+    Пример:
+        with AtomicCSVWriter(path) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+        writer.result.mb_per_s
+
+    Args:
+        path: Целевой файл
+        compression: None, 'gzip' или 'zstd' (по умолчанию - по расширению path)
+        encoding: Кодировка CSV
+        chunk_rows: Строк в чанке кодирования
+        max_workers: Размер пула кодирования
+        executor: 'thread' или 'process' (to_csv удерживает GIL, процессы дают параллелизм
+                  на больших таблицах ценой передачи чанков между процессами)
+        level: Уровень сжатия
+    """
+
+    def __init__(self, path: Union[str, Path], compression: str = None, encoding: str = 'utf-8',
+                 chunk_rows: int = OUTPUT_CONFIG['write_chunk_rows'],
+                 max_workers: int = OUTPUT_CONFIG['write_workers'],
+                 executor: str = OUTPUT_CONFIG['write_executor'], level: int = None):
+        self.path = Path(path)
+        self.compression = compression or infer_compression(self.path)
+        if self.compression not in (None, 'gzip', 'zstd'):
+            raise ValueError(f"Неизвестное сжатие: {self.compression}. Допустимые: gzip, zstd")
+        if executor not in EXECUTORS:
+            raise ValueError(f"Неизвестный пул: {executor}. Допустимые: {EXECUTORS}")
+        self.encoding = encoding
+        self.chunk_rows = chunk_rows
+        self.max_workers = max_workers
+        self.executor_kind = executor
+        self.level = level if level is not None else (6 if self.compression == 'gzip' else 3)
+
+        self.rows = 0
+        self.first_frame = None  # Первый чанк без строк - схема для каталога
+        self.result: Optional[WriteResult] = None
+        self._file = None
+        self._tmp_path = None
+        self._executor = None
+        self._pending = deque()
+        self._digest = hashlib.sha256()
+        self._bytes = 0
+        self._zstd = None
+        self._zstd_frame_end = None
+        self._header_written = False
+        self._started = None
+
+    def __enter__(self) -> 'AtomicCSVWriter':
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def open(self):
+        self._started = time.perf_counter()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f'.{self.path.name}.', suffix='.tmp')
+        # mkstemp создает файл с правами 0600
+        os.chmod(self._tmp_path, file_mode(self.path))
+        self._file = os.fdopen(fd, 'wb')
+        if self.compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                self.abort()
+                raise ImportError("Для сжатия zstd необходим пакет zstandard")
+            compressor = zstandard.ZstdCompressor(level=self.level, threads=self.max_workers)
+            self._zstd = compressor.stream_writer(_DigestSink(self), closefd=False)
+            self._zstd_frame_end = zstandard.FLUSH_FRAME
+        pool = ThreadPoolExecutor if self.executor_kind == 'thread' else ProcessPoolExecutor
+        self._executor = pool(max_workers=self.max_workers)
+
+    def write(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]]):
+        """Добавляет DataFrame или поток DataFrame; заголовок пишется один раз"""
+        frames = [data] if isinstance(data, pd.DataFrame) else data
+        for frame in frames:
+            if self.first_frame is None:
+                self.first_frame = frame.iloc[:0]
+                if frame.empty:
+                    self._submit(frame)
+            for start in range(0, len(frame), self.chunk_rows):
+                chunk = frame.iloc[start:start + self.chunk_rows]
+                self._submit(chunk)
+                self.rows += len(chunk)
+
+    def _submit(self, chunk: pd.DataFrame):
+        compression = 'gzip' if self.compression == 'gzip' else None
+        header, self._header_written = not self._header_written, True
+        encoding = self.encoding if header else continuation_encoding(self.encoding)
+        self._pending.append(self._executor.submit(encode_chunk, chunk, header, encoding, compression,
+                                                   self.level))
+        # Ограничиваем число закодированных, но не записанных чанков
+        while len(self._pending) > self.max_workers * 2:
+            self._write_bytes(self._pending.popleft().result())
+
+    def _write_bytes(self, data: bytes):
+        if self._zstd is not None:
+            self._zstd.write(data)
+        else:
+            self._sink(data)
+
+    def _sink(self, data: bytes):
+        self._file.write(data)
+        self._digest.update(data)
+        self._bytes += len(data)
+
+    def commit(self) -> WriteResult:
+        """Дописывает чанки, сбрасывает файл на диск и атомарно заменяет целевой файл"""
+        try:
+            while self._pending:
+                self._write_bytes(self._pending.popleft().result())
+            if self._zstd is not None:
+                self._zstd.flush(self._zstd_frame_end)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self._executor.shutdown(wait=True)
+
+        self.result = WriteResult(self.path, self.rows, self._bytes, time.perf_counter() - self._started,
+                                  self._digest.hexdigest())
+        return self.result
+
+    def abort(self):
+        """Отменяет запись: целевой файл не меняется, временный удаляется"""
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if self._tmp_path and os.path.exists(self._tmp_path):
+            os.unlink(self._tmp_path)
+
+
+class _DigestSink:
+    """Файловый объект для компрессора zstd: пишет сжатые байты через AtomicCSVWriter._sink"""
+
+    def __init__(self, writer: AtomicCSVWriter):
+        self.writer = writer
+
+    def write(self, data) -> int:
+        self.writer._sink(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def write_csv(data: Union[pd.DataFrame, Iterable[pd.DataFrame]], path: Union[str, Path],
+              encoding: str = 'utf-8', source: str = None, query: str = None, catalog: bool = True,
+              **options) -> WriteResult:
+    """
+    Атомарно записывает DataFrame (или поток чанков) в CSV
+
+    Размер файла учитывается в метриках текущей стадии и записи 'write.csv' (kind='write'),
+    пропускная способность (МБ/с) - в тегах записи 'write.csv'. При catalog=True набор записывается в каталог каталога
+    файла с контрольной суммой, посчитанной при записи (файл повторно не читается).
+    """
+    path = Path(path)
+    with track('write.csv', kind='write', file=path.name) as metrics:
+        with AtomicCSVWriter(path, encoding=encoding, **options) as writer:
+            writer.write(data)
+        result = writer.result
+        metrics.add_rows_out(result.rows)
+        metrics.add_bytes_written(result.bytes_written)
+        metrics.tags['mb_per_s'] = round(result.mb_per_s, 2)
+    record_file_written(path)
+
+    if catalog:
+        record_dataset(path, writer.first_frame, source=source, query=query, rows=result.rows,
+                       checksum=result.checksum)
+    return result
@@ -0,0 +1,517 @@
+"""
+Генератор синтетических данных для tbl_crm_status_hist, business_units,
+financial_models и истории ответственных экспертов CRM
+
+Данные генерируются векторно (numpy) блоками помещений и записываются потоком
+в CSV, Parquet или SQLite, поэтому объем памяти определяется размером блока,
+а не общим числом строк. Колонки совпадают со списками в sql/*.sql.template.
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+logger = logging.getLogger(__name__)
+
+FACT_MODEL_ID = 666
+
+# Колонки в порядке sql/extract_history.sql.template
+HISTORY_COLUMNS = [
+    'model_id', 'unit_id', 'lease_id', 'status_sequence', 'status_start_date',
+    'status_end_date', 'crm_status', 'trc_abbreviation', 'legal_entity'
+]
+
+# Колонки в порядке sql/extract_tenants.sql.template
+BUSINESS_UNITS_COLUMNS = [
+    'model_id', 'lease_id', 'unit_id', 'total_area', 'legal_entity', 'model_location_unit',
+    'location_unit', 'billing_start', 'operations_start', 'billing_end', 'unit_created',
+    'unit_closed', 'fiscal_year', 'forecast_begin', 'forecast_end', 'brand_name',
+    'client_category', 'business_profile', 'creation_reason', 'contract_date',
+    'renovation_days', 'agreement_end'
+]
+
+# Колонки в порядке sql/extract_models.sql.template
+FINANCIAL_MODELS_COLUMNS = ['model_id', 'model_type', 'forecast_year']
+
+# Поля $select запроса экспертов в src/api/api-crm.py
+EXPERT_COLUMNS = [
+    'TrcUnitNumber', 'TrcShoppingMall', 'TrcIsChief', 'TrcContactFullName',
+    'TrcRespStartDate', 'TrcRespEndDate', 'ModifiedOn', 'TrcBooleanActive'
+]
+
+# Строковые справочники хранятся как object-массивы: выборка по индексу не требует
+# преобразования numpy-строк при создании DataFrame
+VACANT_STATUS = 'Свободен'
+STATUSES = np.array([VACANT_STATUS, 'Бронь', 'Договор подписан', 'Арендован'], dtype=object)
+CLIENT_CATEGORIES = np.array(['Якорный', 'Крупный', 'Средний', 'Малый', 'Киоск'], dtype=object)
+BUSINESS_PROFILES = np.array(['Продукты', 'Фудкорт', 'Одежда', 'Электроника', 'Услуги', 'Развлечения'],
+                             dtype=object)
+CREATION_REASONS = np.array(['Новое', 'Техническое', 'Ребрендинг'], dtype=object)
+BRAND_NAMES = np.array([f'Бренд {i}' for i in range(1, 2001)], dtype=object)
+EXPERT_NAMES = np.array([f'Эксперт {i}' for i in range(1, 501)], dtype=object)
+
+BASE_DATE = np.datetime64('2018-01-01')
+
+# Помещений в блоке случайных значений: генератор блока - default_rng([seed, номер блока])
+RNG_BLOCK_UNITS = 4096
+
+
+def _dates_to_str(dates: np.ndarray) -> np.ndarray:
+    """
+    datetime64[D] -> 'YYYY-MM-DD' (NaT -> None)
+
+    Строки формируются один раз для диапазона дат и выбираются по индексу дня.
+    """
+    missing = np.isnat(dates)
+    if missing.all():
+        return np.full(len(dates), None, dtype=object)
+
+    days = dates.astype('int64')
+    first_day, last_day = days[~missing].min(), days[~missing].max()
+    lookup = np.arange(first_day, last_day + 1).astype('datetime64[D]').astype(str).astype(object)
+
+    result = lookup[np.where(missing, first_day, days) - first_day]
+    result[missing] = None
+    return result
+
+
+class SyntheticDataGenerator:
+    """
+    Генератор цепочек статусов, договоров арендаторов, моделей и экспертов
+
+    Цепочка фактической модели (666) генерируется для каждого помещения, прогнозные
+    модели повторяют ее до случайной точки расхождения, после которой статусы
+    генерируются заново. Непрерывный участок с lease_id != 0 - один договор,
+    периоды вакантности имеют lease_id = 0. ТРЦ нумеруются с first_legal_entity,
+    договоры - с lease_offset + 1 (разные значения - непересекающиеся помещения
+    и договоры разных источников).
+    """
+
+    def __init__(self, units: int = 1000, models: int = 4, statuses_per_unit: int = 8,
+                 legal_entities: int = 5, experts_per_unit: int = 3,
+                 occupancy: float = 0.65, seed: int = 42, first_legal_entity: int = 1,
+                 lease_offset: int = 0):
+        self.units = units
+        self.models = models
+        self.statuses_per_unit = statuses_per_unit
+        self.legal_entities = legal_entities
+        self.first_legal_entity = first_legal_entity
+        self.lease_offset = lease_offset
+        self.experts_per_unit = experts_per_unit
+        self.occupancy = occupancy
+        self.seed = seed
+
+        self.model_ids = np.array([FACT_MODEL_ID] + [1000 + i for i in range(1, models)])
+        self.forecast_years = np.array([0] + [2024 + (i - 1) % 3 for i in range(1, models)])
+
+    @classmethod
+    def for_history_rows(cls, rows: int, models: int = 4, statuses_per_unit: int = 8,
+                         **kwargs) -> 'SyntheticDataGenerator':
+        """Генератор, дающий примерно rows строк tbl_crm_status_hist"""
+        units = max(1, -(-rows // (models * statuses_per_unit)))
+        return cls(units=units, models=models, statuses_per_unit=statuses_per_unit, **kwargs)
+
+    @property
+    def history_rows(self) -> int:
+        return self.units * self.models * self.statuses_per_unit
+
+    def legal_entity_names(self) -> pd.DataFrame:
+        """Названия ТРЦ в БД и в CRM (аналог data/processed/mapping_trc.csv)"""
+        numbers = np.arange(self.first_legal_entity, self.first_legal_entity + self.legal_entities).astype(str)
+        return pd.DataFrame({
+            'legal_entity': np.char.add('ООО ТРЦ ', numbers),
+            'trc_abbreviation': np.char.add('ТРЦ', numbers),
+            'crm': np.char.add('ТЦ ', numbers),
+        })
+
+    def financial_models(self) -> pd.DataFrame:
+        """
+        Справочник financial_models (без фактической модели 666 -
+        ее добавляет HistoryProcessor.add_fact_to_reference)
+        """
+        model_types = np.where(np.arange(1, self.models) % 2 == 1, 'Прогноз', 'Бюджет')
+        return pd.DataFrame({
+            'model_id': self.model_ids[1:],
+            'model_type': model_types,
+            'forecast_year': self.forecast_years[1:],
+        })[FINANCIAL_MODELS_COLUMNS]
+
+    def iter_chunks(self, chunk_units: int = None) -> Iterator[Dict[str, pd.DataFrame]]:
+        """
+        Генерирует данные блоками помещений
+
+        Случайные значения генерируются блоками по RNG_BLOCK_UNITS помещений, чанк -
+        срез этих блоков по помещениям, поэтому данные при том же seed не зависят
+        от chunk_units. Строки чанка упорядочены по помещению.
+
+        Args:
+            chunk_units: Помещений в блоке (по умолчанию ~1 млн строк истории на блок)
+
+        Yields:
+            dict: {'tbl_crm_status_hist': ..., 'business_units': ..., 'expert': ...}
+        """
+        if chunk_units is None:
+            chunk_units = max(1, 1_000_000 // (self.models * self.statuses_per_unit))
+
+        cached = {}
+        for first_unit in range(0, self.units, chunk_units):
+            last_unit = min(first_unit + chunk_units, self.units)
+            parts = {}
+            for block_index in range(first_unit // RNG_BLOCK_UNITS, (last_unit - 1) // RNG_BLOCK_UNITS + 1):
+                # Блок на границе чанков используется и следующим чанком
+                if block_index not in cached:
+                    cached = {block_index: self._random_block(block_index)}
+                for table, (df, row_units) in cached[block_index].items():
+                    start, stop = np.searchsorted(row_units, [first_unit, last_unit])
+                    parts.setdefault(table, []).append(df.iloc[start:stop])
+            yield {table: pd.concat(frames, ignore_index=True) for table, frames in parts.items()}
+
+    def _random_block(self, block_index: int) -> Dict[str, tuple]:
+        """
+        Таблицы блока помещений block_index
+
+        Returns:
+            dict: {таблица: (DataFrame, индекс помещения каждой строки по возрастанию)}
+        """
+        first_unit = block_index * RNG_BLOCK_UNITS
+        units = np.arange(first_unit, min(first_unit + RNG_BLOCK_UNITS, self.units))
+        rng = np.random.default_rng([self.seed, block_index])
+
+        history, runs = self._history_block(rng, units)
+        return {
+            'tbl_crm_status_hist': (history, np.repeat(units, self.models * self.statuses_per_unit)),
+            'business_units': (self._business_units_block(rng, units, runs), runs['unit_index'].to_numpy()),
+            'expert': (self._expert_block(rng, units), np.repeat(units, self.experts_per_unit)),
+        }
+
+    def _unit_attributes(self, units: np.ndarray) -> Dict[str, np.ndarray]:
+        """Номер помещения и ТРЦ по глобальному индексу помещения"""
+        entity_numbers = (units % self.legal_entities + self.first_legal_entity).astype(str)
+        local_numbers = (units // self.legal_entities + 1).astype(str)
+        return {
+            'unit_id': np.char.add('P-', local_numbers).astype(object),
+            'legal_entity': np.char.add('ООО ТРЦ ', entity_numbers).astype(object),
+            'trc_abbreviation': np.char.add('ТРЦ', entity_numbers).astype(object),
+            'crm': np.char.add('ТЦ ', entity_numbers).astype(object),
+            'location_unit': np.char.add(np.char.add(np.char.add('ООО ТРЦ ', entity_numbers), '_'),
+                                         np.char.add('P-', local_numbers)).astype(object),
+        }
+
+    def _history_block(self, rng: np.random.Generator, units: np.ndarray):
+        """Цепочки статусов блока помещений для всех моделей"""
+        n, steps, models = len(units), self.statuses_per_unit, self.models
+        positions = np.arange(steps)[None, :]
+
+        base_flags = rng.random((n, steps)) < self.occupancy
+        base_durations = rng.integers(30, 400, (n, steps))
+        unit_offsets = rng.integers(0, 3 * 365, n)
+        unit_area = np.round(rng.lognormal(4.5, 0.8, n), 1)
+
+        history_parts, run_parts = [], []
+        for model_index in range(models):
+            if model_index == 0:
+                divergence = np.full(n, steps)
+                flags, durations = base_flags, base_durations
+            else:
+                divergence = rng.integers(steps // 2, steps + 1, n)
+                diverged = positions >= divergence[:, None]
+                flags = np.where(diverged, rng.random((n, steps)) < self.occupancy, base_flags)
+                durations = np.where(diverged, rng.integers(30, 400, (n, steps)), base_durations)
+
+            # Начало участка договора: переход 0 -> !=0 или точка расхождения модели
+            previous_flags = np.zeros_like(flags)
+            previous_flags[:, 1:] = flags[:, :-1]
+            run_start = flags & (~previous_flags | (positions == divergence[:, None]))
+            run_start_pos = np.maximum.accumulate(np.where(run_start, positions, -1), axis=1)
+
+            lease_ids = 1 + self.lease_offset + units[:, None] * steps + run_start_pos
+            lease_ids = lease_ids + np.where(run_start_pos >= divergence[:, None],
+                                             model_index * self.units * steps, 0)
+            lease_ids = np.where(flags, lease_ids, 0)
+
+            starts = BASE_DATE + (unit_offsets[:, None] + np.cumsum(durations, axis=1) - durations).astype('timedelta64[D]')
+            ends = np.full_like(starts, np.datetime64('NaT'))
+            ends[:, :-1] = starts[:, 1:] - np.timedelta64(1, 'D')
+
+            step_in_run = positions - run_start_pos
+            statuses = STATUSES[np.select([~flags, step_in_run == 0, step_in_run == 1], [0, 1, 2], 3)]
+
+            # Последняя строка участка договора (для даты окончания договора)
+            next_continues = np.zeros_like(flags)
+            next_continues[:, :-1] = flags[:, 1:] & ~run_start[:, 1:]
+            run_end = flags & ~next_continues
+
+            unit_rows = np.repeat(np.arange(n), steps)
+            history_parts.append(pd.DataFrame({
+                'model_id': self.model_ids[model_index],
+                'unit_index': units[unit_rows],
+                'lease_id': lease_ids.reshape(-1),
+                'status_sequence': np.tile(np.arange(1, steps + 1), n),
+                'status_start_date': starts.reshape(-1),
+                'status_end_date': ends.reshape(-1),
+                'crm_status': statuses.reshape(-1),
+            }))
+
+            run_starts = run_start.reshape(-1)
+            run_ends = run_end.reshape(-1)
+            run_parts.append(pd.DataFrame({
+                'model_index': model_index,
+                'unit_index': units[unit_rows[run_starts]],
+                'total_area': unit_area[unit_rows[run_starts]],
+                'unit_created': (BASE_DATE + unit_offsets.astype('timedelta64[D]'))[unit_rows[run_starts]],
+                'lease_id': lease_ids.reshape(-1)[run_starts],
+                'run_start': starts.reshape(-1)[run_starts],
+                'run_end': ends.reshape(-1)[run_ends],
+            }))
+
+        # Строки по помещению, внутри помещения - по модели и номеру статуса
+        order = np.arange(models * n * steps).reshape(models, n, steps).transpose(1, 0, 2).reshape(-1)
+        history = pd.concat(history_parts, ignore_index=True).take(order).reset_index(drop=True)
+        runs = pd.concat(run_parts, ignore_index=True)
+        runs = runs.take(np.argsort(runs['unit_index'].to_numpy(), kind='stable')).reset_index(drop=True)
+        # Атрибуты считаются для помещений блока и выбираются по индексу строки
+        attributes = self._unit_attributes(units)
+        block_rows = history['unit_index'].to_numpy() - units[0]
+        history['unit_id'] = attributes['unit_id'][block_rows]
+        history['trc_abbreviation'] = attributes['trc_abbreviation'][block_rows]
+        history['legal_entity'] = attributes['legal_entity'][block_rows]
+        history['status_start_date'] = _dates_to_str(history['status_start_date'].to_numpy('datetime64[D]'))
+        history['status_end_date'] = _dates_to_str(history['status_end_date'].to_numpy('datetime64[D]'))
+
+        return history[HISTORY_COLUMNS], runs
+
+    def _business_units_block(self, rng: np.random.Generator, units: np.ndarray,
+                              runs: pd.DataFrame) -> pd.DataFrame:
+        """Договоры арендаторов (по одной строке на модель и договор)"""
+        count = len(runs)
+        block_rows = runs['unit_index'].to_numpy() - units[0]
+        attributes = {key: values[block_rows] for key, values in self._unit_attributes(units).items()}
+        model_index = runs['model_index'].to_numpy()
+        model_ids = self.model_ids[model_index].astype(str)
+
+        run_start = runs['run_start'].to_numpy('datetime64[D]')
+        run_end = runs['run_end'].to_numpy('datetime64[D]')
+        open_ended = np.isnat(run_end)
+        run_end = np.where(open_ended, run_start + rng.integers(365, 5 * 365, count).astype('timedelta64[D]'), run_end)
+
+        renovation_days = rng.integers(0, 90, count)
+        billing_start = np.minimum(run_start + renovation_days.astype('timedelta64[D]'), run_end)
+        contract_date = run_start - rng.integers(10, 90, count).astype('timedelta64[D]')
+
+        forecast_years = self.forecast_years[model_index]
+        is_forecast = forecast_years > 0
+        forecast_begin = np.where(is_forecast, np.char.add(forecast_years.astype(str), '-01-01'), None)
+        forecast_end = np.where(is_forecast, np.char.add(forecast_years.astype(str), '-12-31'), None)
+
+        df = pd.DataFrame({
+            'model_id': self.model_ids[model_index],
+            'lease_id': runs['lease_id'].to_numpy(),
+            'unit_id': attributes['unit_id'],
+            'total_area': runs['total_area'].to_numpy(),
+            'legal_entity': attributes['legal_entity'],
+            'model_location_unit': model_ids.astype(object) + '_' + attributes['location_unit'],
+            'location_unit': attributes['location_unit'],
+            'billing_start': _dates_to_str(billing_start),
+            'operations_start': _dates_to_str(billing_start),
+            'billing_end': _dates_to_str(run_end),
+            'unit_created': _dates_to_str(runs['unit_created'].to_numpy('datetime64[D]')),
+            'unit_closed': None,
+            'fiscal_year': billing_start.astype('datetime64[Y]').astype(int) + 1970,
+            'forecast_begin': forecast_begin,
+            'forecast_end': forecast_end,
+            'brand_name': BRAND_NAMES[rng.integers(0, len(BRAND_NAMES), count)],
+            'client_category': CLIENT_CATEGORIES[rng.integers(0, len(CLIENT_CATEGORIES), count)],
+            'business_profile': BUSINESS_PROFILES[rng.integers(0, len(BUSINESS_PROFILES), count)],
+            'creation_reason': CREATION_REASONS[rng.integers(0, len(CREATION_REASONS), count)],
+            'contract_date': _dates_to_str(contract_date),
+            'renovation_days': renovation_days,
+            'agreement_end': _dates_to_str(run_end),
+        })
+        return df[BUSINESS_UNITS_COLUMNS]
+
+    def _expert_block(self, rng: np.random.Generator, units: np.ndarray) -> pd.DataFrame:
+        """
+        История ответственных экспертов в формате CRM
+
+        Периоды одного помещения могут пересекаться, последний период открыт
+        (TrcRespEndDate пуст) - как в реальной выгрузке.
+        """
+        n, per_unit = len(units), self.experts_per_unit
+        total = n * per_unit
+        unit_rows = np.repeat(np.arange(n), per_unit)
+        attributes = self._unit_attributes(units)
+
+        gaps = rng.integers(60, 720, (n, per_unit))
+        starts = BASE_DATE + np.cumsum(gaps, axis=1).astype('timedelta64[D]')
+        # Окончание периода: день перед следующим началом +/- случайный сдвиг (пересечения)
+        ends = np.full_like(starts, np.datetime64('NaT'))
+        shift = rng.integers(-30, 30, (n, per_unit - 1)).astype('timedelta64[D]')
+        ends[:, :-1] = starts[:, 1:] - np.timedelta64(1, 'D') + shift
+        modified = starts + rng.integers(0, 60, (n, per_unit)).astype('timedelta64[D]')
+
+        is_chief = rng.random(total) < 0.3
+        is_active = np.tile(np.arange(per_unit) == per_unit - 1, n)
+        seconds = rng.integers(0, 86400, total).astype('timedelta64[s]')
+        modified_on = np.char.add((modified.reshape(-1).astype('datetime64[s]') + seconds).astype(str), 'Z')
+
+        return pd.DataFrame({
+            'TrcUnitNumber': attributes['unit_id'][unit_rows],
+            'TrcShoppingMall': attributes['crm'][unit_rows],
+            'TrcIsChief': is_chief,
+            'TrcContactFullName': EXPERT_NAMES[rng.integers(0, len(EXPERT_NAMES), total)],
+            'TrcRespStartDate': _dates_to_str(starts.reshape(-1)),
+            'TrcRespEndDate': _dates_to_str(ends.reshape(-1)),
+            'ModifiedOn': modified_on,
+            'TrcBooleanActive': is_active,
+        })[EXPERT_COLUMNS]
+
+
+class CSVSink:
+    """Потоковая запись таблиц в CSV (по файлу на таблицу)"""
+
+    def __init__(self, output_dir: Union[str, Path], encoding: str = 'utf-8'):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.encoding = encoding
+        self.started = set()
+
+    def write(self, table: str, df: pd.DataFrame) -> int:
+        first = table not in self.started
+        df.to_csv(self.output_dir / f'{table}.csv', mode='w' if first else 'a',
+                  header=first, index=False, encoding=self.encoding)
+        self.started.add(table)
+        return len(df)
+
+    def close(self):
+        pass
+
+
+class ParquetSink:
+    """Потоковая запись таблиц в Parquet (требуется pyarrow)"""
+
+    def __init__(self, output_dir: Union[str, Path]):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Для записи в Parquet необходим пакет pyarrow")
+
+        self.pa, self.pq = pa, pq
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.writers = {}
+
+    def write(self, table: str, df: pd.DataFrame) -> int:
+        writer = self.writers.get(table)
+        if writer is None:
+            arrow_table = self.pa.Table.from_pandas(df, preserve_index=False)
+            # Колонки, пустые в первом чанке, записываем как строки
+            schema = self.pa.schema([
+                field.with_type(self.pa.string()) if self.pa.types.is_null(field.type) else field
+                for field in arrow_table.schema
+            ])
+            writer = self.pq.ParquetWriter(self.output_dir / f'{table}.parquet', schema)
+            self.writers[table] = writer
+        writer.write_table(self.pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False))
+        return len(df)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+class SQLiteSink:
+    """Потоковая загрузка в mock-хранилище SQLite (таблицы из mock_warehouse.TABLES)"""
+
+    def __init__(self, db_path: Union[str, Path]):
+        from src.database.mock_warehouse import TABLES, MockWarehouseBuilder
+
+        self.tables = TABLES
+        self.builder = MockWarehouseBuilder(db_path)
+        self.builder.open()
+        self.builder.create_schema()
+
+    def write(self, table: str, df: pd.DataFrame) -> Optional[int]:
+        if table not in self.tables:
+            logger.info(f"Таблица {table} отсутствует в схеме SQLite, пропускаем")
+            return None
+        return self.builder.load_table(table, df)
+
+    def close(self):
+        self.builder.finalize()
+        self.builder.close()
+
+
+SINKS = {
+    'csv': CSVSink,
+    'parquet': ParquetSink,
+    'sqlite': SQLiteSink,
+}
+
+
+def write_dataset(generator: SyntheticDataGenerator, output_format: str,
+                  target: Union[str, Path], chunk_units: int = None) -> Dict[str, int]:
+    """
+    Генерирует данные и потоком записывает их в выбранный формат
+
+    Args:
+        generator: Настроенный SyntheticDataGenerator
+        output_format: 'csv', 'parquet' или 'sqlite'
+        target: Папка (csv/parquet) или файл базы (sqlite)
+        chunk_units: Помещений в блоке генерации
+
+    Returns:
+        dict: Количество записанных строк по таблицам (пропущенные приемником таблицы не входят)
+    """
+    sink = SINKS[output_format](target)
+    row_counts = {}
+
+    def write(table: str, df: pd.DataFrame):
+        # write возвращает None, если приемник не хранит таблицу (expert в SQLite)
+        written = sink.write(table, df)
+        if written is not None:
+            row_counts[table] = row_counts.get(table, 0) + written
+
+    try:
+        write('financial_models', generator.financial_models())
+        write('mapping_trc', generator.legal_entity_names())
+
+        for chunk in generator.iter_chunks(chunk_units):
+            for table, df in chunk.items():
+                write(table, df)
+    finally:
+        sink.close()
+
+    return row_counts
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Генерация синтетических данных')
+    parser.add_argument('--rows', type=int, default=100000, help='Строк tbl_crm_status_hist')
+    parser.add_argument('--models', type=int, default=4)
+    parser.add_argument('--statuses', type=int, default=8, help='Статусов в цепочке помещения')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', choices=sorted(SINKS), default='csv')
+    parser.add_argument('--output', default=str(project_root / 'data' / 'synthetic'))
+    args = parser.parse_args(argv)
+
+    generator = SyntheticDataGenerator.for_history_rows(
+        args.rows, models=args.models, statuses_per_unit=args.statuses, seed=args.seed
+    )
+    row_counts = write_dataset(generator, args.format, args.output)
+
+    for table, count in row_counts.items():
+        print(f"  - {table}: {count} строк")
+    print(f"Данные сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
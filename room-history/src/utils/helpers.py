@@ -0,0 +1,318 @@
+#helpers.py
+"""
+Инструментирование стадий пайплайна: время, CPU, память, строки и байты
+
+Каждая стадия (или запрос) оборачивается в track() / @instrument и по завершении
+порождает запись метрик. Записи пишутся в лог 'pipeline.metrics' строками JSON,
+при заданном файле - дополнительно в JSON Lines (logs/metrics.jsonl), и сводятся
+в итоговую таблицу по стадиям через MetricsRecorder.summary().
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger('pipeline.metrics')
+
+# Файл JSON Lines можно задать переменной окружения
+METRICS_FILE_ENV = 'PIPELINE_METRICS_FILE'
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Пиковый RSS процесса в байтах (None если недоступно на платформе)"""
+    try:
+        import resource
+        import sys
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux отдает килобайты, macOS - байты
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+
+    try:
+        import psutil
+
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss)
+    except ImportError:
+        return None
+
+
+class StageMetrics:
+    """Метрики одной стадии или запроса"""
+
+    def __init__(self, stage: str, kind: str = 'stage', parent: str = None, **tags):
+        self.stage = stage
+        self.kind = kind
+        self.parent = parent
+        self.tags = tags
+        self.rows_in = 0
+        self.rows_out = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_rss_delta = None
+        self.status = 'ok'
+        self.started_at = datetime.now().isoformat(timespec='milliseconds')
+
+    def add_rows_in(self, rows: int):
+        self.rows_in += int(rows)
+
+    def add_rows_out(self, rows: int):
+        self.rows_out += int(rows)
+
+    def add_bytes_read(self, size: int):
+        self.bytes_read += int(size)
+
+    def add_bytes_written(self, size: int):
+        self.bytes_written += int(size)
+
+    def to_dict(self) -> dict:
+        record = {
+            'stage': self.stage,
+            'kind': self.kind,
+            'parent': self.parent,
+            'status': self.status,
+            'started_at': self.started_at,
+            'wall_s': round(self.wall_s, 4),
+            'cpu_s': round(self.cpu_s, 4),
+            'peak_rss_delta': self.peak_rss_delta,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+        }
+        if self.tags:
+            record['tags'] = self.tags
+        return record
+
+
+class MetricsRecorder:
+    """Накопитель метрик запуска с выводом в JSON Lines"""
+
+    def __init__(self, metrics_file: Union[str, Path] = None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.metrics_file = Path(metrics_file) if metrics_file else None
+        self.records: List[dict] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def current(self) -> Optional[StageMetrics]:
+        """Метрики текущей (самой вложенной) стадии в этом потоке"""
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+
+    def _push(self, metrics: StageMetrics):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        self._local.stack.append(metrics)
+
+    def _pop(self):
+        self._local.stack.pop()
+
+    def emit(self, metrics: StageMetrics):
+        """Сохраняет запись метрик и пишет ее в лог и файл"""
+        record = {'run_id': self.run_id, **metrics.to_dict()}
+        line = json.dumps(record, ensure_ascii=False, default=str)
+
+        with self._lock:
+            self.records.append(record)
+            if self.metrics_file:
+                self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.metrics_file, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+
+        logger.info(line)
+
+    def summary(self, kind: str = None) -> List[dict]:
+        """
+        Сводка по стадиям: количество вызовов, суммарное время, строки и байты
+
+        Returns:
+            list: Строки сводки, отсортированные по убыванию времени
+        """
+        totals: Dict[str, dict] = {}
+        with self._lock:
+            records = list(self.records)
+
+        for record in records:
+            if kind and record['kind'] != kind:
+                continue
+            item = totals.setdefault(record['stage'], {
+                'stage': record['stage'], 'kind': record['kind'], 'calls': 0, 'errors': 0,
+                'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_delta': 0,
+                'rows_in': 0, 'rows_out': 0, 'bytes_read': 0, 'bytes_written': 0,
+            })
+            item['calls'] += 1
+            item['errors'] += record['status'] != 'ok'
+            for key in ('wall_s', 'cpu_s', 'rows_in', 'rows_out', 'bytes_read', 'bytes_written'):
+                item[key] += record[key]
+            item['peak_rss_delta'] = max(item['peak_rss_delta'], record['peak_rss_delta'] or 0)
+
+        return sorted(totals.values(), key=lambda item: item['wall_s'], reverse=True)
+
+    def format_summary(self) -> str:
+        """Текстовая таблица сводки для вывода в конце запуска"""
+        lines = [
+            f"Метрики запуска {self.run_id}:",
+            f"  {'стадия':<40} {'вызовов':>7} {'wall, с':>9} {'cpu, с':>9} {'RSS+, МБ':>9} "
+            f"{'строк in':>10} {'строк out':>10} {'чтение, МБ':>11} {'запись, МБ':>11}",
+        ]
+        for item in self.summary():
+            lines.append(
+                f"  {item['stage']:<40} {item['calls']:>7} {item['wall_s']:>9.3f} {item['cpu_s']:>9.3f} "
+                f"{item['peak_rss_delta'] / 2 ** 20:>9.1f} {item['rows_in']:>10} {item['rows_out']:>10} "
+                f"{item['bytes_read'] / 2 ** 20:>11.2f} {item['bytes_written'] / 2 ** 20:>11.2f}"
+            )
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+        self.run_id = uuid.uuid4().hex[:12]
+
+
+_recorder = MetricsRecorder(os.getenv(METRICS_FILE_ENV))
+
+
+def get_recorder() -> MetricsRecorder:
+    """Глобальный накопитель метрик"""
+    return _recorder
+
+
+def configure_metrics(metrics_file: Union[str, Path, None]) -> MetricsRecorder:
+    """
+    Задает файл JSON Lines для метрик (если он не задан переменной окружения)
+
+    Включает профилирование стадий, если оно запрошено переменной PIPELINE_PROFILE
+    (см. src/utils/profiling.py); профили пишутся в каталог profiles рядом с метриками.
+    """
+    if _recorder.metrics_file is None and metrics_file is not None:
+        _recorder.metrics_file = Path(metrics_file)
+
+    from src.utils.profiling import configure_profiling
+
+    configure_profiling(output_dir=_recorder.metrics_file.parent / 'profiles' if _recorder.metrics_file else None)
+    return _recorder
+
+
+# Наблюдатели стадий (профилировщик): stage_started(metrics) / stage_finished(metrics)
+_stage_hooks: list = []
+
+
+def add_stage_hook(hook):
+    if hook not in _stage_hooks:
+        _stage_hooks.append(hook)
+
+
+def remove_stage_hook(hook):
+    if hook in _stage_hooks:
+        _stage_hooks.remove(hook)
+
+
+@contextmanager
+def track(stage: str, kind: str = 'stage', **tags):
+    """
+    Замер стадии или запроса
+
+    Пример:
+        with track('extract.history') as metrics:
+            df = ...
+            metrics.add_rows_out(len(df))
+    """
+    recorder = get_recorder()
+    parent = recorder.current
+    metrics = StageMetrics(stage, kind=kind, parent=parent.stage if parent else None, **tags)
+
+    rss_before = peak_rss_bytes()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    recorder._push(metrics)
+    for hook in _stage_hooks:
+        hook.stage_started(metrics)
+    try:
+        yield metrics
+    except BaseException:
+        metrics.status = 'error'
+        raise
+    finally:
+        for hook in reversed(_stage_hooks):
+            hook.stage_finished(metrics)
+        recorder._pop()
+        metrics.wall_s = time.perf_counter() - wall_start
+        metrics.cpu_s = time.process_time() - cpu_start
+        rss_after = peak_rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            metrics.peak_rss_delta = rss_after - rss_before
+        recorder.emit(metrics)
+
+
+def query_label(query: str, max_length: int = 120) -> str:
+    """Короткая однострочная подпись SQL-запроса для метрик"""
+    label = ' '.join(query.split())
+    return label if len(label) <= max_length else label[:max_length - 3] + '...'
+
+
+def _frame_rows(value) -> Optional[int]:
+    """Количество строк, если значение - DataFrame"""
+    import pandas as pd
+
+    return len(value) if isinstance(value, pd.DataFrame) else None
+
+
+def instrument(stage: str = None, kind: str = 'stage'):
+    """
+    Декоратор замера функции
+
+    rows_in - сумма строк аргументов-DataFrame, rows_out - строки результата-DataFrame.
+    """
+    def decorator(func):
+        name = stage or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track(name, kind=kind) as metrics:
+                for value in list(args) + list(kwargs.values()):
+                    rows = _frame_rows(value)
+                    if rows is not None:
+                        metrics.add_rows_in(rows)
+
+                result = func(*args, **kwargs)
+
+                rows = _frame_rows(result)
+                if rows is not None:
+                    metrics.add_rows_out(rows)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def current_metrics() -> Optional[StageMetrics]:
+    """Метрики текущей стадии (None вне track/instrument)"""
+    return _recorder.current
+
+
+def record_file_read(path: Union[str, Path]):
+    """Добавляет размер прочитанного файла к метрикам текущей стадии"""
+    metrics = current_metrics()
+    if metrics is not None and Path(path).exists():
+        metrics.add_bytes_read(Path(path).stat().st_size)
+
+
+def record_file_written(path: Union[str, Path]):
+    """Добавляет размер записанного файла к метрикам текущей стадии"""
+    metrics = current_metrics()
+    if metrics is not None and Path(path).exists():
+        metrics.add_bytes_written(Path(path).stat().st_size)
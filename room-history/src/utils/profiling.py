@@ -0,0 +1,307 @@
+"""
+Профилирование стадий пайплайна (включается явно)
+
+Режимы (переменная PIPELINE_PROFILE или флаг CLI --profile-stages):
+    sample        - фоновый поток раз в PIPELINE_PROFILE_INTERVAL_MS снимает стеки потоков,
+                    выполняющих стадии track()/@instrument. Стек засчитывается каждой
+                    объемлющей стадии потока. По стадиям пишутся <стадия>.collapsed (формат
+                    flamegraph.pl / inferno) и <стадия>.speedscope.json (https://speedscope.app).
+                    Накладные расходы - доли процента, режим можно оставлять в проде.
+    deterministic - cProfile на каждую стадию (вложенные стадии входят в родительскую),
+                    <стадия>.prof (pstats/snakeviz) и <стадия>.top.txt с PIPELINE_PROFILE_TOP
+                    самыми затратными функциями. Замедляет выполнение в разы.
+
+PIPELINE_PROFILE_RATE - доля запусков, которые профилируются (например, 0.05).
+Профили пишутся при завершении процесса в <каталог>/<run_id>/.
+"""
+
+import atexit
+import json
+import os
+import random
+import re
+import sys
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
+
+from src.utils.helpers import add_stage_hook, get_recorder, remove_stage_hook
+
+if TYPE_CHECKING:
+    import pstats
+
+PROFILE_ENV = 'PIPELINE_PROFILE'
+PROFILE_RATE_ENV = 'PIPELINE_PROFILE_RATE'
+PROFILE_INTERVAL_ENV = 'PIPELINE_PROFILE_INTERVAL_MS'
+PROFILE_TOP_ENV = 'PIPELINE_PROFILE_TOP'
+PROFILE_MODES = ('sample', 'deterministic')
+
+DEFAULT_PROFILE_DIR = Path(__file__).parent.parent.parent / 'logs' / 'profiles'
+MAX_STACK_DEPTH = 256
+
+_active = None
+_decided = False  # Решение о профилировании (с учетом rate) принимается один раз за процесс
+_configure_lock = threading.Lock()
+
+
+def _file_name(stage: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', stage)
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик стадий
+
+    Args:
+        interval: Период снятия стеков в секундах
+    """
+
+    mode = 'sample'
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: Dict[str, Counter] = defaultdict(Counter)
+        self._stages: Dict[int, List[str]] = {}
+        self._labels: Dict[object, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def stage_started(self, metrics):
+        with self._lock:
+            self._stages.setdefault(threading.get_ident(), []).append(metrics.stage)
+
+    def stage_finished(self, metrics):
+        with self._lock:
+            stages = self._stages.get(threading.get_ident())
+            if stages:
+                stages.pop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stage-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _collapse(self, frame) -> str:
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+    def sample(self):
+        """Один снимок стеков потоков, выполняющих стадии"""
+        with self._lock:
+            active = {thread_id: list(stages) for thread_id, stages in self._stages.items() if stages}
+        if not active:
+            return
+        frames = sys._current_frames()
+        for thread_id, stages in active.items():
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            stack = self._collapse(frame)
+            for stage in set(stages):
+                self.samples[stage][stack] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def write(self, output_dir: Path) -> List[Path]:
+        """Пишет <стадия>.collapsed и <стадия>.speedscope.json"""
+        output_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for stage, stacks in sorted(self.samples.items()):
+            collapsed = output_dir / f'{_file_name(stage)}.collapsed'
+            collapsed.write_text(''.join(f'{stack} {count}\n' for stack, count in stacks.most_common()),
+                                 encoding='utf-8')
+            speedscope = output_dir / f'{_file_name(stage)}.speedscope.json'
+            speedscope.write_text(json.dumps(self.speedscope(stage, stacks), ensure_ascii=False), encoding='utf-8')
+            paths += [collapsed, speedscope]
+        return paths
+
+    def speedscope(self, stage: str, stacks: Counter) -> dict:
+        """Профиль стадии в формате speedscope (sampled, веса - миллисекунды)"""
+        frames, index, samples, weights = [], {}, [], []
+        for stack, count in stacks.most_common():
+            ids = []
+            for label in stack.split(';'):
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({'name': label})
+                ids.append(index[label])
+            samples.append(ids)
+            weights.append(round(count * self.interval * 1000, 3))
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'exporter': 'room-history',
+            'name': stage,
+            'activeProfileIndex': 0,
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': stage,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': round(sum(weights), 3),
+                'samples': samples,
+                'weights': weights,
+            }],
+        }
+
+
+class DeterministicProfiler:
+    """
+    cProfile по стадиям
+
+    В потоке активен один cProfile: при входе во вложенную стадию профиль родителя
+    приостанавливается, при выходе статистика вложенной стадии добавляется к родителю.
+
+    Args:
+        top: Число функций в <стадия>.top.txt
+    """
+
+    mode = 'deterministic'
+
+    def __init__(self, top: int = 30):
+        self.top = top
+        self.stats: Dict[str, 'pstats.Stats'] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def stage_started(self, metrics):
+        import cProfile
+
+        stack = self._stack()
+        if stack and stack[-1]['profile'] is not None:
+            stack[-1]['profile'].disable()
+        profile = cProfile.Profile()
+        stack.append({'stage': metrics.stage, 'profile': profile, 'children': []})
+        try:
+            profile.enable()
+        except ValueError:
+            # В потоке уже работает другой профилировщик - стадия не профилируется
+            stack[-1]['profile'] = None
+
+    def stage_finished(self, metrics):
+        import pstats
+
+        stack = self._stack()
+        if not stack:
+            return
+        item = stack.pop()
+        # Stats.add копирует записи, поэтому статистика стадии не разделяется с родителем
+        stats = pstats.Stats()
+        if item['profile'] is not None:
+            item['profile'].disable()
+            item['profile'].create_stats()
+            if item['profile'].stats:
+                stats.add(pstats.Stats(item['profile']))
+        for child in item['children']:
+            stats.add(child)
+
+        if stats.stats:
+            with self._lock:
+                self.stats.setdefault(item['stage'], pstats.Stats()).add(stats)
+        if stack:
+            if stats.stats:
+                stack[-1]['children'].append(stats)
+            if stack[-1]['profile'] is not None:
+                stack[-1]['profile'].enable()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def write(self, output_dir: Path) -> List[Path]:
+        """Пишет <стадия>.prof и <стадия>.top.txt (функции по собственному времени)"""
+        import io
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for stage, stats in sorted(self.stats.items()):
+            prof = output_dir / f'{_file_name(stage)}.prof'
+            stats.dump_stats(prof)
+            report = io.StringIO()
+            stats.stream = report
+            stats.sort_stats('tottime').print_stats(self.top)
+            top = output_dir / f'{_file_name(stage)}.top.txt'
+            top.write_text(report.getvalue(), encoding='utf-8')
+            paths += [prof, top]
+        return paths
+
+
+def configure_profiling(mode: str = None, rate: float = None, output_dir: Union[str, Path] = None,
+                        interval_ms: float = None, top: int = None):
+    """
+    Включает профилирование стадий для текущего процесса (один раз)
+
+    Параметры по умолчанию берутся из переменных окружения PIPELINE_PROFILE*.
+    Запуск профилируется с вероятностью rate. Возвращает активный профилировщик или None.
+    """
+    global _active, _decided
+
+    mode = mode or os.getenv(PROFILE_ENV, '').strip().lower()
+    if not mode or mode in ('0', 'off', 'none'):
+        return _active
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Неизвестный режим профилирования: {mode}. Допустимые: {PROFILE_MODES}")
+
+    with _configure_lock:
+        if _decided:
+            return _active
+        _decided = True
+
+        rate = float(os.getenv(PROFILE_RATE_ENV, 1.0)) if rate is None else rate
+        if random.random() >= rate:
+            return None
+
+        if mode == 'sample':
+            interval_ms = interval_ms or float(os.getenv(PROFILE_INTERVAL_ENV, 10))
+            profiler = SamplingProfiler(interval=interval_ms / 1000)
+        else:
+            profiler = DeterministicProfiler(top=top or int(os.getenv(PROFILE_TOP_ENV, 30)))
+
+        profiler.output_dir = Path(output_dir) if output_dir else DEFAULT_PROFILE_DIR
+        add_stage_hook(profiler)
+        profiler.start()
+        atexit.register(finish_profiling)
+        _active = profiler
+        print(f"Профилирование стадий ({mode}) включено, профили: {profiler.output_dir}")
+        return profiler
+
+
+def finish_profiling() -> Optional[Path]:
+    """Останавливает профилировщик и пишет профили в <каталог>/<run_id>/"""
+    global _active
+
+    with _configure_lock:
+        profiler, _active = _active, None
+    if profiler is None:
+        return None
+    remove_stage_hook(profiler)
+    profiler.stop()
+    output_dir = profiler.output_dir / get_recorder().run_id
+    paths = profiler.write(output_dir)
+    print(f"Профили стадий ({profiler.mode}): {len(paths)} файлов в {output_dir}")
+    return output_dir
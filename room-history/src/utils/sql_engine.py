@@ -0,0 +1,213 @@
+"""
+Встроенный SQL-движок над наборами data/processed и data/output/mart
+
+Каждый CSV каталогов регистрируется таблицей с именем файла без расширения
+(processed_history, dim_room, ...). Запрос возвращает DataFrame.
+
+Движки (SQL_ENGINE):
+    duckdb - наборы регистрируются представлениями над read_csv: файлы читаются при
+             запросе, читатель CSV разбирает только нужные колонки, фильтры и агрегации
+             выполняются векторно в SQL_ENGINE_THREADS потоков. Типы колонок берутся из
+             схемы каталога (catalog.json), поэтому совпадают с типами pandas и не
+             определяются заново по выборке строк. Нужен пакет duckdb.
+    sqlite - запасной вариант на стандартной библиотеке: таблицы запроса загружаются в
+             SQLite в памяти при первом обращении, только колонки, упомянутые в запросе.
+    auto   - duckdb, если пакет установлен, иначе sqlite.
+"""
+
+import re
+import threading
+from pathlib import Path
+import sys
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.settings import SQL_ENGINE_CONFIG
+from src.database.query_cache import referenced_tables
+from src.utils.catalog import DatasetCatalog
+from src.utils.helpers import query_label, record_file_read, track
+
+ENGINES = ('auto', 'duckdb', 'sqlite')
+
+DEFAULT_DIRECTORIES = {
+    'processed': project_root / 'data' / 'processed',
+    'mart': project_root / 'data' / 'output' / 'mart',
+}
+
+# dtype pandas из каталога -> тип DuckDB
+_DUCKDB_TYPES = {
+    'int64': 'BIGINT', 'Int64': 'BIGINT', 'int32': 'INTEGER', 'Int32': 'INTEGER',
+    'float64': 'DOUBLE', 'Float64': 'DOUBLE', 'float32': 'FLOAT',
+    'bool': 'BOOLEAN', 'boolean': 'BOOLEAN',
+}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def duckdb_type(dtype: str) -> str:
+    """Тип колонки DuckDB по dtype pandas (строки и прочие типы - VARCHAR)"""
+    if dtype.startswith('datetime64'):
+        return 'TIMESTAMP'
+    return _DUCKDB_TYPES.get(dtype, 'VARCHAR')
+
+
+def resolve_engine(engine: str = None) -> str:
+    """Движок из параметра или SQL_ENGINE_CONFIG; auto - duckdb при наличии пакета"""
+    engine = engine or SQL_ENGINE_CONFIG['engine']
+    if engine not in ENGINES:
+        raise ValueError(f"Неизвестный движок SQL: {engine}. Допустимые: {ENGINES}")
+    if engine != 'auto':
+        return engine
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return 'sqlite'
+    return 'duckdb'
+
+
+class DatasetTable:
+    """Набор данных, зарегистрированный таблицей"""
+
+    def __init__(self, name: str, path: Path, schema: Dict[str, str] = None):
+        self.name = name
+        self.path = path
+        self.schema = schema
+
+    def columns(self) -> List[str]:
+        if self.schema:
+            return list(self.schema)
+        return list(pd.read_csv(self.path, nrows=0).columns)
+
+
+class DatasetEngine:
+    """
+    SQL над наборами данных каталогов
+
+    Args:
+        directories: {расположение: каталог} (по умолчанию processed и mart)
+        engine: 'duckdb', 'sqlite' или 'auto' (по умолчанию SQL_ENGINE_CONFIG['engine'])
+        threads: Потоков выполнения DuckDB (по умолчанию SQL_ENGINE_CONFIG['threads'])
+    """
+
+    def __init__(self, directories: Dict[str, Union[str, Path]] = None, engine: str = None, threads: int = None):
+        self.directories = {location: Path(path) for location, path in (directories or DEFAULT_DIRECTORIES).items()}
+        self.engine = resolve_engine(engine)
+        self.threads = threads or SQL_ENGINE_CONFIG['threads']
+        self.tables = self.discover()
+        self._lock = threading.Lock()
+        self._loaded: Dict[str, set] = {}
+        self._connection = self._connect()
+
+    def __enter__(self) -> 'DatasetEngine':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def discover(self) -> Dict[str, DatasetTable]:
+        """Таблицы по CSV каталогов (при совпадении имен - из первого каталога)"""
+        tables = {}
+        for location, directory in self.directories.items():
+            if not directory.is_dir():
+                continue
+            entries = DatasetCatalog(directory).load()
+            for path in sorted(directory.glob('*.csv')):
+                if not path.stat().st_size:
+                    continue
+                name = path.stem
+                if name in tables:
+                    print(f"Предупреждение: таблица {name} из {location} скрыта набором {tables[name].path}")
+                    continue
+                entry, stat = entries.get(path.name), path.stat()
+                # Схема каталога актуальна, только если файл не менялся после записи
+                fresh = entry and entry.get('bytes') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns
+                tables[name] = DatasetTable(name, path, entry.get('schema') if fresh else None)
+        return tables
+
+    def _connect(self):
+        if self.engine == 'duckdb':
+            import duckdb
+
+            connection = duckdb.connect(':memory:', config={'threads': self.threads})
+            for table in self.tables.values():
+                connection.execute(f"CREATE VIEW {_quote(table.name)} AS SELECT * FROM {self._duckdb_reader(table)}")
+            return connection
+
+        import sqlite3
+
+        return sqlite3.connect(':memory:', check_same_thread=False)
+
+    @staticmethod
+    def _duckdb_reader(table: DatasetTable) -> str:
+        path = str(table.path).replace("'", "''")
+        if not table.schema:
+            return f"read_csv('{path}', header = true, auto_detect = true)"
+        columns = ', '.join(f"'{name.replace(chr(39), chr(39) * 2)}': '{duckdb_type(dtype)}'"
+                            for name, dtype in table.schema.items())
+        return f"read_csv('{path}', header = true, auto_detect = false, columns = {{{columns}}})"
+
+    def _required_columns(self, sql: str, table: DatasetTable) -> List[str]:
+        """Колонки таблицы, упомянутые в запросе (все - при SELECT *)"""
+        columns = table.columns()
+        # COUNT(*) не требует колонок, звездочка в списке выборки - все колонки
+        if re.search(r'(^|[\s,.])\*', re.sub(r'\(\s*\*\s*\)', '()', sql)):
+            return columns
+        tokens = {token.lower() for token in re.findall(r'\w+', sql)}
+        used = [column for column in columns if column.lower() in tokens]
+        return used or columns[:1]
+
+    def _load_sqlite(self, sql: str):
+        """Загружает в SQLite таблицы запроса (только нужные колонки)"""
+        for name in referenced_tables(sql):
+            table = self.tables.get(name.split('.')[-1])
+            if table is None:
+                continue
+            columns = self._required_columns(sql, table)
+            loaded = self._loaded.get(table.name)
+            if loaded is not None and set(columns) <= loaded:
+                continue
+            columns = sorted(set(columns) | (loaded or set()), key=table.columns().index)
+            # Текстовые колонки каталога читаются текстом, как в DuckDB (ведущие нули кодов)
+            text = {column: str for column in columns
+                    if table.schema and duckdb_type(table.schema[column]) == 'VARCHAR'}
+            df = pd.read_csv(table.path, usecols=columns, dtype=text)
+            record_file_read(table.path)
+            df.to_sql(table.name, self._connection, if_exists='replace', index=False)
+            self._loaded[table.name] = set(columns)
+
+    def query(self, sql: str, params: Union[tuple, list] = None) -> pd.DataFrame:
+        """Выполняет запрос и возвращает DataFrame"""
+        with self._lock, track('sql.query', kind='query', engine=self.engine, sql=query_label(sql)) as metrics:
+            if self.engine == 'duckdb':
+                df = self._connection.execute(sql, params or []).df()
+            else:
+                self._load_sqlite(sql)
+                df = pd.read_sql(sql, self._connection, params=params)
+            metrics.add_rows_out(len(df))
+            return df
+
+    def table_names(self) -> List[str]:
+        return sorted(self.tables)
+
+    def describe(self) -> pd.DataFrame:
+        """Зарегистрированные таблицы: имя, файл, число колонок"""
+        return pd.DataFrame([{'table': table.name, 'path': str(table.path), 'columns': len(table.columns())}
+                             for table in self.tables.values()])
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def query(sql: str, params: Union[tuple, list] = None, engine: str = None,
+          directories: Optional[Dict[str, Union[str, Path]]] = None) -> pd.DataFrame:
+    """Разовый запрос к наборам processed и mart"""
+    with DatasetEngine(directories, engine=engine) as sql_engine:
+        return sql_engine.query(sql, params)
@@ -0,0 +1,26 @@
+# tests/conftest.py
+"""
+Общие настройки тестов: тесты, которым нужно подключение к SQL Server,
+пропускаются без config/credentials.py
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Модули тестов, обращающиеся к настоящей базе через create_db_connector_from_config
+REQUIRES_CREDENTIALS = {'test_database_connection.py'}
+
+
+def pytest_collection_modifyitems(config, items):
+    if importlib.util.find_spec('config.credentials') is not None:
+        return
+    skip = pytest.mark.skip(reason="Нет config/credentials.py - подключение к БД не настроено")
+    for item in items:
+        if item.path.name in REQUIRES_CREDENTIALS:
+            item.add_marker(skip)
@@ -0,0 +1,193 @@
+# tests/test_api_scheduler.py
+"""
+Тесты планировщика запросов к API на локальном сервере с ограничением нагрузки
+"""
+
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import requests
+    from src.api.scheduler import AIMDWindow, RequestScheduler, TokenBucket, parse_retry_after
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    /items       - 429, если одновременно обрабатывается больше capacity запросов
+    /retry-after - первый запрос: 429 с Retry-After, дальше 200
+    /slow        - первый запрос отвечает дольше таймаута клиента
+    /throttled   - всегда 429
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, headers=None):
+        try:
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'{}')
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент закрыл соединение по таймауту (/slow) - ответ не нужен
+            self.close_connection = True
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        with server.lock:
+            server.hits[path] = server.hits.get(path, 0) + 1
+            hit = server.hits[path]
+            server.in_flight += 1
+            overloaded = server.in_flight > server.capacity
+        try:
+            if path == '/items':
+                time.sleep(0.02)
+                self._reply(429 if overloaded else 200)
+            elif path == '/retry-after':
+                server.times.append(time.monotonic())
+                self._reply(429, {'Retry-After': '0.2'}) if hit == 1 else self._reply(200)
+            elif path == '/slow':
+                time.sleep(0.5 if hit == 1 else 0)
+                self._reply(200)
+            else:
+                self._reply(429)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.lock = threading.Lock()
+    server.hits, server.times = {}, []
+    server.in_flight, server.capacity = 0, 3
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_token_bucket_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, burst=3, clock=clock, sleep=clock.sleep)
+    waits = [bucket.acquire() for _ in range(8)]
+    # Пачка проходит сразу, дальше - токен раз в 0.1 с
+    assert waits[:3] == [0, 0, 0]
+    assert clock.now == pytest.approx(0.5)
+
+    bucket.pause(2.0)
+    assert bucket.acquire() == pytest.approx(2.0)
+
+
+def test_aimd_window():
+    window = AIMDWindow(initial=2, minimum=1, maximum=4)
+    for _ in range(20):
+        window.on_success(0.01)
+    assert window.limit == 4
+    window.on_congestion()
+    assert window.limit == 2
+    # Всплеск задержки уменьшает окно так же, как 429
+    window._last_decrease = 0.0
+    window.on_success(1.0)
+    assert window.limit == 1
+
+
+def test_aimd_window_adapts_to_new_latency_level():
+    """Устойчивый рост задержки снижает окно один раз, затем окно снова растет"""
+    window = AIMDWindow(initial=2, minimum=1, maximum=8)
+    window.on_success(0.05)
+    for _ in range(40):
+        window.on_success(1.0)
+
+    assert window.limit > 4
+    assert window.baseline > 0.9
+    assert window.recent == pytest.approx(1.0)
+
+    # Всплеск относительно нового уровня по-прежнему уменьшает окно
+    window._last_decrease = 0.0
+    limit = window.limit
+    window.on_success(5.0)
+    assert window.limit == limit * window.decrease
+
+
+def test_parse_retry_after():
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after('0.5') == 0.5
+    assert parse_retry_after(format_datetime(now + timedelta(seconds=7), usegmt=True), now=now) == 7.0
+    assert parse_retry_after('завтра') is None
+    assert parse_retry_after(None) is None
+
+
+def test_adapts_to_server_capacity(stub):
+    server, base_url = stub
+    scheduler = RequestScheduler(rate=200, burst=20, max_concurrency=10, retry_attempts=8,
+                                 backoff_base=0.02, backoff_cap=0.2)
+    with requests.Session() as session:
+        responses = scheduler.map(session, [f'{base_url}/items?page={i}' for i in range(60)])
+
+    assert [r.status_code for r in responses] == [200] * 60
+    stats = scheduler.stats()[f'127.0.0.1:{server.server_address[1]}']
+    assert stats['throttled'] > 0 and stats['retries'] == stats['throttled']
+    assert stats['requests'] == 60 + stats['retries']
+    # Окно сократилось от максимума после ответов 429
+    assert stats['window'] < 10
+
+
+def test_honors_retry_after(stub):
+    server, base_url = stub
+    scheduler = RequestScheduler(rate=100, retry_attempts=2, backoff_base=0)
+    with requests.Session() as session:
+        response = scheduler.get(session, f'{base_url}/retry-after')
+    assert response.status_code == 200
+    assert server.times[1] - server.times[0] >= 0.2
+
+
+def test_retries_timeout(stub):
+    server, base_url = stub
+    scheduler = RequestScheduler(rate=100, retry_attempts=1, timeout=0.2, backoff_base=0)
+    with requests.Session() as session:
+        assert scheduler.get(session, f'{base_url}/slow').status_code == 200
+    stats = next(iter(scheduler.stats().values()))
+    assert (stats['errors'], stats['retries']) == (1, 1)
+
+    scheduler = RequestScheduler(rate=100, retry_attempts=0, timeout=0.2)
+    server.hits.clear()
+    with requests.Session() as session, pytest.raises(requests.Timeout):
+        scheduler.get(session, f'{base_url}/slow')
+
+
+def test_returns_last_response_when_retries_exhausted(stub):
+    server, base_url = stub
+    scheduler = RequestScheduler(rate=100, retry_attempts=2, backoff_base=0)
+    with requests.Session() as session:
+        assert scheduler.get(session, f'{base_url}/throttled').status_code == 429
+    assert server.hits['/throttled'] == 3
@@ -0,0 +1,44 @@
+# tests/test_benchmarks.py
+"""
+Дымовой тест бенчмарка пайплайна на минимальном масштабе
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+# Добавляем путь к проекту
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from benchmarks.bench_pipeline import compare_with_baseline, run_benchmarks
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+def test_benchmark_covers_all_stages(tmp_path):
+    report = run_benchmarks([300], trace_memory=False, workspace=tmp_path)
+    stages = report['results']['300']
+
+    expected = {
+        'extract.get_master_reference', 'extract.extract_history',
+        'extract.extract_tenants_with_placeholder', 'extract.enrich_models_reference',
+        'process.process_history', 'process.create_expert_history',
+        'process.add_foreign_key_to_tenants', 'mart.build',
+    }
+    assert expected <= set(stages)
+    assert stages['extract.extract_history']['rows'] == stages['process.process_history']['rows'] > 0
+    assert stages['process.create_expert_history']['rows'] > 0
+
+
+def test_compare_with_baseline_flags_slow_stages():
+    baseline = {'results': {'1000': {'a': {'wall_s': 1.0}, 'b': {'wall_s': 0.01}, 'c': {'wall_s': 1.0}}}}
+    report = {'results': {'1000': {'a': {'wall_s': 1.5}, 'b': {'wall_s': 0.03}, 'c': {'wall_s': 1.1}}}}
+
+    regressions = compare_with_baseline(report, baseline, tolerance=0.25)
+    assert [item['stage'] for item in regressions] == ['a']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,175 @@
+# tests/test_bulk_load.py
+"""
+Тесты пакетной загрузки на локальной SQLite
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Добавляем путь к проекту
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from src.database.db_connector import SQLServerConnector
+    from src.database.sqlite_connector import SQLiteConnector
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+@pytest.fixture
+def connector(tmp_path):
+    return SQLiteConnector(tmp_path / 'test.sqlite')
+
+
+def make_frame(start: int, count: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        'unit_id': range(start, start + count),
+        'lease_id': [float(i) if i % 3 else None for i in range(start, start + count)],
+        'crm_status': ['Свободен', 'Арендован'] * (count // 2) + ['Свободен'] * (count % 2),
+        'status_start_date': pd.date_range('2024-01-01', periods=count, freq='D'),
+    })
+
+
+def test_bulk_load_appends_in_batches(connector):
+    """Загрузка чанками и дозапись в существующую таблицу"""
+    assert connector.bulk_load(make_frame(0, 25), 'history', chunk_size=10) == 25
+    assert connector.bulk_load(make_frame(25, 5), 'history', chunk_size=10) == 5
+
+    df = connector.execute_query("SELECT * FROM history ORDER BY unit_id")
+    assert len(df) == 30
+    assert df['lease_id'].isna().sum() == 10
+    assert df.loc[0, 'status_start_date'] == '2024-01-01 00:00:00'
+
+
+def test_bulk_load_swap_replaces_table(connector):
+    """Загрузка через staging-таблицу полностью заменяет целевую"""
+    connector.bulk_load(make_frame(0, 20), 'history')
+    connector.bulk_load(make_frame(100, 3), 'history', swap=True)
+
+    df = connector.execute_query("SELECT unit_id FROM history ORDER BY unit_id")
+    assert df['unit_id'].tolist() == [100, 101, 102]
+
+    tables = connector.execute_query("SELECT name FROM sqlite_master WHERE type = 'table'")
+    assert tables['name'].tolist() == ['history']
+
+
+def test_bulk_load_streams_chunks(connector):
+    """Поток DataFrame загружается без предварительного объединения"""
+    chunks = (make_frame(i * 7, 7) for i in range(4))
+    assert connector.bulk_load(chunks, 'history', chunk_size=3) == 28
+    assert connector.execute_query("SELECT COUNT(*) AS n FROM history")['n'][0] == 28
+
+
+class RecordingConnection:
+    """Соединение SQL Server, записывающее выполненные инструкции (columns - колонки существующей таблицы)"""
+
+    def __init__(self, columns: list = None):
+        self.statements = []
+        self.rows = []
+        self.columns = columns
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def execute(self, sql, *params):
+                connection.statements.append(sql)
+
+            def executemany(self, sql, rows):
+                connection.rows += rows
+
+            def fetchone(self):
+                return (1 if connection.columns else None,)
+
+            def fetchall(self):
+                return connection.columns
+
+        return Cursor()
+
+    def commit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+@pytest.fixture
+def mssql():
+    # Без __init__: движку SQLAlchemy нужен драйвер ODBC, проверяются только инструкции
+    connector = SQLServerConnector.__new__(SQLServerConnector)
+    connector.schema = 'dbo'
+    connection = RecordingConnection()
+    connector.get_connection = lambda: connection
+    return connector, connection
+
+
+def test_later_chunk_widens_column_types(mssql):
+    """Тип колонки, ставший шире в следующем чанке, расширяется до вставки"""
+    connector, connection = mssql
+    chunks = [
+        pd.DataFrame({'lease_id': [1, 2], 'area': [10, 20], 'code': [1, 2]}),
+        # lease_id: NaN после read_csv, значения целые - остается BIGINT
+        pd.DataFrame({'lease_id': [3.0, None], 'area': [1.5, 2.0], 'code': ['A-1', '2']}),
+    ]
+    assert connector.bulk_load(iter(chunks), "o'hist", swap=True) == 4
+
+    create = next(sql for sql in connection.statements if sql.startswith('CREATE'))
+    assert '[lease_id] BIGINT' in create and '[area] BIGINT' in create
+    alters = [sql for sql in connection.statements if sql.startswith('ALTER')]
+    assert alters == ["ALTER TABLE [dbo].[o'hist__stage] ALTER COLUMN [area] FLOAT",
+                      "ALTER TABLE [dbo].[o'hist__stage] ALTER COLUMN [code] NVARCHAR(4000)"]
+    assert connection.rows[-1] == (None, 2.0, '2')
+    assert connection.statements[-1] == "EXEC sp_rename N'[dbo].[o''hist__stage]', N'o''hist'"
+
+
+def test_dtypes_from_catalog_schema(mssql):
+    """Явная схема задает типы таблицы вместо первого чанка"""
+    connector, connection = mssql
+    chunk = pd.DataFrame({'lease_id': [1.0, None], 'note': [None, None]})
+    connector.bulk_load(chunk, 'history', swap=True, dtypes={'lease_id': 'Int64', 'note': 'object'})
+
+    create = next(sql for sql in connection.statements if sql.startswith('CREATE'))
+    assert '[lease_id] BIGINT' in create and '[note] NVARCHAR(4000)' in create
+    assert not [sql for sql in connection.statements if sql.startswith('ALTER')]
+    assert connection.rows == [(1, None), (None, None)]
+
+
+def test_append_widens_existing_table(mssql):
+    """Дозапись расширяет колонки существующей таблицы по ее типам, а не по первому чанку"""
+    connector, connection = mssql
+    connection.columns = [('lease_id', 'bigint', None), ('area', 'float', None), ('code', 'nvarchar', 10)]
+    chunks = [
+        pd.DataFrame({'lease_id': [1, 2], 'area': [10, 20], 'code': ['A-1', 'B-2']}),
+        pd.DataFrame({'lease_id': [3, 4], 'area': [30, 40], 'code': ['A-1-rebranding', None]}),
+    ]
+    assert connector.bulk_load(iter(chunks), 'history') == 4
+
+    assert not [sql for sql in connection.statements if sql.startswith(('CREATE', 'DROP'))]
+    alters = [sql for sql in connection.statements if sql.startswith('ALTER')]
+    assert alters == ["ALTER TABLE [dbo].[history] ALTER COLUMN [code] NVARCHAR(4000)"]
+    assert len(connection.rows) == 4
+
+
+def test_append_rejects_unknown_columns(mssql):
+    connector, connection = mssql
+    connection.columns = [('lease_id', 'bigint', None)]
+    with pytest.raises(ValueError, match=r"\['note'\]"):
+        connector.bulk_load(pd.DataFrame({'lease_id': [1], 'note': ['x']}), 'history')
+    assert connection.rows == []
+
+
+def test_sqlite_accepts_widened_chunks(connector):
+    chunks = [pd.DataFrame({'code': [1, 2]}), pd.DataFrame({'code': ['A-1', None]})]
+    assert connector.bulk_load(iter(chunks), 'codes', swap=True) == 4
+    assert connector.execute_query("SELECT code FROM codes")['code'].tolist() == [1, 2, 'A-1', None]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
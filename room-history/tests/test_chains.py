@@ -0,0 +1,150 @@
+# tests/test_chains.py
+"""
+Тесты компактного хранения цепочек статусов
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from src.etl.chains import ChainStore
+    from src.utils.data_generator import SyntheticDataGenerator
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+def reference_tenants(df: pd.DataFrame) -> pd.DataFrame:
+    """Построчный расчет previous/future_tenant (исходная реализация)"""
+    keys = ['model_id', 'unit_id', 'legal_entity']
+    result = df.sort_values(keys + ['status_sequence'], kind='stable').reset_index(drop=True)
+    previous, future = [], []
+    for _, leases in result.groupby(keys, sort=False)['lease_id']:
+        chain_previous, chain_future = tenants_of_chain(leases.to_list())
+        previous += chain_previous
+        future += chain_future
+    result['previous_tenant'] = pd.array(previous, dtype='Int64')
+    result['future_tenant'] = pd.array(future, dtype='Int64')
+    return result
+
+
+def tenants_of_chain(leases: list) -> tuple:
+    previous, future = [], []
+    for i, lease in enumerate(leases):
+        before = [value for value in leases[:i + 1] if value != 0]
+        after = [value for value in leases[i + 1:] if value != 0]
+        previous.append(before[-1] if before else None)
+        future.append(after[0] if after else None)
+    return previous, future
+
+
+def history_row(model, unit, seq, lease, status='Свободно'):
+    return {
+        'model_id': model, 'legal_entity': 'ООО ТРЦ 1', 'unit_id': f'P-{unit}',
+        'status_sequence': seq, 'lease_id': lease, 'crm_status': status,
+        'status_start_date': f'2024-{seq:02d}-01', 'status_end_date': f'2024-{seq + 1:02d}-01',
+    }
+
+
+@pytest.fixture
+def df_history():
+    fact = [(1, 0), (2, 10), (3, 0), (4, 11)]
+    rows = [history_row(666, 1, seq, lease) for seq, lease in fact]
+    # Модель 1 совпадает с фактом полностью, модель 2 - на двух первых статусах
+    rows += [history_row(1, 1, seq, lease) for seq, lease in fact]
+    rows += [history_row(2, 1, seq, lease) for seq, lease in fact[:2]]
+    rows += [history_row(2, 1, 3, 0, 'Резерв'), history_row(2, 1, 4, 0), history_row(2, 1, 5, 12)]
+    # Помещение без факта
+    rows += [history_row(2, 2, 1, 0), history_row(2, 2, 2, 0)]
+    return pd.DataFrame(rows)
+
+
+def test_segments_are_shared(df_history):
+    """Совпадающие с фактом цепочки хранятся одним сегментом"""
+    store = ChainStore.from_history(df_history)
+    chains = store.chains.set_index(['model_id', 'unit_id'])
+
+    assert chains.loc[(666, 'P-1'), 'prefix_segment'] == chains.loc[(1, 'P-1'), 'prefix_segment']
+    assert chains.loc[(1, 'P-1'), 'suffix_segment'] == -1
+    assert chains.loc[(2, 'P-1'), 'prefix_length'] == 2
+    assert chains.loc[(2, 'P-2'), 'prefix_segment'] == -1
+    assert store.stats()['segment_rows'] < store.stats()['rows']
+
+
+def test_resolve_tenants_matches_reference(df_history):
+    """Раздача по сегментам совпадает с построчным расчетом"""
+    keys = ['model_id', 'unit_id', 'legal_entity', 'status_sequence']
+    result = ChainStore.from_history(df_history).resolve_tenants()
+    expected = reference_tenants(df_history)
+
+    result = result.sort_values(keys).reset_index(drop=True)
+    expected = expected.sort_values(keys).reset_index(drop=True)
+    assert result.loc[result['model_id'] == 2, 'previous_tenant'].tolist()[2] == 10
+    for column in ['previous_tenant', 'future_tenant']:
+        assert result[column].astype('Float64').fillna(-1).tolist() == \
+            expected[column].astype('Float64').fillna(-1).tolist()
+
+
+def test_history_without_fact_model(df_history):
+    """Без строк факта (666) префиксов нет, вся цепочка - хвост"""
+    forecast = df_history[df_history['model_id'] != 666]
+    store = ChainStore.from_history(forecast)
+    assert (store.chains['prefix_segment'] == -1).all()
+    assert (store.chains['prefix_length'] == 0).all()
+
+    keys = ['model_id', 'unit_id', 'legal_entity', 'status_sequence']
+    result = store.resolve_tenants().sort_values(keys).reset_index(drop=True)
+    expected = reference_tenants(forecast)
+    for column in ['previous_tenant', 'future_tenant']:
+        assert result[column].astype('Float64').fillna(-1).tolist() == \
+            expected[column].astype('Float64').fillna(-1).tolist()
+
+    single = ChainStore.from_history(forecast[forecast['model_id'] == 1])
+    assert single.stats() == {'rows': 4, 'chains': 1, 'segments': 1, 'segment_rows': 4}
+
+    empty = ChainStore.from_history(df_history.iloc[:0])
+    assert empty.stats()['rows'] == 0 and empty.resolve_tenants().empty
+
+
+def test_resolve_tenants_on_synthetic_history():
+    """Паритет на синтетической истории с несколькими моделями"""
+    generator = SyntheticDataGenerator(units=60, models=4, statuses_per_unit=8, seed=3)
+    df = pd.concat([chunk['tbl_crm_status_hist'] for chunk in generator.iter_chunks()], ignore_index=True)
+    keys = ['model_id', 'unit_id', 'legal_entity', 'status_sequence']
+
+    result = ChainStore.from_history(df).resolve_tenants().sort_values(keys).reset_index(drop=True)
+    expected = reference_tenants(df).sort_values(keys).reset_index(drop=True)
+
+    for column in ['previous_tenant', 'future_tenant']:
+        np.testing.assert_array_equal(result[column].astype('Float64').fillna(-1).to_numpy(),
+                                      expected[column].astype('Float64').fillna(-1).to_numpy())
+
+
+def test_prefixes_are_not_stored_separately():
+    """Префиксы ссылаются на цепочку факта: хранятся только факт и хвосты"""
+    generator = SyntheticDataGenerator(units=2000, models=6, statuses_per_unit=8, seed=3)
+    df = pd.concat([chunk['tbl_crm_status_hist'] for chunk in generator.iter_chunks()], ignore_index=True)
+    store = ChainStore.from_history(df)
+    stats = store.stats()
+
+    fact_rows = int((df['model_id'] == 666).sum())
+    tail_rows = int((store.chains['length'] - store.chains['prefix_length']).sum())
+    assert stats['segment_rows'] <= fact_rows + tail_rows
+    assert stats['segment_rows'] < stats['rows'] / 2
+
+    units = ['legal_entity', 'unit_id']
+    fact = store.chains.loc[store.chains['model_id'] == 666, units + ['prefix_segment']]
+    forecast = store.chains[(store.chains['model_id'] != 666) & (store.chains['prefix_length'] > 0)]
+    merged = forecast.merge(fact, on=units, suffixes=('', '_fact'))
+    assert len(merged) == len(forecast)
+    assert (merged['prefix_segment'] == merged['prefix_segment_fact']).all()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
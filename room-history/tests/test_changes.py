@@ -0,0 +1,123 @@
+# tests/test_changes.py
+"""
+Тесты потока изменений между снимками выгрузок
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import numpy as np
+    import pandas as pd
+    from src.etl.changes import CHANGE_COLUMN, SnapshotDiff, SnapshotStore, load_changes
+    from src.utils.catalog import DatasetCatalog
+    from src.utils.csv_writer import write_csv
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+KEYS = ['model_id', 'legal_entity', 'unit_id', 'status_sequence']
+
+
+def _history(n: int = 1000) -> pd.DataFrame:
+    return pd.DataFrame({
+        'model_id': np.arange(n) % 3,
+        'legal_entity': np.where(np.arange(n) % 2, 'ООО Альфа', 'ООО Бета'),
+        'unit_id': [f"U{i // 6}" for i in range(n)],
+        'status_sequence': np.arange(n) % 6,
+        'crm_status': 'Свободно',
+        'lease_id': pd.array([i if i % 5 else None for i in range(n)], dtype='Int64'),
+    })
+
+
+@pytest.fixture
+def snapshots(tmp_path):
+    old = _history()
+    new = old.copy()
+    new.loc[[10, 20, 30], 'crm_status'] = 'Занято'          # изменения
+    new.loc[41, 'lease_id'] = None                         # изменение в пропуск
+    new = new.drop(index=[50, 60])                         # удаления
+    inserted = old.iloc[[0, 1]].assign(unit_id=['U_NEW1', 'U_NEW2'])
+    new = pd.concat([new, inserted], ignore_index=True)    # вставки
+    old_path, new_path = tmp_path / 'old.csv', tmp_path / 'new.csv'
+    old.to_csv(old_path, index=False)
+    new.to_csv(new_path, index=False)
+    return old_path, new_path
+
+
+def test_diff_classifies_changes(tmp_path, snapshots):
+    old_path, new_path = snapshots
+    output = tmp_path / 'changes' / 'history_changes.csv'
+    summary = SnapshotDiff(KEYS, partitions=4, chunk_rows=128).diff(old_path, new_path, output)
+
+    assert summary == {'insert': 2, 'update': 4, 'delete': 2, 'old_rows': 1000, 'new_rows': 1000,
+                       'unchanged': 994}
+    feed = load_changes(output)
+    assert list(feed.columns) == [CHANGE_COLUMN, *pd.read_csv(new_path, nrows=0).columns]
+    assert sorted(feed.loc[feed[CHANGE_COLUMN] == 'insert', 'unit_id']) == ['U_NEW1', 'U_NEW2']
+    updates = feed[feed[CHANGE_COLUMN] == 'update']
+    assert set(updates['crm_status']) == {'Занято', 'Свободно'}
+    deleted = load_changes(output, change_types=['delete'], columns=['unit_id', 'status_sequence'])
+    assert sorted(deleted['status_sequence']) == [0, 2]
+    assert not list(output.parent.glob('.diff-*'))
+    assert DatasetCatalog(output.parent).entry(output.name)['rows'] == 8
+
+
+def test_no_false_changes_from_type_inference(tmp_path):
+    """Одинаковый текст CSV - нет изменений, даже если pandas выводит типы по чанкам по-разному"""
+    df = _history(300)
+    old_path, new_path = tmp_path / 'old.csv', tmp_path / 'new.csv'
+    df.to_csv(old_path, index=False)
+    df.iloc[::-1].to_csv(new_path, index=False)
+
+    summary = SnapshotDiff(KEYS, partitions=3, chunk_rows=7).diff(old_path, new_path, tmp_path / 'c.csv')
+    assert (summary['insert'], summary['update'], summary['delete']) == (0, 0, 0)
+    assert pd.read_csv(tmp_path / 'c.csv').empty
+
+
+def test_schema_change(tmp_path):
+    old = _history(20)
+    new = old.drop(index=[0]).assign(area=1.5)
+    old_path, new_path = tmp_path / 'old.csv', tmp_path / 'new.csv'
+    old.to_csv(old_path, index=False)
+    new.to_csv(new_path, index=False)
+
+    summary = SnapshotDiff(KEYS).diff(old_path, new_path, tmp_path / 'c.csv')
+    assert (summary['update'], summary['delete']) == (19, 1)
+    feed = pd.read_csv(tmp_path / 'c.csv')
+    assert feed.loc[feed[CHANGE_COLUMN] == 'delete', 'area'].isna().all()
+
+
+def test_missing_key_column(tmp_path, snapshots):
+    old_path, new_path = snapshots
+    with pytest.raises(KeyError):
+        SnapshotDiff(['room_key']).diff(old_path, new_path, tmp_path / 'c.csv')
+
+
+def test_store_capture(tmp_path):
+    raw = tmp_path / 'raw'
+    store = SnapshotStore(tmp_path / 'snapshots', tmp_path / 'changes', enabled=True, partitions=2)
+    path = raw / 'extract_history.csv'
+    v1 = _history(100)
+    v2 = v1.assign(crm_status=np.where(np.arange(100) < 5, 'Занято', 'Свободно'))
+
+    with store.capture(path):
+        write_csv(v1, path)
+    assert not store.changes_path(path).exists()
+
+    with store.capture(path):
+        write_csv(v2, path)
+    feed = load_changes(store.changes_path(path))
+    assert store.changes_path(path).name == 'extract_history_changes.csv'
+    assert (feed[CHANGE_COLUMN] == 'update').sum() == 5
+    # Предыдущий снимок - версия до последней записи
+    assert pd.read_csv(store.previous_path(path))['crm_status'].eq('Свободно').all()
+
+    disabled = SnapshotStore(tmp_path / 'off', tmp_path / 'off_changes', enabled=False)
+    with disabled.capture(path):
+        write_csv(v1, path)
+    assert not (tmp_path / 'off').exists()
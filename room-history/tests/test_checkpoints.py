@@ -0,0 +1,130 @@
+# tests/test_checkpoints.py
+"""
+Тесты возобновляемых выгрузок чанками
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import pandas as pd
+    from benchmarks.bench_pipeline import prepare_workspace
+    from src.database.sqlite_connector import SQLiteConnector
+    from src.etl.checkpoints import ResumableExtraction
+    from src.etl.db_extractor import DBExtractor
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+QUERY = "SELECT * FROM numbers WHERE id IN ({ids})"
+CHUNKS = [list(range(i, i + 10)) for i in range(0, 50, 10)]
+
+
+def fetch_numbers(calls: list, fail_on: set = ()):
+    def fetch(ids):
+        calls.append(ids[0])
+        if ids[0] in fail_on:
+            raise ConnectionError('соединение разорвано')
+        return pd.DataFrame({'id': ids, 'code': [f'0{i}' for i in ids], 'value': [i / 3 for i in ids]})
+    return fetch
+
+
+def test_resume_fetches_only_incomplete_chunks(tmp_path):
+    calls = []
+    first = ResumableExtraction('numbers', QUERY, CHUNKS, tmp_path / 'checkpoints')
+    stats = first.run(fetch_numbers(calls, fail_on={20, 40}))
+    assert stats == {'chunks': 5, 'resumed': 0, 'fetched': 3, 'failed': 2}
+    assert not first.is_complete
+
+    manifest = json.loads((tmp_path / 'checkpoints' / 'numbers' / 'manifest.json').read_text(encoding='utf-8'))
+    assert sorted(manifest['chunks']) == ['0', '1', '3']
+    assert manifest['chunks']['1']['rows'] == 10 and len(manifest['chunks']['1']['checksum']) == 64
+
+    # Неполная выгрузка собирается из выполненных чанков, контрольная точка сохраняется
+    first.assemble(tmp_path / 'partial.csv', catalog=False)
+    assert len(pd.read_csv(tmp_path / 'partial.csv')) == 30
+    assert (tmp_path / 'checkpoints' / 'numbers').exists()
+
+    calls.clear()
+    second = ResumableExtraction('numbers', QUERY, CHUNKS, tmp_path / 'checkpoints')
+    assert second.run(fetch_numbers(calls))['resumed'] == 3
+    assert calls == [20, 40]
+    second.assemble(tmp_path / 'result.csv', catalog=False)
+    assert not (tmp_path / 'checkpoints' / 'numbers').exists()
+
+    ResumableExtraction('numbers', QUERY, CHUNKS, tmp_path / 'fresh').run(fetch_numbers([]))
+    expected = tmp_path / 'expected.csv'
+    pd.concat([fetch_numbers([])(ids) for ids in CHUNKS]).to_csv(expected, index=False)
+    # Значения фрагментов переносятся без приведения типов (ведущие нули сохраняются)
+    assert (tmp_path / 'result.csv').read_bytes() == expected.read_bytes()
+
+
+def test_damaged_fragment_and_changed_plan(tmp_path):
+    calls = []
+    ResumableExtraction('numbers', QUERY, CHUNKS, tmp_path).run(fetch_numbers(calls, fail_on={40}))
+    (tmp_path / 'numbers' / 'chunk-00002.csv').write_text('id\n1\n', encoding='utf-8')
+
+    calls.clear()
+    ResumableExtraction('numbers', QUERY, CHUNKS, tmp_path).run(fetch_numbers(calls))
+    assert calls == [20, 40]
+
+    calls.clear()
+    changed = ResumableExtraction('numbers', QUERY + ' AND id > 0', CHUNKS, tmp_path)
+    assert changed.run(fetch_numbers(calls))['resumed'] == 0
+    assert len(calls) == 5
+
+    calls.clear()
+    ResumableExtraction('numbers', QUERY + ' AND id > 0', CHUNKS, tmp_path, resume=False).run(fetch_numbers(calls))
+    assert len(calls) == 5
+
+
+def test_tenant_extraction_resumes_after_failure(tmp_path, monkeypatch):
+    paths = prepare_workspace(tmp_path / 'ws', rows=4000, seed=3)
+    connector = SQLiteConnector(paths['db'])
+
+    def extractor(name):
+        extractor = DBExtractor(connector=connector, sql_dir=str(paths['sql']), output_dir=str(tmp_path / name))
+        extractor.get_master_reference()
+        return extractor
+
+    reference = extractor('reference')
+    lease_count = pd.read_csv(reference.output_dir / 'ref_lease.csv')['lease_id'].nunique()
+    assert lease_count > 500, "нужно несколько чанков арендаторов"
+    reference.extract_tenants_with_placeholder()
+
+    resumed = extractor('resumed')
+    execute_query = connector.execute_query
+    calls = []
+
+    def failing(query, *args, **kwargs):
+        calls.append(query)
+        if len(calls) == 2:
+            raise RuntimeError('таймаут запроса')
+        return execute_query(query, *args, **kwargs)
+
+    # Предыдущая выгрузка остается на месте, пока не выполнены все чанки
+    previous = resumed.output_dir / 'extract_tenants.csv'
+    previous_text = ''.join((reference.output_dir / 'extract_tenants.csv').open(encoding='utf-8').readlines()[:3])
+    previous.write_text(previous_text, encoding='utf-8')
+    monkeypatch.setattr(connector, 'execute_query', failing)
+    with pytest.raises(RuntimeError, match='чанков арендаторов'):
+        resumed.extract_tenants_with_placeholder()
+    assert (resumed.checkpoint_dir / 'extract_tenants' / 'manifest.json').exists()
+    assert previous.read_text(encoding='utf-8') == previous_text
+    first_calls = len(calls)
+
+    calls.clear()
+    resumed.extract_tenants_with_placeholder()
+    assert len(calls) == 1 < first_calls
+    assert not (resumed.checkpoint_dir / 'extract_tenants').exists()
+    assert (resumed.output_dir / 'extract_tenants.csv').read_bytes() == \
+        (reference.output_dir / 'extract_tenants.csv').read_bytes()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
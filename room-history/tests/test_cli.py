@@ -0,0 +1,67 @@
+# tests/test_cli.py
+"""
+Тесты точки входа room-history
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from benchmarks.bench_startup import measure_startup
+    from src.cli import build_parser, count_lines, list_datasets, parse_args
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+def test_cli_import_is_lightweight():
+    """Импорт CLI не загружает тяжелые зависимости"""
+    code = ("import sys; import src.cli; "
+            "print(','.join(m for m in ('pandas', 'numpy', 'sqlalchemy', 'requests') if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=project_root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ''
+
+
+def test_parser_commands():
+    parser = build_parser()
+    for command in ['datasets', 'profile', 'extract', 'sync-crm', 'sync-erp', 'process', 'export', 'validate',
+                    'mart', 'sql', 'bench']:
+        assert parser.parse_args([command]).command == command
+
+    assert parser.parse_args(['profile']).locations == []
+    assert parser.parse_args(['--profile-stages', 'sample', 'profile']).profile_stages == 'sample'
+    assert parser.parse_args(['profile', 'mart', 'raw']).locations == ['mart', 'raw']
+    with pytest.raises(SystemExit):
+        parser.parse_args(['profile', 'archive'])
+
+    assert parser.parse_args(['extract', '--sequential']).parallel is False
+    assert parser.parse_args(['validate', '--sample', '0.1']).sample == 0.1
+    assert parse_args(['bench', '--scales', '1000']).options == ['--scales', '1000']
+    with pytest.raises(SystemExit):
+        parse_args(['process', '--scales', '1000'])
+
+
+def test_list_datasets(tmp_path):
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    (raw / 'a.csv').write_text('x\n1\n2\n', encoding='utf-8')
+    (raw / 'b.csv').write_text('x\n1', encoding='utf-8')
+    (raw / 'notes.txt').write_text('-', encoding='utf-8')
+
+    datasets = list_datasets({'raw': raw, 'missing': tmp_path / 'missing'}, rows=True)
+    assert [(item['name'], item['rows']) for item in datasets] == [('a.csv', 2), ('b.csv', 1)]
+    assert count_lines(raw / 'a.csv', block_size=2) == 2
+
+
+def test_measure_startup():
+    results = measure_startup({'cli.help': ['main.py', '--help']}, repeat=1)
+    assert 0 < results['cli.help']['wall_s'] < 5
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
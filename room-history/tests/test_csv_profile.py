@@ -0,0 +1,116 @@
+# tests/test_csv_profile.py
+"""
+Тесты профилирования CSV наборов
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import numpy as np
+    import pandas as pd
+    from src.utils.catalog import record_dataset
+    from src.utils.csv_profile import (HyperLogLog, column_stats, count_lines, profile_directories,
+                                       profile_file, sample_frame, write_profile_json, write_text_report)
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+@pytest.fixture
+def history_csv(tmp_path):
+    n = 20000
+    df = pd.DataFrame({
+        'model_id': np.arange(n) % 7,
+        'room_id': [f"R{i}" for i in range(n)],
+        'status_date': pd.date_range('2020-01-01', periods=n, freq='h').strftime('%Y-%m-%d %H:%M:%S'),
+        'contract': [None if i % 4 else f"C{i % 500}" for i in range(n)],
+    })
+    path = tmp_path / 'history.csv'
+    df.to_csv(path, index=False)
+    return path, df
+
+
+def test_hyperloglog_estimate_and_merge():
+    values = pd.Series(np.arange(100000)).astype(str)
+    left, right = HyperLogLog(), HyperLogLog()
+    left.add_values(values[:60000])
+    right.add_values(values[40000:])
+    assert abs(left.estimate() - 60000) / 60000 < 0.05
+    assert abs(left.merge(right).estimate() - 100000) / 100000 < 0.05
+
+    small = HyperLogLog()
+    small.add_values(pd.Series(['a', 'b', 'c', 'a', None]))
+    assert small.estimate() == 3
+
+
+def test_column_stats_kinds():
+    numbers = column_stats(pd.Series(['3', '1.5', None, '10']))
+    assert numbers['kind'] == 'number'
+    assert (numbers['min'], numbers['max']) == (1.5, 10.0)
+    assert numbers['null_rate'] == 0.25
+
+    dates = column_stats(pd.Series(['31.01.2024', '01.02.2023']))
+    assert (dates['kind'], dates['min'], dates['max']) == ('date', '2023-02-01', '2024-01-31')
+
+    text = column_stats(pd.Series(['x', '2024-01-01']))
+    assert text['kind'] == 'text' and text['min'] is None
+
+
+def test_sample_frame_reads_blocks(history_csv):
+    path, df = history_csv
+    sample = sample_frame(path, list(df.columns), len(df), sample_rows=2000, blocks=4)
+    assert 1900 <= len(sample) <= 2000
+    assert list(sample.columns) == list(df.columns)
+    # Блоки покрывают весь файл, а не только начало
+    assert sample['room_id'].isin(df['room_id'].tail(5000)).any()
+    assert sample['room_id'].isin(df['room_id']).all()
+
+
+def test_profile_file(history_csv):
+    path, df = history_csv
+    profile = profile_file(path, sample_rows=4000)
+
+    assert profile['row_count'] == len(df)
+    assert profile['columns'] == list(df.columns)
+    assert profile['sampled'] and profile['sample_rows'] <= 4000
+    stats = profile['stats']
+    assert stats['model_id']['distinct'] == 7
+    assert stats['status_date']['kind'] == 'date'
+    assert stats['status_date']['min'] < stats['status_date']['max']
+    assert 0.7 < stats['contract']['null_rate'] < 0.8
+
+
+def test_profile_uses_catalog_rows(tmp_path):
+    path = tmp_path / 'data.csv'
+    df = pd.DataFrame({'a': ['x\ny', 'z']})
+    df.to_csv(path, index=False)
+    assert count_lines(path) == 3
+    record_dataset(path, df)
+    assert profile_file(path, with_stats=False)['row_count'] == 2
+
+
+def test_profile_directories_and_reports(tmp_path, history_csv):
+    path, _ = history_csv
+    other = tmp_path / 'other'
+    other.mkdir()
+    pd.DataFrame({'x': [1, 2]}).to_csv(other / 'b.csv', index=False)
+    pd.DataFrame({'x': [1]}).to_csv(other / '_skip.csv', index=False)
+    (other / 'empty.csv').write_text('', encoding='utf-8')
+
+    profiles = profile_directories({'raw': path.parent, 'other': other}, sample_rows=1000, max_workers=3)
+    assert [(p['location'], p['file_name']) for p in profiles] == [
+        ('raw', 'history.csv'), ('other', 'b.csv'), ('other', 'empty.csv')]
+
+    write_profile_json(profiles, tmp_path / 'profile.json')
+    write_text_report(profiles, tmp_path / 'profile.txt')
+    assert json.loads((tmp_path / 'profile.json').read_text(encoding='utf-8'))[1]['row_count'] == 2
+    report = (tmp_path / 'profile.txt').read_text(encoding='utf-8')
+    assert 'Файл: raw/history.csv' in report
+    assert 'Количество строк: 20000' in report
+    assert '  1. x (пропуски 0.0%, различных ~2, number 1 .. 2)' in report
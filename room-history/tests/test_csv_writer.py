@@ -0,0 +1,132 @@
+# tests/test_csv_writer.py
+"""
+Тесты атомарной записи CSV
+"""
+
+import gzip
+import io
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import numpy as np
+    import pandas as pd
+    from src.utils.catalog import DatasetCatalog, file_checksum
+    from src.utils.csv_writer import AtomicCSVWriter, write_csv
+    from src.utils.helpers import get_recorder
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+@pytest.fixture
+def frame():
+    n = 2500
+    return pd.DataFrame({
+        'model_id': np.arange(n) % 5,
+        'status': [f"статус {i % 7}" for i in range(n)],
+        'start': pd.date_range('2024-01-01', periods=n, freq='D').strftime('%Y-%m-%d'),
+        'tenant': pd.array([None if i % 3 else i for i in range(n)], dtype='Int64'),
+    })
+
+
+def _expected(df: pd.DataFrame) -> str:
+    return df.to_csv(index=False)
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_write_matches_to_csv(tmp_path, frame, executor):
+    path = tmp_path / 'extract_history.csv'
+    result = write_csv(frame, path, chunk_rows=300, max_workers=3, executor=executor, source='extract_history.sql')
+
+    assert path.read_text(encoding='utf-8') == _expected(frame)
+    assert result.rows == len(frame)
+    assert result.bytes_written == path.stat().st_size
+    assert result.checksum == file_checksum(path)
+
+    entry = DatasetCatalog(tmp_path).entry('extract_history.csv')
+    assert entry['rows'] == len(frame)
+    assert entry['checksum'] == result.checksum
+    assert list(entry['schema']) == list(frame.columns)
+
+
+def test_streamed_chunks_and_gzip(tmp_path, frame):
+    path = tmp_path / 'history.csv.gz'
+    chunks = (frame.iloc[start:start + 700] for start in range(0, len(frame), 700))
+    with AtomicCSVWriter(path, chunk_rows=256, max_workers=2) as writer:
+        writer.write(frame.iloc[:0])
+        writer.write(chunks)
+
+    assert writer.compression == 'gzip'
+    assert gzip.decompress(path.read_bytes()).decode('utf-8') == _expected(frame)
+    pd.testing.assert_frame_equal(pd.read_csv(path), pd.read_csv(io.StringIO(_expected(frame))))
+
+
+@pytest.mark.parametrize('encoding', ['utf-8-sig', 'utf-16'])
+def test_bom_written_once(tmp_path, frame, encoding):
+    """BOM пишется только в начале файла, а не в каждом чанке"""
+    path = tmp_path / 'history.csv'
+    write_csv(frame.iloc[:7], path, encoding=encoding, chunk_rows=2, catalog=False)
+
+    assert path.read_bytes() == _expected(frame.iloc[:7]).encode(encoding)
+    assert path.read_text(encoding=encoding) == _expected(frame.iloc[:7])
+    pd.testing.assert_frame_equal(pd.read_csv(path, encoding=encoding),
+                                  pd.read_csv(io.StringIO(_expected(frame.iloc[:7]))))
+
+def test_empty_frame_writes_header(tmp_path):
+    path = tmp_path / 'empty.csv'
+    write_csv(pd.DataFrame(columns=['a', 'b']), path)
+    assert path.read_text(encoding='utf-8') == 'a,b\n'
+    assert DatasetCatalog(tmp_path).entry('empty.csv')['rows'] == 0
+
+
+def test_failure_keeps_previous_file(tmp_path, frame):
+    path = tmp_path / 'extract_history.csv'
+    path.write_text('old\n', encoding='utf-8')
+
+    def broken_stream():
+        yield frame.iloc[:100]
+        raise RuntimeError('обрыв выборки')
+
+    with pytest.raises(RuntimeError):
+        write_csv(broken_stream(), path, chunk_rows=10)
+
+    assert path.read_text(encoding='utf-8') == 'old\n'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['extract_history.csv']
+
+
+def test_permissions_and_metrics(tmp_path, frame):
+    path = tmp_path / 'out.csv'
+    umask = os.umask(0)
+    os.umask(umask)
+    write_csv(frame, path, catalog=False)
+
+    assert path.stat().st_mode & 0o777 == 0o666 & ~umask
+    assert not (tmp_path / 'catalog.json').exists()
+    record = [r for r in get_recorder().records if r['stage'] == 'write.csv'][-1]
+    assert record['bytes_written'] == path.stat().st_size
+    assert record['tags']['mb_per_s'] >= 0
+
+    # Заменяемый файл сохраняет свои права
+    path.chmod(0o640)
+    write_csv(frame, path, catalog=False)
+    assert path.stat().st_mode & 0o777 == 0o640
+
+
+def test_zstd(tmp_path, frame):
+    pytest.importorskip('zstandard')
+    path = tmp_path / 'history.csv.zst'
+    write_csv(frame, path, chunk_rows=500)
+    pd.testing.assert_frame_equal(pd.read_csv(path), pd.read_csv(io.StringIO(_expected(frame))))
+
+
+def test_unknown_options(tmp_path):
+    with pytest.raises(ValueError):
+        AtomicCSVWriter(tmp_path / 'a.csv', compression='lz4')
+    with pytest.raises(ValueError):
+        AtomicCSVWriter(tmp_path / 'a.csv', executor='fork')
@@ -0,0 +1,97 @@
+# tests/test_cubes.py
+"""
+Тесты куба занятости
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from src.etl.cubes import NO_CONTRACT, OccupancyCube, aggregate_months, enrich_history
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+def status(unit, seq, start, end, lease, model=666, entity='ООО ТРЦ 1', crm_status='Арендован'):
+    return {'legal_unit_id': unit, 'model_id': model, 'legal_entity': entity, 'unit_id': f'P-{unit}',
+            'trc_abbreviation': 'ТРЦ1', 'lease_id': lease, 'status_sequence': seq, 'status_start_date': start,
+            'status_end_date': end, 'crm_status': crm_status}
+
+
+@pytest.fixture
+def df_history():
+    return pd.DataFrame([
+        # Помещение 1 (100 м2): свободно январь, арендовано с февраля
+        status(1, 1, '2024-01-01', '2024-01-31', 0, crm_status='Свободен'),
+        status(1, 2, '2024-02-01', None, 10),
+        # Помещение 2 (50 м2): арендовано весь период
+        status(2, 1, '2024-01-01', None, 20),
+        # Другое юр. лицо
+        status(3, 1, '2024-01-01', None, 0, entity='ООО ТРЦ 2', crm_status='Свободен'),
+    ])
+
+
+@pytest.fixture
+def df_tenants():
+    return pd.DataFrame({'model_id': [666, 666, 666], 'lease_id': [10, 20, 30], 'legal_unit_id': [1, 2, 3],
+                         'total_area': [100.0, 50.0, 80.0], 'client_category': ['Якорный', 'Малый', 'Малый']})
+
+
+def test_aggregate_months_splits_intervals(df_history, df_tenants):
+    df = enrich_history(df_history, df_tenants)
+    cube = aggregate_months(df, pd.Timestamp('2024-03-31').to_datetime64().astype('datetime64[D]'))
+
+    unit1 = cube[(cube['legal_entity'] == 'ООО ТРЦ 1') & (cube['client_category'].isin(['Якорный', NO_CONTRACT]))]
+    by_month = unit1.groupby('month')[['unit_days', 'area_days']].sum()
+    assert by_month.loc['2024-02', 'unit_days'] == 29
+    assert by_month.loc['2024-03', 'area_days'] == 31 * 100
+    assert unit1[unit1['client_category'] == NO_CONTRACT]['is_leased'].eq(0).all()
+    assert cube['status_starts'].sum() == len(df_history)
+
+
+def test_query_answers_slices(df_history, df_tenants, tmp_path):
+    cube = OccupancyCube(tmp_path / 'cube.sqlite')
+    cube.refresh(df_history, df_tenants, horizon='2024-03-31')
+
+    monthly = cube.query(by=['month'], filters={'legal_entity': 'ООО ТРЦ 1'}).set_index('month')
+    assert monthly.loc['2024-01', 'total_area'] == pytest.approx(150)
+    assert monthly.loc['2024-01', 'occupancy_rate'] == pytest.approx(50 / 150)
+    assert monthly.loc['2024-02', 'occupancy_rate'] == pytest.approx(1.0)
+
+    overall = cube.query(by=['legal_entity'], months=('2024-01', '2024-03')).set_index('legal_entity')
+    assert overall.loc['ООО ТРЦ 2', 'vacancy_rate'] == pytest.approx(1.0)
+    assert overall.loc['ООО ТРЦ 1', 'leased_area'] == pytest.approx((50 * 91 + 100 * 60) / 91)
+
+    with pytest.raises(ValueError):
+        cube.query(by=['unit_id'])
+
+
+def test_refresh_touches_only_changed_partitions(df_history, df_tenants, tmp_path):
+    cube = OccupancyCube(tmp_path / 'cube.sqlite')
+    first = cube.refresh(df_history, df_tenants, horizon='2024-03-31')
+    assert first['refreshed'] == 2
+
+    assert cube.refresh(df_history, df_tenants, horizon='2024-03-31')['refreshed'] == 0
+
+    changed = df_history.copy()
+    changed.loc[3, 'lease_id'] = 30
+    stats = cube.refresh(changed, df_tenants, horizon='2024-03-31')
+    assert stats['refreshed'] == 1
+    assert cube.query(by=['legal_entity']).set_index('legal_entity').loc['ООО ТРЦ 2', 'occupancy_rate'] == 1.0
+
+    # Удаленное юр. лицо убирается из куба, явные changed_keys ограничивают пересчет
+    stats = cube.refresh(changed[changed['legal_entity'] == 'ООО ТРЦ 1'], df_tenants, horizon='2024-03-31',
+                         changed_keys=pd.DataFrame({'model_id': [666], 'legal_entity': ['ООО ТРЦ 1']}))
+    assert stats == {'partitions': 1, 'refreshed': 1, 'removed': 1, 'rows': stats['rows']}
+    assert list(cube.query(by=['legal_entity'])['legal_entity']) == ['ООО ТРЦ 1']
+    assert len(cube.partitions()) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,121 @@
+# tests/test_data_generator.py
+"""
+Тесты генератора синтетических данных
+"""
+
+import pytest
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Добавляем путь к проекту
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from src.utils.data_generator import (
+        FACT_MODEL_ID, SyntheticDataGenerator, write_dataset,
+        HISTORY_COLUMNS, BUSINESS_UNITS_COLUMNS, FINANCIAL_MODELS_COLUMNS
+    )
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+def template_columns(template_name: str) -> list:
+    """Список колонок SELECT из sql/*.sql.template"""
+    text = (project_root / 'sql' / template_name).read_text(encoding='utf-8')
+    select_part = text[text.index('SELECT'):text.index('FROM')]
+    return re.findall(r'^\s+(\w+)', select_part, flags=re.MULTILINE)
+
+
+@pytest.fixture
+def chunk():
+    generator = SyntheticDataGenerator(units=40, models=3, statuses_per_unit=6, seed=7)
+    return next(generator.iter_chunks())
+
+
+def test_columns_match_templates():
+    assert HISTORY_COLUMNS == template_columns('extract_history.sql.template')
+    assert BUSINESS_UNITS_COLUMNS == template_columns('extract_tenants.sql.template')
+    assert FINANCIAL_MODELS_COLUMNS == template_columns('extract_models.sql.template')
+
+
+def test_status_chains_are_continuous(chunk):
+    """Цепочка помещения непрерывна: конец статуса - день перед началом следующего"""
+    history = chunk['tbl_crm_status_hist']
+    assert len(history) == 40 * 3 * 6
+
+    keys = ['model_id', 'legal_entity', 'unit_id']
+    history = history.sort_values(keys + ['status_sequence'])
+    next_start = pd.to_datetime(history.groupby(keys)['status_start_date'].shift(-1))
+    end = pd.to_datetime(history['status_end_date'])
+
+    assert ((next_start - end).dropna() == pd.Timedelta(days=1)).all()
+    assert history.groupby(keys)['status_end_date'].apply(lambda s: s.isna().sum()).eq(1).all()
+    assert (history['lease_id'] == 0).any()
+    assert (history.loc[history['lease_id'] == 0, 'crm_status'] == 'Свободен').all()
+
+
+def test_forecast_models_share_fact_prefix(chunk):
+    """Первая половина цепочки прогнозной модели совпадает с фактом"""
+    history = chunk['tbl_crm_status_hist']
+    fact = history[history['model_id'] == FACT_MODEL_ID].drop(columns='model_id').reset_index(drop=True)
+
+    for model_id in history['model_id'].unique():
+        model = history[history['model_id'] == model_id].drop(columns='model_id').reset_index(drop=True)
+        prefix = model['status_sequence'] <= 3
+        pd.testing.assert_frame_equal(model[prefix], fact[prefix])
+
+
+def test_contracts_cover_every_lease(chunk):
+    history = chunk['tbl_crm_status_hist']
+    tenants = chunk['business_units']
+
+    leased = history.loc[history['lease_id'] != 0, ['model_id', 'lease_id']].drop_duplicates()
+    assert len(leased) == len(tenants)
+    assert set(map(tuple, leased.values)) == set(map(tuple, tenants[['model_id', 'lease_id']].values))
+
+
+def test_streamed_output_is_reproducible(tmp_path):
+    """Запись чанками дает те же данные при том же seed"""
+    generator = SyntheticDataGenerator(units=25, models=2, statuses_per_unit=4, seed=1)
+    row_counts = write_dataset(generator, 'csv', tmp_path / 'a', chunk_units=10)
+    write_dataset(generator, 'csv', tmp_path / 'b', chunk_units=10)
+
+    history = pd.read_csv(tmp_path / 'a' / 'tbl_crm_status_hist.csv')
+    assert len(history) == row_counts['tbl_crm_status_hist'] == 25 * 2 * 4
+    pd.testing.assert_frame_equal(history, pd.read_csv(tmp_path / 'b' / 'tbl_crm_status_hist.csv'))
+
+
+def test_row_counts_match_written_rows(tmp_path):
+    """Таблицы, которые приемник пропускает (expert в SQLite), не попадают в row_counts"""
+    generator = SyntheticDataGenerator(units=20, models=3, statuses_per_unit=4, seed=3)
+    row_counts = write_dataset(generator, 'sqlite', tmp_path / 'mock.sqlite', chunk_units=7)
+
+    assert 'expert' not in row_counts and 'mapping_trc' not in row_counts
+    with sqlite3.connect(tmp_path / 'mock.sqlite') as conn:
+        for table, count in row_counts.items():
+            assert conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] == count
+
+    csv_counts = write_dataset(generator, 'csv', tmp_path / 'csv', chunk_units=7)
+    assert csv_counts['expert'] == 20 * 3 and csv_counts['mapping_trc'] == 5
+
+
+@pytest.mark.parametrize('block_units', [4096, 16])
+def test_chunk_size_does_not_change_data(monkeypatch, block_units):
+    """Данные при том же seed не зависят от размера чанка (и от границ блоков случайных значений)"""
+    monkeypatch.setattr('src.utils.data_generator.RNG_BLOCK_UNITS', block_units)
+    generator = SyntheticDataGenerator(units=40, models=2, statuses_per_unit=5, seed=7)
+    whole = next(generator.iter_chunks(40))
+    for chunk_units in (10, 7):
+        chunks = list(generator.iter_chunks(chunk_units))
+        assert len(chunks) == -(-40 // chunk_units)
+        for table, df in whole.items():
+            pd.testing.assert_frame_equal(pd.concat([chunk[table] for chunk in chunks], ignore_index=True), df)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
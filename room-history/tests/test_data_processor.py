@@ -1 +1,52 @@
-#test_data_processor.py
\ No newline at end of file
+#test_data_processor.py
+"""
+Тесты стадии обработки process_history_data (выгрузка для BI только после проверки)
+"""
+
+import functools
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import pandas as pd
+    from benchmarks.bench_pipeline import prepare_workspace
+    from src.database.sqlite_connector import SQLiteConnector
+    from src.etl import data_processor
+    from src.etl.db_extractor import DBExtractor
+    from src.etl.export import export_processed
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+@pytest.mark.parametrize('broken', [False, True])
+def test_export_only_after_successful_validation(tmp_path, monkeypatch, broken):
+    """Ошибки проверки данных не публикуются в партиции BI"""
+    paths = prepare_workspace(tmp_path / 'ws', rows=400)
+    DBExtractor(connector=SQLiteConnector(paths['db']), sql_dir=str(paths['sql']),
+                output_dir=str(paths['raw'])).extract_all(parallel=False)
+    if broken:
+        # Договоры без записи в ref_lease - ошибка tenants_lease_fk
+        ref_lease = pd.read_csv(paths['raw'] / 'ref_lease.csv')
+        ref_lease[ref_lease['lease_id'] == 0].to_csv(paths['raw'] / 'ref_lease.csv', index=False)
+
+    export_dir = tmp_path / 'export'
+    monkeypatch.setattr(data_processor, 'configure_metrics', lambda path: None)
+    monkeypatch.setattr(data_processor, 'HistoryProcessor',
+                        functools.partial(data_processor.HistoryProcessor, paths['raw'], paths['processed']))
+    monkeypatch.setattr(data_processor, 'export_processed',
+                        functools.partial(export_processed, export_dir=export_dir))
+
+    assert data_processor.process_history_data() is not broken
+
+    assert (paths['processed'] / 'processed_history.csv').exists()
+    partitions = list(export_dir.glob('*/legal_entity=*/month=*/*.csv'))
+    assert bool(partitions) is not broken
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
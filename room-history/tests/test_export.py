@@ -0,0 +1,108 @@
+# tests/test_export.py
+"""
+Тесты партиционированной выгрузки обработанных наборов для BI
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import pandas as pd
+    from src.etl.export import PartitionedExport, export_processed, partition_value
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+def _history() -> pd.DataFrame:
+    return pd.DataFrame({
+        'legal_unit_id': range(12),
+        'legal_entity': ['ООО Альфа'] * 6 + ['ИП "Бета"/Юг'] * 4 + [''] * 2,
+        'unit_id': [f'0{i}' for i in range(12)],
+        'status_start_date': ['2024-01-05', '2024-01-20', '2024-02-01', '2024-02-11', '2024-03-01', '',
+                              '2024-01-02', '2024-01-03', '2024-05-31 10:00:00', '2024-05-01',
+                              '2024-01-01', '2024-01-15'],
+        'crm_status': 'Свободно',
+    })
+
+
+def manifest(export_dir: Path) -> dict:
+    return json.loads((export_dir / 'processed_history' / '_manifest.json').read_text(encoding='utf-8'))
+
+
+def test_partitions_layout_and_manifest(tmp_path):
+    path = tmp_path / 'processed_history.csv'
+    _history().to_csv(path, index=False)
+    summary = PartitionedExport(tmp_path / 'export').export(path)
+    assert summary == {'partitions': 7, 'written': 7, 'unchanged': 0, 'removed': 0, 'rows': 12}
+
+    root = tmp_path / 'export' / 'processed_history'
+    part = pd.read_csv(root / 'legal_entity=ООО Альфа' / 'month=2024-01' / 'part-0.csv', dtype=str)
+    assert list(part['unit_id']) == ['00', '01']
+    assert (root / 'legal_entity=ИП %22Бета%22%2FЮг' / 'month=2024-05' / 'part-0.csv').exists()
+    assert (root / 'legal_entity=__HIVE_DEFAULT_PARTITION__' / 'month=2024-01').is_dir()
+    assert (root / 'legal_entity=ООО Альфа' / 'month=__HIVE_DEFAULT_PARTITION__').is_dir()
+
+    data = manifest(tmp_path / 'export')
+    assert data['rows'] == 12 and len(data['changed']) == 7
+    entry = data['partitions']['legal_entity=ООО Альфа/month=2024-02']
+    assert (entry['legal_entity'], entry['month'], entry['rows']) == ('ООО Альфа', '2024-02', 2)
+    # Объединение партиций дает исходный набор
+    parts = pd.concat([pd.read_csv(root / e['path'], dtype=str, keep_default_na=False)
+                       for e in data['partitions'].values()])
+    original = pd.read_csv(path, dtype=str, keep_default_na=False)
+    pd.testing.assert_frame_equal(parts.sort_values('legal_unit_id').reset_index(drop=True),
+                                  original.sort_values('legal_unit_id').reset_index(drop=True))
+
+
+def test_rewrites_only_changed_partitions(tmp_path):
+    path = tmp_path / 'processed_history.csv'
+    export = PartitionedExport(tmp_path / 'export')
+    df = _history()
+    df.to_csv(path, index=False)
+    export.export(path)
+    root = tmp_path / 'export' / 'processed_history'
+    untouched = root / 'legal_entity=ООО Альфа' / 'month=2024-01' / 'part-0.csv'
+    mtime = untouched.stat().st_mtime_ns
+
+    # Порядок строк не влияет на хэш партиций
+    df.iloc[::-1].to_csv(path, index=False)
+    assert export.export(path)['written'] == 0
+
+    df.loc[3, 'crm_status'] = 'Занято'                       # изменение в 2024-02
+    df = df[df['legal_entity'] != '']                        # удаление партиции
+    df.to_csv(path, index=False)
+    summary = export.export(path)
+    assert (summary['written'], summary['removed'], summary['unchanged']) == (1, 1, 5)
+
+    data = manifest(tmp_path / 'export')
+    assert data['changed'] == ['legal_entity=ООО Альфа/month=2024-02']
+    assert data['removed'] == ['legal_entity=__HIVE_DEFAULT_PARTITION__/month=2024-01']
+    assert not (root / 'legal_entity=__HIVE_DEFAULT_PARTITION__').exists()
+    assert untouched.stat().st_mtime_ns == mtime
+
+    # Изменение схемы перезаписывает все партиции
+    df.assign(area='1.5').to_csv(path, index=False)
+    assert export.export(path)['written'] == 6
+
+
+def test_export_processed_skips_missing(tmp_path):
+    _history().to_csv(tmp_path / 'processed_history.csv', index=False)
+    pd.DataFrame({'unit_id': ['1']}).to_csv(tmp_path / 'processed_tenants.csv', index=False)
+    results = export_processed(tmp_path, tmp_path / 'export')
+    assert list(results) == ['processed_history.csv']
+
+
+def test_partition_value():
+    assert partition_value('ТРЦ Мега') == 'ТРЦ Мега'
+    assert partition_value('a/b=c%') == 'a%2Fb%3Dc%25'
+    assert partition_value('') == '__HIVE_DEFAULT_PARTITION__'
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,46 @@
+# tests/test_fetch_engine.py
+"""
+Тесты колоночного движка выборки (преобразование Arrow -> DataFrame)
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import pyarrow as pa
+    from src.database.db_connector import FETCH_ENGINES, arrow_to_frame
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+def test_arrow_frame_matches_read_sql():
+    """Типы DataFrame из Arrow совпадают с pd.read_sql"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE t (lease_id INTEGER, area REAL, brand TEXT, renovation_days INTEGER)')
+    conn.executemany('INSERT INTO t VALUES (?, ?, ?, ?)',
+                     [(1, 10.5, 'А', 30), (2, None, None, None), (3, 7.0, 'Б', 0)])
+    expected = pd.read_sql('SELECT * FROM t', conn)
+
+    table = pa.table({
+        'lease_id': pa.array([1, 2, 3], pa.int64()),
+        'area': pa.array([10.5, None, 7.0], pa.float64()),
+        'brand': pa.array(['А', None, 'Б'], pa.string()),
+        'renovation_days': pa.array([30, None, 0], pa.int32()),
+    })
+    result = arrow_to_frame(table)
+
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    assert result['lease_id'].dtype == expected['lease_id'].dtype
+    assert result['renovation_days'].dtype == expected['renovation_days'].dtype
+    assert 'arrow' in FETCH_ENGINES
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
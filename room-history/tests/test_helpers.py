@@ -0,0 +1,79 @@
+# tests/test_helpers.py
+"""
+Тесты инструментирования стадий
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from src.utils.helpers import get_recorder, instrument, record_file_written, track
+    from src.database.sqlite_connector import SQLiteConnector
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    """Глобальный накопитель с файлом JSON Lines во временной папке"""
+    recorder = get_recorder()
+    previous_file = recorder.metrics_file
+    recorder.reset()
+    recorder.metrics_file = tmp_path / 'metrics.jsonl'
+    yield recorder
+    recorder.metrics_file = previous_file
+    recorder.reset()
+
+
+def test_nested_stages_and_queries(recorder, tmp_path):
+    """Вложенные стадии, запросы коннектора и запись файлов попадают в метрики"""
+    connector = SQLiteConnector(tmp_path / 'test.sqlite')
+    connector.bulk_load(pd.DataFrame({'id': range(10)}), 'numbers')
+
+    @instrument('test.stage')
+    def stage(df):
+        result = connector.execute_query('SELECT * FROM numbers WHERE id < 4')
+        output_path = tmp_path / 'out.csv'
+        result.to_csv(output_path, index=False)
+        record_file_written(output_path)
+        return result
+
+    stage(pd.DataFrame({'x': range(7)}))
+
+    lines = [json.loads(line) for line in recorder.metrics_file.read_text(encoding='utf-8').splitlines()]
+    query, outer = lines[-2], lines[-1]
+    assert query['kind'] == 'query' and query['parent'] == 'test.stage'
+    assert query['rows_out'] == 4 and 'numbers' in query['tags']['sql']
+    assert outer['stage'] == 'test.stage'
+    assert outer['rows_in'] == 7 and outer['rows_out'] == 4
+    assert outer['bytes_written'] == (tmp_path / 'out.csv').stat().st_size
+    assert outer['wall_s'] >= query['wall_s']
+    assert {line['run_id'] for line in lines} == {recorder.run_id}
+
+
+def test_summary_counts_errors(recorder):
+    """Сводка агрегирует вызовы и ошибки по стадии"""
+    for rows in (3, 5):
+        with track('test.loop') as metrics:
+            metrics.add_rows_out(rows)
+
+    with pytest.raises(ValueError):
+        with track('test.loop'):
+            raise ValueError('сбой')
+
+    summary = {item['stage']: item for item in recorder.summary()}
+    assert summary['test.loop']['calls'] == 3
+    assert summary['test.loop']['errors'] == 1
+    assert summary['test.loop']['rows_out'] == 8
+    assert 'test.loop' in recorder.format_summary()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,204 @@
+# tests/test_intervals.py
+"""
+Тесты операций над интервалами (ответственность экспертов)
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from src.etl.bi_mart import BIMartBuilder
+    from src.etl.data_processor import HistoryProcessor
+    from src.etl.intervals import OPEN_END, interval_join, resolve_responsibility, sweep_intervals
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+def expert(unit, name, start, end, modified, is_chief=False):
+    return {
+        'legal_unit_id': unit, 'unit_id': f'P-{unit}', 'legal_entity': 'ООО ТРЦ 1',
+        'is_chief': is_chief, 'contact_full_name': name, 'resp_start_date': start,
+        'resp_end_date': end, 'modified_on': modified, 'is_active': True,
+    }
+
+
+@pytest.fixture
+def df_expert():
+    return pd.DataFrame([
+        # Помещение 1: открытая запись B изменена позже и перекрывает хвост A
+        expert(1, 'A', '2024-01-01', '2024-03-01', '2024-01-01'),
+        expert(1, 'B', '2024-02-01', None, '2024-02-01'),
+        # Помещение 2: вложенная запись B изменена позже, A продолжается после нее
+        expert(2, 'A', '2024-01-01', '2024-06-01', '2024-01-01'),
+        expert(2, 'B', '2024-02-01', '2024-03-01', '2024-05-01'),
+        # Помещение 3: продления одного сотрудника склеиваются, старший - отдельная дорожка
+        expert(3, 'C', '2024-01-01', '2024-02-01', '2024-01-01'),
+        expert(3, 'C', '2024-02-01', '2024-04-01', '2024-01-15'),
+        expert(3, 'D', '2023-12-01', None, '2023-12-01', is_chief=True),
+        # Без даты начала - отбрасывается
+        expert(3, 'E', None, '2024-04-01', '2024-01-15'),
+    ])
+
+
+def test_resolve_responsibility(df_expert):
+    """Пересечения разрешаются по modified_on, смены нумеруются"""
+    result = resolve_responsibility(df_expert)
+    rows = [tuple(row) for row in result.fillna('').itertuples(index=False)]
+
+    # Даты окончания включаются в период: смены не делят граничный день
+    assert rows == [
+        (1, False, 'A', '2024-01-01', '2024-01-31', 1),
+        (1, False, 'B', '2024-02-01', '', 2),
+        (2, False, 'A', '2024-01-01', '2024-01-31', 1),
+        (2, False, 'B', '2024-02-01', '2024-03-01', 2),
+        (2, False, 'A', '2024-03-02', '2024-06-01', 3),
+        (3, False, 'C', '2024-01-01', '2024-04-01', 1),
+        (3, True, 'D', '2023-12-01', '', 1),
+    ]
+
+
+def test_responsibility_end_date_is_inclusive():
+    """Однодневное назначение сохраняется, вложенный период не делит граничные дни"""
+    result = resolve_responsibility(pd.DataFrame([
+        expert(1, 'B', '2024-01-01', '2024-01-31', '2024-01-01'),
+        expert(1, 'A', '2024-01-10', '2024-01-20', '2024-01-05'),
+        expert(2, 'C', '2024-03-05', '2024-03-05', '2024-03-05'),
+        # Смежные периоды одного сотрудника склеиваются
+        expert(3, 'D', '2024-01-01', '2024-01-31', '2024-01-01'),
+        expert(3, 'D', '2024-02-01', None, '2024-02-01'),
+    ]))
+    rows = [tuple(row) for row in result.fillna('').itertuples(index=False)]
+
+    assert rows == [
+        (1, False, 'B', '2024-01-01', '2024-01-09', 1),
+        (1, False, 'A', '2024-01-10', '2024-01-20', 2),
+        (1, False, 'B', '2024-01-21', '2024-01-31', 3),
+        (2, False, 'C', '2024-03-05', '2024-03-05', 1),
+        (3, False, 'D', '2024-01-01', '', 1),
+    ]
+
+
+def test_mart_splits_senior_responsibility(df_expert, tmp_path):
+    """Старшие ответственные попадают в fact_senior_responsibility"""
+    dim_employee, fact, fact_senior = BIMartBuilder(output_dir=tmp_path).build_responsibility(df_expert)
+
+    assert len(fact) == 6 and len(fact_senior) == 1
+    senior_name = dim_employee.set_index('employee_id').loc[fact_senior['employee_id'].iloc[0], 'full_name']
+    assert senior_name == 'D'
+    assert list(fact['responsibility_id']) == list(range(1, 7))
+
+
+def test_sweep_intervals_matches_brute_force():
+    """В каждой точке дорожки действует покрывающий интервал с наибольшим приоритетом"""
+    rng = np.random.default_rng(2)
+    n = 400
+    track = rng.integers(0, 8, n)
+    start = rng.integers(0, 100, n)
+    end = np.where(rng.random(n) < 0.1, OPEN_END, start + rng.integers(1, 30, n))
+    priority = rng.permutation(n) * 2 - n
+
+    rec, seg_start, seg_end = sweep_intervals(track, start, end, priority)
+
+    # Отрезки идут по (дорожка, начало), не пересекаются и не повторяют победителя подряд
+    assert (seg_end > seg_start).all()
+    same = track[rec][1:] == track[rec][:-1]
+    assert (seg_start[1:][same] >= seg_end[:-1][same]).all()
+    assert not ((rec[1:] == rec[:-1]) & (seg_start[1:] == seg_end[:-1]))[same].any()
+
+    for point in range(0, 140):
+        for tr in range(8):
+            covering = np.flatnonzero((track == tr) & (start <= point) & (end > point))
+            expected = covering[np.argmax(priority[covering])] if len(covering) else -1
+            found = np.flatnonzero((track[rec] == tr) & (seg_start <= point) & (seg_end > point))
+            assert (rec[found[0]] if len(found) else -1) == expected
+
+
+def test_interval_join_matches_brute_force():
+    """Пары совпадают с полным соединением по ключу и фильтром по пересечению"""
+    rng = np.random.default_rng(1)
+
+    def frame(n, prefix):
+        starts = pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 700, n), unit='D')
+        ends = pd.Series(starts + pd.to_timedelta(rng.integers(0, 200, n), unit='D')).where(rng.random(n) > 0.1)
+        return pd.DataFrame({
+            'key': rng.integers(0, 30, n),
+            f'{prefix}_start': starts.strftime('%Y-%m-%d'),
+            f'{prefix}_end': ends.dt.strftime('%Y-%m-%d'),
+            f'{prefix}_id': range(n),
+        })
+
+    left, right = frame(1000, 'l'), frame(300, 'r')
+    # Маленький max_pairs проверяет обработку пакетами
+    result = interval_join(left, right, ['key'], ('l_start', 'l_end'), ('r_start', 'r_end'), max_pairs=50)
+
+    merged = left.merge(right, on='key')
+    open_end = pd.Timestamp.max
+    l_start, l_end = pd.to_datetime(merged['l_start']), pd.to_datetime(merged['l_end']).fillna(open_end)
+    r_start, r_end = pd.to_datetime(merged['r_start']), pd.to_datetime(merged['r_end']).fillna(open_end)
+    expected = merged[(r_end > l_start) & (r_start < l_end) & (r_end > r_start)]
+
+    assert len(result) == len(expected) > 0
+    assert set(zip(result['l_id'], result['r_id'])) == set(zip(expected['l_id'], expected['r_id']))
+
+
+def test_contract_history(tmp_path):
+    """Статус получает атрибуты договоров, действовавших в его период"""
+    df_history = pd.DataFrame({
+        'legal_unit_id': [1, 1, 1, 2],
+        'model_id': [666, 666, 666, 666],
+        'lease_id': [0, 10, 0, 0],
+        'status_sequence': [1, 2, 3, 1],
+        'status_start_date': ['2024-01-01', '2024-02-01', '2024-06-01', '2024-01-01'],
+        'status_end_date': ['2024-01-31', '2024-05-31', None, None],
+    })
+    df_tenants = pd.DataFrame({
+        'legal_unit_id': [1, 1],
+        'model_id': [666, 666],
+        'lease_id': [10, 11],
+        'billing_start': ['2024-02-15', '2024-07-01'],
+        'billing_end': ['2024-05-31', '2025-06-30'],
+        'brand_name': ['Бренд А', 'Бренд Б'],
+        'renovation_days': [14, 30],
+    })
+
+    processor = HistoryProcessor(data_dir=tmp_path, output_dir=tmp_path)
+    result = processor.create_contract_history(df_history, df_tenants)
+
+    assert list(result['status_sequence']) == [1, 2, 3, 1]
+    assert result['contract_lease_id'].tolist() == [pd.NA, 10, 11, pd.NA]
+    assert result.loc[1, 'brand_name'] == 'Бренд А'
+
+
+def test_contract_history_inclusive_status_end(tmp_path):
+    """Однодневный статус и договор, начинающийся в последний день статуса, сопоставляются"""
+    df_history = pd.DataFrame({
+        'legal_unit_id': [1, 1, 2],
+        'model_id': 666,
+        'lease_id': [0, 10, 0],
+        'status_sequence': [1, 2, 1],
+        'status_start_date': ['2024-03-05', '2024-03-06', '2024-01-01'],
+        'status_end_date': ['2024-03-05', None, '2024-02-14'],
+    })
+    df_tenants = pd.DataFrame({
+        'legal_unit_id': [1, 2, 2],
+        'model_id': 666,
+        'lease_id': [10, 20, 21],
+        'billing_start': ['2024-03-01', '2024-02-14', '2024-02-15'],
+        'billing_end': ['2024-12-31', '2024-12-31', '2024-12-31'],
+    })
+
+    processor = HistoryProcessor(data_dir=tmp_path, output_dir=tmp_path)
+    result = processor.create_contract_history(df_history, df_tenants)
+
+    assert result['contract_lease_id'].tolist() == [10, 10, 20]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
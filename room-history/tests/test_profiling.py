@@ -0,0 +1,118 @@
+# tests/test_profiling.py
+"""
+Тесты профилирования стадий
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from src.utils.helpers import add_stage_hook, remove_stage_hook, track
+    from src.utils.profiling import DeterministicProfiler, SamplingProfiler
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+def busy_inner(seconds: float):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+
+def busy_outer():
+    with track('test.inner'):
+        busy_inner(0.15)
+    busy_inner(0.05)
+
+
+@pytest.fixture
+def hooked():
+    profilers = []
+
+    def attach(profiler):
+        add_stage_hook(profiler)
+        profiler.start()
+        profilers.append(profiler)
+        return profiler
+
+    yield attach
+    for profiler in profilers:
+        remove_stage_hook(profiler)
+        profiler.stop()
+
+
+def test_sampling_profiler_per_stage(tmp_path, hooked):
+    profiler = hooked(SamplingProfiler(interval=0.002))
+    with track('test.outer'):
+        busy_outer()
+    with track('test.idle'):
+        pass
+    profiler.stop()
+
+    outer, inner = profiler.samples['test.outer'], profiler.samples['test.inner']
+    # Стек вложенной стадии засчитывается и родительской
+    assert sum(outer.values()) > sum(inner.values()) > 0
+    assert all('busy_inner' in stack for stack in inner)
+    assert any(stack.endswith(f"busy_inner ({Path(__file__).name}:{busy_inner.__code__.co_firstlineno})")
+               for stack in outer)
+
+    paths = profiler.write(tmp_path)
+    assert {p.name for p in paths} >= {'test.outer.collapsed', 'test.inner.speedscope.json'}
+    line = (tmp_path / 'test.inner.collapsed').read_text(encoding='utf-8').splitlines()[0]
+    assert line.rsplit(' ', 1)[1].isdigit()
+
+    speedscope = json.loads((tmp_path / 'test.inner.speedscope.json').read_text(encoding='utf-8'))
+    profile = speedscope['profiles'][0]
+    assert profile['type'] == 'sampled' and len(profile['samples']) == len(profile['weights'])
+    assert max(max(sample) for sample in profile['samples']) < len(speedscope['shared']['frames'])
+
+
+def test_deterministic_profiler_top(tmp_path, hooked):
+    profiler = hooked(DeterministicProfiler(top=5))
+    with track('test.outer'):
+        busy_outer()
+    with track('test.outer'):
+        busy_inner(0.01)
+
+    outer = {func[2]: stat for func, stat in profiler.stats['test.outer'].stats.items()}
+    inner = {func[2]: stat for func, stat in profiler.stats['test.inner'].stats.items()}
+    # Родительская стадия включает вызовы вложенной; повторные вызовы стадии суммируются
+    assert outer['busy_inner'][1] == 3
+    assert inner['busy_inner'][1] == 1
+
+    profiler.write(tmp_path)
+    report = (tmp_path / 'test.outer.top.txt').read_text(encoding='utf-8')
+    assert 'busy_inner' in report
+    assert (tmp_path / 'test.inner.prof').stat().st_size > 0
+
+
+def test_profiling_from_environment(tmp_path):
+    script = (
+        "import sys; sys.path.insert(0, '.')\n"
+        "from src.utils.helpers import configure_metrics, track\n"
+        f"configure_metrics({str(tmp_path / 'metrics.jsonl')!r})\n"
+        "import time\n"
+        "with track('env.stage'):\n"
+        "    deadline = time.perf_counter() + 0.1\n"
+        "    while time.perf_counter() < deadline: pass\n"
+    )
+    env = dict(os.environ, PIPELINE_PROFILE='sample', PIPELINE_PROFILE_INTERVAL_MS='2')
+    subprocess.run([sys.executable, '-c', script], cwd=project_root, env=env, check=True, capture_output=True)
+    [run_dir] = (tmp_path / 'profiles').iterdir()
+    assert (run_dir / 'env.stage.collapsed').exists()
+
+    env['PIPELINE_PROFILE_RATE'] = '0'
+    subprocess.run([sys.executable, '-c', script.replace('metrics.jsonl', 'off/metrics.jsonl')],
+                   cwd=project_root, env=env, check=True, capture_output=True)
+    assert not (tmp_path / 'off' / 'profiles').exists()
@@ -0,0 +1,181 @@
+# tests/test_query_cache.py
+"""
+Тесты кэша результатов запросов
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from src.database.db_connector import SQLServerConnector
+    from src.database.query_cache import QueryCache, cache_key, normalize_sql, referenced_tables
+    from src.database.sqlite_connector import SQLiteConnector
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+def test_normalization_and_tables():
+    """Комментарии и пробелы не влияют на ключ, литералы - влияют"""
+    query = """
+        -- мастер-справочник
+        SELECT h.model_id, u.unit_id
+        FROM   [dbo].[tbl_crm_status_hist] h  /* история */
+        JOIN business_units u ON u.unit_id = h.unit_id
+        WHERE h.crm_status = 'Свободен  '
+    """
+    compact = "SELECT h.model_id, u.unit_id FROM [dbo].[tbl_crm_status_hist] h " \
+              "JOIN business_units u ON u.unit_id = h.unit_id WHERE h.crm_status = 'Свободен  '"
+    assert normalize_sql(query) == compact
+    assert cache_key(query, (1,), 'v1') == cache_key(compact, (1,), 'v1')
+    assert cache_key(query, (1,), 'v1') != cache_key(query, (1,), 'v2')
+    assert referenced_tables(query) == ['business_units', 'dbo.tbl_crm_status_hist']
+
+
+def test_connector_cache_hit_and_invalidation(tmp_path):
+    """Повторный запрос берется из кэша, изменение базы делает запись неактуальной"""
+    connector = SQLiteConnector(tmp_path / 'source.sqlite')
+    connector.bulk_load(pd.DataFrame({'id': range(5), 'name': list('абвгд')}), 'items')
+    cache = connector.enable_query_cache(tmp_path / 'cache')
+
+    query = 'SELECT * FROM items ORDER BY id'
+    first = connector.execute_query(query)
+    second = connector.execute_query(query)
+    pd.testing.assert_frame_equal(first, second)
+    assert list(cache.stats.values()) == [{'hits': 1, 'misses': 1}]
+
+    connector.bulk_load(pd.DataFrame({'id': [5], 'name': ['е']}), 'items')
+    assert len(connector.execute_query(query)) == 6
+    assert list(cache.stats.values()) == [{'hits': 1, 'misses': 2}]
+
+    # Кэш переживает пересоздание объекта
+    reopened = QueryCache(tmp_path / 'cache')
+    assert len(reopened._index) == 2
+
+
+def test_update_with_same_row_count_invalidates(tmp_path):
+    """UPDATE без изменения числа строк не возвращает устаревший результат"""
+    connector = SQLiteConnector(tmp_path / 'source.sqlite')
+    connector.bulk_load(pd.DataFrame({'id': range(3), 'name': list('абв')}), 'items')
+    connector.enable_query_cache(tmp_path / 'cache')
+
+    query = 'SELECT name FROM items ORDER BY id'
+    assert list(connector.execute_query(query)['name']) == list('абв')
+    with connector.get_connection() as conn:
+        conn.execute("UPDATE items SET name = 'я' WHERE id = 0")
+        conn.commit()
+    assert list(connector.execute_query(query)['name']) == list('ябв')
+
+
+class MetadataServer:
+    """Метаданные SQL Server для _source_version (change tracking, usage stats, sys.partitions)"""
+
+    def __init__(self, ct_version=None, tracked_tables=0, last_update=None, view_server_state=True):
+        self.ct_version = ct_version
+        self.tracked_tables = tracked_tables
+        self.last_update = last_update
+        self.view_server_state = view_server_state
+        self.rows = 3
+        self.name = 'а'
+
+    def update(self, version: int, name: str):
+        """UPDATE одной строки: число строк не меняется"""
+        self.name = name
+        if self.ct_version is not None:
+            self.ct_version = version
+        if self.last_update is not None:
+            self.last_update = f'2024-01-0{version} 10:00:00'
+
+    def cursor(self):
+        server = self
+
+        class Cursor:
+            def execute(self, sql, *params):
+                if 'dm_db_index_usage_stats' in sql:
+                    if not server.view_server_state:
+                        raise PermissionError('VIEW SERVER STATE permission was denied')
+                    self.row = (server.last_update,)
+                else:
+                    self.row = (server.ct_version, server.tracked_tables, server.rows)
+
+            def fetchone(self):
+                return self.row
+
+        return Cursor()
+
+
+@pytest.mark.parametrize('server, cached', [
+    (MetadataServer(ct_version=1, tracked_tables=1), True),
+    (MetadataServer(last_update='2024-01-01 10:00:00'), True),
+    # Change tracking включен в базе, но не для таблицы; нет VIEW SERVER STATE
+    (MetadataServer(ct_version=1, tracked_tables=0, view_server_state=False), False),
+])
+def test_sql_server_version_requires_change_signal(tmp_path, monkeypatch, server, cached):
+    # Без __init__: движку SQLAlchemy нужен драйвер ODBC, а проверяется только кэш
+    connector = SQLServerConnector.__new__(SQLServerConnector)
+    connector.enable_query_cache(tmp_path / 'cache')
+
+    @contextmanager
+    def get_connection():
+        yield server
+
+    monkeypatch.setattr(connector, 'get_connection', get_connection)
+    query = 'SELECT name FROM dbo.tbl_crm_status_hist'
+    execute = lambda: pd.DataFrame({'name': [server.name]})
+
+    assert connector._cached(query, None, execute)['name'][0] == 'а'
+    assert (connector._source_version(query) is not None) == cached
+    server.update(2, 'б')
+    assert connector._cached(query, None, execute)['name'][0] == 'б'
+
+
+def test_counts_from_threads(tmp_path):
+    """Попадания из потоков пула не теряются"""
+    cache = QueryCache(tmp_path / 'cache')
+    df = pd.DataFrame({'value': [1]})
+    cache.fetch('SELECT 1', None, 'v1', lambda: df)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: cache.fetch('SELECT 1', None, 'v1', lambda: df), range(200)))
+    assert list(cache.stats.values()) == [{'hits': 200, 'misses': 1}]
+
+
+def test_lru_eviction(tmp_path):
+    """При превышении лимита удаляется давно не использованная запись"""
+    cache = QueryCache(tmp_path / 'cache', max_bytes=10 ** 9)
+    df = pd.DataFrame({'value': range(1000)})
+    for key in ('a', 'b', 'c'):
+        cache.put(key, df)
+    cache.get('a')
+
+    cache.max_bytes = cache.total_bytes
+    cache.put('d', df)
+
+    assert set(cache._index) == {'a', 'c', 'd'}
+    assert not list((tmp_path / 'cache').glob('b.*'))
+
+
+def test_hit_does_not_rewrite_index(tmp_path):
+    """Попадание меняет время обращения только в памяти; индекс пишется при put"""
+    cache = QueryCache(tmp_path / 'cache')
+    df = pd.DataFrame({'value': [1]})
+    cache.put('a', df)
+    index_path = tmp_path / 'cache' / 'index.json'
+    saved = index_path.read_text(encoding='utf-8')
+
+    assert cache.get('a').equals(df)
+    assert index_path.read_text(encoding='utf-8') == saved
+
+    last_access = cache._index['a']['last_access']
+    cache.put('b', df)
+    assert QueryCache(tmp_path / 'cache')._index['a']['last_access'] == last_access
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,182 @@
+# tests/test_query_pool.py
+"""
+Тесты параллельного выполнения запросов (submit/gather) и DBExtractor.extract_all
+"""
+
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from benchmarks.bench_pipeline import prepare_workspace
+    from src.database.db_connector import SQLServerConnector
+    from src.database.sqlite_connector import SQLiteConnector
+    from src.etl.db_extractor import DBExtractor
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+# Запрос, выполняющийся несколько секунд (рекурсивный CTE)
+SLOW_QUERY = """
+WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 200000000)
+SELECT COUNT(*) AS cnt FROM n
+"""
+
+
+@pytest.fixture
+def connector(tmp_path):
+    connector = SQLiteConnector(tmp_path / 'source.sqlite')
+    connector.bulk_load(pd.DataFrame({'id': range(100)}), 'numbers')
+    yield connector
+    connector.close_pool()
+
+
+def test_submit_gather_keeps_order(connector):
+    """Результаты возвращаются в порядке задач"""
+    futures = [connector.submit(f'SELECT COUNT(*) AS cnt FROM numbers WHERE id < {limit}')
+               for limit in (10, 50, 100)]
+    results = connector.gather(futures)
+    assert [df['cnt'].iloc[0] for df in results] == [10, 50, 100]
+    assert all(future.task.wall_s is not None for future in futures)
+
+
+def test_first_failure_cancels_others(connector):
+    """Ошибка одного запроса прерывает выполняющийся и отменяет ожидающие"""
+    connector.max_workers = 2
+    slow = connector.submit(SLOW_QUERY, name='slow')
+    time.sleep(0.2)
+    failing = connector.submit('SELECT * FROM missing_table', name='failing')
+    # Освободившийся после ошибки поток может успеть взять queued: запрос медленный,
+    # чтобы он не завершился раньше отмены ни из очереди, ни при выполнении
+    queued = connector.submit(SLOW_QUERY, name='queued')
+
+    start = time.perf_counter()
+    with pytest.raises(Exception, match='missing_table'):
+        connector.gather([slow, failing, queued])
+
+    assert time.perf_counter() - start < 5
+    assert slow.task.cancelled and queued.task.cancelled
+    assert queued.cancelled() or queued.exception() is not None
+
+
+class BlockingCursor:
+    """Курсор pyodbc, запрос которого выполняется до вызова cancel()"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.cancelled = threading.Event()
+
+    def execute(self, query, *params):
+        self.started.set()
+        if self.cancelled.wait(5):
+            raise RuntimeError('Operation canceled')
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def close(self):
+        pass
+
+
+@pytest.mark.filterwarnings('ignore:pandas only supports SQLAlchemy')
+def test_sql_server_cancel_interrupts_running_query(monkeypatch):
+    """Отмена задачи прерывает выполняющийся запрос SQL Server через cursor.cancel()"""
+    cursor = BlockingCursor()
+    connection = types.SimpleNamespace(cursor=lambda: cursor, close=lambda: None, rollback=lambda: None)
+    monkeypatch.setitem(sys.modules, 'pyodbc', types.SimpleNamespace(connect=lambda _: connection, Error=OSError))
+
+    # Без __init__: движку SQLAlchemy нужен драйвер ODBC
+    connector = SQLServerConnector.__new__(SQLServerConnector)
+    connector.server, connector.database, connector.connection_string = 'sql', 'BI', ''
+    connector.fetch_engine = 'pandas'
+    future = connector.submit('SELECT * FROM tbl_crm_status_hist', name='history')
+    assert cursor.started.wait(5)
+
+    start = time.perf_counter()
+    connector.cancel([future])
+    with pytest.raises(Exception, match='Operation canceled'):
+        future.result(timeout=5)
+    assert time.perf_counter() - start < 2
+    connector.close_pool()
+
+
+def test_extract_all_parallel_matches_sequential(tmp_path):
+    """Параллельное извлечение дает те же файлы, что последовательное"""
+    paths = prepare_workspace(tmp_path / 'ws', rows=500)
+    connector = SQLiteConnector(paths['db'])
+
+    outputs = {}
+    for parallel in (False, True):
+        output_dir = tmp_path / f'raw_{parallel}'
+        extractor = DBExtractor(connector=connector, sql_dir=str(paths['sql']), output_dir=str(output_dir))
+        results = extractor.extract_all(parallel=parallel)
+        assert set(results) == {'master_reference', 'history', 'tenants', 'models'}
+        outputs[parallel] = {path.name: path.read_bytes() for path in output_dir.glob('*.csv')}
+
+    connector.close_pool()
+    assert outputs[True] == outputs[False]
+    assert 'extract_tenants.csv' in outputs[True]
+
+
+def test_history_overlaps_tenants(tmp_path):
+    """Арендаторы ждут только мастер-справочник, а не выгрузку истории"""
+    paths = prepare_workspace(tmp_path / 'ws', rows=300)
+    connector = SQLiteConnector(paths['db'])
+    extractor = DBExtractor(connector=connector, sql_dir=str(paths['sql']), output_dir=str(tmp_path / 'raw'))
+    tenants_started = threading.Event()
+    extract_history, extract_tenants = extractor.extract_history, extractor.extract_tenants_with_placeholder
+
+    def history():
+        assert tenants_started.wait(5), "арендаторы не начались до окончания истории"
+        return extract_history()
+
+    def tenants():
+        tenants_started.set()
+        return extract_tenants()
+
+    extractor.extract_history, extractor.extract_tenants_with_placeholder = history, tenants
+    results = extractor.extract_all(parallel=True)
+    connector.close_pool()
+    assert set(results) == {'master_reference', 'history', 'tenants', 'models'}
+    assert (tmp_path / 'raw' / 'extract_history.csv').exists()
+
+
+def test_master_failure_cancels_history(tmp_path):
+    paths = prepare_workspace(tmp_path / 'ws', rows=300)
+    connector = SQLiteConnector(paths['db'])
+    extractor = DBExtractor(connector=connector, sql_dir=str(paths['sql']), output_dir=str(tmp_path / 'raw'))
+    def master():
+        raise RuntimeError('master failed')
+
+    extractor.get_master_reference = master
+    # Выполняющаяся задача без подключения не прерывается - gather дожидается ее окончания
+    extractor.extract_history = lambda: time.sleep(0.3)
+    extractor.extract_tenants_with_placeholder = lambda: pytest.fail('арендаторы без мастер-справочника')
+    with pytest.raises(RuntimeError, match='master failed'):
+        extractor.extract_all(parallel=True)
+    connector.close_pool()
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_history_failure_fails_extract_all(tmp_path, parallel):
+    """Ошибка запроса истории не превращается в пустую выгрузку"""
+    paths = prepare_workspace(tmp_path / 'ws', rows=300)
+    (paths['sql'] / 'extract_history.sql').write_text('SELECT * FROM missing_history', encoding='utf-8')
+    connector = SQLiteConnector(paths['db'])
+    extractor = DBExtractor(connector=connector, sql_dir=str(paths['sql']), output_dir=str(tmp_path / 'raw'))
+
+    with pytest.raises(Exception, match='missing_history'):
+        extractor.extract_all(parallel=parallel)
+    connector.close_pool()
+    assert not (tmp_path / 'raw' / 'extract_history.csv').exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
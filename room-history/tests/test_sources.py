@@ -0,0 +1,158 @@
+# tests/test_sources.py
+"""
+Тесты параллельной выгрузки из нескольких источников (SQLite вместо региональных БД)
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import pandas as pd
+    from benchmarks.bench_pipeline import prepare_workspace
+    from src.database.db_connector import parse_sources
+    from src.database.sqlite_connector import SQLiteConnector
+    from src.etl.db_extractor import DBExtractor
+    from src.etl.sources import SOURCE_COLUMN, MultiSourceExtractor
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+@pytest.fixture(scope='module')
+def workspaces(tmp_path_factory):
+    root = tmp_path_factory.mktemp('sources')
+    # У регионов свои ТРЦ и договоры: помещения и lease_id источников не пересекаются
+    return {name: prepare_workspace(root / name, rows=1500, seed=seed, first_legal_entity=first, lease_offset=offset)
+            for name, seed, first, offset in (('msk', 1, 1, 0), ('spb', 2, 6, 1000000), ('ekb', 3, 11, 0))}
+
+
+def single_source(paths, output_dir):
+    extractor = DBExtractor(connector=SQLiteConnector(paths['db']), sql_dir=str(paths['sql']),
+                            output_dir=str(output_dir))
+    extractor.extract_all(parallel=False)
+    return pd.read_csv(output_dir / 'extract_history.csv', dtype=str, keep_default_na=False)
+
+
+def test_merge_tags_rows_with_source(tmp_path, workspaces):
+    connectors = {name: SQLiteConnector(workspaces[name]['db']) for name in ('msk', 'spb')}
+    extractor = MultiSourceExtractor(connectors, sql_dir=str(workspaces['msk']['sql']), output_dir=str(tmp_path / 'raw'))
+    results = extractor.extract_all()
+    assert {name: result['status'] for name, result in results.items()} == {'msk': 'ok', 'spb': 'ok'}
+    assert not list((tmp_path / 'raw' / 'sources' / '.staging').iterdir())
+
+    history = pd.read_csv(tmp_path / 'raw' / 'extract_history.csv', dtype=str, keep_default_na=False)
+    assert history.columns[0] == SOURCE_COLUMN
+    for name in ('msk', 'spb'):
+        paths = workspaces[name]
+        expected = single_source(paths, tmp_path / f'single_{name}')
+        part = history[history[SOURCE_COLUMN] == name].drop(columns=SOURCE_COLUMN).reset_index(drop=True)
+        pd.testing.assert_frame_equal(part, expected)
+        assert (tmp_path / 'raw' / 'sources' / f'source={name}' / 'extract_tenants.csv').exists()
+
+    # Справочник - объединение без повторов и без колонки источника
+    statuses = pd.read_csv(tmp_path / 'raw' / 'ref_crm_status.csv')
+    assert list(statuses.columns) == ['crm_status'] and not statuses['crm_status'].duplicated().any()
+    assert set(statuses['crm_status']) == set(history['crm_status'])
+    extractor.close()
+
+
+def test_failed_source_keeps_previous_partition(tmp_path, workspaces):
+    output_dir = tmp_path / 'raw'
+    connectors = {name: SQLiteConnector(workspaces[name]['db']) for name in ('msk', 'spb')}
+    MultiSourceExtractor(connectors, sql_dir=str(workspaces['msk']['sql']), output_dir=str(output_dir)).extract_all()
+    before = pd.read_csv(output_dir / 'extract_history.csv')
+
+    connectors['spb'] = SQLiteConnector(tmp_path / 'missing' / 'spb.sqlite')
+    connectors['ekb'] = SQLiteConnector(tmp_path / 'missing' / 'ekb.sqlite')
+    results = MultiSourceExtractor(connectors, sql_dir=str(workspaces['msk']['sql']),
+                                   output_dir=str(output_dir)).extract_all()
+    assert [results[name]['status'] for name in ('msk', 'spb', 'ekb')] == ['ok', 'failed', 'failed']
+
+    # spb - предыдущая выгрузка из партиции, у ekb партиции нет
+    after = pd.read_csv(output_dir / 'extract_history.csv')
+    pd.testing.assert_frame_equal(after, before)
+    assert not (output_dir / 'sources' / 'source=ekb').exists()
+
+
+class FailingTenantsConnector(SQLiteConnector):
+    """Выгрузка арендаторов завершается ошибкой после выгрузки истории и справочников"""
+
+    def execute_query(self, query: str, *args, **kwargs):
+        if 'business_units' in query:
+            raise RuntimeError('таймаут запроса')
+        return super().execute_query(query, *args, **kwargs)
+
+
+def test_partially_failed_source_keeps_whole_partition(tmp_path, workspaces):
+    """Новая история не смешивается с арендаторами и справочниками предыдущей выгрузки"""
+    output_dir = tmp_path / 'raw'
+    sql_dir = str(workspaces['msk']['sql'])
+    MultiSourceExtractor({'spb': SQLiteConnector(workspaces['spb']['db'])}, sql_dir=sql_dir,
+                         output_dir=str(output_dir)).extract_all(parallel=False)
+    partition = output_dir / 'sources' / 'source=spb'
+    before = {path.name: path.read_bytes() for path in partition.glob('*.csv')}
+
+    extractor = MultiSourceExtractor({'spb': FailingTenantsConnector(workspaces['msk']['db'])}, sql_dir=sql_dir,
+                                     output_dir=str(output_dir))
+    results = extractor.extract_all(parallel=False)
+    assert results['spb']['status'] == 'failed'
+    assert {path.name: path.read_bytes() for path in partition.glob('*.csv')} == before
+    assert not (output_dir / 'sources' / '.staging' / 'source=spb').exists()
+
+
+def test_overlapping_sources_fail_merge(tmp_path, workspaces):
+    """Одни и те же помещения в двух источниках не объединяются в одну цепочку"""
+    output_dir = tmp_path / 'raw'
+    paths = workspaces['msk']
+    connectors = {name: SQLiteConnector(paths['db']) for name in ('msk', 'msk_copy')}
+    extractor = MultiSourceExtractor(connectors, sql_dir=str(paths['sql']), output_dir=str(output_dir))
+
+    with pytest.raises(ValueError, match='extract_history.csv.*пересекаются'):
+        extractor.extract_all()
+    assert not list(output_dir.glob('*.csv'))
+    extractor.close()
+
+
+def test_overlapping_lease_ids_fail_merge(tmp_path, workspaces):
+    """Разные помещения с одинаковыми lease_id не объединяются в один договор"""
+    output_dir = tmp_path / 'raw'
+    connectors = {name: SQLiteConnector(workspaces[name]['db']) for name in ('msk', 'ekb')}
+    extractor = MultiSourceExtractor(connectors, sql_dir=str(workspaces['msk']['sql']), output_dir=str(output_dir))
+
+    with pytest.raises(ValueError, match=r"extract_tenants.csv.*\['lease_id'\]"):
+        extractor.extract_all()
+    assert not list(output_dir.glob('*.csv'))
+    extractor.close()
+
+
+def test_conflicting_reference_fails_merge(tmp_path):
+    """Модель с разными атрибутами в источниках - ошибка, одинаковые строки объединяются"""
+    extractor = MultiSourceExtractor({'msk': None, 'spb': None}, output_dir=str(tmp_path / 'raw'))
+    for name, year in (('msk', 2024), ('spb', 2025)):
+        extractor.partition_dir(name).mkdir(parents=True)
+        pd.DataFrame({'model_id': [666, 1001], 'forecast_year': [0, year]}).to_csv(
+            extractor.partition_dir(name) / 'ref_model.csv', index=False)
+
+    with pytest.raises(ValueError, match='ref_model.csv'):
+        extractor.merge()
+
+    (extractor.partition_dir('spb') / 'ref_model.csv').write_text('model_id,forecast_year\n666,0\n')
+    assert extractor.merge() == {'ref_model.csv': 2}
+
+
+def test_parse_sources():
+    assert parse_sources('msk=sql-msk/BI_MSK, spb=sql-spb/BI_SPB') == {
+        'msk': ('sql-msk', 'BI_MSK'), 'spb': ('sql-spb', 'BI_SPB')}
+    assert parse_sources('') == {}
+    with pytest.raises(ValueError):
+        parse_sources('msk=sql-msk')
+    with pytest.raises(ValueError):
+        parse_sources('msk=a/b,msk=c/d')
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
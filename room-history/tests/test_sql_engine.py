@@ -0,0 +1,98 @@
+# tests/test_sql_engine.py
+"""
+Тесты встроенного SQL-движка над обработанными наборами и витриной
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import pandas as pd
+    from src.utils.csv_writer import write_csv
+    from src.utils.sql_engine import DatasetEngine, duckdb_type, resolve_engine
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+def _engines():
+    engines = ['sqlite']
+    try:
+        import duckdb  # noqa: F401
+        engines.append('duckdb')
+    except ImportError:
+        pass
+    return engines
+
+
+@pytest.fixture
+def directories(tmp_path):
+    processed, mart = tmp_path / 'processed', tmp_path / 'output' / 'mart'
+    history = pd.DataFrame({
+        'unit_id': [f'0{i % 7}' for i in range(40)],
+        'legal_entity': ['ООО Альфа', 'ООО Бета'] * 20,
+        'area': [10.5 + i for i in range(40)],
+        'is_free': [i % 3 == 0 for i in range(40)],
+        'comment': ['x' * 20] * 40,
+    })
+    write_csv(history, processed / 'processed_history.csv')
+    write_csv(pd.DataFrame({'unit_id': [f'0{i}' for i in range(7)], 'floor': range(7)}), mart / 'dim_room.csv')
+    # Файл без записи каталога - колонки определяются по заголовку
+    pd.DataFrame({'unit_id': ['00'], 'note': ['a']}).to_csv(mart / 'notes.csv', index=False)
+    return {'processed': processed, 'mart': mart}, history
+
+
+@pytest.mark.parametrize('engine', _engines())
+def test_join_and_aggregate_match_pandas(directories, engine):
+    dirs, history = directories
+    sql = ("SELECT h.legal_entity, SUM(h.area) AS area, COUNT(*) AS units "
+           "FROM processed_history h JOIN dim_room d ON d.unit_id = h.unit_id "
+           "WHERE d.floor >= ? AND h.is_free GROUP BY h.legal_entity ORDER BY h.legal_entity")
+    with DatasetEngine(dirs, engine=engine) as sql_engine:
+        assert sql_engine.table_names() == ['dim_room', 'notes', 'processed_history']
+        result = sql_engine.query(sql, (2,))
+
+    rooms = pd.DataFrame({'unit_id': [f'0{i}' for i in range(7)], 'floor': range(7)})
+    merged = history.merge(rooms, on='unit_id')
+    merged = merged[(merged['floor'] >= 2) & merged['is_free']]
+    expected = merged.groupby('legal_entity').agg(area=('area', 'sum'), units=('area', 'size')).reset_index()
+    assert list(result['legal_entity']) == list(expected['legal_entity'])
+    assert list(result['area']) == pytest.approx(list(expected['area']))
+    assert [int(value) for value in result['units']] == list(expected['units'])
+
+
+@pytest.mark.parametrize('engine', _engines())
+def test_text_keys_keep_leading_zeros(directories, engine):
+    dirs, _ = directories
+    with DatasetEngine(dirs, engine=engine) as sql_engine:
+        result = sql_engine.query("SELECT DISTINCT unit_id FROM dim_room ORDER BY unit_id")
+    assert list(result['unit_id']) == [f'0{i}' for i in range(7)]
+
+
+def test_sqlite_loads_only_referenced_columns(directories):
+    dirs, _ = directories
+    with DatasetEngine(dirs, engine='sqlite') as sql_engine:
+        sql_engine.query("SELECT legal_entity, COUNT(*) AS n FROM processed_history GROUP BY legal_entity")
+        assert sql_engine._loaded == {'processed_history': {'legal_entity'}}
+        # Новые колонки догружаются к уже загруженным
+        sql_engine.query("SELECT area FROM processed_history")
+        assert sql_engine._loaded['processed_history'] == {'legal_entity', 'area'}
+        assert len(sql_engine.query("SELECT * FROM notes").columns) == 2
+
+
+def test_resolve_engine_and_types():
+    assert resolve_engine('sqlite') == 'sqlite'
+    assert resolve_engine('auto') in ('duckdb', 'sqlite')
+    with pytest.raises(ValueError):
+        resolve_engine('spark')
+    assert duckdb_type('int64') == 'BIGINT'
+    assert duckdb_type('datetime64[ns]') == 'TIMESTAMP'
+    assert duckdb_type('object') == 'VARCHAR'
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
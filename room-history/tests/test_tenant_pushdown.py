@@ -0,0 +1,47 @@
+# tests/test_tenant_pushdown.py
+"""
+Паритет расчета previous/future_tenant оконными функциями в БД и в Python
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from benchmarks.bench_pipeline import prepare_workspace
+    from src.database.sqlite_connector import SQLiteConnector
+    from src.etl.data_processor import HistoryProcessor
+    from src.etl.db_extractor import DBExtractor
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+
+def test_window_pushdown_matches_python(tmp_path):
+    """Результат process_history одинаков для расчета в SQLite и в Python"""
+    paths = prepare_workspace(tmp_path / 'ws', rows=3000, seed=7)
+    connector = SQLiteConnector(paths['db'])
+
+    processed = {}
+    for pushdown in (False, True):
+        raw_dir = tmp_path / f'raw_{pushdown}'
+        extractor = DBExtractor(connector=connector, sql_dir=str(paths['sql']),
+                                output_dir=str(raw_dir), tenant_pushdown=pushdown)
+        extractor.get_master_reference()
+        df_history = extractor.extract_history()
+        assert ('future_tenant' in df_history.columns) == pushdown
+
+        processor = HistoryProcessor(data_dir=raw_dir, output_dir=tmp_path / f'processed_{pushdown}')
+        processed[pushdown] = processor.process_history(processor.load_data())
+
+    python_result, sql_result = processed[False], processed[True]
+    assert sql_result['future_tenant'].notna().any() and sql_result['previous_tenant'].isna().any()
+    pd.testing.assert_frame_equal(sql_result[python_result.columns], python_result, check_dtype=False)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
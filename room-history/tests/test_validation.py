@@ -0,0 +1,143 @@
+# tests/test_validation.py
+"""
+Тесты проверки качества данных
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from src.etl.validation import (
+        ChainContinuityRule, CoverageRule, DataValidator, DomainRule, ForeignKeyRule, NoOverlapRule,
+        default_rules, validate_processed_data
+    )
+    from src.utils.data_generator import SyntheticDataGenerator
+except ImportError:
+    pytest.skip("Не удалось импортировать модули", allow_module_level=True)
+
+CHAIN = ['model_id', 'legal_entity', 'unit_id']
+
+
+def history_row(unit, seq, start, end, lease=0, model=666):
+    return {'model_id': model, 'legal_entity': 'ООО ТРЦ 1', 'unit_id': f'P-{unit}', 'lease_id': lease,
+            'status_sequence': seq, 'status_start_date': start, 'status_end_date': end}
+
+
+@pytest.fixture
+def tables():
+    history = pd.DataFrame([
+        # Помещение 1: корректная цепочка
+        history_row(1, 1, '2024-01-01', '2024-01-31', lease=10),
+        history_row(1, 2, '2024-02-01', None),
+        # Помещение 2: пропуск номера, разрыв дат и пересечение
+        history_row(2, 1, '2024-01-01', '2024-01-31'),
+        history_row(2, 3, '2024-03-01', '2024-03-31', lease=99),
+        history_row(2, 4, '2024-03-15', None),
+        # Помещение 3 отсутствует в справочнике
+        history_row(3, 1, '2024-01-01', None, model=7),
+    ])
+    return {
+        'history': history,
+        'ref_legal_unit': pd.DataFrame({'legal_unit_id': [1, 2], 'legal_entity': ['ООО ТРЦ 1'] * 2,
+                                        'unit_id': ['P-1', 'P-2']}),
+        'ref_lease': pd.DataFrame({'lease_id': [10.0, 11.0]}),
+        'ref_model': pd.DataFrame({'model_id': [666]}),
+        'tenants': pd.DataFrame({'lease_id': [10]}),
+        'expert': pd.DataFrame({'TrcShoppingMall': ['ТРЦ3', 'ТРЦ9', 'ТРЦ9', None]}),
+        'mapping_trc': pd.DataFrame({'crm': ['ТРЦ3'], 'legal_entity': ['ООО ТРЦ 1']}),
+        'source_ref_model': pd.DataFrame({'forecast_year': ['2025', None, 'все', 'мусор']}),
+    }
+
+
+def test_rules_report_violations(tables):
+    """Каждое правило находит свои нарушения"""
+    report = DataValidator(default_rules()).validate(tables)
+    counts = report.counts()
+
+    assert counts['history_chain_continuity'] == 3
+    assert counts['history_no_overlap'] == 1
+    assert counts['history_legal_unit_fk'] == 1
+    assert counts['history_lease_fk'] == 1
+    assert counts['history_model_fk'] == 1
+    assert counts['ref_lease_tenants_coverage'] == 1
+    assert counts['expert_mapping_trc_coverage'] == 1
+    assert counts['ref_model_forecast_year'] == 1
+    assert not report.ok
+
+    status = report.summary.set_index('rule')['status']
+    assert status['expert_legal_unit_fk'] == 'skipped'
+
+    coverage = report.violations[report.violations['rule'] == 'expert_mapping_trc_coverage']
+    assert coverage['detail'].iloc[0] == "'ТРЦ9' нет в mapping_trc (2 строк)"
+    continuity = report.violations[report.violations['rule'] == 'history_chain_continuity']
+    assert set(continuity['row']) == {3, 4}
+    assert continuity['key'].iloc[0] == '666|ООО ТРЦ 1|P-2'
+
+
+def test_max_examples_keeps_full_counts(tables):
+    report = DataValidator([ChainContinuityRule('chain', 'history', CHAIN, 'status_sequence',
+                                                'status_start_date', 'status_end_date')],
+                           max_examples=1).validate(tables)
+    assert report.counts()['chain'] == 3 and len(report.violations) == 1
+
+
+def test_open_interval_overlaps():
+    df = pd.DataFrame({'key': [1, 1, 2, 2], 'start': ['2024-01-01', '2024-06-01', '2024-01-01', '2024-02-01'],
+                       'end': [None, '2024-07-01', '2024-01-31', '2024-02-28']})
+    report = DataValidator([NoOverlapRule('overlap', 't', ['key'], 'start', 'end')]).validate({'t': df})
+    assert list(report.violations['row']) == [1]
+
+
+def test_synthetic_history_is_clean_and_sampling_keeps_chains():
+    """Синтетическая история без нарушений, выборка берет цепочки целиком"""
+    generator = SyntheticDataGenerator(units=200, models=3, statuses_per_unit=6, seed=5)
+    history = pd.concat([chunk['tbl_crm_status_hist'] for chunk in generator.iter_chunks()], ignore_index=True)
+    rules = [
+        ChainContinuityRule('chain', 'history', CHAIN, 'status_sequence', 'status_start_date', 'status_end_date'),
+        NoOverlapRule('overlap', 'history', CHAIN, 'status_start_date', 'status_end_date'),
+    ]
+
+    full = DataValidator(rules).validate({'history': history})
+    assert full.ok and full.violations.empty
+
+    sampled = DataValidator(rules, sample_fraction=0.25, seed=3).validate({'history': history})
+    checked = sampled.summary['rows_checked'].iloc[0]
+    assert 0 < checked < len(history) and checked % 6 == 0
+    assert sampled.ok
+
+
+def test_validate_processed_data_saves_report(tables, tmp_path):
+    raw, processed = tmp_path / 'raw', tmp_path / 'processed'
+    raw.mkdir()
+    processed.mkdir()
+    tables['history'].to_csv(processed / 'processed_history.csv', index=False)
+    tables['ref_legal_unit'].to_csv(processed / 'processed_ref_legal_unit.csv', index=False)
+    tables['ref_lease'].to_csv(raw / 'ref_lease.csv', index=False)
+
+    report = validate_processed_data(data_dir=raw, processed_dir=processed)
+
+    assert report.counts()['history_legal_unit_fk'] == 1
+    assert (processed / 'validation_violations.csv').exists()
+    summary = pd.read_csv(processed / 'validation_summary.csv')
+    assert (summary.set_index('rule').loc['tenants_lease_fk', 'status']) == 'skipped'
+
+
+def test_foreign_key_nulls_and_domain():
+    df = pd.DataFrame({'fk': [1, None, 3], 'year': ['2024', 'x', None]})
+    rules = [
+        ForeignKeyRule('fk', 't', ['fk'], 'ref', allow_null=False),
+        CoverageRule('cov', 't', ['fk'], 'ref'),
+        DomainRule('year', 't', 'year', numeric=True, allow_null=False),
+    ]
+    report = DataValidator(rules).validate({'t': df, 'ref': pd.DataFrame({'fk': [1]})})
+    assert report.counts() == {'fk': 2, 'cov': 1, 'year': 2}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])